@@ -7,8 +7,39 @@ Complete Professional Accounting System - Python 3.11 Compatible
 
 import os
 import json
+import base64
 import shutil
-from datetime import datetime, date
+import time
+import hashlib
+import functools
+import threading
+from datetime import datetime, date, timedelta
+from urllib.parse import urlsplit
+
+
+class StartupTimer:
+    """قياس زمن مراحل تشغيل العملية (الاستيراد، بناء التطبيق، قاعدة البيانات)"""
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.phases = []
+        self.reported = False
+
+    def mark(self, label):
+        now = time.perf_counter()
+        self.phases.append((label, (now - self.last) * 1000))
+        self.last = now
+
+    def report(self):
+        if self.reported:
+            return
+        self.reported = True
+        total = (time.perf_counter() - self.started) * 1000
+        breakdown = '، '.join(f'{label} {ms:.0f}' for label, ms in self.phases)
+        print(f"⏱️ زمن التشغيل: {total:.0f} ms ({breakdown})")
+
+
+startup_timer = StartupTimer()
 
 # إضافة دوال مساعدة لـ Jinja2
 def format_date(format_string='%Y-%m-%d'):
@@ -23,13 +54,24 @@ def zfill_number(number, width=3):
     """دالة لإضافة أصفار للرقم"""
     return str(number).zfill(width)
 from decimal import Decimal
-from flask import Flask, render_template_string, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, request, redirect, url_for, flash, jsonify, session, stream_with_context, abort
+from flask import before_render_template, template_rendered, g, has_request_context
+from jinja2 import BaseLoader, FileSystemBytecodeCache, TemplateNotFound
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sql_profiler import init_sql_profiler
+from green_db import enable_green_db
+from report_cache import ReportCache
+from live_updates import LiveUpdateCoalescer, stats_delta
+from rate_limiter import timer_wheel
+from translation_catalog import build_catalogs, build_js_bundles
+from migrate_database import schema_fingerprint, run_migration
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 
 # إضافة دعم WebSocket للتحديث الفوري
 try:
     from flask_socketio import SocketIO, emit, join_room, leave_room
+    from socketio_bus import create_message_bus
     SOCKETIO_AVAILABLE = True
     print("✅ Flask-SocketIO متاح - سيتم تفعيل التحديث الفوري")
 except ImportError:
@@ -77,6 +119,8 @@ except ImportError:
     IP_BLOCKER_ENABLED = False
     print("⚠️ نظام حظر IP غير متوفر")
 
+startup_timer.mark('imports')
+
 # إنشاء التطبيق
 app = Flask(__name__)
 
@@ -87,11 +131,22 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
 # تهيئة SocketIO للتحديث الفوري
 if SOCKETIO_AVAILABLE:
-    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
+    # ناقل رسائل بين العمليات حتى يصل التحديث الفوري لمتصفحات كل عمليات gunicorn
+    socketio_bus = create_message_bus(
+        os.environ.get('SOCKETIO_BUS', 'none'),
+        os.environ.get('DATABASE_URL'),
+        os.environ.get('SOCKETIO_BUS_DIR', os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'instance', 'socketio_bus'))
+    )
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', client_manager=socketio_bus)
     print("✅ تم تهيئة SocketIO للتحديث الفوري")
+    if socketio_bus is not None:
+        print(f"🔀 ناقل رسائل SocketIO بين العمليات: {socketio_bus.name}")
 else:
     socketio = None
+    socketio_bus = None
     print("⚠️ SocketIO غير متاح - لن يكون هناك تحديث فوري")
+startup_timer.mark('socketio')
 
 # إعدادات اللغات المتعددة
 app.config['LANGUAGES'] = {
@@ -140,11 +195,14 @@ if database_url:
     print(f"🐘 استخدام PostgreSQL في الإنتاج: {database_url.split('@')[1] if '@' in database_url else 'مخفي'}")
 
     # إعدادات خاصة بـ PostgreSQL
+    # مع عامل eventlet تتشارك مئات الخيوط الخضراء مجمع العملية الواحدة، فلا يصح max_overflow=0
+    # الحد: عدد العمليات × (DB_POOL_SIZE + DB_MAX_OVERFLOW) أقل من max_connections في الخادم
     app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
-        'pool_timeout': 20,
-        'max_overflow': 0
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10))
     }
 else:
     # في بيئة التطوير المحلي
@@ -175,6 +233,13 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 # قاعدة البيانات
 db = SQLAlchemy(app)
 
+# مراقبة استعلامات SQL لكل طلب (Server-Timing وكشف N+1 والطلبات البطيئة)
+init_sql_profiler(app)
+
+# الوصول التعاوني لقاعدة البيانات عند العمل بخيوط eventlet (انظر green_db.py)
+enable_green_db(app, db)
+startup_timer.mark('app setup')
+
 # نظام تسجيل الدخول
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -182,7 +247,16 @@ login_manager.login_view = 'login'
 
 # وظائف Babel للغات المتعددة - محسنة
 def get_locale():
-    """الحصول على اللغة الحالية من الجلسة أو الافتراضية"""
+    """الحصول على اللغة الحالية (تُحسب مرة واحدة لكل طلب وتُحفظ في g)"""
+    if not has_request_context():
+        return app.config.get('BABEL_DEFAULT_LOCALE', 'ar')
+    locale = g.get('locale')
+    if locale is None:
+        locale = g.locale = resolve_locale()
+    return locale
+
+def resolve_locale():
+    """تحديد اللغة من الجلسة أو المتصفح أو الافتراضية"""
     try:
         # التحقق من اللغة المحددة في الجلسة أولاً
         if 'language' in session:
@@ -284,27 +358,115 @@ TRANSLATIONS = {
     }
 }
 
+# فهرس مدمج لكل لغة (ملفات .po ثم TRANSLATIONS) يُبنى مرة واحدة لكل عملية
+try:
+    TRANSLATION_CATALOGS = build_catalogs(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translations'),
+        app.config['LANGUAGES'], overrides=TRANSLATIONS
+    )
+except Exception as e:
+    print(f"⚠️ تعذر تحميل ملفات الترجمة: {e}")
+    TRANSLATION_CATALOGS = {locale: dict(TRANSLATIONS.get(locale, {})) for locale in app.config['LANGUAGES']}
+
 def _(text):
     """وظيفة ترجمة بسيطة ومباشرة"""
-    try:
-        current_lang = get_locale()
-        if current_lang in TRANSLATIONS and text in TRANSLATIONS[current_lang]:
-            return TRANSLATIONS[current_lang][text]
-        return text
-    except:
-        return text
+    catalog = TRANSLATION_CATALOGS.get(get_locale())
+    return catalog.get(text, text) if catalog else text
 
 def translate_text(text, target_lang=None):
     """ترجمة نص إلى لغة محددة"""
-    try:
-        if target_lang is None:
-            target_lang = get_locale()
+    catalog = TRANSLATION_CATALOGS.get(target_lang or get_locale())
+    return catalog.get(text, text) if catalog else text
 
-        if target_lang in TRANSLATIONS and text in TRANSLATIONS[target_lang]:
-            return TRANSLATIONS[target_lang][text]
-        return text
-    except:
-        return text
+# مفاتيح واجهة JavaScript (تُضاف إلى حزم الترجمة فوق الفهرس المدمج)
+JS_TRANSLATIONS = {
+    'ar': {
+        'welcome': 'مرحباً',
+        'dashboard': 'لوحة التحكم',
+        'customers': 'العملاء',
+        'suppliers': 'الموردين',
+        'products': 'المنتجات',
+        'sales': 'المبيعات',
+        'employees': 'الموظفين',
+        'reports': 'التقارير',
+        'settings': 'الإعدادات',
+        'logout': 'تسجيل الخروج',
+        'add': 'إضافة',
+        'edit': 'تعديل',
+        'delete': 'حذف',
+        'save': 'حفظ',
+        'cancel': 'إلغاء',
+        'confirm': 'تأكيد',
+        'success': 'نجح',
+        'error': 'خطأ',
+        'warning': 'تحذير',
+        'info': 'معلومات',
+        'loading': 'جاري التحميل...',
+        'search': 'بحث',
+        'print': 'طباعة',
+        'export': 'تصدير',
+        'total': 'الإجمالي',
+        'date': 'التاريخ',
+        'name': 'الاسم',
+        'phone': 'الهاتف',
+        'email': 'البريد الإلكتروني',
+        'address': 'العنوان',
+        'price': 'السعر',
+        'quantity': 'الكمية',
+        'description': 'الوصف',
+        'category': 'الفئة',
+        'status': 'الحالة',
+        'actions': 'الإجراءات'
+    },
+    'en': {
+        'welcome': 'Welcome',
+        'dashboard': 'Dashboard',
+        'customers': 'Customers',
+        'suppliers': 'Suppliers',
+        'products': 'Products',
+        'sales': 'Sales',
+        'employees': 'Employees',
+        'reports': 'Reports',
+        'settings': 'Settings',
+        'logout': 'Logout',
+        'add': 'Add',
+        'edit': 'Edit',
+        'delete': 'Delete',
+        'save': 'Save',
+        'cancel': 'Cancel',
+        'confirm': 'Confirm',
+        'success': 'Success',
+        'error': 'Error',
+        'warning': 'Warning',
+        'info': 'Information',
+        'loading': 'Loading...',
+        'search': 'Search',
+        'print': 'Print',
+        'export': 'Export',
+        'total': 'Total',
+        'date': 'Date',
+        'name': 'Name',
+        'phone': 'Phone',
+        'email': 'Email',
+        'address': 'Address',
+        'price': 'Price',
+        'quantity': 'Quantity',
+        'description': 'Description',
+        'category': 'Category',
+        'status': 'Status',
+        'actions': 'Actions'
+    }
+}
+
+# حزم الترجمة للمتصفح، تُبنى مرة واحدة عند التشغيل من الفهرس نفسه
+TRANSLATION_BUNDLES = build_js_bundles(TRANSLATION_CATALOGS, extra=JS_TRANSLATIONS)
+TRANSLATION_BUNDLE_FILES = {bundle.filename: bundle for bundle in TRANSLATION_BUNDLES.values()}
+startup_timer.mark('translations')
+
+def translation_bundle_url(locale=None):
+    """رابط حزمة الترجمة للغة (يتغير مع كل تعديل في الترجمات)"""
+    bundle = TRANSLATION_BUNDLES.get(locale or get_locale()) or TRANSLATION_BUNDLES[app.config['BABEL_DEFAULT_LOCALE']]
+    return f'/i18n/{bundle.filename}'
 
 def get_current_language():
     """الحصول على اللغة الحالية"""
@@ -342,6 +504,8 @@ SOCKETIO_JS = '''
     socket.on('connect', function() {
         console.log('🔗 متصل بالخادم');
         socket.emit('join_room', {room: 'general'});
+        // غرفة الصفحة الحالية: يحدد الخادم الغرفة من المسار
+        socket.emit('subscribe', {path: location.pathname});
     });
 
     socket.on('disconnect', function() {
@@ -351,30 +515,178 @@ SOCKETIO_JS = '''
     socket.on('data_update', function(data) {
         console.log('📡 تحديث فوري:', data);
 
-        // إظهار إشعار للمستخدم
-        if (data.type === 'sales_invoice') {
-            showNotification('تم إضافة فاتورة مبيعات جديدة', 'success');
-        } else if (data.type === 'customer') {
+        // انتهاء مهمة في الخلفية: إشعار برابط التحميل دون إعادة تحميل الصفحة
+        if (data.type === 'job') {
+            const job = data.data;
+            if (typeof renderJob === 'function') {
+                renderJob(job);
+            }
+            // رسالة المهمة واسم الملف نصوص من المستخدم أو الاستثناء: تُعرض نصاً لا HTML
+            if (job.status === 'done') {
+                showNotification('اكتملت المهمة #' + job.id + (job.message ? ' - ' + job.message : ''), 'success',
+                    job.download_url ? {href: job.download_url, text: 'تحميل ' + job.result_name} : null);
+            } else {
+                showNotification('فشلت المهمة #' + job.id + ': ' + (job.message || ''), 'danger');
+            }
+            return;
+        }
+
+        // تغيّر حالة فواتير بالجملة (الترحيل الدوري للمتأخرة أو الحالة الجماعية): لا فروقات صفوف،
+        // فإشعار وإعادة تحميل واحدة لصفحة الفواتير المعنية
+        if (data.type === 'invoices_overdue' || data.type === 'invoices_status') {
+            applyInvoiceStatusChange(data.type, data.data);
+            return;
+        }
+
+        if (data.type !== 'batch') {
+            return;
+        }
+
+        // دفعة كبيرة جداً: إعادة تحميل واحدة بدلاً من تطبيق كل الفروقات
+        if (data.overflow) {
+            scheduleReload();
+            return;
+        }
+
+        const created = {};
+        data.events.forEach(function(event) {
+            applyRowDelta(event);
+            applyStatDeltas(event);
+            if (event.action === 'created') {
+                created[event.type] = (created[event.type] || 0) + 1;
+            }
+        });
+
+        // إظهار إشعار واحد لكل نوع في الدفعة
+        if (created.sales_invoice) {
+            showNotification(created.sales_invoice > 1 ?
+                'تم إضافة ' + created.sales_invoice + ' فواتير مبيعات جديدة' : 'تم إضافة فاتورة مبيعات جديدة', 'success');
+        }
+        if (created.customer) {
             showNotification('تم تحديث بيانات العملاء', 'info');
-        } else if (data.type === 'product') {
+        }
+        if (created.product) {
             showNotification('تم تحديث المنتجات', 'info');
         }
-
-        // إعادة تحميل الصفحة أو تحديث البيانات
-        setTimeout(() => {
-            location.reload();
-        }, 2000);
     });
 
-    function showNotification(message, type = 'info') {
-        // إنشاء إشعار بسيط
+    let reloadTimer = null;
+    function scheduleReload() {
+        if (!reloadTimer) {
+            reloadTimer = setTimeout(() => location.reload(), 2000);
+        }
+    }
+
+    // الصفحات التي تعرض حالة كل نوع من الفواتير
+    const INVOICE_STATUS_PAGES = {sale: ['/sales', '/dashboard'], purchase: ['/purchases']};
+    const INVOICE_STATUS_LABELS = {paid: 'مدفوعة', pending: 'معلقة', overdue: 'متأخرة'};
+
+    function applyInvoiceStatusChange(type, data) {
+        // الترحيل يرسل {sale: عدد، purchase: عدد}، والحالة الجماعية {type, status, count}
+        const counts = type === 'invoices_overdue' ? data : {[data.type]: data.count};
+        const status = type === 'invoices_overdue' ? 'overdue' : data.status;
+        let total = 0;
+        let shown = false;
+        Object.keys(counts).forEach(function(kind) {
+            if (!counts[kind]) return;
+            total += counts[kind];
+            if ((INVOICE_STATUS_PAGES[kind] || []).indexOf(location.pathname) !== -1) shown = true;
+        });
+        if (!total) return;
+        showNotification('تم تحويل ' + total + ' فاتورة إلى ' + (INVOICE_STATUS_LABELS[status] || status),
+            status === 'overdue' ? 'warning' : 'info');
+        if (shown) {
+            scheduleReload();
+        }
+    }
+
+    function formatLiveValue(value, format) {
+        if (format === 'money') {
+            return Number(value).toFixed(2) + ' ر.س';
+        }
+        return (value === null || value === undefined || value === '') ? '-' : value;
+    }
+
+    // تحديث صف في الجداول المعلمة بـ data-live-table، أو إضافته أو حذفه
+    function applyRowDelta(event) {
+        document.querySelectorAll('table[data-live-table="' + event.type + '"]').forEach(function(table) {
+            const tbody = table.tBodies[0];
+            const existing = tbody.querySelector('tr[data-row-id="' + event.id + '"]');
+
+            if (event.action === 'deleted') {
+                if (existing) existing.remove();
+                return;
+            }
+
+            let row = existing;
+            if (!row) {
+                // الصف غير معروض: يُضاف في أول الجدول فقط إذا لم تكن الصفحة مصفاة
+                if (table.dataset.liveInsert !== '1') return;
+                row = document.createElement('tr');
+                row.dataset.rowId = event.id;
+                row.className = 'table-success';
+                if (table.dataset.rowClassField) row.dataset.classField = table.dataset.rowClassField;
+                table.querySelectorAll('thead th').forEach(function(th) {
+                    const cell = document.createElement('td');
+                    if (th.dataset.field) {
+                        cell.dataset.field = th.dataset.field;
+                        if (th.dataset.format) cell.dataset.format = th.dataset.format;
+                    }
+                    row.appendChild(cell);
+                });
+                tbody.insertBefore(row, tbody.firstChild);
+            }
+
+            row.querySelectorAll('[data-field]').forEach(function(cell) {
+                if (cell.dataset.field in event.row) {
+                    cell.textContent = formatLiveValue(event.row[cell.dataset.field], cell.dataset.format);
+                }
+            });
+
+            // الأصناف التابعة للقيم (low-stock للصف، ولون شارة المخزون): data-class-field يحدد
+            // حقل الصنف، و data-live-class الصنف الحالي الذي يُستبدل
+            [row].concat(Array.from(row.querySelectorAll('[data-class-field]'))).forEach(function(el) {
+                const field = el.dataset.classField;
+                if (!field || !(field in event.row)) return;
+                if (el.dataset.liveClass) el.classList.remove(el.dataset.liveClass);
+                if (event.row[field]) el.classList.add(event.row[field]);
+                el.dataset.liveClass = event.row[field];
+            });
+        });
+    }
+
+    // تعديل بطاقات الإحصائيات بالفرق؛ data-branch و data-since تحصر البطاقة في فرع وفترة
+    function applyStatDeltas(event) {
+        Object.keys(event.stats || {}).forEach(function(name) {
+            document.querySelectorAll('[data-live-stat="' + name + '"]').forEach(function(el) {
+                if (el.dataset.branch && el.dataset.branch !== event.row.branch) return;
+                if (el.dataset.since && (event.row.date || '') < el.dataset.since) return;
+                const value = parseFloat(el.dataset.value || '0') + event.stats[name];
+                const decimals = parseInt(el.dataset.decimals || '0', 10);
+                el.dataset.value = value;
+                el.textContent = value.toFixed(decimals);
+            });
+        });
+    }
+
+    function showNotification(message, type = 'info', link = null) {
+        // إنشاء إشعار بسيط (الرسالة نص، والرابط الاختياري {href, text})
         const notification = document.createElement('div');
         notification.className = `alert alert-${type} alert-dismissible fade show position-fixed`;
         notification.style.cssText = 'top: 20px; right: 20px; z-index: 9999; min-width: 300px;';
-        notification.innerHTML = `
-            ${message}
-            <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
-        `;
+        notification.appendChild(document.createTextNode(message));
+        if (link) {
+            const anchor = document.createElement('a');
+            anchor.href = link.href;
+            anchor.className = 'd-block';
+            anchor.textContent = link.text;
+            notification.appendChild(anchor);
+        }
+        const closeButton = document.createElement('button');
+        closeButton.type = 'button';
+        closeButton.className = 'btn-close';
+        closeButton.dataset.bsDismiss = 'alert';
+        notification.appendChild(closeButton);
 
         document.body.appendChild(notification);
 
@@ -396,6 +708,7 @@ app.jinja_env.globals.update(
     now=datetime.now,
     _=_,  # وظيفة الترجمة المحسنة
     translate_text=translate_text,  # وظيفة الترجمة المباشرة
+    translation_bundle_url=translation_bundle_url,  # رابط حزمة ترجمة JavaScript
     get_locale=get_locale,  # الحصول على اللغة الحالية
     get_available_languages=get_available_languages,  # اللغات المتاحة
     get_current_branch=get_current_branch,  # الحصول على الفرع الحالي
@@ -405,6 +718,76 @@ app.jinja_env.globals.update(
     SOCKETIO_JS=SOCKETIO_JS  # JavaScript للتحديث الفوري
 )
 
+# ===== ذاكرة القوالب المترجمة =====
+# قوالب الصفحات نصوص ثابتة داخل الملف، لذلك تُترجم مرة واحدة لكل عملية بدلاً من كل طلب،
+# وتُحفظ الشيفرة المترجمة على القرص حتى تبدأ العمليات الجديدة جاهزة
+
+app.config['TEMPLATE_CACHE_DIR'] = os.environ.get(
+    'TEMPLATE_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'jinja_cache')
+)
+
+
+class InlineTemplateLoader(BaseLoader):
+    """محمل قوالب للنصوص المضمنة في الكود، يستخدم ذاكرة الشيفرة المترجمة للبيئة"""
+
+    def __init__(self):
+        self.sources = {}
+
+    def register(self, source):
+        """تسجيل نص قالب وإرجاع اسمه المشتق من محتواه
+
+        الامتداد .html ضروري: Flask يفعّل الهروب التلقائي حسب امتداد اسم القالب، كما كان يفعل
+        render_template_string الأصلي
+        """
+        name = 'inline-' + hashlib.sha1(source.encode('utf-8')).hexdigest() + '.html'
+        self.sources[name] = source
+        return name
+
+    def get_source(self, environment, template):
+        if template not in self.sources:
+            raise TemplateNotFound(template)
+        return self.sources[template], None, lambda: True
+
+
+inline_template_loader = InlineTemplateLoader()
+_compiled_templates = {}
+
+
+def setup_template_cache():
+    """تفعيل ذاكرة الشيفرة المترجمة على القرص"""
+    cache_dir = app.config.get('TEMPLATE_CACHE_DIR')
+    if not cache_dir:
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    except OSError as e:
+        print(f"⚠️ تعذر إنشاء ذاكرة القوالب: {e}")
+
+
+def get_compiled_template(source):
+    """إرجاع القالب المترجم لنص معين (يُترجم مرة واحدة لكل عملية)"""
+    template = _compiled_templates.get(source)
+    if template is None:
+        name = inline_template_loader.register(source)
+        template = inline_template_loader.load(app.jinja_env, name, app.jinja_env.make_globals(None))
+        _compiled_templates[source] = template
+    return template
+
+
+def render_template_string(source, **context):
+    """بديل render_template_string في Flask يعيد استخدام القالب المترجم"""
+    template = get_compiled_template(source)
+    app.update_template_context(context)
+    before_render_template.send(app, template=template, context=context)
+    rv = template.render(context)
+    template_rendered.send(app, template=template, context=context)
+    return rv
+
+
+setup_template_cache()
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
@@ -432,7 +815,10 @@ class Customer(db.Model):
     phone = db.Column(db.String(20))
     address = db.Column(db.Text)
     tax_number = db.Column(db.String(50))
+    # الرصيد المستحق = المتبقي على الفواتير - الدفعات غير المخصصة (يُحدَّث مع كل فاتورة ودفعة)
+    balance = db.Column(db.Numeric(14, 2), nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 class Supplier(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -441,9 +827,19 @@ class Supplier(db.Model):
     phone = db.Column(db.String(20))
     address = db.Column(db.Text)
     tax_number = db.Column(db.String(50))
+    # الرصيد المستحق = المتبقي على الفواتير - الدفعات غير المخصصة (يُحدَّث مع كل فاتورة ودفعة)
+    balance = db.Column(db.Numeric(14, 2), nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 class Product(db.Model):
+    __table_args__ = (
+        # فهرس جزئي للمنتجات منخفضة المخزون (لوحة التحكم وصفحة المنتجات)
+        db.Index('ix_product_low_stock', 'quantity', 'min_quantity',
+                 postgresql_where=db.text('quantity <= min_quantity'),
+                 sqlite_where=db.text('quantity <= min_quantity')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
@@ -453,12 +849,50 @@ class Product(db.Model):
     min_quantity = db.Column(db.Integer, default=10)
     category = db.Column(db.String(50))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+def _initial_amount_paid(context):
+    """المدفوع لفاتورة جديدة: إجماليها إذا أُنشئت مدفوعة، وإلا صفر"""
+    params = context.get_current_parameters()
+    return Decimal(str(params.get('total') or 0)) if params.get('status') == 'paid' else Decimal('0')
+
+def _initial_balance_due(context):
+    """الرصيد المتبقي لفاتورة جديدة = الإجمالي - المدفوع"""
+    params = context.get_current_parameters()
+    paid = params.get('amount_paid')
+    if paid is None:
+        paid = _initial_amount_paid(context)
+    return Decimal(str(params.get('total') or 0)) - Decimal(str(paid))
+
+def _initial_due_date(context):
+    """تاريخ الاستحقاق الافتراضي = تاريخ الفاتورة + مدة السداد (PAYMENT_TERMS_DAYS)"""
+    invoice_date = context.get_current_parameters().get('date') or date.today()
+    return invoice_date + timedelta(days=app.config.get('PAYMENT_TERMS_DAYS', 30))
 
 class SalesInvoice(db.Model):
+    __table_args__ = (
+        db.Index('ix_sales_invoice_branch_date', 'branch', 'date', 'id'),
+        db.Index('ix_sales_invoice_date_id', 'date', 'id'),
+        db.Index('ix_sales_invoice_created_at', 'created_at'),
+        db.Index('ix_sales_invoice_status_date', 'status', 'date'),
+        db.Index('ix_sales_invoice_status_due', 'status', 'due_date'),
+        db.Index('ix_sales_invoice_status_method', 'status', 'payment_method'),
+        db.Index('ix_sales_invoice_customer_date', 'customer_id', 'date'),
+        # فهرس جزئي للمستحقات غير المدفوعة (المدفوعات والمستحقات)
+        db.Index('ix_sales_invoice_unpaid', 'date',
+                 postgresql_where=db.text("status <> 'paid'"),
+                 sqlite_where=db.text("status <> 'paid'")),
+        # فهرس جزئي مغطٍ لأعمار الديون (التجميع حسب الطرف دون قراءة الجدول)
+        db.Index('ix_sales_invoice_aging', 'customer_id', 'date', 'balance_due',
+                 postgresql_where=db.text("status IN ('pending', 'overdue')"),
+                 sqlite_where=db.text("status IN ('pending', 'overdue')")),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     invoice_number = db.Column(db.String(50), unique=True, nullable=False)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'))
     date = db.Column(db.Date, nullable=False, default=date.today)
+    due_date = db.Column(db.Date, default=_initial_due_date)  # ترحيل المعلقة إلى متأخرة بعده
     subtotal = db.Column(db.Numeric(10, 2), nullable=False)
     tax_amount = db.Column(db.Numeric(10, 2), default=0)
     tax_rate = db.Column(db.Numeric(5, 2), default=15.0)  # معدل الضريبة
@@ -468,14 +902,19 @@ class SalesInvoice(db.Model):
     status = db.Column(db.String(20), default='pending')
     branch = db.Column(db.String(50), default='Place India', nullable=False)  # الفرع: Place India أو China Town
     notes = db.Column(db.Text)
+    # المدفوع والمتبقي من تخصيصات الدفعات (يُحدَّثان ذرياً في نفس معاملة الدفعة)
+    amount_paid = db.Column(db.Numeric(10, 2), nullable=False, default=_initial_amount_paid)
+    balance_due = db.Column(db.Numeric(10, 2), default=_initial_balance_due)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     customer = db.relationship('Customer', backref='sales_invoices')
     items = db.relationship('SalesInvoiceItem', backref='invoice', lazy=True, cascade='all, delete-orphan')
+    allocations = db.relationship('PaymentAllocation', backref='sales_invoice', cascade='all, delete-orphan')
 
 class SalesInvoiceItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    invoice_id = db.Column(db.Integer, db.ForeignKey('sales_invoice.id'), nullable=False)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('sales_invoice.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=True)
     product_name = db.Column(db.String(200), nullable=False)  # اسم المنتج (للمرونة)
     description = db.Column(db.Text)  # وصف الصنف
@@ -486,10 +925,27 @@ class SalesInvoiceItem(db.Model):
     product = db.relationship('Product', backref=db.backref('sales_items', lazy=True))
 
 class PurchaseInvoice(db.Model):
+    __table_args__ = (
+        db.Index('ix_purchase_invoice_date_id', 'date', 'id'),
+        db.Index('ix_purchase_invoice_created_at', 'created_at'),
+        db.Index('ix_purchase_invoice_status_date', 'status', 'date'),
+        db.Index('ix_purchase_invoice_status_due', 'status', 'due_date'),
+        db.Index('ix_purchase_invoice_status_method', 'status', 'payment_method'),
+        db.Index('ix_purchase_invoice_supplier_date', 'supplier_id', 'date'),
+        db.Index('ix_purchase_invoice_unpaid', 'date',
+                 postgresql_where=db.text("status <> 'paid'"),
+                 sqlite_where=db.text("status <> 'paid'")),
+        # فهرس جزئي مغطٍ لأعمار الديون (التجميع حسب الطرف دون قراءة الجدول)
+        db.Index('ix_purchase_invoice_aging', 'supplier_id', 'date', 'balance_due',
+                 postgresql_where=db.text("status IN ('pending', 'overdue')"),
+                 sqlite_where=db.text("status IN ('pending', 'overdue')")),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     invoice_number = db.Column(db.String(50), unique=True, nullable=False)
     supplier_id = db.Column(db.Integer, db.ForeignKey('supplier.id'))
     date = db.Column(db.Date, nullable=False, default=date.today)
+    due_date = db.Column(db.Date, default=_initial_due_date)  # ترحيل المعلقة إلى متأخرة بعده
     subtotal = db.Column(db.Numeric(10, 2), nullable=False)
     tax_amount = db.Column(db.Numeric(10, 2), default=0)
     tax_rate = db.Column(db.Numeric(5, 2), default=15.0)  # معدل الضريبة
@@ -498,14 +954,17 @@ class PurchaseInvoice(db.Model):
     payment_method = db.Column(db.String(20), default='cash')  # mada,bank,visa,cash,mastercard,aks,gcc,stc
     status = db.Column(db.String(20), default='pending')
     notes = db.Column(db.Text)
+    amount_paid = db.Column(db.Numeric(10, 2), nullable=False, default=_initial_amount_paid)
+    balance_due = db.Column(db.Numeric(10, 2), default=_initial_balance_due)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     supplier = db.relationship('Supplier', backref='purchase_invoices')
+    allocations = db.relationship('PaymentAllocation', backref='purchase_invoice', cascade='all, delete-orphan')
     items = db.relationship('PurchaseInvoiceItem', backref='invoice', lazy=True, cascade='all, delete-orphan')
 
 class PurchaseInvoiceItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    invoice_id = db.Column(db.Integer, db.ForeignKey('purchase_invoice.id'), nullable=False)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('purchase_invoice.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=True)
     product_name = db.Column(db.String(200), nullable=False)  # اسم المنتج (للمرونة)
     description = db.Column(db.Text)  # وصف الصنف
@@ -516,6 +975,12 @@ class PurchaseInvoiceItem(db.Model):
     product = db.relationship('Product', backref=db.backref('purchase_items', lazy=True))
 
 class Expense(db.Model):
+    __table_args__ = (
+        db.Index('ix_expense_date_id', 'date', 'id'),
+        db.Index('ix_expense_category_date', 'category', 'date'),
+        db.Index('ix_expense_created_at', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(200), nullable=False)
     amount = db.Column(db.Numeric(10, 2), nullable=False)
@@ -549,6 +1014,11 @@ class Employee(db.Model):
 
 class EmployeePayroll(db.Model):
     """كشف راتب الموظف الشهري"""
+    __table_args__ = (
+        db.Index('ix_employee_payroll_employee_period', 'employee_id', 'year', 'month'),
+        db.Index('ix_employee_payroll_period', 'year', 'month'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
     month = db.Column(db.Integer, nullable=False)  # الشهر (1-12)
@@ -574,6 +1044,12 @@ class EmployeePayroll(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Payment(db.Model):
+    __table_args__ = (
+        db.Index('ix_payment_date', 'date'),
+        db.Index('ix_payment_customer_date', 'customer_id', 'date'),
+        db.Index('ix_payment_supplier_date', 'supplier_id', 'date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     amount = db.Column(db.Numeric(10, 2), nullable=False)
     payment_type = db.Column(db.String(20), nullable=False)  # 'received' or 'paid'
@@ -586,6 +1062,78 @@ class Payment(db.Model):
     
     customer = db.relationship('Customer', backref='payments')
     supplier = db.relationship('Supplier', backref='payments')
+    allocations = db.relationship('PaymentAllocation', backref='payment', cascade='all, delete-orphan')
+
+class PaymentAllocation(db.Model):
+    """جزء من دفعة مخصص لفاتورة مبيعات أو مشتريات (الدفعة قد تسدد عدة فواتير جزئياً)"""
+    __table_args__ = (
+        db.Index('ix_payment_allocation_sales_invoice', 'sales_invoice_id'),
+        db.Index('ix_payment_allocation_purchase_invoice', 'purchase_invoice_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    payment_id = db.Column(db.Integer, db.ForeignKey('payment.id'), nullable=False, index=True)
+    sales_invoice_id = db.Column(db.Integer, db.ForeignKey('sales_invoice.id'))
+    purchase_invoice_id = db.Column(db.Integer, db.ForeignKey('purchase_invoice.id'))
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PartyBalanceMonth(db.Model):
+    """صافي حركة رصيد عميل أو مورد في شهر - الرصيد الافتتاحي لكشف الحساب مجموع الأشهر السابقة"""
+    __table_args__ = (db.UniqueConstraint('party', 'party_id', 'month', name='uq_party_balance_month'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    party = db.Column(db.String(20), nullable=False)  # customer أو supplier
+    party_id = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Date, nullable=False)  # أول يوم في الشهر
+    movement = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+class Account(db.Model):
+    """حساب في دليل الحسابات"""
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(20), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    name_en = db.Column(db.String(100))
+    account_type = db.Column(db.String(20), nullable=False)  # asset, liability, equity, revenue, expense
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class JournalEntry(db.Model):
+    """رأس قيد يومية يُرحَّل تلقائياً من فاتورة أو دفعة أو مصروف أو كشف راتب"""
+    __table_args__ = (
+        db.Index('ix_journal_entry_source', 'source', 'source_id'),
+        db.Index('ix_journal_entry_date', 'date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False, default=date.today)
+    description = db.Column(db.String(200), nullable=False)
+    source = db.Column(db.String(30), nullable=False)  # sale, sale_settlement, purchase, payment, expense, payroll...
+    source_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    lines = db.relationship('JournalLine', backref='entry', cascade='all, delete-orphan')
+
+class JournalLine(db.Model):
+    """سطر قيد: مدين أو دائن على حساب"""
+    __table_args__ = (db.Index('ix_journal_line_account', 'account_id', 'entry_id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    entry_id = db.Column(db.Integer, db.ForeignKey('journal_entry.id'), nullable=False, index=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=False)
+    debit = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    credit = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    account = db.relationship('Account')
+
+class AccountPeriodBalance(db.Model):
+    """مجموع المدين والدائن لحساب في شهر - تُبنى منه التقارير المالية دون قراءة القيود"""
+    __table_args__ = (db.UniqueConstraint('account_id', 'period', name='uq_account_period_balance'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=False)
+    period = db.Column(db.Date, nullable=False)  # أول يوم في الشهر
+    debit = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    credit = db.Column(db.Numeric(14, 2), nullable=False, default=0)
 
 class SystemSettings(db.Model):
     """إعدادات النظام العامة"""
@@ -598,28 +1146,1199 @@ class SystemSettings(db.Model):
 
     @staticmethod
     def get_setting(key, default=None):
-        """الحصول على قيمة إعداد"""
-        setting = SystemSettings.query.filter_by(setting_key=key).first()
-        return setting.setting_value if setting else default
+        """الحصول على قيمة إعداد (من ذاكرة الإعدادات)"""
+        return settings_cache.get(key, default)
 
     @staticmethod
-    def set_setting(key, value, setting_type='text', description=None):
-        """تعيين قيمة إعداد"""
-        setting = SystemSettings.query.filter_by(setting_key=key).first()
-        if setting:
-            setting.setting_value = value
-            setting.setting_type = setting_type
-            setting.updated_at = datetime.utcnow()
-        else:
-            setting = SystemSettings(
-                setting_key=key,
-                setting_value=value,
-                setting_type=setting_type,
-                description=description
-            )
-            db.session.add(setting)
+    def set_setting(key, value=None, setting_type='text', description=None):
+        """تعيين قيمة إعداد، أو عدة إعدادات بتمرير قاموس {المفتاح: القيمة} في معاملة واحدة"""
+        values = key if isinstance(key, dict) else {key: value}
+        existing = {
+            setting.setting_key: setting
+            for setting in SystemSettings.query.filter(SystemSettings.setting_key.in_(list(values))).all()
+        }
+
+        saved = []
+        for setting_key, setting_value in values.items():
+            setting = existing.get(setting_key)
+            if setting:
+                setting.setting_value = setting_value
+                setting.setting_type = setting_type
+                setting.updated_at = datetime.utcnow()
+            else:
+                setting = SystemSettings(
+                    setting_key=setting_key,
+                    setting_value=setting_value,
+                    setting_type=setting_type,
+                    description=description
+                )
+                db.session.add(setting)
+            saved.append(setting)
         db.session.commit()
-        return setting
+        settings_cache.invalidate()
+        return saved if isinstance(key, dict) else saved[0]
+
+class DailySummary(db.Model):
+    """ملخص يومي مجمع لكل فرع - يُحدَّث في نفس معاملة الفاتورة أو المصروف"""
+    __table_args__ = (db.UniqueConstraint('branch', 'day', name='uq_daily_summary_branch_day'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    branch = db.Column(db.String(50), nullable=False)  # اسم الفرع أو SUMMARY_SHARED_BRANCH للمشتريات والمصروفات
+    day = db.Column(db.Date, nullable=False)  # يوم التسجيل (created_at)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    sales_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    sales_paid = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    purchases_count = db.Column(db.Integer, nullable=False, default=0)
+    purchases_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    purchases_paid = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    expenses_count = db.Column(db.Integer, nullable=False, default=0)
+    expenses_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+class BackgroundJob(db.Model):
+    """مهمة تعمل في الخلفية (تصدير، تقرير ضريبة، نسخة احتياطية، مسير رواتب)"""
+    __table_args__ = (db.Index('ix_background_job_user_created', 'user_id', 'created_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)
+    params = db.Column(db.Text)  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    message = db.Column(db.String(500))
+    result_path = db.Column(db.String(500))
+    result_name = db.Column(db.String(200))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    pid = db.Column(db.Integer)  # العملية المسؤولة: عامل الويب صاحب المجمع ثم عملية التنفيذ
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': 100 if self.status == 'done' else read_job_progress(self.id),
+            'message': self.message,
+            'result_name': self.result_name,
+            'download_url': f'/jobs/{self.id}/download' if self.status == 'done' and self.result_path else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class DataVersion(db.Model):
+    """عداد إصدار لكل جدول، يزيد مع كل معاملة تعدله (تُبنى عليه مفاتيح ذاكرة التقارير)"""
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+startup_timer.mark('models')
+
+# ===== الملخصات اليومية للوحة التحكم =====
+
+# المشتريات والمصروفات غير مرتبطة بفرع، لذلك تُجمع تحت مفتاح مشترك
+SUMMARY_SHARED_BRANCH = '*'
+
+SUMMARY_COLUMNS = (
+    'sales_count', 'sales_total', 'sales_paid',
+    'purchases_count', 'purchases_total', 'purchases_paid',
+    'expenses_count', 'expenses_total'
+)
+
+def _summary_day(record):
+    """يوم التسجيل الذي يُنسب إليه السجل في الملخص"""
+    return (record.created_at or datetime.utcnow()).date()
+
+def bump_daily_summary(branch, day, **deltas):
+    """إضافة فروقات إلى صف الملخص اليومي داخل الجلسة الحالية (بدون commit)"""
+    from sqlalchemy.exc import IntegrityError
+
+    deltas = {column: value for column, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    def _apply():
+        return DailySummary.query.filter_by(branch=branch, day=day).update(
+            {getattr(DailySummary, column): getattr(DailySummary, column) + value
+             for column, value in deltas.items()},
+            synchronize_session=False
+        )
+
+    if _apply():
+        return
+
+    # لا يوجد صف لهذا اليوم بعد - إنشاؤه مع معالجة السباق مع طلب آخر
+    try:
+        with db.session.begin_nested():
+            db.session.add(DailySummary(branch=branch, day=day, **deltas))
+    except IntegrityError:
+        _apply()
+
+def record_sale_summary(sale, sign=1):
+    """تسجيل فاتورة مبيعات في الملخص اليومي (sign=-1 عند الحذف)"""
+    total = Decimal(str(sale.total or 0)) * sign
+    bump_daily_summary(
+        sale.branch or app.config['DEFAULT_BRANCH'], _summary_day(sale),
+        sales_count=sign, sales_total=total,
+        sales_paid=total if sale.status == 'paid' else 0
+    )
+
+def record_purchase_summary(purchase, sign=1):
+    """تسجيل فاتورة مشتريات في الملخص اليومي (sign=-1 عند الحذف)"""
+    total = Decimal(str(purchase.total or 0)) * sign
+    bump_daily_summary(
+        SUMMARY_SHARED_BRANCH, _summary_day(purchase),
+        purchases_count=sign, purchases_total=total,
+        purchases_paid=total if purchase.status == 'paid' else 0
+    )
+
+def record_expense_summary(expense, sign=1):
+    """تسجيل مصروف في الملخص اليومي (sign=-1 عند الحذف)"""
+    bump_daily_summary(
+        SUMMARY_SHARED_BRANCH, _summary_day(expense),
+        expenses_count=sign, expenses_total=Decimal(str(expense.amount or 0)) * sign
+    )
+
+def record_status_summary(invoice, old_status):
+    """تحديث المبالغ المدفوعة في الملخص عند تغيير حالة الفاتورة"""
+    was_paid, is_paid = old_status == 'paid', invoice.status == 'paid'
+    if was_paid == is_paid:
+        return
+
+    amount = Decimal(str(invoice.total or 0)) * (1 if is_paid else -1)
+    if isinstance(invoice, SalesInvoice):
+        bump_daily_summary(invoice.branch or app.config['DEFAULT_BRANCH'], _summary_day(invoice), sales_paid=amount)
+    else:
+        bump_daily_summary(SUMMARY_SHARED_BRANCH, _summary_day(invoice), purchases_paid=amount)
+
+def get_summary_totals(branch=None, since=None):
+    """مجاميع الملخص اليومي لفرع معين (أو لكل الفروع) منذ تاريخ معين"""
+    query = db.session.query(*[
+        db.func.coalesce(db.func.sum(getattr(DailySummary, column)), 0)
+        for column in SUMMARY_COLUMNS
+    ])
+    if branch:
+        query = query.filter(DailySummary.branch.in_([branch, SUMMARY_SHARED_BRANCH]))
+    if since:
+        query = query.filter(DailySummary.day >= since)
+    return dict(zip(SUMMARY_COLUMNS, query.one()))
+
+def rebuild_daily_summaries():
+    """إعادة بناء جدول الملخصات بالكامل من الجداول الأصلية (للترحيل الأولي أو الإصلاح)"""
+    rows = {}
+
+    def _row(branch, day):
+        if isinstance(day, str):
+            day = datetime.strptime(day[:10], '%Y-%m-%d').date()
+        key = (branch, day)
+        if key not in rows:
+            rows[key] = dict.fromkeys(SUMMARY_COLUMNS, 0)
+        return rows[key]
+
+    sales_day = db.func.date(db.func.coalesce(SalesInvoice.created_at, SalesInvoice.date))
+    for branch, day, status, count, total in db.session.query(
+        SalesInvoice.branch, sales_day, SalesInvoice.status,
+        db.func.count(SalesInvoice.id), db.func.sum(SalesInvoice.total)
+    ).group_by(SalesInvoice.branch, sales_day, SalesInvoice.status):
+        row = _row(branch or app.config['DEFAULT_BRANCH'], day)
+        row['sales_count'] += count
+        row['sales_total'] += total or 0
+        if status == 'paid':
+            row['sales_paid'] += total or 0
+
+    purchases_day = db.func.date(db.func.coalesce(PurchaseInvoice.created_at, PurchaseInvoice.date))
+    for day, status, count, total in db.session.query(
+        purchases_day, PurchaseInvoice.status,
+        db.func.count(PurchaseInvoice.id), db.func.sum(PurchaseInvoice.total)
+    ).group_by(purchases_day, PurchaseInvoice.status):
+        row = _row(SUMMARY_SHARED_BRANCH, day)
+        row['purchases_count'] += count
+        row['purchases_total'] += total or 0
+        if status == 'paid':
+            row['purchases_paid'] += total or 0
+
+    expenses_day = db.func.date(db.func.coalesce(Expense.created_at, Expense.date))
+    for day, count, total in db.session.query(
+        expenses_day, db.func.count(Expense.id), db.func.sum(Expense.amount)
+    ).group_by(expenses_day):
+        row = _row(SUMMARY_SHARED_BRANCH, day)
+        row['expenses_count'] += count
+        row['expenses_total'] += total or 0
+
+    DailySummary.query.delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(DailySummary, [
+        dict(branch=branch, day=day, **values) for (branch, day), values in rows.items()
+    ])
+    db.session.commit()
+    return len(rows)
+
+# ===== تخصيص المدفوعات وأرصدة الفواتير =====
+# المدفوع والمتبقي لكل فاتورة ورصيد كل عميل ومورد أعمدة مخزنة تُعدَّل بفروقات ذرية
+# (UPDATE ... SET col = col + delta) في نفس معاملة الفاتورة أو الدفعة، فتُقرأ مباشرة
+# بدلاً من إعادة جمع السجل الكامل. كل فرق في الرصيد يُسجل أيضاً في حركة شهره (PartyBalanceMonth)
+# ليُقرأ منها الرصيد الافتتاحي لكشف الحساب. rebuild_balances يعيد بنائها بعد الترحيل أو للإصلاح
+
+# الطرف -> (نموذج الطرف، نموذج الفاتورة، عمود الطرف في الفاتورة والدفعة، عمود الفاتورة في التخصيص، نوع الدفعة)
+PAYMENT_PARTIES = {
+    'customer': (Customer, SalesInvoice, 'customer_id', 'sales_invoice_id', 'received'),
+    'supplier': (Supplier, PurchaseInvoice, 'supplier_id', 'purchase_invoice_id', 'paid'),
+}
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+def invoice_party(invoice):
+    """اسم طرف الفاتورة ('customer' أو 'supplier') ومعرفه"""
+    if isinstance(invoice, SalesInvoice):
+        return 'customer', invoice.customer_id
+    return 'supplier', invoice.supplier_id
+
+def _month_start(day):
+    return day.replace(day=1)
+
+def bump_party_month(party, party_id, day, delta):
+    """إضافة فرق إلى حركة شهر الطرف داخل الجلسة الحالية (بدون commit)"""
+    from sqlalchemy.exc import IntegrityError
+
+    month = _month_start(day)
+
+    def _apply():
+        return PartyBalanceMonth.query.filter_by(party=party, party_id=party_id, month=month).update(
+            {PartyBalanceMonth.movement: PartyBalanceMonth.movement + delta}, synchronize_session=False
+        )
+
+    if _apply():
+        return
+
+    # لا يوجد صف لهذا الشهر بعد - إنشاؤه مع معالجة السباق مع طلب آخر
+    try:
+        with db.session.begin_nested():
+            db.session.add(PartyBalanceMonth(party=party, party_id=party_id, month=month, movement=delta))
+    except IntegrityError:
+        _apply()
+
+def bump_party_balance(party, party_id, delta, day):
+    """إضافة فرق إلى رصيد عميل أو مورد وإلى حركة شهر day داخل الجلسة الحالية (بدون commit)"""
+    if party_id is None or not delta:
+        return
+    party_model = PAYMENT_PARTIES[party][0]
+    party_model.query.filter_by(id=party_id).update(
+        {party_model.balance: party_model.balance + delta}, synchronize_session=False
+    )
+    bump_party_month(party, party_id, day, delta)
+
+def record_invoice_balance(invoice, sign=1):
+    """إضافة فاتورة لرصيد طرفها (sign=-1 عند الحذف)
+
+    مساهمة الفاتورة = الإجمالي - ما سُدد منها بدون دفعة؛ عند حذفها تصبح دفعاتها المخصصة
+    رصيداً دائناً غير مخصص للطرف
+    """
+    allocated = sum((_money(allocation.amount) for allocation in invoice.allocations), Decimal('0'))
+    contribution = _money(invoice.total) - _money(invoice.amount_paid) + allocated
+    bump_party_balance(*invoice_party(invoice), contribution * sign, invoice.date or date.today())
+
+def apply_invoice_payment(invoice, amount):
+    """إضافة amount إلى المدفوع على الفاتورة (أو طرحه إذا كان سالباً) وتحديث حالتها
+
+    التحديث ذري ومشروط: لا يتجاوز المدفوع الإجمالي ولا يقل عن صفر حتى مع دفعتين متزامنتين
+    """
+    model = type(invoice)
+    updated = model.query.filter(
+        model.id == invoice.id,
+        model.balance_due >= amount,
+        model.amount_paid + amount >= 0
+    ).update({
+        model.amount_paid: model.amount_paid + amount,
+        model.balance_due: model.balance_due - amount
+    }, synchronize_session=False)
+    if not updated:
+        raise ValueError(f'المبلغ {amount} يتجاوز المتبقي على الفاتورة {invoice.invoice_number}')
+
+    db.session.refresh(invoice, ['amount_paid', 'balance_due'])
+    old_status = invoice.status
+    if invoice.balance_due <= 0:
+        invoice.status = 'paid'
+    elif old_status == 'paid':
+        invoice.status = 'pending'
+    record_status_summary(invoice, old_status)
+
+def record_payment(party, party_id, amount, payment_method='cash', allocations=None,
+                   description=None, payment_date=None):
+    """تسجيل دفعة من عميل أو لمورد وتخصيصها للفواتير (بدون commit)
+
+    allocations: [(معرف الفاتورة، المبلغ)]؛ إذا كانت None تُسدد فواتير الطرف من الأقدم للأحدث،
+    والباقي يبقى رصيداً دائناً غير مخصص
+    """
+    if party not in PAYMENT_PARTIES:
+        raise ValueError('نوع الطرف غير صحيح')
+    party_model, invoice_model, party_key, invoice_key, payment_type = PAYMENT_PARTIES[party]
+    amount = _money(amount)
+    if amount <= 0:
+        raise ValueError('مبلغ الدفعة يجب أن يكون أكبر من صفر')
+    if party_id is not None and db.session.get(party_model, party_id) is None:
+        raise ValueError('الطرف غير موجود')
+
+    party_column = getattr(invoice_model, party_key)
+    if allocations is None:
+        if party_id is None:
+            raise ValueError('يجب تحديد الفواتير لدفعة بدون طرف')
+        invoices = invoice_model.query.filter(party_column == party_id, db.text(UNPAID_CONDITION),
+                                              invoice_model.balance_due > 0) \
+                                      .order_by(invoice_model.date, invoice_model.id).all()
+        allocations, remaining = [], amount
+        for invoice in invoices:
+            if remaining <= 0:
+                break
+            share = min(remaining, _money(invoice.balance_due))
+            allocations.append((invoice, share))
+            remaining -= share
+    else:
+        requested = [(int(invoice_id), _money(share)) for invoice_id, share in allocations]
+        invoices = {invoice.id: invoice for invoice in
+                    invoice_model.query.filter(invoice_model.id.in_([i for i, _ in requested])).all()}
+        allocations = []
+        for invoice_id, share in requested:
+            invoice = invoices.get(invoice_id)
+            if invoice is None:
+                raise ValueError(f'الفاتورة {invoice_id} غير موجودة')
+            if getattr(invoice, party_key) != party_id:
+                raise ValueError(f'الفاتورة {invoice.invoice_number} لا تخص هذا الطرف')
+            if share <= 0:
+                raise ValueError('مبلغ التخصيص يجب أن يكون أكبر من صفر')
+            allocations.append((invoice, share))
+        if sum((share for _, share in allocations), Decimal('0')) > amount:
+            raise ValueError('مجموع التخصيصات أكبر من مبلغ الدفعة')
+
+    if description is None:
+        numbers = '، '.join(invoice.invoice_number for invoice, _ in allocations[:5])
+        description = f'سداد الفواتير {numbers}' if numbers else 'دفعة على الحساب'
+    payment = Payment(amount=amount, payment_type=payment_type, payment_method=payment_method,
+                      description=description[:200], date=payment_date or date.today(),
+                      **{party_key: party_id})
+    db.session.add(payment)
+    db.session.flush()
+
+    for invoice, share in allocations:
+        db.session.add(PaymentAllocation(payment_id=payment.id, amount=share, **{invoice_key: invoice.id}))
+        apply_invoice_payment(invoice, share)
+    bump_party_balance(party, party_id, -amount, payment.date)
+    record_payment_journal(payment)
+    return payment
+
+def delete_payment(payment):
+    """حذف دفعة وإرجاع تخصيصاتها للفواتير ورصيد الطرف (بدون commit)"""
+    for allocation in payment.allocations:
+        apply_invoice_payment(allocation.sales_invoice or allocation.purchase_invoice, -_money(allocation.amount))
+    party = 'customer' if payment.payment_type == 'received' else 'supplier'
+    bump_party_balance(party, payment.customer_id if party == 'customer' else payment.supplier_id,
+                       _money(payment.amount), payment.date)
+    record_payment_journal(payment, sign=-1)
+    db.session.delete(payment)
+
+def reopen_invoice(invoice):
+    """إعادة فاتورة مدفوعة إلى غير مدفوعة (بدون commit)
+
+    تخصيصاتها تُلغى وتبقى دفعاتها رصيداً دائناً للطرف، وما سُدد منها بدون دفعة يُضاف لرصيد الطرف
+    """
+    for allocation in list(invoice.allocations):
+        apply_invoice_payment(invoice, -_money(allocation.amount))
+        invoice.allocations.remove(allocation)
+    unrecorded = _money(invoice.amount_paid)
+    if unrecorded:
+        apply_invoice_payment(invoice, -unrecorded)
+        bump_party_balance(*invoice_party(invoice), unrecorded, invoice.date)
+        unpost_journal(INVOICE_POSTING[type(invoice)][1], invoice.id)
+
+def rebuild_balances():
+    """إعادة حساب المدفوع والمتبقي لكل فاتورة وأرصدة الأطراف من التخصيصات (للترحيل الأولي أو الإصلاح)
+
+    الفاتورة المحددة كمدفوعة قبل وجود التخصيصات تُعتبر مسددة بالكامل
+    """
+    for party, (party_model, invoice_model, party_key, invoice_key, payment_type) in PAYMENT_PARTIES.items():
+        allocated = db.session.query(db.func.coalesce(db.func.sum(PaymentAllocation.amount), 0)) \
+                              .filter(getattr(PaymentAllocation, invoice_key) == invoice_model.id) \
+                              .scalar_subquery()
+        invoice_model.query.update({
+            invoice_model.amount_paid: db.case((invoice_model.status == 'paid', invoice_model.total),
+                                               else_=allocated)
+        }, synchronize_session=False)
+        invoice_model.query.update({invoice_model.balance_due: invoice_model.total - invoice_model.amount_paid},
+                                   synchronize_session=False)
+
+        party_id = getattr(invoice_model, party_key)
+        payment_party = getattr(Payment, party_key)
+        due = db.session.query(db.func.coalesce(db.func.sum(invoice_model.balance_due), 0)) \
+                        .filter(party_id == party_model.id).scalar_subquery()
+        paid = db.session.query(db.func.coalesce(db.func.sum(Payment.amount), 0)) \
+                         .filter(payment_party == party_model.id, Payment.payment_type == payment_type) \
+                         .scalar_subquery()
+        paid_allocated = db.session.query(db.func.coalesce(db.func.sum(PaymentAllocation.amount), 0)) \
+                                   .join(Payment, PaymentAllocation.payment_id == Payment.id) \
+                                   .filter(payment_party == party_model.id, Payment.payment_type == payment_type) \
+                                   .scalar_subquery()
+        party_model.query.update({party_model.balance: due - (paid - paid_allocated)}, synchronize_session=False)
+    rebuild_party_months()
+
+def rebuild_party_months():
+    """إعادة بناء حركات الأرصدة الشهرية من الفواتير والدفعات (للترحيل الأولي أو الإصلاح)
+
+    حركة الفاتورة كمساهمتها في الرصيد (الإجمالي - ما سُدد بدون دفعة) بتاريخها، والدفعة تُطرح بتاريخها
+    """
+    rows = {}
+
+    def _add(party, party_id, day, amount):
+        if isinstance(day, str):
+            day = datetime.strptime(day[:10], '%Y-%m-%d').date()
+        key = (party, party_id, _month_start(day))
+        rows[key] = rows.get(key, Decimal('0')) + _money(amount)
+
+    for party, (party_model, invoice_model, party_key, invoice_key, payment_type) in PAYMENT_PARTIES.items():
+        party_id = getattr(invoice_model, party_key)
+        allocated = db.session.query(db.func.coalesce(db.func.sum(PaymentAllocation.amount), 0)) \
+                              .filter(getattr(PaymentAllocation, invoice_key) == invoice_model.id) \
+                              .scalar_subquery()
+        for invoice_party_id, day, amount in db.session.query(
+            party_id, invoice_model.date,
+            db.func.sum(invoice_model.total - invoice_model.amount_paid + allocated)
+        ).filter(party_id.isnot(None)).group_by(party_id, invoice_model.date):
+            _add(party, invoice_party_id, day, amount)
+
+        payment_party = getattr(Payment, party_key)
+        for payment_party_id, day, amount in db.session.query(
+            payment_party, Payment.date, db.func.sum(Payment.amount)
+        ).filter(payment_party.isnot(None), Payment.payment_type == payment_type) \
+         .group_by(payment_party, Payment.date):
+            _add(party, payment_party_id, day, -_money(amount))
+
+    PartyBalanceMonth.query.delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(PartyBalanceMonth, [
+        dict(party=party, party_id=party_id, month=month, movement=movement)
+        for (party, party_id, month), movement in rows.items() if movement
+    ])
+    db.session.commit()
+    return len(rows)
+
+# ===== دفتر الأستاذ العام (القيد المزدوج) =====
+# كل فاتورة ودفعة ومصروف وكشف راتب يُرحَّل له قيد متوازن في نفس معاملته، وكل سطر يُضاف
+# بفروقات ذرية إلى مجموع حسابه في شهره (AccountPeriodBalance). ميزان المراجعة والميزانية
+# وقائمة الدخل لأي فترة تُجمع من الأرصدة الشهرية: تكلفتها (الحسابات × الأشهر) وليست عدد القيود.
+# الحذف يلغي قيود المصدر ويطرح سطورها. rebuild_ledger يعيد ترحيل كل شيء للترحيل الأولي أو الإصلاح
+
+# الرمز -> (الاسم، الاسم بالإنجليزية، النوع)
+CHART_OF_ACCOUNTS = {
+    '1100': ('النقدية والبنوك', 'Cash and banks', 'asset'),
+    '1200': ('ذمم العملاء', 'Accounts receivable', 'asset'),
+    '1300': ('ضريبة القيمة المضافة على المشتريات', 'Input VAT', 'asset'),
+    '2100': ('ذمم الموردين', 'Accounts payable', 'liability'),
+    '2200': ('ضريبة القيمة المضافة المستحقة', 'Output VAT', 'liability'),
+    '2300': ('رواتب مستحقة', 'Salaries payable', 'liability'),
+    '3100': ('رأس المال', 'Capital', 'equity'),
+    '4100': ('المبيعات', 'Sales', 'revenue'),
+    '5100': ('المشتريات', 'Purchases', 'expense'),
+    '5200': ('المصروفات العامة', 'General expenses', 'expense'),
+    '5300': ('الرواتب والأجور', 'Salaries and wages', 'expense'),
+}
+
+ACCOUNT_TYPES = ('asset', 'liability', 'equity', 'revenue', 'expense')
+DEBIT_NORMAL_TYPES = ('asset', 'expense')
+
+# نوع الفاتورة -> (مصدر القيد، مصدر السداد بدون دفعة، حساب الطرف، حساب الإيراد أو التكلفة، حساب الضريبة)
+INVOICE_POSTING = {
+    SalesInvoice: ('sale', 'sale_settlement', '1200', '4100', '2200'),
+    PurchaseInvoice: ('purchase', 'purchase_settlement', '2100', '5100', '1300'),
+}
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def ensure_chart_of_accounts():
+    """إضافة حسابات الدليل الناقصة (بدون commit)؛ يرجع {الرمز: المعرف}"""
+    from sqlalchemy.exc import IntegrityError
+
+    accounts = dict(db.session.query(Account.code, Account.id))
+    missing = [code for code in CHART_OF_ACCOUNTS if code not in accounts]
+    if missing:
+        try:
+            with db.session.begin_nested():
+                db.session.bulk_insert_mappings(Account, [
+                    dict(code=code, name=CHART_OF_ACCOUNTS[code][0], name_en=CHART_OF_ACCOUNTS[code][1],
+                         account_type=CHART_OF_ACCOUNTS[code][2])
+                    for code in missing
+                ])
+        except IntegrityError:
+            pass  # أضافها طلب آخر في نفس اللحظة
+        accounts = dict(db.session.query(Account.code, Account.id))
+    return accounts
+
+def bump_account_period(account_id, period, debit, credit):
+    """إضافة فروقات إلى مجموع حساب في شهر داخل الجلسة الحالية (بدون commit)"""
+    from sqlalchemy.exc import IntegrityError
+
+    def _apply():
+        return AccountPeriodBalance.query.filter_by(account_id=account_id, period=period).update({
+            AccountPeriodBalance.debit: AccountPeriodBalance.debit + debit,
+            AccountPeriodBalance.credit: AccountPeriodBalance.credit + credit
+        }, synchronize_session=False)
+
+    if _apply():
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(AccountPeriodBalance(account_id=account_id, period=period, debit=debit, credit=credit))
+    except IntegrityError:
+        _apply()
+
+def post_journal(entry_date, description, source, source_id, lines):
+    """ترحيل قيد (بدون commit)
+
+    lines: [(رمز الحساب، مدين، دائن)]؛ السطور الصفرية تُهمل، والقيد غير المتوازن يرفع ValueError
+    """
+    lines = [(code, _money(debit), _money(credit)) for code, debit, credit in lines if debit or credit]
+    if not lines:
+        return None
+    if sum(debit for _, debit, _ in lines) != sum(credit for _, _, credit in lines):
+        raise ValueError(f'القيد غير متوازن: {description}')
+
+    accounts = ensure_chart_of_accounts()
+    entry = JournalEntry(date=entry_date, description=description[:200], source=source, source_id=source_id)
+    period = _month_start(entry_date)
+    for code, debit, credit in lines:
+        entry.lines.append(JournalLine(account_id=accounts[code], debit=debit, credit=credit))
+        bump_account_period(accounts[code], period, debit, credit)
+    db.session.add(entry)
+    return entry
+
+def unpost_journal(source, source_id):
+    """حذف قيود المصدر وطرح سطورها من الأرصدة الشهرية (بدون commit)"""
+    for entry in JournalEntry.query.filter_by(source=source, source_id=source_id).all():
+        period = _month_start(entry.date)
+        for line in entry.lines:
+            bump_account_period(line.account_id, period, -line.debit, -line.credit)
+        db.session.delete(entry)
+
+def _invoice_settlement_lines(invoice, amount):
+    source, settlement, party_account, _, _ = INVOICE_POSTING[type(invoice)]
+    if source == 'sale':
+        return [('1100', amount, 0), (party_account, 0, amount)]
+    return [(party_account, amount, 0), ('1100', 0, amount)]
+
+def record_invoice_journal(invoice, sign=1):
+    """ترحيل قيد الفاتورة وما سُدد منها بدون دفعة (sign=-1 لإلغائهما عند الحذف)"""
+    source, settlement, party_account, main_account, tax_account = INVOICE_POSTING[type(invoice)]
+    if sign < 0:
+        unpost_journal(source, invoice.id)
+        unpost_journal(settlement, invoice.id)
+        return
+
+    total, tax = _money(invoice.total), _money(invoice.tax_amount)
+    if source == 'sale':
+        lines = [(party_account, total, 0), (main_account, 0, total - tax), (tax_account, 0, tax)]
+        description = f'فاتورة مبيعات {invoice.invoice_number}'
+    else:
+        lines = [(main_account, total - tax, 0), (tax_account, tax, 0), (party_account, 0, total)]
+        description = f'فاتورة مشتريات {invoice.invoice_number}'
+    entry_date = invoice.date or date.today()
+    post_journal(entry_date, description, source, invoice.id, lines)
+
+    allocated = sum((_money(allocation.amount) for allocation in invoice.allocations), Decimal('0'))
+    unrecorded = _money(invoice.amount_paid) - allocated
+    if unrecorded > 0:
+        post_journal(entry_date, f'سداد {description}', settlement, invoice.id,
+                     _invoice_settlement_lines(invoice, unrecorded))
+
+def record_payment_journal(payment, sign=1):
+    """ترحيل قيد الدفعة: المقبوض من عميل أو المدفوع لمورد (sign=-1 لإلغائه)"""
+    if sign < 0:
+        unpost_journal('payment', payment.id)
+        return
+    amount = _money(payment.amount)
+    if payment.payment_type == 'received':
+        lines = [('1100', amount, 0), ('1200', 0, amount)]
+    else:
+        lines = [('2100', amount, 0), ('1100', 0, amount)]
+    post_journal(payment.date or date.today(), payment.description, 'payment', payment.id, lines)
+
+def record_expense_journal(expense, sign=1):
+    """ترحيل قيد المصروف (sign=-1 لإلغائه)"""
+    if sign < 0:
+        unpost_journal('expense', expense.id)
+        return
+    amount = _money(expense.amount)
+    post_journal(expense.date or date.today(), expense.description, 'expense', expense.id,
+                 [('5200', amount, 0), ('1100', 0, amount)])
+
+def payroll_date(payroll):
+    """تاريخ قيد الراتب: تاريخ الدفع أو آخر يوم في شهر الكشف"""
+    return payroll.payment_date or _next_month(date(payroll.year, payroll.month, 1)) - timedelta(days=1)
+
+def record_payroll_journal(payroll, sign=1):
+    """ترحيل صافي الراتب كمصروف: دائن النقدية إذا كان مدفوعاً وإلا الرواتب المستحقة (sign=-1 لإلغائه)"""
+    if sign < 0:
+        unpost_journal('payroll', payroll.id)
+        return
+    amount = _money(payroll.net_salary)
+    post_journal(payroll_date(payroll), f'راتب {payroll.month}/{payroll.year}', 'payroll', payroll.id,
+                 [('5300', amount, 0), ('1100' if payroll.status == 'paid' else '2300', 0, amount)])
+
+def rebuild_ledger():
+    """إعادة ترحيل كل القيود وبناء الأرصدة الشهرية من الجداول الأصلية (للترحيل الأولي أو الإصلاح)"""
+    JournalLine.query.delete(synchronize_session=False)
+    JournalEntry.query.delete(synchronize_session=False)
+    AccountPeriodBalance.query.delete(synchronize_session=False)
+    ensure_chart_of_accounts()
+    db.session.commit()
+
+    sources = (
+        (SalesInvoice, record_invoice_journal),
+        (PurchaseInvoice, record_invoice_journal),
+        (Payment, record_payment_journal),
+        (Expense, record_expense_journal),
+        (EmployeePayroll, record_payroll_journal),
+    )
+    posted = 0
+    for model, record in sources:
+        last_id = 0
+        while True:
+            rows = model.query.filter(model.id > last_id).order_by(model.id).limit(500).all()
+            if not rows:
+                break
+            for row in rows:
+                record(row)
+            db.session.commit()
+            posted += len(rows)
+            last_id = rows[-1].id
+    return posted
+
+def ledger_totals(date_from=None, date_to=None):
+    """{معرف الحساب: [مدين، دائن]} للفترة
+
+    الأشهر الكاملة من AccountPeriodBalance، وأطراف الفترة التي لا تغطي شهراً كاملاً من سطور القيود
+    """
+    totals = {}
+
+    def _add(rows):
+        for account_id, debit, credit in rows:
+            row = totals.setdefault(account_id, [Decimal('0'), Decimal('0')])
+            row[0] += _money(debit)
+            row[1] += _money(credit)
+
+    def _lines(start, end):
+        query = db.session.query(JournalLine.account_id, db.func.sum(JournalLine.debit),
+                                 db.func.sum(JournalLine.credit)) \
+                          .join(JournalEntry, JournalLine.entry_id == JournalEntry.id)
+        if start is not None:
+            query = query.filter(JournalEntry.date >= start)
+        _add(query.filter(JournalEntry.date < end).group_by(JournalLine.account_id))
+
+    # [first_full، end_full) الأشهر الكاملة داخل الفترة
+    first_full = None if date_from is None else (date_from if date_from.day == 1 else _next_month(date_from))
+    end_full = None if date_to is None else (
+        _next_month(date_to) if (date_to + timedelta(days=1)).day == 1 else _month_start(date_to))
+    if first_full is not None and end_full is not None and first_full >= end_full:
+        _lines(date_from, date_to + timedelta(days=1))
+        return totals
+
+    query = db.session.query(AccountPeriodBalance.account_id, db.func.sum(AccountPeriodBalance.debit),
+                             db.func.sum(AccountPeriodBalance.credit))
+    if first_full is not None:
+        query = query.filter(AccountPeriodBalance.period >= first_full)
+    if end_full is not None:
+        query = query.filter(AccountPeriodBalance.period < end_full)
+    _add(query.group_by(AccountPeriodBalance.account_id))
+
+    if date_from is not None and first_full != date_from:
+        _lines(date_from, first_full)
+    if date_to is not None and end_full != date_to + timedelta(days=1):
+        _lines(end_full, date_to + timedelta(days=1))
+    return totals
+
+def trial_balance(date_from=None, date_to=None):
+    """ميزان المراجعة: سطر لكل حساب له حركة (المدين، الدائن، الرصيد بطبيعة الحساب) والإجماليات"""
+    totals = ledger_totals(date_from, date_to)
+    totals = {account_id: values for account_id, values in totals.items() if any(values)}
+    rows = []
+    for account in Account.query.filter(Account.id.in_(list(totals))).order_by(Account.code):
+        debit, credit = totals[account.id]
+        balance = debit - credit if account.account_type in DEBIT_NORMAL_TYPES else credit - debit
+        rows.append({'account': account, 'debit': debit, 'credit': credit, 'balance': balance})
+    return {
+        'rows': rows,
+        'debit': sum((row['debit'] for row in rows), Decimal('0')),
+        'credit': sum((row['credit'] for row in rows), Decimal('0')),
+    }
+
+def _group_by_type(rows):
+    groups = {account_type: [] for account_type in ACCOUNT_TYPES}
+    for row in rows:
+        groups[row['account'].account_type].append(row)
+    return groups, {account_type: sum((row['balance'] for row in groups[account_type]), Decimal('0'))
+                    for account_type in ACCOUNT_TYPES}
+
+def income_statement(date_from=None, date_to=None):
+    """قائمة الدخل للفترة من أرصدة حسابات الإيرادات والمصروفات"""
+    groups, totals = _group_by_type(trial_balance(date_from, date_to)['rows'])
+    return {
+        'revenue': groups['revenue'], 'expenses': groups['expense'],
+        'total_revenue': totals['revenue'], 'total_expenses': totals['expense'],
+        'net_profit': totals['revenue'] - totals['expense'],
+    }
+
+def balance_sheet(as_of=None):
+    """الميزانية العمومية في تاريخ: الأصول = الخصوم + حقوق الملكية (شاملة الأرباح المحتجزة)"""
+    groups, totals = _group_by_type(trial_balance(None, as_of)['rows'])
+    retained = totals['revenue'] - totals['expense']
+    return {
+        'assets': groups['asset'], 'liabilities': groups['liability'], 'equity': groups['equity'],
+        'total_assets': totals['asset'], 'total_liabilities': totals['liability'],
+        'retained_earnings': retained, 'total_equity': totals['equity'] + retained,
+    }
+
+# ===== إصدارات البيانات وذاكرة التقارير =====
+# كل جدول له عداد في data_version يزيد داخل نفس المعاملة التي تعدله، فيتراجع مع التراجع
+# وتراه كل عمليات الخادم. مفتاح التقرير يتضمن إصدارات جداوله، فلا يُعرض تقرير قديم أبداً
+
+UNVERSIONED_TABLES = {'data_version', 'background_job'}
+
+app.config['REPORT_CACHE_ENABLED'] = os.environ.get('REPORT_CACHE_ENABLED', '1') != '0'
+app.config['REPORT_CACHE_DIR'] = os.environ.get('REPORT_CACHE_DIR') or None
+
+report_cache = ReportCache(
+    max_entries=int(os.environ.get('REPORT_CACHE_ENTRIES', 128)),
+    max_bytes=int(os.environ.get('REPORT_CACHE_MB', 64)) * 1024 * 1024,
+    disk_dir=app.config['REPORT_CACHE_DIR']
+)
+
+
+def _changed_tables(session):
+    return session.info.setdefault('changed_tables', set())
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    """تسجيل الجداول التي عُدلت في هذه المعاملة"""
+    changed = _changed_tables(session)
+    for obj in list(session.new) + list(session.deleted):
+        changed.add(obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            changed.add(obj.__table__.name)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _collect_bulk_tables(orm_execute_state):
+    """التعديلات الجماعية (query.update/delete) لا تمر عبر flush"""
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _changed_tables(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(db.session, 'before_commit')
+def _bump_data_versions(session):
+    """زيادة عدادات الجداول المعدلة داخل المعاملة نفسها قبل إتمامها"""
+    session.flush()
+    changed = _changed_tables(session) - UNVERSIONED_TABLES
+    if not changed:
+        return
+
+    connection = session.connection()
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+    table = DataVersion.__table__
+    statement = dialect_insert(table).on_conflict_do_update(
+        index_elements=[table.c.name], set_={'version': table.c.version + 1}
+    )
+    # ترتيب ثابت للأسماء حتى لا تتقاطع أقفال معاملتين متزامنتين
+    connection.execute(statement, [{'name': name, 'version': 1} for name in sorted(changed)])
+    session.info['changed_tables'] = set()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _clear_after_commit(session):
+    session.info.pop('changed_tables', None)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _clear_after_rollback(session):
+    session.info.pop('changed_tables', None)
+
+
+def get_data_versions(table_names):
+    """إصدارات الجداول الحالية (الجدول الذي لم يُعدل بعد إصداره 0)"""
+    rows = dict(db.session.query(DataVersion.name, DataVersion.version)
+                .filter(DataVersion.name.in_(table_names)).all())
+    return tuple(rows.get(name, 0) for name in table_names)
+
+
+def cached_report(*models):
+    """تخزين ناتج صفحة تقرير بمفتاح (التقرير، الفرع، الفترة، المعاملات، إصدار البيانات)"""
+    table_names = tuple(sorted(model.__tablename__ for model in models))
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not app.config['REPORT_CACHE_ENABLED']:
+                return view(*args, **kwargs)
+
+            key = ReportCache.make_key((
+                request.endpoint,
+                sorted(kwargs.items()),
+                sorted(request.args.items(multi=True)),
+                str(get_locale()),
+                get_current_branch(),
+                date.today().isoformat(),  # التقارير النسبية (اليوم، هذا الشهر) تتغير بتغير اليوم
+                get_data_versions(table_names)
+            ))
+
+            cached = report_cache.get(key)
+            if cached is not None:
+                response = app.make_response(cached)
+                response.headers['X-Report-Cache'] = 'hit'
+                return response
+
+            rv = view(*args, **kwargs)
+            if not isinstance(rv, str):
+                return rv  # تحويل أو خطأ: لا يُخزن
+            report_cache.set(key, rv)
+            response = app.make_response(rv)
+            response.headers['X-Report-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
+
+
+@app.route('/api/report_cache')
+@login_required
+def report_cache_stats():
+    """عدادات ذاكرة التقارير (للمدير)"""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'ليس لديك صلاحية'}), 403
+    if request.args.get('clear'):
+        report_cache.clear()
+    return jsonify({'success': True, 'stats': report_cache.stats()})
+
+# ===== ذاكرة إعدادات النظام =====
+# تُحمّل كل الإعدادات باستعلام واحد وتُقرأ من الذاكرة في كل عرض للصفحات.
+# الكتابة في هذه العملية تُبطل الذاكرة فوراً، وكتابات العمليات الأخرى تُكتشف من
+# إصدار جدول system_settings في data_version (يُفحص مرة كل SETTINGS_CHECK_SECONDS)
+
+class SettingsCache:
+    """نسخة محلية من جدول system_settings"""
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self.loads = 0
+        self._values = None
+        self._version = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """تحميل جميع الإعدادات دفعة واحدة"""
+        # قراءة الإصدار قبل الصفوف: أي كتابة بينهما تؤدي لإعادة التحميل في الفحص التالي
+        version = get_data_versions(('system_settings',))[0]
+        values = dict(db.session.query(SystemSettings.setting_key, SystemSettings.setting_value).all())
+        with self._lock:
+            self._values = values
+            self._version = version
+            self._checked = time.monotonic()
+            self.loads += 1
+        return values
+
+    def invalidate(self):
+        with self._lock:
+            self._values = None
+
+    def _current(self):
+        values = self._values
+        if values is None:
+            return self.load()
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            self._checked = now
+            if get_data_versions(('system_settings',))[0] != self._version:
+                return self.load()
+        return values
+
+    def get(self, key, default=None):
+        values = self._current()
+        return values[key] if key in values else default
+
+
+settings_cache = SettingsCache(check_interval=float(os.environ.get('SETTINGS_CHECK_SECONDS', 1.0)))
+
+
+@app.route('/api/system_settings', methods=['POST'])
+@login_required
+def api_system_settings():
+    """حفظ مجموعة إعدادات في معاملة واحدة"""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'ليس لديك صلاحية'}), 403
+
+    values = (request.get_json(silent=True) or {}).get('settings')
+    if not isinstance(values, dict) or not values:
+        return jsonify({'success': False, 'message': 'لا توجد بيانات'}), 400
+    invalid = [key for key in values
+               if not isinstance(key, str) or not key or len(key) > 100 or key.startswith('autosave_')]
+    if invalid:
+        return jsonify({'success': False, 'message': f'مفاتيح غير صالحة: {", ".join(map(str, invalid))}'}), 400
+
+    SystemSettings.set_setting({key: None if value is None else str(value) for key, value in values.items()})
+    return jsonify({'success': True, 'message': 'تم حفظ الإعدادات بنجاح', 'saved': len(values)})
+
+# ===== ترقيم الصفحات (keyset) والتصفية لصفحات القوائم =====
+
+LIST_PAGE_SIZE = 50
+LIST_MAX_PAGE_SIZE = 200
+
+PAYMENT_METHODS = {
+    'cash': 'نقدي',
+    'mada': 'مدى',
+    'visa': 'فيزا',
+    'mastercard': 'ماستركارد',
+    'bank': 'تحويل بنكي',
+    'stc': 'STC Pay',
+    'gcc': 'GCC Pay',
+    'aks': 'أكس',
+    'credit': 'آجل'
+}
+
+INVOICE_STATUSES = {
+    'paid': 'مدفوعة',
+    'pending': 'معلقة',
+    'overdue': 'متأخرة'
+}
+
+def encode_cursor(values):
+    """ترميز قيم مفتاح الترتيب كمؤشر نصي آمن للروابط"""
+    raw = json.dumps([value.isoformat() if isinstance(value, (date, datetime)) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, columns):
+    """فك ترميز المؤشر وتحويل قيمه لأنواع الأعمدة - يرجع None إذا كان غير صالح"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+        if len(values) != len(columns):
+            return None
+
+        converted = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if value is None:
+                converted.append(None)
+            elif python_type is datetime:
+                converted.append(datetime.fromisoformat(value))
+            elif python_type is date:
+                converted.append(date.fromisoformat(value))
+            else:
+                converted.append(python_type(value))
+        return converted
+    except Exception:
+        return None
+
+class KeysetPage:
+    """صفحة من نتائج مرتبة تنازلياً بمفتاح ترتيب مع مؤشرات التالي والسابق"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, per_page=LIST_PAGE_SIZE):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def keyset_paginate(query, order_columns, per_page=None):
+    """ترقيم استعلام تنازلياً على order_columns باستخدام after/before من الرابط بدلاً من OFFSET"""
+    if per_page is None:
+        per_page = request.args.get('per_page', LIST_PAGE_SIZE, type=int)
+    per_page = max(1, min(per_page or LIST_PAGE_SIZE, LIST_MAX_PAGE_SIZE))
+
+    def _cursor(row):
+        return encode_cursor([getattr(row, column.key) for column in order_columns])
+
+    key = db.tuple_(*order_columns)
+    before = decode_cursor(request.args.get('before', ''), order_columns) if request.args.get('before') else None
+    after = decode_cursor(request.args.get('after', ''), order_columns) if request.args.get('after') else None
+
+    if before:
+        # الرجوع للخلف: ترتيب تصاعدي ثم عكس النتائج
+        rows = query.filter(key > db.tuple_(*[db.literal(value) for value in before])) \
+                    .order_by(*[column.asc() for column in order_columns]) \
+                    .limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return KeysetPage(
+            rows,
+            next_cursor=_cursor(rows[-1]) if rows else None,
+            prev_cursor=_cursor(rows[0]) if rows and has_more else None,
+            per_page=per_page
+        )
+
+    if after:
+        query = query.filter(key < db.tuple_(*[db.literal(value) for value in after]))
+    rows = query.order_by(*[column.desc() for column in order_columns]).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    return KeysetPage(
+        rows,
+        next_cursor=_cursor(rows[-1]) if rows and has_more else None,
+        prev_cursor=_cursor(rows[0]) if rows and after else None,
+        per_page=per_page
+    )
+
+def apply_list_filters(query, model, choice_filters=(), date_column=None, text_columns=()):
+    """تطبيق فلاتر القائمة من الرابط على الاستعلام (في قاعدة البيانات وليس في Python)
+
+    text_columns: أعمدة أو دوال تستقبل نمط البحث وترجع شرطاً (للبحث في العلاقات)
+    """
+    for name in choice_filters:
+        value = request.args.get(name, '').strip()
+        if value:
+            query = query.filter(getattr(model, name) == value)
+
+    if date_column is not None:
+        for name, compare in (('date_from', date_column.__ge__), ('date_to', date_column.__le__)):
+            value = request.args.get(name, '').strip()
+            if value:
+                try:
+                    query = query.filter(compare(datetime.strptime(value, '%Y-%m-%d').date()))
+                except ValueError:
+                    pass
+
+    text = request.args.get('q', '').strip()
+    if text and text_columns:
+        escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f'%{escaped}%'
+        query = query.filter(db.or_(*[
+            column.ilike(pattern, escape='\\') if hasattr(column, 'ilike') else column(pattern)
+            for column in text_columns
+        ]))
+
+    return query
+
+def list_page_url(**changes):
+    """رابط الصفحة الحالية مع الحفاظ على الفلاتر وتعديل المعاملات المحددة"""
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    for key, value in changes.items():
+        if value is None:
+            args.pop(key, None)
+        else:
+            args[key] = value
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+LIST_CONTROLS_TEMPLATE = '''
+{% if fields %}
+<form method="GET" class="row g-2 align-items-end p-3 bg-light border-bottom list-filters">
+    {% for field in fields %}
+    {% if field == 'q' %}
+    <div class="col-md-3">
+        <label class="form-label small mb-1">{{ 'بحث' if ar else 'Search' }}</label>
+        <input type="text" name="q" value="{{ args.get('q', '') }}" class="form-control form-control-sm">
+    </div>
+    {% elif field == 'date' %}
+    <div class="col-md-2">
+        <label class="form-label small mb-1">{{ 'من تاريخ' if ar else 'From' }}</label>
+        <input type="date" name="date_from" value="{{ args.get('date_from', '') }}" class="form-control form-control-sm">
+    </div>
+    <div class="col-md-2">
+        <label class="form-label small mb-1">{{ 'إلى تاريخ' if ar else 'To' }}</label>
+        <input type="date" name="date_to" value="{{ args.get('date_to', '') }}" class="form-control form-control-sm">
+    </div>
+    {% else %}
+    <div class="col-md-2">
+        <label class="form-label small mb-1">{{ labels.get(field, field) }}</label>
+        <select name="{{ field }}" class="form-select form-select-sm">
+            <option value="">{{ 'الكل' if ar else 'All' }}</option>
+            {% for value, label in choices.get(field, {}).items() %}
+            <option value="{{ value }}" {% if args.get(field) == value %}selected{% endif %}>{{ label }}</option>
+            {% endfor %}
+        </select>
+    </div>
+    {% endif %}
+    {% endfor %}
+    <div class="col-md-auto">
+        <button type="submit" class="btn btn-primary btn-sm"><i class="fas fa-filter me-1"></i>{{ 'تصفية' if ar else 'Filter' }}</button>
+        <a href="{{ url_for(request.endpoint) }}" class="btn btn-outline-secondary btn-sm">{{ 'إلغاء' if ar else 'Reset' }}</a>
+    </div>
+    {% if export %}
+    <div class="col-md-auto ms-auto">
+        <a href="{{ url_for('export_excel', report_type=export, **export_args) }}" class="btn btn-success btn-sm"><i class="fas fa-file-excel me-1"></i>Excel</a>
+        <a href="{{ url_for('export_excel', report_type=export, format='csv', **export_args) }}" class="btn btn-outline-success btn-sm"><i class="fas fa-file-csv me-1"></i>CSV</a>
+        <a href="{{ url_for('export_excel', report_type=export, background=1, **export_args) }}" class="btn btn-outline-secondary btn-sm" title="{{ 'تصدير في الخلفية' if ar else 'Export in background' }}"><i class="fas fa-hourglass-half"></i></a>
+    </div>
+    {% endif %}
+</form>
+{% endif %}
+'''
+
+LIST_PAGER_TEMPLATE = '''
+{% if page.has_prev or page.has_next %}
+<nav class="d-flex justify-content-between align-items-center p-3 border-top list-pager">
+    <div>
+        {% if page.has_prev %}
+        <a class="btn btn-outline-primary btn-sm" href="{{ list_page_url() }}">{{ 'الأحدث' if ar else 'Newest' }}</a>
+        <a class="btn btn-outline-primary btn-sm" href="{{ list_page_url(before=page.prev_cursor) }}">{{ 'السابق' if ar else 'Previous' }}</a>
+        {% endif %}
+    </div>
+    <div>
+        {% if page.has_next %}
+        <a class="btn btn-primary btn-sm" href="{{ list_page_url(after=page.next_cursor) }}">{{ 'التالي' if ar else 'Next' }}</a>
+        {% endif %}
+    </div>
+</nav>
+{% endif %}
+'''
+
+def render_list_filters(fields, choices=None, export=None):
+    """نموذج فلاتر القائمة (بحث، فرع، حالة، طريقة دفع، فترة...)
+
+    export: نوع التقرير لأزرار التصدير، ويُمرر له نفس الفلاتر الحالية
+    """
+    from markupsafe import Markup
+
+    ar = get_locale() == 'ar'
+    all_choices = {
+        'branch': {key: (info['name_ar'] if ar else info['name_en']) for key, info in app.config['BRANCHES'].items()},
+        'status': INVOICE_STATUSES if ar else {key: key.title() for key in INVOICE_STATUSES},
+        'payment_method': PAYMENT_METHODS
+    }
+    all_choices.update(choices or {})
+    labels = {
+        'branch': 'الفرع' if ar else 'Branch',
+        'status': 'الحالة' if ar else 'Status',
+        'payment_method': 'طريقة الدفع' if ar else 'Payment method',
+        'category': 'الفئة' if ar else 'Category',
+        'role': 'الدور' if ar else 'Role',
+        'low_stock': 'المخزون' if ar else 'Stock'
+    }
+    export_args = {key: value for key, value in request.args.items()
+                   if key not in ('after', 'before', 'per_page', 'format', 'background')}
+    return Markup(render_template_string(
+        LIST_CONTROLS_TEMPLATE, fields=fields, choices=all_choices, labels=labels,
+        args=request.args, ar=ar, export=export, export_args=export_args
+    ))
+
+def render_list_pager(page):
+    """أزرار التنقل بين صفحات القائمة"""
+    from markupsafe import Markup
+
+    return Markup(render_template_string(LIST_PAGER_TEMPLATE, page=page, ar=get_locale() == 'ar'))
+
+app.jinja_env.globals.update(
+    list_page_url=list_page_url,
+    render_list_filters=render_list_filters,
+    render_list_pager=render_list_pager
+)
 
 # ===== وظائف مساعدة للحفظ التلقائي =====
 
@@ -1057,38 +2776,24 @@ def dashboard():
     total_products = Product.query.count()
     total_employees = Employee.query.count()
 
-    # إحصائيات مالية حسب الفرع
-    branch_sales = db.session.query(db.func.sum(SalesInvoice.total)).filter(
-        SalesInvoice.branch == current_branch
-    ).scalar() or 0
+    # الإحصائيات المالية من جدول الملخصات اليومية بدلاً من مسح كل الفواتير
+    all_time = get_summary_totals()
+    branch_sales = get_summary_totals(branch=current_branch)['sales_total']
 
     # إحصائيات عامة (جميع الفروع)
-    total_sales = db.session.query(db.func.sum(SalesInvoice.total)).scalar() or 0
-    total_purchases = db.session.query(db.func.sum(PurchaseInvoice.total)).scalar() or 0
-    total_expenses = db.session.query(db.func.sum(Expense.amount)).scalar() or 0
+    total_sales = all_time['sales_total']
+    total_purchases = all_time['purchases_total']
+    total_expenses = all_time['expenses_total']
     net_profit = total_sales - total_purchases - total_expenses
 
-    # إحصائيات هذا الشهر للفرع الحالي
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-
-    monthly_sales = db.session.query(func.sum(SalesInvoice.total)).filter(
-        SalesInvoice.branch == current_branch,
-        extract('month', SalesInvoice.created_at) == current_month,
-        extract('year', SalesInvoice.created_at) == current_year
-    ).scalar() or 0
-
-    monthly_expenses = db.session.query(func.sum(Expense.amount)).filter(
-        extract('month', Expense.created_at) == current_month,
-        extract('year', Expense.created_at) == current_year
-    ).scalar() or 0
+    # إحصائيات هذا الشهر للفرع الحالي (المصروفات مشتركة بين الفروع)
+    this_month = get_summary_totals(branch=current_branch, since=date.today().replace(day=1))
+    monthly_sales = this_month['sales_total']
+    monthly_expenses = this_month['expenses_total']
 
     # إحصائيات الأسبوع الماضي للفرع الحالي
-    week_ago = datetime.now() - timedelta(days=7)
-    weekly_sales = db.session.query(func.sum(SalesInvoice.total)).filter(
-        SalesInvoice.branch == current_branch,
-        SalesInvoice.created_at >= week_ago
-    ).scalar() or 0
+    week_ago = date.today() - timedelta(days=7)
+    weekly_sales = get_summary_totals(branch=current_branch, since=week_ago)['sales_total']
 
     # المنتجات منخفضة المخزون
     low_stock_products = Product.query.filter(Product.quantity <= Product.min_quantity).all()
@@ -1635,7 +3340,7 @@ def dashboard():
                         <div class="stat-icon mx-auto" style="background: var(--primary-gradient);">
                             <i class="fas fa-users"></i>
                         </div>
-                        <div class="stat-number">{{ total_customers }}</div>
+                        <div class="stat-number" data-live-stat="customers_count" data-value="{{ total_customers }}">{{ total_customers }}</div>
                         <div class="stat-label">إجمالي العملاء</div>
                         <div class="mt-2">
                             <small class="text-success">
@@ -1663,11 +3368,11 @@ def dashboard():
                         <div class="stat-icon mx-auto" style="background: var(--warning-gradient);">
                             <i class="fas fa-box"></i>
                         </div>
-                        <div class="stat-number">{{ total_products }}</div>
+                        <div class="stat-number" data-live-stat="products_count" data-value="{{ total_products }}">{{ total_products }}</div>
                         <div class="stat-label">إجمالي المنتجات</div>
                         <div class="mt-2">
                             <small class="text-warning">
-                                <i class="fas fa-exclamation-triangle me-1"></i>{{ low_stock_products|length }} منخفض المخزون
+                                <i class="fas fa-exclamation-triangle me-1"></i><span data-live-stat="low_stock_count" data-value="{{ low_stock_products|length }}">{{ low_stock_products|length }}</span> منخفض المخزون
                             </small>
                         </div>
                     </div>
@@ -1698,7 +3403,7 @@ def dashboard():
                         <div class="stat-icon mx-auto" style="background: var(--success-gradient);">
                             <i class="fas fa-arrow-up"></i>
                         </div>
-                        <div class="stat-number text-success">{{ "%.0f"|format(total_sales) }}</div>
+                        <div class="stat-number text-success" data-live-stat="sales_total" data-value="{{ total_sales }}">{{ "%.0f"|format(total_sales) }}</div>
                         <div class="stat-label">إجمالي المبيعات</div>
                         <div class="mt-2">
                             <small class="text-success">
@@ -1740,7 +3445,7 @@ def dashboard():
                         <div class="stat-icon mx-auto" style="background: {% if net_profit >= 0 %}var(--success-gradient){% else %}var(--danger-gradient){% endif %};">
                             <i class="fas fa-chart-line"></i>
                         </div>
-                        <div class="stat-number {% if net_profit >= 0 %}text-success{% else %}text-danger{% endif %}">{{ "%.0f"|format(net_profit) }}</div>
+                        <div class="stat-number {% if net_profit >= 0 %}text-success{% else %}text-danger{% endif %}" data-live-stat="net_profit" data-value="{{ net_profit }}">{{ "%.0f"|format(net_profit) }}</div>
                         <div class="stat-label">صافي الربح</div>
                         <div class="mt-2">
                             <small class="{% if net_profit >= 0 %}text-success{% else %}text-danger{% endif %}">
@@ -1767,7 +3472,7 @@ def dashboard():
                             </div>
                             <div>
                                 <h5 class="mb-1">إدارة العملاء</h5>
-                                <p class="text-muted mb-0">{{ total_customers }} عميل مسجل</p>
+                                <p class="text-muted mb-0"><span data-live-stat="customers_count" data-value="{{ total_customers }}">{{ total_customers }}</span> عميل مسجل</p>
                                 <small class="text-success">
                                     <i class="fas fa-plus me-1"></i>إضافة وتعديل وحذف
                                 </small>
@@ -1801,9 +3506,9 @@ def dashboard():
                             </div>
                             <div>
                                 <h5 class="mb-1">إدارة المنتجات</h5>
-                                <p class="text-muted mb-0">{{ total_products }} منتج متاح</p>
+                                <p class="text-muted mb-0"><span data-live-stat="products_count" data-value="{{ total_products }}">{{ total_products }}</span> منتج متاح</p>
                                 <small class="text-warning">
-                                    <i class="fas fa-exclamation-triangle me-1"></i>{{ low_stock_products|length }} منخفض المخزون
+                                    <i class="fas fa-exclamation-triangle me-1"></i><span data-live-stat="low_stock_count" data-value="{{ low_stock_products|length }}">{{ low_stock_products|length }}</span> منخفض المخزون
                                 </small>
                             </div>
                         </div>
@@ -1818,7 +3523,7 @@ def dashboard():
                             </div>
                             <div>
                                 <h5 class="mb-1">فواتير المبيعات</h5>
-                                <p class="text-muted mb-0">{{ "%.0f"|format(weekly_sales) }} ر.س هذا الأسبوع</p>
+                                <p class="text-muted mb-0"><span data-live-stat="sales_total" data-value="{{ weekly_sales }}" data-branch="{{ current_branch }}" data-since="{{ week_ago }}">{{ "%.0f"|format(weekly_sales) }}</span> ر.س هذا الأسبوع</p>
                                 <small class="text-success">
                                     <i class="fas fa-chart-line me-1"></i>إنشاء فواتير جديدة
                                 </small>
@@ -1908,7 +3613,7 @@ def dashboard():
                         <h6 class="mb-3"><i class="fas fa-chart-pie me-2"></i>أداء هذا الشهر</h6>
                         <div class="row text-center">
                             <div class="col-6">
-                                <div class="stat-number text-success">{{ "%.0f"|format(monthly_sales) }}</div>
+                                <div class="stat-number text-success" data-live-stat="sales_total" data-value="{{ monthly_sales }}" data-branch="{{ current_branch }}" data-since="{{ month_start }}">{{ "%.0f"|format(monthly_sales) }}</div>
                                 <small class="text-muted">مبيعات الشهر</small>
                             </div>
                             <div class="col-6">
@@ -2089,7 +3794,7 @@ def dashboard():
 
             async function loadTranslations() {
                 try {
-                    const response = await fetch('/get_translations');
+                    const response = await fetch('{{ translation_bundle_url() }}');
                     currentTranslations = await response.json();
                     console.log('تم تحميل الترجمات:', currentTranslations);
                 } catch (error) {
@@ -2230,18 +3935,21 @@ def dashboard():
     monthly_sales=monthly_sales, monthly_expenses=monthly_expenses,
     weekly_sales=weekly_sales, branch_sales=branch_sales,
     low_stock_products=low_stock_products, recent_sales=recent_sales,
-    top_customers=top_customers, current_branch=current_branch)
+    top_customers=top_customers, current_branch=current_branch,
+    month_start=date.today().replace(day=1).isoformat(), week_ago=week_ago.isoformat())
 
 # ===== إدارة العملاء =====
 
 @app.route('/customers')
 @login_required
 def customers():
-    customers = Customer.query.order_by(Customer.created_at.desc()).all()
-    total_customers = len(customers)
-
-    # إحصائيات العملاء
-    customers_with_sales = db.session.query(Customer).join(SalesInvoice).distinct().count()
+    query = apply_list_filters(
+        Customer.query, Customer,
+        text_columns=(Customer.name, Customer.phone, Customer.email, Customer.tax_number)
+    )
+    total_customers = query.count()
+    page = keyset_paginate(query, [Customer.id])
+    customers = page.items
 
     return render_template_string('''
     <!DOCTYPE html>
@@ -2281,7 +3989,7 @@ def customers():
                     <h2 class="fw-bold text-primary">
                         <i class="fas fa-users me-2"></i>إدارة العملاء
                     </h2>
-                    <p class="text-muted">إجمالي العملاء: {{ total_customers }} عميل</p>
+                    <p class="text-muted">إجمالي العملاء: <span{% if not request.args %} data-live-stat="customers_count" data-value="{{ total_customers }}"{% endif %}>{{ total_customers }}</span> عميل</p>
                 </div>
                 <div class="col-md-4 text-end">
                     <button type="button" class="btn btn-primary btn-lg" data-bs-toggle="modal" data-bs-target="#addCustomerModal">
@@ -2304,28 +4012,34 @@ def customers():
                         </div>
                     </div>
                 </div>
+                {{ render_list_filters(['q']) }}
                 <div class="card-body">
                     <div class="table-responsive">
-                        <table class="table table-striped">
+                        <table class="table table-striped" data-live-table="customer" data-live-insert="{{ 0 if request.args else 1 }}">
                             <thead>
                                 <tr>
-                                    <th>الاسم</th>
-                                    <th>الهاتف</th>
-                                    <th>البريد الإلكتروني</th>
-                                    <th>العنوان</th>
-                                    <th>تاريخ الإضافة</th>
+                                    <th data-field="name">الاسم</th>
+                                    <th data-field="phone">الهاتف</th>
+                                    <th data-field="email">البريد الإلكتروني</th>
+                                    <th data-field="address">العنوان</th>
+                                    <th data-field="balance" data-format="money">الرصيد</th>
+                                    <th data-field="created_at">تاريخ الإضافة</th>
                                     <th>الإجراءات</th>
                                 </tr>
                             </thead>
                             <tbody>
                                 {% for customer in customers %}
-                                <tr>
-                                    <td>{{ customer.name }}</td>
-                                    <td>{{ customer.phone or '-' }}</td>
-                                    <td>{{ customer.email or '-' }}</td>
-                                    <td>{{ customer.address or '-' }}</td>
-                                    <td>{{ customer.created_at.strftime('%Y-%m-%d') if customer.created_at else '-' }}</td>
+                                <tr data-row-id="{{ customer.id }}">
+                                    <td data-field="name">{{ customer.name }}</td>
+                                    <td data-field="phone">{{ customer.phone or '-' }}</td>
+                                    <td data-field="email">{{ customer.email or '-' }}</td>
+                                    <td data-field="address">{{ customer.address or '-' }}</td>
+                                    <td data-field="balance" data-format="money">{{ "%.2f"|format(customer.balance or 0) }} ر.س</td>
+                                    <td data-field="created_at">{{ customer.created_at.strftime('%Y-%m-%d') if customer.created_at else '-' }}</td>
                                     <td>
+                                        <a class="btn btn-sm btn-info me-1" href="{{ url_for('customer_statement', customer_id=customer.id) }}" title="كشف حساب">
+                                            <i class="fas fa-file-invoice-dollar"></i>
+                                        </a>
                                         <button class="btn btn-sm btn-warning me-1" onclick="editCustomer({{ customer.id }}, '{{ customer.name }}', '{{ customer.phone or '' }}', '{{ customer.email or '' }}', '{{ customer.address or '' }}')" title="تعديل">
                                             <i class="fas fa-edit"></i>
                                         </button>
@@ -2338,6 +4052,7 @@ def customers():
                             </tbody>
                         </table>
                     </div>
+                    {{ render_list_pager(page) }}
                 </div>
             </div>
         </div>
@@ -2620,9 +4335,10 @@ def customers():
             });
         </script>
         {{ get_auto_save_script()|safe }}
+        {{ SOCKETIO_JS|safe }}
     </body>
     </html>
-    ''', customers=customers, total_customers=total_customers)
+    ''', customers=customers, total_customers=total_customers, page=page)
 
 @app.route('/add_customer', methods=['POST'])
 @login_required
@@ -2637,13 +4353,8 @@ def add_customer():
         db.session.add(customer)
         db.session.commit()
 
-        # إرسال تحديث فوري لجميع المستخدمين
-        broadcast_update('customer', {
-            'action': 'created',
-            'name': customer.name,
-            'email': customer.email,
-            'phone': customer.phone
-        })
+        # إرسال الصف الجديد لصفحات العملاء ولوحة التحكم
+        publish_live_update('customer', 'created', customer)
 
         # التأكد من الحفظ
         saved_customer = Customer.query.filter_by(name=request.form['name']).first()
@@ -2664,6 +4375,7 @@ def edit_customer():
     try:
         customer_id = request.form['customer_id']
         customer = Customer.query.get_or_404(customer_id)
+        before = live_state('customer', customer)
 
         customer.name = request.form['name']
         customer.phone = request.form.get('phone')
@@ -2671,6 +4383,7 @@ def edit_customer():
         customer.address = request.form.get('address')
 
         db.session.commit()
+        publish_live_update('customer', 'updated', customer, before=before)
         flash('تم تحديث بيانات العميل بنجاح', 'success')
     except Exception as e:
         db.session.rollback()
@@ -2686,8 +4399,10 @@ def delete_customer(customer_id):
         if not customer:
             return jsonify({'success': False, 'message': 'العميل غير موجود'})
 
+        before = live_state('customer', customer)
         db.session.delete(customer)
         db.session.commit()
+        publish_live_update('customer', 'deleted', before=before)
         return jsonify({'success': True, 'message': 'تم حذف العميل بنجاح'})
     except Exception as e:
         db.session.rollback()
@@ -2747,6 +4462,7 @@ def suppliers():
                                     <th>البريد الإلكتروني</th>
                                     <th>العنوان</th>
                                     <th>الرقم الضريبي</th>
+                                    <th>الرصيد</th>
                                     <th>تاريخ الإضافة</th>
                                     <th>الإجراءات</th>
                                 </tr>
@@ -2760,8 +4476,12 @@ def suppliers():
                                     <td>{{ supplier.email or '-' }}</td>
                                     <td>{{ supplier.address or '-' }}</td>
                                     <td>{{ supplier.tax_number or '-' }}</td>
+                                    <td>{{ "%.2f"|format(supplier.balance or 0) }} ر.س</td>
                                     <td>{{ supplier.created_at.strftime('%Y-%m-%d') if supplier.created_at else '-' }}</td>
                                     <td>
+                                        <a class="btn btn-sm btn-outline-info" href="{{ url_for('supplier_statement', supplier_id=supplier.id) }}" title="كشف حساب">
+                                            <i class="fas fa-file-invoice-dollar"></i>
+                                        </a>
                                         <button class="btn btn-sm btn-outline-primary" onclick="editSupplier({{ supplier.id }}, '{{ supplier.name }}', '{{ supplier.phone or '' }}', '{{ supplier.email or '' }}', '{{ supplier.address or '' }}', '{{ supplier.tax_number or '' }}')" title="تعديل">
                                             <i class="fas fa-edit"></i>
                                         </button>
@@ -2995,8 +4715,25 @@ def delete_supplier(supplier_id):
 @app.route('/products')
 @login_required
 def products():
-    products = Product.query.all()
+    query = apply_list_filters(
+        Product.query, Product,
+        choice_filters=('category',),
+        text_columns=(Product.name, Product.description, Product.category)
+    )
+    if request.args.get('low_stock'):
+        query = query.filter(Product.quantity <= Product.min_quantity)
+
+    products_count, total_prices, total_quantity = query.with_entities(
+        db.func.count(Product.id),
+        db.func.coalesce(db.func.sum(Product.price), 0),
+        db.func.coalesce(db.func.sum(Product.quantity), 0)
+    ).one()
     low_stock_count = Product.query.filter(Product.quantity <= Product.min_quantity).count()
+    category_choices = {row[0]: row[0] for row in db.session.query(Product.category).filter(
+        Product.category.isnot(None)).distinct().order_by(Product.category)}
+
+    page = keyset_paginate(query, [Product.id])
+    products = page.items
 
     return render_template_string('''
     <!DOCTYPE html>
@@ -3038,7 +4775,7 @@ def products():
                     <div class="card bg-primary text-white">
                         <div class="card-body text-center">
                             <i class="fas fa-box fa-2x mb-2"></i>
-                            <h4>{{ products|length }}</h4>
+                            <h4{% if not request.args %} data-live-stat="products_count" data-value="{{ products_count }}"{% endif %}>{{ products_count }}</h4>
                             <p class="mb-0">إجمالي المنتجات</p>
                         </div>
                     </div>
@@ -3047,7 +4784,7 @@ def products():
                     <div class="card bg-warning text-white">
                         <div class="card-body text-center">
                             <i class="fas fa-exclamation-triangle fa-2x mb-2"></i>
-                            <h4>{{ low_stock_count }}</h4>
+                            <h4 data-live-stat="low_stock_count" data-value="{{ low_stock_count }}">{{ low_stock_count }}</h4>
                             <p class="mb-0">منتجات منخفضة المخزون</p>
                         </div>
                     </div>
@@ -3056,7 +4793,7 @@ def products():
                     <div class="card bg-success text-white">
                         <div class="card-body text-center">
                             <i class="fas fa-dollar-sign fa-2x mb-2"></i>
-                            <h4>{{ "%.0f"|format(products|sum(attribute='price')|default(0)) }}</h4>
+                            <h4{% if not request.args %} data-live-stat="products_prices" data-value="{{ total_prices }}"{% endif %}>{{ "%.0f"|format(total_prices) }}</h4>
                             <p class="mb-0">إجمالي قيمة الأسعار</p>
                         </div>
                     </div>
@@ -3065,7 +4802,7 @@ def products():
                     <div class="card bg-info text-white">
                         <div class="card-body text-center">
                             <i class="fas fa-warehouse fa-2x mb-2"></i>
-                            <h4>{{ products|sum(attribute='quantity')|default(0) }}</h4>
+                            <h4{% if not request.args %} data-live-stat="products_quantity" data-value="{{ total_quantity }}"{% endif %}>{{ total_quantity }}</h4>
                             <p class="mb-0">إجمالي الكمية</p>
                         </div>
                     </div>
@@ -3079,45 +4816,50 @@ def products():
                         <i class="fas fa-plus me-2"></i>إضافة منتج جديد
                     </button>
                 </div>
+                {{ render_list_filters(['q', 'category', 'low_stock'], export='inventory', choices={
+                    'category': category_choices,
+                    'low_stock': {'1': 'منخفض المخزون'}
+                }) }}
                 <div class="card-body">
                     {% if products %}
                     <div class="table-responsive">
-                        <table class="table table-hover">
+                        <table class="table table-hover" data-live-table="product" data-live-insert="{{ 0 if request.args else 1 }}" data-row-class-field="stock_class">
                             <thead class="table-dark">
                                 <tr>
                                     <th>#</th>
-                                    <th>اسم المنتج</th>
-                                    <th>الفئة</th>
-                                    <th>سعر البيع</th>
-                                    <th>سعر الشراء</th>
-                                    <th>الكمية المتاحة</th>
-                                    <th>الحد الأدنى</th>
-                                    <th>حالة المخزون</th>
+                                    <th data-field="name">اسم المنتج</th>
+                                    <th data-field="category">الفئة</th>
+                                    <th data-field="price" data-format="money">سعر البيع</th>
+                                    <th data-field="cost" data-format="money">سعر الشراء</th>
+                                    <th data-field="quantity">الكمية المتاحة</th>
+                                    <th data-field="min_quantity">الحد الأدنى</th>
+                                    <th data-field="stock_label">حالة المخزون</th>
                                     <th>الإجراءات</th>
                                 </tr>
                             </thead>
                             <tbody>
                                 {% for product in products %}
-                                <tr class="{% if product.quantity == 0 %}out-of-stock{% elif product.quantity <= product.min_quantity %}low-stock{% endif %}">
+                                {% set stock_class = 'out-of-stock' if product.quantity == 0 else ('low-stock' if product.quantity <= product.min_quantity else '') %}
+                                <tr data-row-id="{{ product.id }}" class="{{ stock_class }}" data-class-field="stock_class" data-live-class="{{ stock_class }}">
                                     <td>{{ loop.index }}</td>
                                     <td>
-                                        <strong>{{ product.name }}</strong>
+                                        <strong data-field="name">{{ product.name }}</strong>
                                         {% if product.description %}
                                         <br><small class="text-muted">{{ product.description[:50] }}...</small>
                                         {% endif %}
                                     </td>
-                                    <td>{{ product.category or '-' }}</td>
-                                    <td><strong>{{ "%.2f"|format(product.price) }} ر.س</strong></td>
-                                    <td>{{ "%.2f"|format(product.cost or 0) }} ر.س</td>
-                                    <td><span class="badge bg-primary">{{ product.quantity }}</span></td>
-                                    <td>{{ product.min_quantity }}</td>
+                                    <td data-field="category">{{ product.category or '-' }}</td>
+                                    <td><strong data-field="price" data-format="money">{{ "%.2f"|format(product.price) }} ر.س</strong></td>
+                                    <td data-field="cost" data-format="money">{{ "%.2f"|format(product.cost or 0) }} ر.س</td>
+                                    <td><span class="badge bg-primary" data-field="quantity">{{ product.quantity }}</span></td>
+                                    <td data-field="min_quantity">{{ product.min_quantity }}</td>
                                     <td>
                                         {% if product.quantity == 0 %}
-                                        <span class="badge bg-danger stock-badge">نفد المخزون</span>
+                                        <span class="badge bg-danger stock-badge" data-field="stock_label" data-class-field="stock_badge" data-live-class="bg-danger">نفد المخزون</span>
                                         {% elif product.quantity <= product.min_quantity %}
-                                        <span class="badge bg-warning stock-badge">مخزون منخفض</span>
+                                        <span class="badge bg-warning stock-badge" data-field="stock_label" data-class-field="stock_badge" data-live-class="bg-warning">مخزون منخفض</span>
                                         {% else %}
-                                        <span class="badge bg-success stock-badge">متوفر</span>
+                                        <span class="badge bg-success stock-badge" data-field="stock_label" data-class-field="stock_badge" data-live-class="bg-success">متوفر</span>
                                         {% endif %}
                                     </td>
                                     <td>
@@ -3136,6 +4878,7 @@ def products():
                             </tbody>
                         </table>
                     </div>
+                    {{ render_list_pager(page) }}
                     {% else %}
                     <div class="text-center py-5">
                         <i class="fas fa-box fa-3x text-muted mb-3"></i>
@@ -3376,9 +5119,11 @@ def products():
                 }
             }
         </script>
+        {{ SOCKETIO_JS|safe }}
     </body>
     </html>
-    ''', products=products, low_stock_count=low_stock_count)
+    ''', products=products, low_stock_count=low_stock_count, products_count=products_count,
+         total_prices=total_prices, total_quantity=total_quantity, category_choices=category_choices, page=page)
 
 @app.route('/add_product', methods=['POST'])
 @login_required
@@ -3394,6 +5139,7 @@ def add_product():
     )
     db.session.add(product)
     db.session.commit()
+    publish_live_update('product', 'created', product)
     flash('تم إضافة المنتج بنجاح', 'success')
     return redirect(url_for('products'))
 
@@ -3403,6 +5149,7 @@ def edit_product():
     try:
         product_id = request.form['product_id']
         product = Product.query.get_or_404(product_id)
+        before = live_state('product', product)
 
         product.name = request.form['name']
         product.description = request.form.get('description')
@@ -3413,6 +5160,7 @@ def edit_product():
         product.min_quantity = int(request.form.get('min_quantity', 10))
 
         db.session.commit()
+        publish_live_update('product', 'updated', product, before=before)
         flash('تم تحديث بيانات المنتج بنجاح', 'success')
     except Exception as e:
         db.session.rollback()
@@ -3427,10 +5175,12 @@ def add_stock():
         product_id = request.form['product_id']
         product = Product.query.get_or_404(product_id)
 
+        before = live_state('product', product)
         add_quantity = int(request.form['quantity'])
         product.quantity += add_quantity
 
         db.session.commit()
+        publish_live_update('product', 'updated', product, before=before)
         flash(f'تم إضافة {add_quantity} وحدة للمنتج "{product.name}" بنجاح', 'success')
     except Exception as e:
         db.session.rollback()
@@ -3446,8 +5196,10 @@ def delete_product(product_id):
         if not product:
             return jsonify({'success': False, 'message': 'المنتج غير موجود'})
 
+        before = live_state('product', product)
         db.session.delete(product)
         db.session.commit()
+        publish_live_update('product', 'deleted', before=before)
         return jsonify({'success': True, 'message': 'تم حذف المنتج بنجاح'})
     except Exception as e:
         db.session.rollback()
@@ -3456,9 +5208,21 @@ def delete_product(product_id):
 @app.route('/sales')
 @login_required
 def sales():
-    sales = SalesInvoice.query.order_by(SalesInvoice.created_at.desc()).all()
-    customers = Customer.query.all()
-    total_sales = sum(sale.total for sale in sales)
+    # التصفية والترقيم والمجاميع في قاعدة البيانات بدلاً من تحميل كل الفواتير
+    query = apply_list_filters(
+        SalesInvoice.query, SalesInvoice,
+        choice_filters=('branch', 'status', 'payment_method'),
+        date_column=SalesInvoice.date,
+        text_columns=(SalesInvoice.invoice_number, SalesInvoice.notes,
+                      lambda pattern: SalesInvoice.customer.has(Customer.name.ilike(pattern, escape='\\')))
+    )
+    sales_count, total_sales = query.with_entities(
+        db.func.count(SalesInvoice.id), db.func.coalesce(db.func.sum(SalesInvoice.total), 0)
+    ).one()
+    page = keyset_paginate(query.options(db.joinedload(SalesInvoice.customer)),
+                           [SalesInvoice.date, SalesInvoice.id])
+    sales = page.items
+    customers_count = Customer.query.count()
 
     # Add discount logic
     for sale in sales:
@@ -3544,7 +5308,7 @@ def sales():
                         <div class="text-primary mb-3">
                             <i class="fas fa-users fa-3x"></i>
                         </div>
-                        <h3 class="fw-bold text-primary">{{ customers|length }}</h3>
+                        <h3 class="fw-bold text-primary" data-live-stat="customers_count" data-value="{{ customers_count }}">{{ customers_count }}</h3>
                         <p class="text-muted mb-0">العملاء المسجلين</p>
                     </div>
                 </div>
@@ -3558,36 +5322,38 @@ def sales():
                         <i class="fas fa-plus me-2"></i>فاتورة مبيعات جديدة
                     </button>
                 </div>
+                {{ render_list_filters(['q', 'branch', 'status', 'payment_method', 'date'], export='sales') }}
                 <div class="card-body p-0">
                     {% if sales %}
                     <div class="table-responsive">
-                        <table class="table table-hover mb-0" id="salesTable">
+                        <table class="table table-hover mb-0" id="salesTable" data-live-table="sales_invoice" data-live-insert="{{ 0 if request.args else 1 }}">
                             <thead class="table-dark">
                                 <tr>
-                                    <th>رقم الفاتورة</th>
-                                    <th>العميل</th>
-                                    <th>التاريخ</th>
-                                    <th>الإجمالي</th>
-                                    <th>الخصم</th>
-                                    <th>الإجمالي بعد الخصم</th>
-                                    <th>الحالة</th>
+                                    <th data-field="invoice_number">رقم الفاتورة</th>
+                                    <th data-field="customer">العميل</th>
+                                    <th data-field="date">التاريخ</th>
+                                    <th data-field="total" data-format="money">الإجمالي</th>
+                                    <th data-field="discount" data-format="money">الخصم</th>
+                                    <th data-field="discounted_total" data-format="money">الإجمالي بعد الخصم</th>
+                                    <th data-field="status">الحالة</th>
                                 </tr>
                             </thead>
                             <tbody>
                                 {% for sale in sales %}
-                                <tr>
-                                    <td>{{ sale.invoice_number }}</td>
-                                    <td>{{ sale.customer.name if sale.customer else 'عميل نقدي' }}</td>
-                                    <td>{{ sale.date.strftime('%Y-%m-%d') }}</td>
-                                    <td>{{ "%.2f"|format(sale.total) }} ر.س</td>
-                                    <td>{{ "%.2f"|format(sale.discount or 0) }} ر.س</td>
-                                    <td>{{ "%.2f"|format(sale.discounted_total) }} ر.س</td>
-                                    <td>{{ sale.status }}</td>
+                                <tr data-row-id="{{ sale.id }}">
+                                    <td data-field="invoice_number">{{ sale.invoice_number }}</td>
+                                    <td data-field="customer">{{ sale.customer.name if sale.customer else 'عميل نقدي' }}</td>
+                                    <td data-field="date">{{ sale.date.strftime('%Y-%m-%d') }}</td>
+                                    <td data-field="total" data-format="money">{{ "%.2f"|format(sale.total) }} ر.س</td>
+                                    <td data-field="discount" data-format="money">{{ "%.2f"|format(sale.discount or 0) }} ر.س</td>
+                                    <td data-field="discounted_total" data-format="money">{{ "%.2f"|format(sale.discounted_total) }} ر.س</td>
+                                    <td data-field="status">{{ sale.status }}</td>
                                 </tr>
                                 {% endfor %}
                             </tbody>
                         </table>
                     </div>
+                    {{ render_list_pager(page) }}
                     {% else %}
                     <div class="text-center py-5">
                         <div class="mb-4">
@@ -3603,9 +5369,11 @@ def sales():
                 </div>
             </div>
         </div>
+        {{ SOCKETIO_JS|safe }}
     </body>
     </html>
-    ''', sales=sales, customers=customers, total_sales=total_sales)
+    ''', sales=sales, customers_count=customers_count, total_sales=total_sales,
+         sales_count=sales_count, page=page)
     sales = SalesInvoice.query.order_by(SalesInvoice.created_at.desc()).all()
     customers = Customer.query.all()
     total_sales = sum(sale.total for sale in sales)
@@ -4175,6 +5943,8 @@ def add_sale():
             notes=request.form.get('notes'),
             status='pending'
         )
+        if request.form.get('due_date'):
+            sale.due_date = datetime.strptime(request.form['due_date'], '%Y-%m-%d').date()
         db.session.add(sale)
         db.session.flush()  # للحصول على ID الفاتورة
 
@@ -4208,19 +5978,14 @@ def add_sale():
                 )
                 db.session.add(item)
 
+        # تحديث الملخص اليومي ورصيد العميل في نفس المعاملة
+        record_sale_summary(sale)
+        record_invoice_balance(sale)
+        record_invoice_journal(sale)
         db.session.commit()
 
-        # الحصول على بيانات العميل للتحديث الفوري
-        customer = Customer.query.get(sale.customer_id) if sale.customer_id else None
-
-        # إرسال تحديث فوري لجميع المستخدمين
-        broadcast_update('sales_invoice', {
-            'action': 'created',
-            'invoice_number': sale.invoice_number,
-            'customer': customer.name if customer else 'عميل نقدي',
-            'total': float(sale.total),
-            'branch': sale.branch
-        })
+        # إرسال الفاتورة لصفحات المبيعات ولوحة التحكم
+        publish_live_update('sales_invoice', 'created', sale)
 
         flash('تم إنشاء فاتورة المبيعات بنجاح', 'success')
         return redirect(url_for('sales'))
@@ -4235,18 +6000,35 @@ def add_sale():
 def delete_sale(sale_id):
     try:
         sale = SalesInvoice.query.get_or_404(sale_id)
+        before = live_state('sales_invoice', sale)
+        record_sale_summary(sale, sign=-1)
+        record_invoice_balance(sale, sign=-1)
+        record_invoice_journal(sale, sign=-1)
         db.session.delete(sale)
         db.session.commit()
+        publish_live_update('sales_invoice', 'deleted', before=before)
         return jsonify({'success': True, 'message': 'تم حذف الفاتورة بنجاح'})
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/purchases')
 @login_required
 def purchases():
-    purchases = PurchaseInvoice.query.order_by(PurchaseInvoice.created_at.desc()).all()
-    suppliers = Supplier.query.all()
-    total_purchases = sum(purchase.total for purchase in purchases)
+    # التصفية والترقيم والمجاميع في قاعدة البيانات بدلاً من تحميل كل الفواتير
+    query = apply_list_filters(
+        PurchaseInvoice.query, PurchaseInvoice,
+        choice_filters=('status', 'payment_method'),
+        date_column=PurchaseInvoice.date,
+        text_columns=(PurchaseInvoice.invoice_number, PurchaseInvoice.notes,
+                      lambda pattern: PurchaseInvoice.supplier.has(Supplier.name.ilike(pattern, escape='\\')))
+    )
+    purchases_count, total_purchases = query.with_entities(
+        db.func.count(PurchaseInvoice.id), db.func.coalesce(db.func.sum(PurchaseInvoice.total), 0)
+    ).one()
+    page = keyset_paginate(query.options(db.joinedload(PurchaseInvoice.supplier)),
+                           [PurchaseInvoice.date, PurchaseInvoice.id])
+    purchases = page.items
 
     # Add discount logic
     for purchase in purchases:
@@ -4332,7 +6114,7 @@ def purchases():
                         <div class="text-secondary mb-3">
                             <i class="fas fa-shopping-cart fa-3x"></i>
                         </div>
-                        <h3 class="fw-bold text-secondary">{{ purchases|length }}</h3>
+                        <h3 class="fw-bold text-secondary">{{ purchases_count }}</h3>
                         <p class="text-muted mb-0">إجمالي فواتير المشتريات</p>
                     </div>
                 </div>
@@ -4346,6 +6128,7 @@ def purchases():
                         <i class="fas fa-plus me-2"></i>فاتورة مشتريات جديدة
                     </button>
                 </div>
+                {{ render_list_filters(['q', 'status', 'payment_method', 'date'], export='purchases') }}
                 <div class="card-body p-0">
                     {% if purchases %}
                     <div class="table-responsive">
@@ -4376,6 +6159,7 @@ def purchases():
                             </tbody>
                         </table>
                     </div>
+                    {{ render_list_pager(page) }}
                     {% else %}
                     <div class="text-center py-5">
                         <div class="mb-4">
@@ -4393,7 +6177,8 @@ def purchases():
         </div>
     </body>
     </html>
-    ''', purchases=purchases, suppliers=suppliers, total_purchases=total_purchases)
+    ''', purchases=purchases, total_purchases=total_purchases,
+         purchases_count=purchases_count, page=page)
     purchases = PurchaseInvoice.query.order_by(PurchaseInvoice.created_at.desc()).all()
     suppliers = Supplier.query.all()
     total_purchases = sum(purchase.total for purchase in purchases)
@@ -4977,6 +6762,8 @@ def add_purchase():
             notes=request.form.get('notes'),
             status='pending'
         )
+        if request.form.get('due_date'):
+            purchase.due_date = datetime.strptime(request.form['due_date'], '%Y-%m-%d').date()
         db.session.add(purchase)
         db.session.flush()  # للحصول على ID الفاتورة
 
@@ -5010,6 +6797,10 @@ def add_purchase():
                 )
                 db.session.add(item)
 
+        # تحديث الملخص اليومي ورصيد المورد في نفس المعاملة
+        record_purchase_summary(purchase)
+        record_invoice_balance(purchase)
+        record_invoice_journal(purchase)
         db.session.commit()
         flash('تم إنشاء فاتورة المشتريات بنجاح', 'success')
         return redirect(url_for('purchases'))
@@ -5024,10 +6815,14 @@ def add_purchase():
 def delete_purchase(purchase_id):
     try:
         purchase = PurchaseInvoice.query.get_or_404(purchase_id)
+        record_purchase_summary(purchase, sign=-1)
+        record_invoice_balance(purchase, sign=-1)
+        record_invoice_journal(purchase, sign=-1)
         db.session.delete(purchase)
         db.session.commit()
         return jsonify({'success': True, 'message': 'تم حذف فاتورة المشتريات بنجاح'})
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'message': str(e)})
 
 # وظائف إدارة الموظفين المتقدمة
@@ -5205,6 +7000,8 @@ def view_employee(employee_id):
 def delete_employee(employee_id):
     try:
         employee = Employee.query.get_or_404(employee_id)
+        for payroll in employee.payrolls:
+            record_payroll_journal(payroll, sign=-1)
         db.session.delete(employee)
         db.session.commit()
         return jsonify({'success': True, 'message': 'تم حذف الموظف بنجاح'})
@@ -5448,6 +7245,8 @@ def save_payroll():
         )
 
         db.session.add(payroll)
+        db.session.flush()
+        record_payroll_journal(payroll)
         db.session.commit()
 
         flash('تم إنشاء كشف الراتب بنجاح', 'success')
@@ -5616,10 +7415,13 @@ def save_employee_payment():
             gross_salary=amount,
             net_salary=amount,
             notes=f"دفع مباشر - {payment_method} - {notes}",
-            status='paid'
+            status='paid',
+            payment_date=date.today()
         )
 
         db.session.add(payroll)
+        db.session.flush()
+        record_payroll_journal(payroll)
         db.session.commit()
 
         flash(f'تم تسجيل دفع راتب {employee.name} بمبلغ {amount} ر.س بنجاح', 'success')
@@ -5885,7 +7687,7 @@ def employees_report():
         positions[employee.position].append(employee)
 
     # كشوف الرواتب الحديثة
-    recent_payrolls = EmployeePayroll.query.order_by(EmployeePayroll.created_at.desc()).limit(10).all()
+    recent_payrolls = EmployeePayroll.query.options(db.joinedload(EmployeePayroll.employee)).order_by(EmployeePayroll.created_at.desc()).limit(10).all()
 
     return render_template_string('''
     <!DOCTYPE html>
@@ -6777,8 +8579,17 @@ def print_purchase(purchase_id):
 @app.route('/expenses')
 @login_required
 def expenses():
-    expenses = Expense.query.order_by(Expense.created_at.desc()).all()
-    total_expenses = sum(expense.amount for expense in expenses)
+    query = apply_list_filters(
+        Expense.query, Expense,
+        choice_filters=('category', 'payment_method'),
+        date_column=Expense.date,
+        text_columns=(Expense.description, Expense.receipt_number, Expense.notes)
+    )
+    expenses_count, total_expenses = query.with_entities(
+        db.func.count(Expense.id), db.func.coalesce(db.func.sum(Expense.amount), 0)
+    ).one()
+    page = keyset_paginate(query, [Expense.date, Expense.id])
+    expenses = page.items
 
     # تجميع المصروفات حسب الفئة
     from sqlalchemy import func
@@ -6787,6 +8598,7 @@ def expenses():
         func.sum(Expense.amount).label('total'),
         func.count(Expense.id).label('count')
     ).group_by(Expense.category).all()
+    category_choices = {row.category: row.category for row in expense_categories}
 
     return render_template_string('''
     <!DOCTYPE html>
@@ -6884,7 +8696,7 @@ def expenses():
                         <div class="text-danger mb-3">
                             <i class="fas fa-receipt fa-3x"></i>
                         </div>
-                        <h3 class="fw-bold text-danger">{{ expenses|length }}</h3>
+                        <h3 class="fw-bold text-danger">{{ expenses_count }}</h3>
                         <p class="text-muted mb-0">إجمالي المصروفات</p>
                     </div>
                 </div>
@@ -6911,7 +8723,7 @@ def expenses():
                         <div class="text-success mb-3">
                             <i class="fas fa-calculator fa-3x"></i>
                         </div>
-                        <h3 class="fw-bold text-success">{{ "%.2f"|format(total_expenses / (expenses|length) if expenses|length > 0 else 0) }}</h3>
+                        <h3 class="fw-bold text-success">{{ "%.2f"|format(total_expenses / expenses_count if expenses_count > 0 else 0) }}</h3>
                         <p class="text-muted mb-0">متوسط المصروف (ر.س)</p>
                     </div>
                 </div>
@@ -6952,6 +8764,7 @@ def expenses():
                         <i class="fas fa-plus me-2"></i>إضافة مصروف جديد
                     </button>
                 </div>
+                {{ render_list_filters(['q', 'category', 'payment_method', 'date'], choices={'category': category_choices}, export='expenses') }}
                 <div class="card-body p-0">
                     {% if expenses %}
                     <div class="table-responsive">
@@ -7015,6 +8828,7 @@ def expenses():
                             </tbody>
                         </table>
                     </div>
+                    {{ render_list_pager(page) }}
                     {% else %}
                     <div class="text-center py-5">
                         <div class="mb-4">
@@ -7192,7 +9006,8 @@ def expenses():
         </script>
     </body>
     </html>
-    ''', expenses=expenses, total_expenses=total_expenses, expense_categories=expense_categories)
+    ''', expenses=expenses, total_expenses=total_expenses, expense_categories=expense_categories,
+         expenses_count=expenses_count, category_choices=category_choices, page=page)
 
 @app.route('/add_expense', methods=['POST'])
 @login_required
@@ -7210,6 +9025,9 @@ def add_expense():
         notes=request.form.get('notes')
     )
     db.session.add(expense)
+    db.session.flush()
+    record_expense_summary(expense)
+    record_expense_journal(expense)
     db.session.commit()
     flash('تم إضافة المصروف بنجاح', 'success')
     return redirect(url_for('expenses'))
@@ -7217,9 +9035,20 @@ def add_expense():
 @app.route('/employees')
 @login_required
 def employees():
-    employees = Employee.query.order_by(Employee.created_at.desc()).all()
-    active_employees = Employee.query.filter_by(status='active').count()
-    total_salaries = sum(emp.salary for emp in employees if emp.status == 'active')
+    query = apply_list_filters(
+        Employee.query, Employee,
+        choice_filters=('status',),
+        text_columns=(Employee.name, Employee.position, Employee.phone, Employee.email)
+    )
+    employees_count = query.count()
+    page = keyset_paginate(query, [Employee.id])
+    employees = page.items
+
+    # كشف الرواتب يشمل كل الموظفين النشطين وليس الصفحة الحالية فقط
+    payroll_sheet = db.session.query(Employee.name, Employee.position, Employee.salary) \
+        .filter(Employee.status == 'active').order_by(Employee.name).all()
+    active_employees = len(payroll_sheet)
+    total_salaries = sum(row.salary for row in payroll_sheet)
 
     return render_template_string('''
     <!DOCTYPE html>
@@ -7259,7 +9088,7 @@ def employees():
                     <div class="card bg-primary text-white employee-card">
                         <div class="card-body text-center">
                             <i class="fas fa-user-tie fa-2x mb-2"></i>
-                            <h4>{{ employees|length }}</h4>
+                            <h4>{{ employees_count }}</h4>
                             <p class="mb-0">إجمالي الموظفين</p>
                         </div>
                     </div>
@@ -7305,6 +9134,7 @@ def employees():
                         </button>
                     </div>
                 </div>
+                {{ render_list_filters(['q', 'status'], choices={'status': {'active': 'نشط', 'inactive': 'غير نشط'}}, export='employees') }}
                 <div class="card-body">
                     {% if employees %}
                     <div class="table-responsive">
@@ -7397,6 +9227,7 @@ def employees():
                             </tbody>
                         </table>
                     </div>
+                    {{ render_list_pager(page) }}
                     {% else %}
                     <div class="text-center py-5">
                         <i class="fas fa-user-tie fa-3x text-muted mb-3"></i>
@@ -7539,8 +9370,7 @@ def employees():
                                     </tr>
                                 </thead>
                                 <tbody>
-                                    {% for employee in employees %}
-                                    {% if employee.status == 'active' %}
+                                    {% for employee in payroll_sheet %}
                                     <tr>
                                         <td><strong>{{ employee.name }}</strong></td>
                                         <td>{{ employee.position }}</td>
@@ -7549,7 +9379,6 @@ def employees():
                                         <td>0.00 ر.س</td>
                                         <td class="salary-highlight">{{ "%.2f"|format(employee.salary) }} ر.س</td>
                                     </tr>
-                                    {% endif %}
                                     {% endfor %}
                                 </tbody>
                                 <tfoot class="table-dark">
@@ -7562,6 +9391,9 @@ def employees():
                         </div>
                     </div>
                     <div class="modal-footer">
+                        <button type="button" class="btn btn-primary" onclick="runPayroll(this)">
+                            <i class="fas fa-cogs me-2"></i>إنشاء كشوف الشهر لجميع الموظفين
+                        </button>
                         <button type="button" class="btn btn-success">
                             <i class="fas fa-print me-2"></i>طباعة كشف الرواتب
                         </button>
@@ -7614,10 +9446,30 @@ def employees():
             function recordPayment(employeeId) {
                 window.location.href = '/record_employee_payment/' + employeeId;
             }
+
+            function runPayroll(btn) {
+                const now = new Date();
+                btn.disabled = true;
+                fetch('/jobs/payroll_run', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({month: now.getMonth() + 1, year: now.getFullYear()})
+                })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.success) {
+                        alert('جاري إنشاء كشوف الرواتب في الخلفية، ستصلك رسالة عند الانتهاء');
+                    } else {
+                        alert('خطأ: ' + data.message);
+                    }
+                })
+                .finally(() => { btn.disabled = false; });
+            }
         </script>
     </body>
     </html>
-    ''', employees=employees, active_employees=active_employees, total_salaries=total_salaries)
+    ''', employees=employees, active_employees=active_employees, total_salaries=total_salaries,
+         employees_count=employees_count, payroll_sheet=payroll_sheet, page=page)
 
 @app.route('/add_employee', methods=['POST'])
 @login_required
@@ -7900,6 +9752,25 @@ def reports():
                     </div>
                 </div>
 
+                <!-- ميزان المراجعة والميزانية العمومية من دفتر الأستاذ -->
+                <div class="col-md-6 col-lg-4">
+                    <div class="report-card h-100">
+                        <div class="card-body text-center p-4">
+                            <div class="report-icon bg-primary">
+                                <i class="fas fa-book"></i>
+                            </div>
+                            <h5 class="card-title fw-bold">ميزان المراجعة والميزانية</h5>
+                            <p class="card-text text-muted">أرصدة الحسابات من القيود المزدوجة</p>
+                            <a href="{{ url_for('trial_balance_report') }}" class="btn btn-report">
+                                <i class="fas fa-file-alt me-2"></i>ميزان المراجعة
+                            </a>
+                            <a href="{{ url_for('balance_sheet_report') }}" class="btn btn-report mt-2">
+                                <i class="fas fa-file-alt me-2"></i>الميزانية العمومية
+                            </a>
+                        </div>
+                    </div>
+                </div>
+
                 <!-- تقرير المخزون التفصيلي -->
                 <div class="col-md-6 col-lg-4">
                     <div class="report-card h-100">
@@ -8031,12 +9902,13 @@ def reports():
 # تقرير المبيعات التفصيلي
 @app.route('/sales_report')
 @login_required
+@cached_report(SalesInvoice, Customer)
 def sales_report():
     from sqlalchemy import func, extract
     from datetime import datetime, timedelta
 
     # الحصول على بيانات المبيعات
-    sales = SalesInvoice.query.order_by(SalesInvoice.date.desc()).all()
+    sales = SalesInvoice.query.options(db.joinedload(SalesInvoice.customer)).order_by(SalesInvoice.date.desc()).all()
     total_sales = sum(sale.total for sale in sales)
     total_invoices = len(sales)
 
@@ -8406,10 +10278,11 @@ def sales_report():
 # تقرير المشتريات التفصيلي
 @app.route('/purchases_report')
 @login_required
+@cached_report(PurchaseInvoice, Supplier)
 def purchases_report():
     from sqlalchemy import func
 
-    purchases = PurchaseInvoice.query.order_by(PurchaseInvoice.date.desc()).all()
+    purchases = PurchaseInvoice.query.options(db.joinedload(PurchaseInvoice.supplier)).order_by(PurchaseInvoice.date.desc()).all()
     total_purchases = sum(purchase.total for purchase in purchases)
 
     # أفضل الموردين
@@ -8603,16 +10476,20 @@ def purchases_report():
 # تقرير الأرباح والخسائر
 @app.route('/profit_loss_report')
 @login_required
+@cached_report(AccountPeriodBalance, JournalLine, Account)
 def profit_loss_report():
-    from sqlalchemy import func
+    # من أرصدة دفتر الأستاذ الشهرية للفترة (date_from و date_to اختياريان)؛ المبيعات والمشتريات بدون الضريبة
+    date_from, date_to = report_date_range()
+    statement = income_statement(date_from, date_to)
+    balances = {row['account'].code: row['balance'] for row in statement['revenue'] + statement['expenses']}
 
     # حساب الإيرادات
-    total_sales = db.session.query(func.sum(SalesInvoice.total)).scalar() or 0
+    total_sales = balances.get('4100', Decimal('0'))
 
     # حساب التكاليف
-    total_purchases = db.session.query(func.sum(PurchaseInvoice.total)).scalar() or 0
-    total_expenses = db.session.query(func.sum(Expense.amount)).scalar() or 0
-    total_salaries = db.session.query(func.sum(Employee.salary)).filter(Employee.status == 'active').scalar() or 0
+    total_purchases = balances.get('5100', Decimal('0'))
+    total_expenses = balances.get('5200', Decimal('0'))
+    total_salaries = balances.get('5300', Decimal('0'))
 
     # حساب الأرباح
     gross_profit = total_sales - total_purchases
@@ -8676,6 +10553,8 @@ def profit_loss_report():
                 <p class="lead text-muted">قائمة الدخل الشاملة والتحليل المالي</p>
             </div>
 
+            {{ ledger_period_form() }}
+
             <div class="row justify-content-center">
                 <div class="col-lg-8">
                     <div class="profit-loss-card">
@@ -8806,9 +10685,162 @@ def profit_loss_report():
     ''', total_sales=total_sales, total_purchases=total_purchases, total_expenses=total_expenses,
          total_salaries=total_salaries, gross_profit=gross_profit, net_profit=net_profit)
 
+# ===== التقارير المالية من دفتر الأستاذ =====
+
+def report_date_range():
+    """date_from و date_to من الرابط (القيم غير الصالحة تُهمل)"""
+    dates = []
+    for name in ('date_from', 'date_to'):
+        try:
+            dates.append(datetime.strptime(request.args.get(name, '').strip(), '%Y-%m-%d').date())
+        except ValueError:
+            dates.append(None)
+    return tuple(dates)
+
+LEDGER_PERIOD_FORM_TEMPLATE = '''
+<form method="GET" class="row g-2 align-items-end justify-content-center mb-4">
+    {% if not as_of %}
+    <div class="col-md-3">
+        <label class="form-label small mb-1">من تاريخ</label>
+        <input type="date" name="date_from" value="{{ request.args.get('date_from', '') }}" class="form-control form-control-sm">
+    </div>
+    {% endif %}
+    <div class="col-md-3">
+        <label class="form-label small mb-1">{{ 'في تاريخ' if as_of else 'إلى تاريخ' }}</label>
+        <input type="date" name="date_to" value="{{ request.args.get('date_to', '') }}" class="form-control form-control-sm">
+    </div>
+    <div class="col-md-auto">
+        <button type="submit" class="btn btn-primary btn-sm"><i class="fas fa-filter me-1"></i>عرض</button>
+        <a href="{{ url_for(request.endpoint) }}" class="btn btn-outline-secondary btn-sm">إلغاء</a>
+    </div>
+    <div class="col-md-auto">
+        <a href="{{ url_for('profit_loss_report', **request.args) }}" class="btn btn-outline-info btn-sm">قائمة الدخل</a>
+        <a href="{{ url_for('trial_balance_report', **request.args) }}" class="btn btn-outline-info btn-sm">ميزان المراجعة</a>
+        <a href="{{ url_for('balance_sheet_report', **request.args) }}" class="btn btn-outline-info btn-sm">الميزانية العمومية</a>
+    </div>
+</form>
+'''
+
+def ledger_period_form(as_of=False):
+    """نموذج الفترة وروابط التقارير المالية الثلاثة"""
+    from markupsafe import Markup
+
+    return Markup(render_template_string(LEDGER_PERIOD_FORM_TEMPLATE, as_of=as_of))
+
+app.jinja_env.globals.update(ledger_period_form=ledger_period_form)
+
+LEDGER_REPORT_TEMPLATE = '''
+<!DOCTYPE html>
+<html dir="rtl" lang="ar">
+<head>
+    <meta charset="UTF-8">
+    <title>{{ title }} - نظام المحاسبة</title>
+    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.rtl.min.css" rel="stylesheet">
+    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css" rel="stylesheet">
+    <style>
+        body { background-color: #f8f9fa; }
+        .navbar { background: linear-gradient(45deg, #667eea, #764ba2) !important; }
+        .total-row { background: #f1f3f5; font-weight: bold; }
+    </style>
+</head>
+<body>
+    <nav class="navbar navbar-expand-lg navbar-dark">
+        <div class="container">
+            <a class="navbar-brand" href="{{ url_for('dashboard') }}">
+                <i class="fas fa-calculator me-2"></i>نظام المحاسبة الاحترافي
+            </a>
+            <div class="navbar-nav ms-auto">
+                <a class="nav-link" href="{{ url_for('reports') }}">
+                    <i class="fas fa-arrow-right me-1"></i>رجوع للتقارير
+                </a>
+                <a class="nav-link" href="{{ url_for('dashboard') }}">
+                    <i class="fas fa-home me-1"></i>الرئيسية
+                </a>
+            </div>
+        </div>
+    </nav>
+
+    <div class="container mt-4">
+        <h2 class="fw-bold text-primary text-center mb-4"><i class="fas fa-book me-2"></i>{{ title }}</h2>
+        {{ ledger_period_form(as_of=sheet is not none) }}
+
+        <div class="card shadow">
+            <div class="card-body">
+                {% if trial %}
+                <table class="table table-striped table-sm">
+                    <thead>
+                        <tr><th>الرمز</th><th>الحساب</th><th class="text-end">مدين</th><th class="text-end">دائن</th><th class="text-end">الرصيد</th></tr>
+                    </thead>
+                    <tbody>
+                        {% for row in trial.rows %}
+                        <tr>
+                            <td>{{ row.account.code }}</td>
+                            <td>{{ row.account.name }}</td>
+                            <td class="text-end">{{ "%.2f"|format(row.debit) }}</td>
+                            <td class="text-end">{{ "%.2f"|format(row.credit) }}</td>
+                            <td class="text-end">{{ "%.2f"|format(row.balance) }}</td>
+                        </tr>
+                        {% else %}
+                        <tr><td colspan="5" class="text-center text-muted py-4">لا توجد قيود</td></tr>
+                        {% endfor %}
+                    </tbody>
+                    <tfoot>
+                        <tr class="total-row">
+                            <td colspan="2">الإجمالي</td>
+                            <td class="text-end">{{ "%.2f"|format(trial.debit) }}</td>
+                            <td class="text-end">{{ "%.2f"|format(trial.credit) }}</td>
+                            <td class="text-end">{% if trial.debit == trial.credit %}<i class="fas fa-check text-success"></i>{% else %}<i class="fas fa-exclamation-triangle text-danger"></i>{% endif %}</td>
+                        </tr>
+                    </tfoot>
+                </table>
+                {% else %}
+                <table class="table table-sm">
+                    {% for label, rows, total in [('الأصول', sheet.assets, sheet.total_assets), ('الخصوم', sheet.liabilities, sheet.total_liabilities)] %}
+                    <tr class="table-light"><td colspan="2" class="fw-bold fs-5">{{ label }}</td></tr>
+                    {% for row in rows %}
+                    <tr><td class="ps-4">{{ row.account.name }}</td><td class="text-end">{{ "%.2f"|format(row.balance) }}</td></tr>
+                    {% endfor %}
+                    <tr class="total-row"><td>إجمالي {{ label }}</td><td class="text-end">{{ "%.2f"|format(total) }}</td></tr>
+                    {% endfor %}
+                    <tr class="table-light"><td colspan="2" class="fw-bold fs-5">حقوق الملكية</td></tr>
+                    {% for row in sheet.equity %}
+                    <tr><td class="ps-4">{{ row.account.name }}</td><td class="text-end">{{ "%.2f"|format(row.balance) }}</td></tr>
+                    {% endfor %}
+                    <tr><td class="ps-4">الأرباح المحتجزة</td><td class="text-end">{{ "%.2f"|format(sheet.retained_earnings) }}</td></tr>
+                    <tr class="total-row"><td>إجمالي حقوق الملكية</td><td class="text-end">{{ "%.2f"|format(sheet.total_equity) }}</td></tr>
+                    <tr class="table-primary fw-bold">
+                        <td>الخصوم وحقوق الملكية</td>
+                        <td class="text-end">{{ "%.2f"|format(sheet.total_liabilities + sheet.total_equity) }}</td>
+                    </tr>
+                </table>
+                {% endif %}
+            </div>
+        </div>
+    </div>
+</body>
+</html>
+'''
+
+@app.route('/trial_balance')
+@login_required
+@cached_report(AccountPeriodBalance, JournalLine, Account)
+def trial_balance_report():
+    date_from, date_to = report_date_range()
+    return render_template_string(LEDGER_REPORT_TEMPLATE, title='ميزان المراجعة',
+                                  trial=trial_balance(date_from, date_to), sheet=None)
+
+@app.route('/balance_sheet')
+@login_required
+@cached_report(AccountPeriodBalance, JournalLine, Account)
+def balance_sheet_report():
+    _, as_of = report_date_range()
+    return render_template_string(LEDGER_REPORT_TEMPLATE, title='الميزانية العمومية',
+                                  trial=None, sheet=balance_sheet(as_of))
+
 # تقرير المصروفات التفصيلي
 @app.route('/expenses_report')
 @login_required
+@cached_report(Expense)
 def expenses_report():
     from sqlalchemy import func, extract
     from datetime import datetime
@@ -9108,6 +11140,7 @@ def expenses_report():
 
 @app.route('/inventory_report')
 @login_required
+@cached_report(Product)
 def inventory_report():
     from sqlalchemy import func
 
@@ -9390,12 +11423,13 @@ def inventory_report():
 
 @app.route('/payroll_report')
 @login_required
+@cached_report(EmployeePayroll, Employee)
 def payroll_report():
     from sqlalchemy import func, extract
     from datetime import datetime
 
     # جلب جميع كشوف الرواتب
-    payrolls = EmployeePayroll.query.order_by(EmployeePayroll.year.desc(), EmployeePayroll.month.desc()).all()
+    payrolls = EmployeePayroll.query.options(db.joinedload(EmployeePayroll.employee)).order_by(EmployeePayroll.year.desc(), EmployeePayroll.month.desc()).all()
 
     # إحصائيات عامة
     total_payrolls = len(payrolls)
@@ -9608,6 +11642,7 @@ def payroll_report():
 # التقارير السريعة
 @app.route('/quick_report/<period>')
 @login_required
+@cached_report(SalesInvoice, PurchaseInvoice, Expense, Customer, Supplier)
 def quick_report(period):
     from datetime import datetime, timedelta
     from sqlalchemy import func, extract
@@ -9639,12 +11674,12 @@ def quick_report(period):
         return redirect(url_for('reports'))
 
     # جلب البيانات للفترة المحددة
-    sales = SalesInvoice.query.filter(
+    sales = SalesInvoice.query.options(db.joinedload(SalesInvoice.customer)).filter(
         SalesInvoice.date >= start_date,
         SalesInvoice.date <= end_date
     ).all()
 
-    purchases = PurchaseInvoice.query.filter(
+    purchases = PurchaseInvoice.query.options(db.joinedload(PurchaseInvoice.supplier)).filter(
         PurchaseInvoice.date >= start_date,
         PurchaseInvoice.date <= end_date
     ).all()
@@ -9803,32 +11838,611 @@ def quick_report(period):
          total_sales=total_sales, total_purchases=total_purchases,
          total_expenses=total_expenses, net_profit=net_profit)
 
+# ===== محرك أعمار الديون (المستحقات لنا وعلينا) =====
+# الإجماليات وطرق الدفع وفئات العمر تُحسب بـ GROUP BY في قاعدة البيانات بدلاً من تحميل
+# كل الفواتير وتصنيفها في Python؛ تكلفة أعمار الديون تتناسب مع الفواتير غير المدفوعة فقط
+
+UNPAID_STATUSES = ('pending', 'overdue')
+# الشرط بنص الفهرس الجزئي حرفياً: SQLite لا يستخدم الفهرس الجزئي مع معاملات مربوطة
+UNPAID_CONDITION = "status IN ('pending', 'overdue')"
+AGING_PAGE_SIZE = 25
+
+# (المفتاح، العنوان، أقل عمر بالأيام، أكبر عمر)
+AGING_BUCKETS = (
+    ('days_0_30', '0-30 يوم', 0, 30),
+    ('days_31_60', '31-60 يوم', 31, 60),
+    ('days_61_90', '61-90 يوم', 61, 90),
+    ('days_over_90', 'أكثر من 90 يوم', 91, None),
+)
+
+def invoice_status_summary(model):
+    """عدد وإجمالي ومتبقي الفواتير حسب الحالة وطريقة الدفع باستعلام تجميع واحد"""
+    rows = db.session.query(
+        model.status, model.payment_method, db.func.count(model.id),
+        db.func.coalesce(db.func.sum(model.total), 0), db.func.coalesce(db.func.sum(model.balance_due), 0)
+    ).group_by(model.status, model.payment_method).all()
+
+    def _empty():
+        return {'count': 0, 'total': 0.0, 'due': 0.0}
+
+    summary = {
+        'count': 0, 'total': 0.0, 'due': 0.0,
+        'status': {status: _empty() for status in INVOICE_STATUSES},
+        'methods': {},
+        'credit': _empty(),
+        'unpaid': _empty()
+    }
+    for status, method, count, total, due in rows:
+        total, due = float(total), float(due)
+        groups = [summary, summary['status'].setdefault(status, _empty()),
+                  summary['methods'].setdefault(method, _empty())]
+        if method == 'credit':
+            groups.append(summary['credit'])
+        if status in UNPAID_STATUSES:
+            groups.append(summary['unpaid'])
+        for group in groups:
+            group['count'] += count
+            group['total'] += total
+            group['due'] += due
+    return summary
+
+class AgingReport:
+    """أعمار المستحقات غير المدفوعة: إجمالي لكل فئة وصفحة من الأطراف مرتبة بالرصيد"""
+
+    def __init__(self, as_of, totals, parties, party_count, page, per_page):
+        self.as_of = as_of
+        self.buckets = AGING_BUCKETS
+        self.totals = totals
+        self.parties = parties
+        self.party_count = party_count
+        self.page = page
+        self.per_page = per_page
+
+    @property
+    def pages(self):
+        return max(1, -(-self.party_count // self.per_page))
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+def aging_report(model, party_column, party_model, as_of=None, page=1, per_page=AGING_PAGE_SIZE):
+    """أعمار ديون فواتير model غير المدفوعة مجمعة حسب party_column (العميل أو المورد)
+
+    المبالغ هي المتبقي على الفواتير (balance_due) بعد الدفعات الجزئية.
+    عمر الفاتورة = as_of - تاريخها؛ الفواتير المؤرخة مستقبلاً تُحسب في الفئة الأولى
+    """
+    as_of = as_of or date.today()
+    page = max(1, page or 1)
+
+    bucket_columns = []
+    for key, label, min_days, max_days in AGING_BUCKETS:
+        conditions = []
+        if max_days is not None:
+            conditions.append(model.date >= as_of - timedelta(days=max_days))
+        if min_days:
+            conditions.append(model.date <= as_of - timedelta(days=min_days))
+        bucket_columns.append(db.func.coalesce(db.func.sum(
+            db.case((db.and_(*conditions), model.balance_due), else_=0) if conditions else model.balance_due
+        ), 0).label(key))
+
+    unpaid = db.text(UNPAID_CONDITION)
+    outstanding = db.func.coalesce(db.func.sum(model.balance_due), 0).label('outstanding')
+
+    def _row(row):
+        return {
+            'count': row.count,
+            'outstanding': float(row.outstanding),
+            'buckets': {key: float(getattr(row, key)) for key, *_ in AGING_BUCKETS}
+        }
+
+    totals = _row(db.session.query(db.func.count(model.id).label('count'), outstanding, *bucket_columns)
+                  .filter(unpaid).one())
+
+    party_count = db.session.query(db.func.count(db.func.distinct(db.func.coalesce(party_column, 0)))) \
+                            .filter(unpaid).scalar() or 0
+    rows = db.session.query(party_column.label('party_id'), db.func.count(model.id).label('count'),
+                            outstanding, *bucket_columns) \
+                     .filter(unpaid) \
+                     .group_by(party_column) \
+                     .order_by(outstanding.desc(), party_column) \
+                     .limit(per_page).offset((page - 1) * per_page).all()
+
+    ids = [row.party_id for row in rows if row.party_id is not None]
+    names = dict(db.session.query(party_model.id, party_model.name).filter(party_model.id.in_(ids)).all()) if ids else {}
+    parties = []
+    for row in rows:
+        party = _row(row)
+        party['id'] = row.party_id
+        party['name'] = names.get(row.party_id)
+        parties.append(party)
+
+    return AgingReport(as_of, totals, parties, party_count, page, per_page)
+
+AGING_TABLE_TEMPLATE = '''
+<div class="table-responsive">
+    <table class="table table-hover mb-0 aging-table">
+        <thead class="table-light">
+            <tr>
+                <th>{{ party_label }}</th>
+                <th>عدد الفواتير</th>
+                {% for key, label, min_days, max_days in report.buckets %}
+                <th>{{ label }}</th>
+                {% endfor %}
+                <th>الرصيد المستحق</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for party in report.parties %}
+            <tr>
+                <td><strong>{{ party.name or cash_label }}</strong></td>
+                <td>{{ party.count }}</td>
+                {% for key, label, min_days, max_days in report.buckets %}
+                <td class="{% if min_days > 90 and party.buckets[key] %}text-danger fw-bold{% endif %}">{{ "%.2f"|format(party.buckets[key]) }}</td>
+                {% endfor %}
+                <td class="fw-bold">{{ "%.2f"|format(party.outstanding) }} ر.س</td>
+            </tr>
+            {% else %}
+            <tr><td colspan="{{ report.buckets|length + 3 }}" class="text-center text-muted py-4">لا توجد مستحقات غير مدفوعة</td></tr>
+            {% endfor %}
+        </tbody>
+        <tfoot class="table-secondary">
+            <tr>
+                <th>الإجمالي</th>
+                <th>{{ report.totals.count }}</th>
+                {% for key, label, min_days, max_days in report.buckets %}
+                <th>{{ "%.2f"|format(report.totals.buckets[key]) }}</th>
+                {% endfor %}
+                <th>{{ "%.2f"|format(report.totals.outstanding) }} ر.س</th>
+            </tr>
+        </tfoot>
+    </table>
+</div>
+{% if report.has_prev or report.has_next %}
+<nav class="d-flex justify-content-between align-items-center p-3 border-top aging-pager">
+    <div>
+        {% if report.has_prev %}
+        <a class="btn btn-outline-primary btn-sm" href="{{ list_page_url(**{page_arg: report.page - 1}) }}">السابق</a>
+        {% endif %}
+    </div>
+    <small class="text-muted">صفحة {{ report.page }} من {{ report.pages }}</small>
+    <div>
+        {% if report.has_next %}
+        <a class="btn btn-primary btn-sm" href="{{ list_page_url(**{page_arg: report.page + 1}) }}">التالي</a>
+        {% endif %}
+    </div>
+</nav>
+{% endif %}
+'''
+
+def render_aging_table(report, party_label, page_arg, cash_label='-'):
+    """جدول أعمار الديون لكل طرف مع التنقل بين الصفحات عبر page_arg"""
+    from markupsafe import Markup
+
+    return Markup(render_template_string(AGING_TABLE_TEMPLATE, report=report, party_label=party_label,
+                                         page_arg=page_arg, cash_label=cash_label))
+
+app.jinja_env.globals.update(render_aging_table=render_aging_table)
+
+def latest_invoices(model, party, *criteria):
+    """أحدث LIST_PAGE_SIZE فاتورة تطابق الشروط (القائمة الكاملة في صفحة المبيعات أو المشتريات)"""
+    return model.query.options(db.joinedload(party)).filter(*criteria) \
+                .order_by(model.date.desc(), model.id.desc()).limit(LIST_PAGE_SIZE).all()
+
+# ===== تغيير حالة الفواتير جماعياً وترحيل المتأخرة تلقائياً =====
+# التغيير بين معلقة ومتأخرة عبارة UPDATE واحدة لكل دفعة من المعرفات بدلاً من طلب لكل فاتورة،
+# والسداد يمر عبر record_payment (دفعة واحدة لكل طرف) حتى تبقى المبالغ والأرصدة صحيحة
+
+app.config['PAYMENT_TERMS_DAYS'] = int(os.environ.get('PAYMENT_TERMS_DAYS', 30))
+app.config['OVERDUE_SWEEP_SECONDS'] = int(os.environ.get('OVERDUE_SWEEP_SECONDS', 3600))  # 0 لإيقاف الترحيل
+BULK_STATUS_CHUNK = 500
+
+# نوع الفاتورة في الروابط -> (النموذج، اسم الطرف)
+INVOICE_TYPES = {
+    'sale': (SalesInvoice, 'customer'),
+    'purchase': (PurchaseInvoice, 'supplier'),
+}
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def bulk_update_status(model, ids, status, chunk_size=BULK_STATUS_CHUNK):
+    """نقل الفواتير غير المدفوعة بين pending و overdue بعبارة UPDATE لكل دفعة (بدون commit)
+
+    الفواتير المدفوعة أو التي لها الحالة نفسها لا تتغير؛ يرجع عدد الفواتير المعدلة
+    """
+    if status not in UNPAID_STATUSES:
+        raise ValueError('الحالة غير صحيحة')
+    updated = 0
+    for chunk in _chunks(sorted(set(ids)), chunk_size):
+        updated += model.query.filter(
+            model.id.in_(chunk), model.status.in_(UNPAID_STATUSES), model.status != status
+        ).update({model.status: status}, synchronize_session=False)
+    return updated
+
+def bulk_mark_paid(model, ids, payment_method='cash', chunk_size=BULK_STATUS_CHUNK):
+    """سداد المتبقي على الفواتير بدفعة واحدة لكل طرف (بدون commit)؛ يرجع عدد الفواتير المسددة"""
+    party = INVOICE_TYPES['sale' if model is SalesInvoice else 'purchase'][1]
+    party_column = model.customer_id if model is SalesInvoice else model.supplier_id
+    by_party = {}
+    for chunk in _chunks(sorted(set(ids)), chunk_size):
+        for invoice_id, party_id, balance_due in db.session.query(model.id, party_column, model.balance_due) \
+                .filter(model.id.in_(chunk), model.status.in_(UNPAID_STATUSES), model.balance_due > 0):
+            by_party.setdefault(party_id, []).append((invoice_id, balance_due))
+
+    paid = 0
+    for party_id, allocations in by_party.items():
+        record_payment(party, party_id, sum(amount for _, amount in allocations),
+                       payment_method=payment_method, allocations=allocations)
+        paid += len(allocations)
+    return paid
+
+def backfill_due_dates():
+    """تعبئة تاريخ الاستحقاق للفواتير القديمة (تاريخ الفاتورة + مدة السداد) بعبارة لكل يوم"""
+    terms = timedelta(days=app.config['PAYMENT_TERMS_DAYS'])
+    filled = 0
+    for model in (SalesInvoice, PurchaseInvoice):
+        days = [day for day, in db.session.query(model.date).filter(model.due_date.is_(None)).distinct()]
+        for day in days:
+            filled += model.query.filter(model.due_date.is_(None), model.date == day) \
+                                 .update({model.due_date: day + terms}, synchronize_session=False)
+    db.session.commit()
+    return filled
+
+def sweep_overdue_invoices(today=None, chunk_size=BULK_STATUS_CHUNK):
+    """نقل الفواتير المعلقة التي تجاوزت تاريخ استحقاقها إلى متأخرة، دفعة بعد دفعة
+
+    كل دفعة معاملة مستقلة قصيرة؛ تشغيل الترحيل في أكثر من عملية بالتزامن آمن لأن
+    التحديث مشروط بالحالة. يرجع {'sale': عدد، 'purchase': عدد}
+    """
+    today = today or date.today()
+    counts = {}
+    for invoice_type, (model, _) in INVOICE_TYPES.items():
+        counts[invoice_type] = 0
+        while True:
+            ids = [invoice_id for invoice_id, in db.session.query(model.id).filter(
+                model.status == 'pending', model.due_date < today
+            ).order_by(model.due_date).limit(chunk_size)]
+            if not ids:
+                break
+            counts[invoice_type] += model.query.filter(model.id.in_(ids), model.status == 'pending') \
+                                               .update({model.status: 'overdue'}, synchronize_session=False)
+            db.session.commit()
+            if len(ids) < chunk_size:
+                break
+
+    if any(counts.values()):
+        print(f"⏰ ترحيل الفواتير المتأخرة: {counts['sale']} مبيعات، {counts['purchase']} مشتريات")
+        broadcast_update('invoices_overdue', counts)
+    return counts
+
+def _run_overdue_sweep():
+    try:
+        with app.app_context():
+            sweep_overdue_invoices()
+    except Exception as e:
+        print(f'⚠️ تعذر ترحيل الفواتير المتأخرة: {e}')
+    finally:
+        start_overdue_sweeper()
+
+def start_overdue_sweeper(delay=None):
+    """جدولة الترحيل الدوري على عجلة المؤقتات المشتركة (مرة لكل عملية خادم)"""
+    interval = app.config['OVERDUE_SWEEP_SECONDS']
+    if interval > 0:
+        timer_wheel.schedule('overdue_sweep', interval if delay is None else delay, _run_overdue_sweep)
+
+# ===== كشف حساب العميل والمورد =====
+# قيود الكشف (الفواتير، وما سُدد منها بدون دفعة، والدفعات) تُجمع بـ UNION ALL والرصيد الجاري
+# بدالة نافذة SUM() OVER (ORDER BY date, ...) في قاعدة البيانات. الصفحة تُحدد بمؤشر keyset،
+# والرصيد الافتتاحي لشهر أول قيد فيها مجموع حركات الأشهر السابقة من PartyBalanceMonth،
+# فتكلفة الصفحة تتناسب مع قيود شهرها وليس مع كامل تاريخ الطرف
+
+STATEMENT_PAGE_SIZE = 50
+
+# ترتيب القيود في اليوم نفسه: الفاتورة ثم ما سُدد منها بدون دفعة ثم الدفعات
+STATEMENT_KINDS = ('invoice', 'settlement', 'payment')
+STATEMENT_KIND_LABELS = {
+    'invoice': 'فاتورة',
+    'settlement': 'سداد مسجل على الفاتورة',
+    'payment': 'دفعة'
+}
+STATEMENT_CURSOR_COLUMNS = (db.column('date', db.Date), db.column('seq', db.Integer),
+                            db.column('entry_id', db.Integer))
+
+class StatementPage(KeysetPage):
+    """صفحة من كشف الحساب مرتبة تصاعدياً بالتاريخ مع رصيدها الافتتاحي"""
+
+    def __init__(self, items, opening_balance, next_cursor=None, prev_cursor=None, per_page=STATEMENT_PAGE_SIZE):
+        super().__init__(items, next_cursor, prev_cursor, per_page)
+        self.opening_balance = opening_balance
+
+    @property
+    def closing_balance(self):
+        return self.items[-1]['balance'] if self.items else self.opening_balance
+
+def _statement_key_filter(date_column, id_column, seq, cursor, descending):
+    """القيود بعد المؤشر (أو قبله) بشروط على التاريخ والمعرف يستخدمها فهرس (الطرف، التاريخ)"""
+    day, cursor_seq, entry_id = cursor
+    if descending:
+        if seq != cursor_seq:
+            return date_column <= day if seq < cursor_seq else date_column < day
+        return db.or_(date_column < day, db.and_(date_column == day, id_column < entry_id))
+    if seq != cursor_seq:
+        return date_column >= day if seq > cursor_seq else date_column > day
+    return db.or_(date_column > day, db.and_(date_column == day, id_column > entry_id))
+
+def _statement_entries(party, party_id, since=None, cursor=None, descending=False, limit=None):
+    """قيود الطرف كاستعلام فرعي (date, seq, entry_id, reference, amount)
+
+    amount موجب يزيد الرصيد (فاتورة) وسالب ينقصه (دفعة). مع limit يُرتب كل فرع ويُحد
+    قبل UNION ALL، فيقرأ من الفهرس صفوف الصفحة فقط
+    """
+    party_model, invoice_model, party_key, invoice_key, payment_type = PAYMENT_PARTIES[party]
+    allocated = db.select(db.func.coalesce(db.func.sum(PaymentAllocation.amount), 0)) \
+                  .where(getattr(PaymentAllocation, invoice_key) == invoice_model.id) \
+                  .scalar_subquery()
+    unrecorded = invoice_model.amount_paid - allocated
+    branches = (
+        (invoice_model, invoice_model.invoice_number, invoice_model.total, ()),
+        (invoice_model, invoice_model.invoice_number, -unrecorded, (unrecorded > 0,)),
+        (Payment, Payment.description, -Payment.amount, (Payment.payment_type == payment_type,)),
+    )
+
+    selects = []
+    for seq, (model, reference, amount, criteria) in enumerate(branches):
+        criteria = [getattr(model, party_key) == party_id, *criteria]
+        if since is not None:
+            criteria.append(model.date >= since)
+        if cursor is not None:
+            criteria.append(_statement_key_filter(model.date, model.id, seq, cursor, descending))
+        query = db.select(
+            model.date.label('date'), db.literal(seq, db.Integer).label('seq'), model.id.label('entry_id'),
+            reference.label('reference'), amount.label('amount')
+        ).where(*criteria)
+        if limit is not None:
+            order = (model.date.desc(), model.id.desc()) if descending else (model.date, model.id)
+            query = db.select(query.order_by(*order).limit(limit).subquery())
+        selects.append(query)
+    return db.union_all(*selects).subquery('statement_entries')
+
+def _statement_order(entries, descending=False):
+    columns = (entries.c.date, entries.c.seq, entries.c.entry_id)
+    return [column.desc() for column in columns] if descending else list(columns)
+
+def party_opening_balance(party, party_id, month):
+    """رصيد الطرف قبل أول يوم في month من الحركات الشهرية"""
+    return _money(db.session.query(db.func.coalesce(db.func.sum(PartyBalanceMonth.movement), 0)).filter(
+        PartyBalanceMonth.party == party, PartyBalanceMonth.party_id == party_id,
+        PartyBalanceMonth.month < month
+    ).scalar())
+
+def party_statement(party, party_id, after=None, before=None, per_page=STATEMENT_PAGE_SIZE):
+    """صفحة من كشف حساب عميل أو مورد
+
+    بدون مؤشر تُعرض آخر القيود؛ before للقيود الأقدم من المؤشر وafter للأحدث.
+    القيد: {'date', 'kind', 'entry_id', 'reference', 'debit', 'credit', 'balance'}
+    """
+    descending = after is None
+    entries = _statement_entries(party, party_id, cursor=after if after is not None else before,
+                                 descending=descending, limit=per_page + 1)
+    keys = [tuple(row) for row in db.session.execute(
+        db.select(entries.c.date, entries.c.seq, entries.c.entry_id)
+          .order_by(*_statement_order(entries, descending)).limit(per_page + 1)
+    )]
+    has_more = len(keys) > per_page
+    keys = keys[:per_page]
+    if descending:
+        keys.reverse()
+    if not keys:
+        return StatementPage([], party_opening_balance(party, party_id, date.max), per_page=per_page)
+
+    # الرصيد الجاري من أول شهر الصفحة فقط، مضافاً إليه رصيد ما قبله
+    month = _month_start(keys[0][0])
+    opening = party_opening_balance(party, party_id, month)
+    entries = _statement_entries(party, party_id, since=month)
+    order = _statement_order(entries)
+    windowed = db.select(
+        entries, db.func.sum(entries.c.amount).over(order_by=order, rows=(None, 0)).label('running')
+    ).where(db.tuple_(*order) <= db.tuple_(*[db.literal(value) for value in keys[-1]])).subquery()
+    rows = db.session.execute(
+        db.select(windowed)
+          .where(db.tuple_(windowed.c.date, windowed.c.seq, windowed.c.entry_id) >=
+                 db.tuple_(*[db.literal(value) for value in keys[0]]))
+          .order_by(windowed.c.date, windowed.c.seq, windowed.c.entry_id)
+    ).all()
+
+    items, page_opening = [], opening
+    for row in rows:
+        amount = _money(row.amount)
+        balance = opening + _money(row.running)
+        if not items:
+            page_opening = balance - amount  # رصيد الصفحة قبل أول قيد فيها
+        # العميل: الفاتورة مدينة والدفعة دائنة، والمورد بالعكس
+        increases = (amount > 0) == (party == 'customer')
+        items.append({
+            'date': row.date,
+            'kind': STATEMENT_KINDS[row.seq],
+            'entry_id': row.entry_id,
+            'reference': row.reference,
+            'debit': abs(amount) if increases else Decimal('0.00'),
+            'credit': Decimal('0.00') if increases else abs(amount),
+            'balance': balance
+        })
+
+    # الأقدم يوجد دائماً إذا بدأت الصفحة من مؤشر after، والأحدث إذا بدأت من before
+    return StatementPage(
+        items, page_opening,
+        next_cursor=encode_cursor(keys[-1]) if (before is not None if descending else has_more) else None,
+        prev_cursor=encode_cursor(keys[0]) if (has_more if descending else True) else None,
+        per_page=per_page
+    )
+
+STATEMENT_TEMPLATE = '''
+<!DOCTYPE html>
+<html dir="rtl" lang="ar">
+<head>
+    <meta charset="UTF-8">
+    <title>كشف حساب {{ record.name }} - نظام المحاسبة</title>
+    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.rtl.min.css" rel="stylesheet">
+    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css" rel="stylesheet">
+    <style>
+        body { background-color: #f8f9fa; }
+        .navbar { background: linear-gradient(45deg, #667eea, #764ba2) !important; }
+        @media print { .navbar, .list-pager, .no-print { display: none !important; } }
+    </style>
+</head>
+<body>
+    <nav class="navbar navbar-expand-lg navbar-dark">
+        <div class="container">
+            <a class="navbar-brand d-flex align-items-center" href="{{ url_for('dashboard') }}">
+                <img src="{{ get_company_logo() }}" alt="شعار الشركة" style="height: 40px; margin-left: 10px;" class="company-logo">
+                <span>نظام المحاسبة</span>
+            </a>
+            <div class="navbar-nav ms-auto">
+                <a class="nav-link" href="{{ url_for(back_endpoint) }}">
+                    <i class="fas fa-arrow-right me-1"></i>{{ party_label_plural }}
+                </a>
+                <a class="nav-link" href="{{ url_for('dashboard') }}">
+                    <i class="fas fa-home me-1"></i>الرئيسية
+                </a>
+            </div>
+        </div>
+    </nav>
+
+    <div class="container mt-4">
+        <div class="row mb-4">
+            <div class="col-md-8">
+                <h2 class="fw-bold text-primary">
+                    <i class="fas fa-file-invoice-dollar me-2"></i>كشف حساب {{ party_label }}: {{ record.name }}
+                </h2>
+                <p class="text-muted mb-0">
+                    {% if record.phone %}<i class="fas fa-phone me-1"></i>{{ record.phone }}{% endif %}
+                    {% if record.tax_number %}<span class="ms-3">الرقم الضريبي: {{ record.tax_number }}</span>{% endif %}
+                </p>
+            </div>
+            <div class="col-md-4 text-end">
+                <div class="card border-primary">
+                    <div class="card-body py-2">
+                        <small class="text-muted">الرصيد الحالي</small>
+                        <h4 class="mb-0 {{ 'text-danger' if record.balance > 0 else 'text-success' }}">{{ "%.2f"|format(record.balance or 0) }} ر.س</h4>
+                    </div>
+                </div>
+            </div>
+        </div>
+
+        <div class="card shadow">
+            <div class="card-header bg-primary text-white d-flex justify-content-between align-items-center">
+                <h5 class="mb-0"><i class="fas fa-list me-2"></i>الحركات</h5>
+                <button class="btn btn-light btn-sm no-print" onclick="window.print()">
+                    <i class="fas fa-print me-1"></i>طباعة
+                </button>
+            </div>
+            <div class="card-body">
+                <div class="table-responsive">
+                    <table class="table table-striped table-sm align-middle">
+                        <thead>
+                            <tr>
+                                <th>التاريخ</th>
+                                <th>البيان</th>
+                                <th>المرجع</th>
+                                <th class="text-end">مدين</th>
+                                <th class="text-end">دائن</th>
+                                <th class="text-end">الرصيد</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                            <tr class="table-light fw-bold">
+                                <td colspan="5">رصيد سابق</td>
+                                <td class="text-end">{{ "%.2f"|format(page.opening_balance) }}</td>
+                            </tr>
+                            {% for entry in page.items %}
+                            <tr>
+                                <td>{{ entry.date.strftime('%Y-%m-%d') }}</td>
+                                <td>{{ kind_labels[entry.kind] }}</td>
+                                <td>{{ entry.reference or '-' }}</td>
+                                <td class="text-end">{{ "%.2f"|format(entry.debit) if entry.debit else '' }}</td>
+                                <td class="text-end">{{ "%.2f"|format(entry.credit) if entry.credit else '' }}</td>
+                                <td class="text-end">{{ "%.2f"|format(entry.balance) }}</td>
+                            </tr>
+                            {% else %}
+                            <tr><td colspan="6" class="text-center text-muted py-4">لا توجد حركات</td></tr>
+                            {% endfor %}
+                        </tbody>
+                        <tfoot>
+                            <tr class="table-light fw-bold">
+                                <td colspan="5">الرصيد في نهاية الصفحة</td>
+                                <td class="text-end">{{ "%.2f"|format(page.closing_balance) }}</td>
+                            </tr>
+                        </tfoot>
+                    </table>
+                </div>
+                {{ render_list_pager(page) }}
+            </div>
+        </div>
+    </div>
+
+    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+</body>
+</html>
+'''
+
+def render_party_statement(party, party_id):
+    """صفحة كشف الحساب لعميل أو مورد مع التنقل بالمؤشرات after/before"""
+    record = PAYMENT_PARTIES[party][0].query.get_or_404(party_id)
+    per_page = request.args.get('per_page', STATEMENT_PAGE_SIZE, type=int)
+    per_page = max(1, min(per_page or STATEMENT_PAGE_SIZE, LIST_MAX_PAGE_SIZE))
+    cursors = {
+        name: decode_cursor(request.args[name], STATEMENT_CURSOR_COLUMNS) if request.args.get(name) else None
+        for name in ('after', 'before')
+    }
+    page = party_statement(party, party_id, after=cursors['after'], before=cursors['before'], per_page=per_page)
+    return render_template_string(
+        STATEMENT_TEMPLATE, record=record, page=page, kind_labels=STATEMENT_KIND_LABELS,
+        party_label='العميل' if party == 'customer' else 'المورد',
+        party_label_plural='العملاء' if party == 'customer' else 'الموردين',
+        back_endpoint='customers' if party == 'customer' else 'suppliers'
+    )
+
+@app.route('/customers/<int:customer_id>/statement')
+@login_required
+def customer_statement(customer_id):
+    return render_party_statement('customer', customer_id)
+
+@app.route('/suppliers/<int:supplier_id>/statement')
+@login_required
+def supplier_statement(supplier_id):
+    return render_party_statement('supplier', supplier_id)
+
 # شاشة المدفوعات والمستحقات
 @app.route('/payments')
 @login_required
 def payments():
-    from sqlalchemy import or_
+    # الإجماليات والأعداد من استعلامات التجميع، والجداول تعرض أحدث الفواتير فقط
+    summary_sales = invoice_status_summary(SalesInvoice)
+    summary_purchases = invoice_status_summary(PurchaseInvoice)
 
-    # جلب جميع فواتير المبيعات
-    sales_invoices = SalesInvoice.query.order_by(SalesInvoice.date.desc()).all()
+    unpaid_sales = latest_invoices(SalesInvoice, SalesInvoice.customer, SalesInvoice.status.in_(UNPAID_STATUSES))
+    paid_sales = latest_invoices(SalesInvoice, SalesInvoice.customer, SalesInvoice.status == 'paid')
+    credit_sales = latest_invoices(SalesInvoice, SalesInvoice.customer, SalesInvoice.payment_method == 'credit')
 
-    # جلب جميع فواتير المشتريات
-    purchase_invoices = PurchaseInvoice.query.order_by(PurchaseInvoice.date.desc()).all()
+    unpaid_purchases = latest_invoices(PurchaseInvoice, PurchaseInvoice.supplier, PurchaseInvoice.status.in_(UNPAID_STATUSES))
+    paid_purchases = latest_invoices(PurchaseInvoice, PurchaseInvoice.supplier, PurchaseInvoice.status == 'paid')
+    credit_purchases = latest_invoices(PurchaseInvoice, PurchaseInvoice.supplier, PurchaseInvoice.payment_method == 'credit')
 
-    # تصنيف الفواتير
-    paid_sales = [s for s in sales_invoices if s.status == 'paid']
-    unpaid_sales = [s for s in sales_invoices if s.status in ['pending', 'overdue']]
-    credit_sales = [s for s in sales_invoices if s.payment_method == 'credit']
+    receivables_aging = aging_report(SalesInvoice, SalesInvoice.customer_id, Customer,
+                                     page=request.args.get('customers_page', 1, type=int))
+    payables_aging = aging_report(PurchaseInvoice, PurchaseInvoice.supplier_id, Supplier,
+                                  page=request.args.get('suppliers_page', 1, type=int))
 
-    paid_purchases = [p for p in purchase_invoices if p.status == 'paid']
-    unpaid_purchases = [p for p in purchase_invoices if p.status in ['pending', 'overdue']]
-    credit_purchases = [p for p in purchase_invoices if p.payment_method == 'credit']
-
-    # حساب الإجماليات
-    total_receivables = sum(s.total for s in unpaid_sales)
-    total_payables = sum(p.total for p in unpaid_purchases)
-    total_paid_sales = sum(s.total for s in paid_sales)
-    total_paid_purchases = sum(p.total for p in paid_purchases)
+    total_receivables = summary_sales['unpaid']['due']
+    total_payables = summary_purchases['unpaid']['due']
+    total_paid_sales = summary_sales['status']['paid']['total']
+    total_paid_purchases = summary_purchases['status']['paid']['total']
 
     return render_template_string('''
     <!DOCTYPE html>
@@ -9941,14 +12555,14 @@ def payments():
                             </div>
                             <div class="text-end">
                                 <div class="progress" style="height: 8px; width: 60px;">
-                                    <div class="progress-bar bg-success" style="width: {{ (unpaid_sales|length / (sales_invoices|length + 1) * 100)|round }}%"></div>
+                                    <div class="progress-bar bg-success" style="width: {{ (summary_sales.unpaid.count / (summary_sales.count + 1) * 100)|round }}%"></div>
                                 </div>
                             </div>
                         </div>
                         <h3 class="fw-bold text-success mb-1">{{ "%.2f"|format(total_receivables) }}</h3>
                         <p class="text-muted mb-1">المستحقات لنا</p>
                         <div class="d-flex justify-content-between">
-                            <small class="text-muted">{{ unpaid_sales|length }} فاتورة</small>
+                            <small class="text-muted">{{ summary_sales.unpaid.count }} فاتورة</small>
                             <small class="badge bg-success">{{ ((total_receivables / (total_receivables + total_payables + 1)) * 100)|round }}%</small>
                         </div>
                     </div>
@@ -9961,14 +12575,14 @@ def payments():
                             </div>
                             <div class="text-end">
                                 <div class="progress" style="height: 8px; width: 60px;">
-                                    <div class="progress-bar bg-danger" style="width: {{ (unpaid_purchases|length / (purchase_invoices|length + 1) * 100)|round }}%"></div>
+                                    <div class="progress-bar bg-danger" style="width: {{ (summary_purchases.unpaid.count / (summary_purchases.count + 1) * 100)|round }}%"></div>
                                 </div>
                             </div>
                         </div>
                         <h3 class="fw-bold text-danger mb-1">{{ "%.2f"|format(total_payables) }}</h3>
                         <p class="text-muted mb-1">المستحقات علينا</p>
                         <div class="d-flex justify-content-between">
-                            <small class="text-muted">{{ unpaid_purchases|length }} فاتورة</small>
+                            <small class="text-muted">{{ summary_purchases.unpaid.count }} فاتورة</small>
                             <small class="badge bg-danger">{{ ((total_payables / (total_receivables + total_payables + 1)) * 100)|round }}%</small>
                         </div>
                     </div>
@@ -9981,14 +12595,14 @@ def payments():
                             </div>
                             <div class="text-end">
                                 <div class="progress" style="height: 8px; width: 60px;">
-                                    <div class="progress-bar bg-primary" style="width: {{ (paid_sales|length / (sales_invoices|length + 1) * 100)|round }}%"></div>
+                                    <div class="progress-bar bg-primary" style="width: {{ (summary_sales.status.paid.count / (summary_sales.count + 1) * 100)|round }}%"></div>
                                 </div>
                             </div>
                         </div>
                         <h3 class="fw-bold text-primary mb-1">{{ "%.2f"|format(total_paid_sales) }}</h3>
                         <p class="text-muted mb-1">المبيعات المدفوعة</p>
                         <div class="d-flex justify-content-between">
-                            <small class="text-muted">{{ paid_sales|length }} فاتورة</small>
+                            <small class="text-muted">{{ summary_sales.status.paid.count }} فاتورة</small>
                             <small class="badge bg-primary">مدفوعة</small>
                         </div>
                     </div>
@@ -10029,7 +12643,7 @@ def payments():
                             </div>
                             <div class="flex-grow-1 ms-3">
                                 <h5 class="fw-bold mb-1">فواتير متأخرة</h5>
-                                <h3 class="text-warning mb-0">{{ (unpaid_sales|selectattr('status', 'equalto', 'overdue')|list|length) + (unpaid_purchases|selectattr('status', 'equalto', 'overdue')|list|length) }}</h3>
+                                <h3 class="text-warning mb-0">{{ summary_sales.status.overdue.count + summary_purchases.status.overdue.count }}</h3>
                                 <small class="text-muted">تحتاج متابعة فورية</small>
                             </div>
                         </div>
@@ -10061,7 +12675,7 @@ def payments():
                             </div>
                             <div class="flex-grow-1 ms-3">
                                 <h5 class="fw-bold mb-1">معدل التحصيل</h5>
-                                <h3 class="text-secondary mb-0">{{ ((paid_sales|length / (sales_invoices|length + 1)) * 100)|round }}%</h3>
+                                <h3 class="text-secondary mb-0">{{ ((summary_sales.status.paid.count / (summary_sales.count + 1)) * 100)|round }}%</h3>
                                 <small class="text-muted">من إجمالي المبيعات</small>
                             </div>
                         </div>
@@ -10069,6 +12683,26 @@ def payments():
                 </div>
             </div>
 
+            <!-- أعمار الديون -->
+            <div class="row g-4 mb-5">
+                <div class="col-12">
+                    <div class="stat-card">
+                        <div class="card-header bg-success text-white p-3">
+                            <h5 class="mb-0"><i class="fas fa-hourglass-half me-2"></i>أعمار المستحقات لنا (حسب العميل)</h5>
+                        </div>
+                        {{ render_aging_table(receivables_aging, 'العميل', 'customers_page', 'عميل نقدي') }}
+                    </div>
+                </div>
+                <div class="col-12">
+                    <div class="stat-card">
+                        <div class="card-header bg-danger text-white p-3">
+                            <h5 class="mb-0"><i class="fas fa-hourglass-half me-2"></i>أعمار المستحقات علينا (حسب المورد)</h5>
+                        </div>
+                        {{ render_aging_table(payables_aging, 'المورد', 'suppliers_page') }}
+                    </div>
+                </div>
+            </div>
+
             <!-- تبويبات المدفوعات -->
             <div class="row">
                 <div class="col-12">
@@ -10077,22 +12711,22 @@ def payments():
                             <ul class="nav nav-tabs card-header-tabs" id="paymentsTab" role="tablist">
                                 <li class="nav-item" role="presentation">
                                     <button class="nav-link active text-white" id="receivables-tab" data-bs-toggle="tab" data-bs-target="#receivables" type="button" role="tab">
-                                        <i class="fas fa-arrow-down me-2"></i>المستحقات لنا ({{ unpaid_sales|length }})
+                                        <i class="fas fa-arrow-down me-2"></i>المستحقات لنا ({{ summary_sales.unpaid.count }})
                                     </button>
                                 </li>
                                 <li class="nav-item" role="presentation">
                                     <button class="nav-link text-white" id="payables-tab" data-bs-toggle="tab" data-bs-target="#payables" type="button" role="tab">
-                                        <i class="fas fa-arrow-up me-2"></i>المستحقات علينا ({{ unpaid_purchases|length }})
+                                        <i class="fas fa-arrow-up me-2"></i>المستحقات علينا ({{ summary_purchases.unpaid.count }})
                                     </button>
                                 </li>
                                 <li class="nav-item" role="presentation">
                                     <button class="nav-link text-white" id="paid-tab" data-bs-toggle="tab" data-bs-target="#paid" type="button" role="tab">
-                                        <i class="fas fa-check-circle me-2"></i>المدفوعات ({{ (paid_sales|length + paid_purchases|length) }})
+                                        <i class="fas fa-check-circle me-2"></i>المدفوعات ({{ summary_sales.status.paid.count + summary_purchases.status.paid.count }})
                                     </button>
                                 </li>
                                 <li class="nav-item" role="presentation">
                                     <button class="nav-link text-white" id="credit-tab" data-bs-toggle="tab" data-bs-target="#credit" type="button" role="tab">
-                                        <i class="fas fa-clock me-2"></i>الآجلة ({{ (credit_sales|length + credit_purchases|length) }})
+                                        <i class="fas fa-clock me-2"></i>الآجلة ({{ summary_sales.credit.count + summary_purchases.credit.count }})
                                     </button>
                                 </li>
                             </ul>
@@ -10104,7 +12738,7 @@ def payments():
                                     <div class="table-responsive">
                                         <div class="d-flex justify-content-between align-items-center p-3 bg-light">
                                             <div>
-                                                <h6 class="mb-0">المستحقات لنا - {{ unpaid_sales|length }} فاتورة</h6>
+                                                <h6 class="mb-0">المستحقات لنا - {{ summary_sales.unpaid.count }} فاتورة</h6>
                                                 <small class="text-muted">إجمالي المبلغ: {{ "%.2f"|format(total_receivables) }} ر.س</small>
                                             </div>
                                             <div>
@@ -10172,6 +12806,9 @@ def payments():
                                                         {% if sale.tax_amount > 0 %}
                                                         <br><small class="text-muted">شامل ضريبة: {{ "%.2f"|format(sale.tax_amount) }}</small>
                                                         {% endif %}
+                                                        {% if sale.amount_paid %}
+                                                        <br><small class="text-danger">المتبقي: {{ "%.2f"|format(sale.balance_due or 0) }}</small>
+                                                        {% endif %}
                                                     </td>
                                                     <td>
                                                         <span class="badge {% if sale.payment_method == 'cash' %}bg-success{% elif sale.payment_method == 'credit' %}bg-info{% else %}bg-secondary{% endif %}">
@@ -10202,6 +12839,13 @@ def payments():
                                                 {% endfor %}
                                             </tbody>
                                         </table>
+                                        {% if summary_sales.unpaid.count > unpaid_sales|length %}
+                                        <div class="p-3 border-top bg-light text-center small">
+                                            تعرض أحدث {{ list_limit }} فاتورة فقط -
+                                            <a href="{{ url_for('sales', status='pending') }}" class="ms-2">كل المعلقة</a>
+                                            <a href="{{ url_for('sales', status='overdue') }}" class="ms-2">كل المتأخرة</a>
+                                        </div>
+                                        {% endif %}
                                     </div>
                                 </div>
 
@@ -10226,7 +12870,12 @@ def payments():
                                                     <td><strong>{{ purchase.invoice_number }}</strong></td>
                                                     <td>{{ purchase.supplier.name }}</td>
                                                     <td>{{ purchase.date.strftime('%Y-%m-%d') }}</td>
-                                                    <td class="fw-bold text-danger">{{ "%.2f"|format(purchase.total) }} ر.س</td>
+                                                    <td class="fw-bold text-danger">
+                                                        {{ "%.2f"|format(purchase.total) }} ر.س
+                                                        {% if purchase.amount_paid %}
+                                                        <br><small class="text-muted">المتبقي: {{ "%.2f"|format(purchase.balance_due or 0) }}</small>
+                                                        {% endif %}
+                                                    </td>
                                                     <td>
                                                         <span class="badge bg-secondary">
                                                             {% if purchase.payment_method == 'cash' %}نقدي
@@ -10251,6 +12900,13 @@ def payments():
                                                 {% endfor %}
                                             </tbody>
                                         </table>
+                                        {% if summary_purchases.unpaid.count > unpaid_purchases|length %}
+                                        <div class="p-3 border-top bg-light text-center small">
+                                            تعرض أحدث {{ list_limit }} فاتورة فقط -
+                                            <a href="{{ url_for('purchases', status='pending') }}" class="ms-2">كل المعلقة</a>
+                                            <a href="{{ url_for('purchases', status='overdue') }}" class="ms-2">كل المتأخرة</a>
+                                        </div>
+                                        {% endif %}
                                     </div>
                                 </div>
 
@@ -10303,6 +12959,13 @@ def payments():
                                                 {% endfor %}
                                             </tbody>
                                         </table>
+                                        {% if summary_sales.status.paid.count > paid_sales|length or summary_purchases.status.paid.count > paid_purchases|length %}
+                                        <div class="p-3 border-top bg-light text-center small">
+                                            تعرض أحدث {{ list_limit }} فاتورة فقط -
+                                            <a href="{{ url_for('sales', status='paid') }}" class="ms-2">كل المبيعات المدفوعة</a>
+                                            <a href="{{ url_for('purchases', status='paid') }}" class="ms-2">كل المشتريات المدفوعة</a>
+                                        </div>
+                                        {% endif %}
                                     </div>
                                 </div>
 
@@ -10366,6 +13029,13 @@ def payments():
                                                 {% endfor %}
                                             </tbody>
                                         </table>
+                                        {% if summary_sales.credit.count > credit_sales|length or summary_purchases.credit.count > credit_purchases|length %}
+                                        <div class="p-3 border-top bg-light text-center small">
+                                            تعرض أحدث {{ list_limit }} فاتورة فقط -
+                                            <a href="{{ url_for('sales', payment_method='credit') }}" class="ms-2">كل المبيعات الآجلة</a>
+                                            <a href="{{ url_for('purchases', payment_method='credit') }}" class="ms-2">كل المشتريات الآجلة</a>
+                                        </div>
+                                        {% endif %}
                                     </div>
                                 </div>
                             </div>
@@ -10504,9 +13174,17 @@ def payments():
 
             // وظائف الإجراءات السريعة
             function markAllOverdue() {
-                if (confirm('هل تريد تحديد جميع الفواتير المتأخرة تلقائياً؟')) {
-                    alert('سيتم تحديد الفواتير المتأخرة (أكثر من 30 يوم)');
-                    // يمكن إضافة منطق تحديد الفواتير المتأخرة هنا
+                if (confirm('هل تريد تحديد جميع الفواتير التي تجاوزت تاريخ استحقاقها كمتأخرة؟')) {
+                    fetch('/api/invoices/overdue_sweep', {method: 'POST'})
+                        .then(response => response.json())
+                        .then(data => {
+                            if (data.success) {
+                                alert(`تم تحديد ${data.counts.sale} فاتورة مبيعات و ${data.counts.purchase} فاتورة مشتريات كمتأخرة`);
+                                location.reload();
+                            } else {
+                                alert(data.message);
+                            }
+                        });
                 }
             }
 
@@ -10547,9 +13225,11 @@ def payments():
         </script>
     </body>
     </html>
-    ''', sales_invoices=sales_invoices, purchase_invoices=purchase_invoices,
+    ''', summary_sales=summary_sales, summary_purchases=summary_purchases,
          paid_sales=paid_sales, unpaid_sales=unpaid_sales, credit_sales=credit_sales,
          paid_purchases=paid_purchases, unpaid_purchases=unpaid_purchases, credit_purchases=credit_purchases,
+         receivables_aging=receivables_aging, payables_aging=payables_aging,
+         list_limit=LIST_PAGE_SIZE,
          total_receivables=total_receivables, total_payables=total_payables,
          total_paid_sales=total_paid_sales, total_paid_purchases=total_paid_purchases)
 
@@ -10565,7 +13245,17 @@ def mark_as_paid(invoice_type, invoice_id):
         else:
             return jsonify({'success': False, 'message': 'نوع الفاتورة غير صحيح'})
 
-        invoice.status = 'paid'
+        if invoice.balance_due and invoice.balance_due > 0:
+            # تسجيل دفعة بالمتبقي بدلاً من تغيير الحالة فقط، فيبقى المدفوع والأرصدة صحيحة
+            party, party_id = invoice_party(invoice)
+            record_payment(party, party_id, invoice.balance_due,
+                           payment_method='cash' if invoice.payment_method == 'credit' else invoice.payment_method,
+                           allocations=[(invoice.id, invoice.balance_due)],
+                           description=f'سداد الفاتورة {invoice.invoice_number}')
+        else:
+            old_status = invoice.status
+            invoice.status = 'paid'
+            record_status_summary(invoice, old_status)
         db.session.commit()
 
         return jsonify({'success': True, 'message': 'تم تحديث حالة الفاتورة إلى مدفوعة'})
@@ -10584,13 +13274,121 @@ def mark_as_overdue(invoice_type, invoice_id):
         else:
             return jsonify({'success': False, 'message': 'نوع الفاتورة غير صحيح'})
 
-        invoice.status = 'overdue'
+        if invoice.status == 'paid':
+            reopen_invoice(invoice)
+            db.session.flush()
+        bulk_update_status(type(invoice), [invoice.id], 'overdue')
         db.session.commit()
 
         return jsonify({'success': True, 'message': 'تم تحديث حالة الفاتورة إلى متأخرة'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/api/invoices/bulk_status', methods=['POST'])
+@login_required
+def api_bulk_invoice_status():
+    """تغيير حالة عدة فواتير بطلب واحد
+
+    JSON: type (sale أو purchase)، status (pending أو overdue أو paid)، ids (اختياري)،
+    payment_method (للسداد). بدون ids تُختار الفواتير بفلاتر الرابط نفسها المستخدمة في
+    صفحتي المبيعات والمشتريات (?status=pending&payment_method=credit&date_to=...)
+    """
+    data = request.get_json(silent=True) or {}
+    if data.get('type') not in INVOICE_TYPES:
+        return jsonify({'success': False, 'message': 'نوع الفاتورة غير صحيح'}), 400
+    model, party = INVOICE_TYPES[data['type']]
+    status = data.get('status')
+    if status not in INVOICE_STATUSES:
+        return jsonify({'success': False, 'message': 'الحالة غير صحيحة'}), 400
+
+    if data.get('ids') is not None:
+        try:
+            ids = [int(invoice_id) for invoice_id in data['ids']]
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'معرفات غير صالحة'}), 400
+    else:
+        if not any(request.args.get(name) for name in
+                   ('branch', 'status', 'payment_method', f'{party}_id', 'date_from', 'date_to', 'q')):
+            return jsonify({'success': False, 'message': 'حدد الفواتير أو فلتراً واحداً على الأقل'}), 400
+        choice_filters = ('status', 'payment_method', f'{party}_id') + (('branch',) if model is SalesInvoice else ())
+        query = apply_list_filters(db.session.query(model.id), model, choice_filters=choice_filters,
+                                   date_column=model.date, text_columns=(model.invoice_number, model.notes))
+        ids = [invoice_id for invoice_id, in query]
+
+    try:
+        if status == 'paid':
+            updated = bulk_mark_paid(model, ids, payment_method=data.get('payment_method') or 'cash')
+        else:
+            updated = bulk_update_status(model, ids, status)
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    if updated:
+        broadcast_update('invoices_status', {'type': data['type'], 'status': status, 'count': updated})
+    return jsonify({'success': True, 'message': f'تم تحديث {updated} فاتورة',
+                    'updated': updated, 'skipped': len(ids) - updated})
+
+@app.route('/api/invoices/overdue_sweep', methods=['POST'])
+@login_required
+def api_overdue_sweep():
+    """تشغيل ترحيل الفواتير المتأخرة فوراً (للمدير)"""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'ليس لديك صلاحية'}), 403
+    return jsonify({'success': True, 'counts': sweep_overdue_invoices()})
+
+@app.route('/api/payments', methods=['POST'])
+@login_required
+def api_record_payment():
+    """تسجيل دفعة جزئية أو كاملة وتخصيصها لفاتورة أو أكثر
+
+    JSON: party (customer أو supplier)، party_id، amount، payment_method، date، description،
+    allocations: [{invoice_id، amount}] (اختياري؛ بدونها تُسدد الفواتير الأقدم أولاً)
+    """
+    data = request.get_json(silent=True) or request.form.to_dict()
+    try:
+        allocations = data.get('allocations')
+        if allocations is not None:
+            allocations = [(item['invoice_id'], item['amount']) for item in allocations]
+        payment_date = datetime.strptime(data['date'], '%Y-%m-%d').date() if data.get('date') else None
+        party = data.get('party')
+        party_id = int(data['party_id']) if data.get('party_id') else None
+        payment = record_payment(party, party_id, data.get('amount'),
+                                 payment_method=data.get('payment_method') or 'cash',
+                                 allocations=allocations, description=data.get('description') or None,
+                                 payment_date=payment_date)
+        db.session.commit()
+    except (ValueError, KeyError, TypeError, ArithmeticError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    allocated = sum(float(allocation.amount) for allocation in payment.allocations)
+    party_model = PAYMENT_PARTIES[party][0]
+    return jsonify({
+        'success': True,
+        'message': 'تم تسجيل الدفعة بنجاح',
+        'payment_id': payment.id,
+        'allocated': allocated,
+        'unallocated': float(payment.amount) - allocated,
+        'balance': float(db.session.get(party_model, party_id).balance) if party_id else None
+    })
+
+@app.route('/api/payments/<int:payment_id>', methods=['DELETE'])
+@login_required
+def api_delete_payment(payment_id):
+    """حذف دفعة وإرجاع المبالغ المخصصة للفواتير"""
+    payment = db.session.get(Payment, payment_id)
+    if payment is None:
+        return jsonify({'success': False, 'message': 'الدفعة غير موجودة'}), 404
+    try:
+        delete_payment(payment)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'تم حذف الدفعة بنجاح'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
     from datetime import datetime, timedelta
 
     # إحصائيات عامة
@@ -11149,7 +13947,23 @@ def api_status():
                             <h6><span class="badge bg-success">GET</span> /api/sales</h6>
                             <p class="text-muted">الحصول على قائمة فواتير المبيعات</p>
                             <div class="code-block">
-                                <code>curl -X GET {{ request.url_root }}api/sales</code>
+                                <code>curl -X GET "{{ request.url_root }}api/sales?fields=id,total,status&updated_since=2024-01-01T00:00:00"</code>
+                            </div>
+                            <small class="text-muted">
+                                جميع القوائم تُرجع صفحات: استخدم <code>next_cursor</code> في <code>?cursor=</code> للصفحة التالية،
+                                و<code>per_page</code> (حتى 1000)، و<code>fields</code> لاختيار الحقول، و<code>updated_since</code> للمزامنة،
+                                و<code>format=ndjson</code> لبث كامل سطراً بسطر. الاستجابات تدعم <code>ETag</code>/<code>If-None-Match</code>.
+                            </small>
+                        </div>
+                    </div>
+
+                    <!-- أصناف المبيعات -->
+                    <div class="card endpoint-card method-get">
+                        <div class="card-body">
+                            <h6><span class="badge bg-success">GET</span> /api/sales_items</h6>
+                            <p class="text-muted">أصناف فواتير المبيعات للمزامنة الكاملة</p>
+                            <div class="code-block">
+                                <code>curl -X GET "{{ request.url_root }}api/sales_items?format=ndjson"</code>
                             </div>
                         </div>
                     </div>
@@ -11244,73 +14058,143 @@ def api_status():
     </html>
     ''')
 
+# ===== واجهة API للمزامنة =====
+# القوائم تُرجع صفحات بمؤشر (cursor) مرتبة تصاعدياً بالمعرف، مع اختيار الحقول (fields=)
+# والتصفية بالتعديل (updated_since=) ودعم ETag، أو بثاً كاملاً بصيغة NDJSON بذاكرة ثابتة
+
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+API_STREAM_BATCH = 1000
+
+
+def _api_fields(*columns, **expressions):
+    """بناء قاموس الحقول: اسم الحقل -> عمود أو تعبير SQL"""
+    fields = {column.key: column for column in columns}
+    fields.update(expressions)
+    return fields
+
+
+def _api_json_value(value):
+    """تحويل قيم قاعدة البيانات إلى قيم JSON"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _api_error(message, status=400):
+    return jsonify({'status': 'error', 'message': message}), status
+
+
+def _api_since_filter(query, timestamp_columns):
+    """تطبيق updated_since؛ الصفوف القديمة بلا updated_at تُقارن بتاريخ إنشائها"""
+    raw = request.args.get('updated_since', '').strip()
+    if not raw:
+        return query
+    try:
+        since = datetime.fromisoformat(raw.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise ValueError('updated_since يجب أن يكون بصيغة ISO 8601')
+    updated_at, created_at = timestamp_columns
+    return query.filter(db.or_(
+        updated_at >= since,
+        db.and_(updated_at.is_(None), created_at >= since)
+    ))
+
+
+def api_list_response(query, id_column, fields, timestamp_columns):
+    """تنفيذ طلب قائمة API: صفحة JSON بمؤشر أو بث NDJSON"""
+    requested = [name.strip() for name in request.args.get('fields', '').split(',') if name.strip()]
+    unknown = [name for name in requested if name not in fields]
+    if unknown:
+        return _api_error(f"حقول غير معروفة: {', '.join(unknown)}")
+    names = requested or list(fields)
+    if 'id' not in names:
+        names = ['id'] + names  # المعرف لازم لبناء المؤشر
+
+    try:
+        query = _api_since_filter(query, timestamp_columns)
+    except ValueError as e:
+        return _api_error(str(e))
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, [id_column])
+        if values is None:
+            return _api_error('مؤشر غير صالح')
+        query = query.filter(id_column > values[0])
+
+    query = query.with_entities(*[fields[name].label(name) for name in names]).order_by(id_column)
+
+    stream = request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+    if stream:
+        def generate():
+            # yield_per يستخدم مؤشراً من جهة الخادم فلا تُحمّل النتيجة كاملة في الذاكرة
+            for row in query.yield_per(API_STREAM_BATCH):
+                yield json.dumps({name: _api_json_value(value) for name, value in zip(names, row)},
+                                 ensure_ascii=False) + '\n'
+
+        return app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    per_page = request.args.get('per_page', API_PAGE_SIZE, type=int) or API_PAGE_SIZE
+    per_page = max(1, min(per_page, API_MAX_PAGE_SIZE))
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    response = jsonify({
+        'status': 'success',
+        'data': [{name: _api_json_value(value) for name, value in zip(names, row)} for row in rows],
+        'count': len(rows),
+        'next_cursor': encode_cursor([rows[-1].id]) if has_more else None
+    })
+    response.add_etag()
+    return response.make_conditional(request)
+
+
 # API Endpoints
 @app.route('/api/customers')
 def api_customers():
-    customers = Customer.query.all()
-    return jsonify({
-        'status': 'success',
-        'data': [{
-            'id': c.id,
-            'name': c.name,
-            'phone': c.phone,
-            'email': c.email,
-            'address': c.address,
-            'created_at': c.created_at.isoformat() if c.created_at else None
-        } for c in customers],
-        'count': len(customers)
-    })
+    fields = _api_fields(Customer.id, Customer.name, Customer.phone, Customer.email, Customer.address,
+                         Customer.tax_number, Customer.created_at, Customer.updated_at)
+    return api_list_response(Customer.query, Customer.id, fields, (Customer.updated_at, Customer.created_at))
 
 @app.route('/api/suppliers')
 def api_suppliers():
-    suppliers = Supplier.query.all()
-    return jsonify({
-        'status': 'success',
-        'data': [{
-            'id': s.id,
-            'name': s.name,
-            'phone': s.phone,
-            'email': s.email,
-            'address': s.address,
-            'created_at': s.created_at.isoformat() if s.created_at else None
-        } for s in suppliers],
-        'count': len(suppliers)
-    })
+    fields = _api_fields(Supplier.id, Supplier.name, Supplier.phone, Supplier.email, Supplier.address,
+                         Supplier.tax_number, Supplier.created_at, Supplier.updated_at)
+    return api_list_response(Supplier.query, Supplier.id, fields, (Supplier.updated_at, Supplier.created_at))
 
 @app.route('/api/products')
 def api_products():
-    products = Product.query.all()
-    return jsonify({
-        'status': 'success',
-        'data': [{
-            'id': p.id,
-            'name': p.name,
-            'price': float(p.price),
-            'cost': float(p.cost) if p.cost else None,
-            'quantity': p.quantity,
-            'min_quantity': p.min_quantity,
-            'category': p.category,
-            'created_at': p.created_at.isoformat() if p.created_at else None
-        } for p in products],
-        'count': len(products)
-    })
+    fields = _api_fields(Product.id, Product.name, Product.price, Product.cost, Product.quantity,
+                         Product.min_quantity, Product.category, Product.created_at, Product.updated_at)
+    return api_list_response(Product.query, Product.id, fields, (Product.updated_at, Product.created_at))
 
 @app.route('/api/sales')
 def api_sales():
-    sales = SalesInvoice.query.all()
-    return jsonify({
-        'status': 'success',
-        'data': [{
-            'id': s.id,
-            'invoice_number': s.invoice_number,
-            'customer_name': s.customer.name if s.customer else 'عميل نقدي',
-            'date': s.date.isoformat(),
-            'total': float(s.total),
-            'status': s.status,
-            'created_at': s.created_at.isoformat() if s.created_at else None
-        } for s in sales],
-        'count': len(sales)
-    })
+    fields = _api_fields(
+        SalesInvoice.id, SalesInvoice.invoice_number, SalesInvoice.customer_id,
+        customer_name=db.func.coalesce(Customer.name, 'عميل نقدي'),
+        date=SalesInvoice.date, subtotal=SalesInvoice.subtotal, tax_amount=SalesInvoice.tax_amount,
+        total=SalesInvoice.total, payment_method=SalesInvoice.payment_method, status=SalesInvoice.status,
+        branch=SalesInvoice.branch, created_at=SalesInvoice.created_at, updated_at=SalesInvoice.updated_at
+    )
+    query = SalesInvoice.query.outerjoin(Customer, SalesInvoice.customer_id == Customer.id)
+    return api_list_response(query, SalesInvoice.id, fields, (SalesInvoice.updated_at, SalesInvoice.created_at))
+
+@app.route('/api/sales_items')
+@login_required
+def api_sales_items():
+    # الأصناف تتغير مع فاتورتها، لذلك تُصفى بتاريخ تعديل الفاتورة
+    fields = _api_fields(SalesInvoiceItem.id, SalesInvoiceItem.invoice_id, SalesInvoiceItem.product_id,
+                         SalesInvoiceItem.product_name, SalesInvoiceItem.quantity,
+                         SalesInvoiceItem.unit_price, SalesInvoiceItem.total_price)
+    query = SalesInvoiceItem.query.join(SalesInvoice, SalesInvoiceItem.invoice_id == SalesInvoice.id)
+    return api_list_response(query, SalesInvoiceItem.id, fields,
+                             (SalesInvoice.updated_at, SalesInvoice.created_at))
 
 @app.route('/api/statistics')
 def api_statistics():
@@ -11322,10 +14206,11 @@ def api_statistics():
     total_products = Product.query.count()
     total_employees = Employee.query.count()
 
-    # إحصائيات مالية
-    total_sales = db.session.query(func.sum(SalesInvoice.total)).scalar() or 0
-    total_purchases = db.session.query(func.sum(PurchaseInvoice.total)).scalar() or 0
-    total_expenses = db.session.query(func.sum(Expense.amount)).scalar() or 0
+    # إحصائيات مالية من جدول الملخصات اليومية
+    totals = get_summary_totals()
+    total_sales = totals['sales_total']
+    total_purchases = totals['purchases_total']
+    total_expenses = totals['expenses_total']
     net_profit = total_sales - total_purchases - total_expenses
 
     return jsonify({
@@ -11352,48 +14237,17 @@ def api_statistics():
 @app.route('/vat_report')
 @login_required
 def vat_report():
-    from io import BytesIO
-    from flask import send_file
-    import pandas as pd
-    from fpdf import FPDF
-
-    # Calculate VAT
-    sales = SalesInvoice.query.all()
-    purchases = PurchaseInvoice.query.all()
-
-    total_sales_vat = sum((sale.total - (getattr(sale, 'discount', 0) or 0)) * 0.15 for sale in sales)
-    total_purchases_vat = sum((purchase.total - (getattr(purchase, 'discount', 0) or 0)) * 0.15 for purchase in purchases)
-    net_vat = total_sales_vat - total_purchases_vat
-
-    # Render the VAT report page
-    if request.args.get('format') == 'pdf':
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font('Arial', 'B', 16)
-        pdf.cell(200, 10, 'VAT Report', ln=True, align='C')
-        pdf.ln(10)
-        pdf.set_font('Arial', '', 12)
-        pdf.cell(200, 10, f'Total Sales VAT: {total_sales_vat:.2f} SAR', ln=True)
-        pdf.cell(200, 10, f'Total Purchases VAT: {total_purchases_vat:.2f} SAR', ln=True)
-        pdf.cell(200, 10, f'Net VAT: {net_vat:.2f} SAR', ln=True)
-
-        pdf_output = BytesIO()
-        pdf.output(pdf_output)
-        pdf_output.seek(0)
-        return send_file(pdf_output, as_attachment=True, download_name='vat_report.pdf', mimetype='application/pdf')
-
-    elif request.args.get('format') == 'excel':
-        data = {
-            'Description': ['Total Sales VAT', 'Total Purchases VAT', 'Net VAT'],
-            'Amount (SAR)': [total_sales_vat, total_purchases_vat, net_vat]
-        }
-        df = pd.DataFrame(data)
-
-        excel_output = BytesIO()
-        with pd.ExcelWriter(excel_output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='VAT Report')
-        excel_output.seek(0)
-        return send_file(excel_output, as_attachment=True, download_name='vat_report.xlsx', mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    # ملفات PDF و Excel تُبنى في الخلفية حتى لا يُحجز عامل الخادم أثناء إعدادها
+    export_format = request.args.get('format')
+    if export_format in ('pdf', 'excel'):
+        submit_job('vat_report', {'format': export_format}, user_id=current_user.id)
+        flash('جاري إعداد تقرير الضريبة في الخلفية، ستصلك رسالة عند الانتهاء', 'info')
+        return redirect(url_for('jobs_page'))
+
+    totals = compute_vat_totals()
+    total_sales_vat = totals['total_sales_vat']
+    total_purchases_vat = totals['total_purchases_vat']
+    net_vat = totals['net_vat']
 
     return render_template_string('''
     <!DOCTYPE html>
@@ -11429,7 +14283,14 @@ def users():
         flash('ليس لديك صلاحية للوصول لهذه الصفحة', 'error')
         return redirect(url_for('dashboard'))
 
-    users = User.query.all()
+    query = apply_list_filters(
+        User.query, User,
+        choice_filters=('role',),
+        text_columns=(User.username, User.full_name)
+    )
+    page = keyset_paginate(query, [User.id])
+    users = page.items
+
     return render_template_string('''
     <!DOCTYPE html>
     <html dir="{{ 'rtl' if get_locale() == 'ar' else 'ltr' }}" lang="{{ get_locale() }}">
@@ -11485,6 +14346,7 @@ def users():
                         <i class="fas fa-plus {{ 'me-2' if get_locale() == 'ar' else 'ms-2' }}"></i>{{ _('إضافة مستخدم جديد') }}
                     </button>
                 </div>
+                {{ render_list_filters(['q', 'role'], choices={'role': {'admin': _('مدير'), 'user': _('مستخدم')}}) }}
                 <div class="card-body">
                     <div class="table-responsive">
                         <table class="table table-hover">
@@ -11531,6 +14393,7 @@ def users():
                             </tbody>
                         </table>
                     </div>
+                    {{ render_list_pager(page) }}
                 </div>
             </div>
         </div>
@@ -11714,7 +14577,7 @@ def users():
         </script>
     </body>
     </html>
-    ''', users=users)
+    ''', users=users, page=page)
 
 @app.route('/add_user', methods=['POST'])
 @login_required
@@ -11932,6 +14795,8 @@ def reset_password(user_id):
 @login_required
 def delete_expense(expense_id):
     expense = Expense.query.get_or_404(expense_id)
+    record_expense_summary(expense, sign=-1)
+    record_expense_journal(expense, sign=-1)
     db.session.delete(expense)
     db.session.commit()
     return jsonify({'success': True})
@@ -11977,44 +14842,811 @@ def export_pdf(report_type):
         flash(f'حدث خطأ أثناء التصدير: {str(e)}', 'error')
         return redirect(request.referrer or url_for('dashboard'))
 
+# ===== محرك التصدير (Excel / CSV) =====
+# الصفوف تُقرأ من قاعدة البيانات دفعات عبر yield_per كقيم مجردة (بلا كائنات ORM)،
+# وتُكتب إلى CSV مباشرة في الاستجابة أو إلى xlsx بوضع الذاكرة الثابتة ثم يُبث الملف
+
+EXPORT_BATCH_ROWS = 1000
+EXPORT_FILE_CHUNK = 64 * 1024
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _low_stock_filter(query):
+    if request.args.get('low_stock'):
+        query = query.filter(Product.quantity <= Product.min_quantity)
+    return query
+
+
+def export_definitions():
+    """تعريف أعمدة واستعلام كل تقرير قابل للتصدير"""
+    return {
+        'sales': {
+            'title': 'تقرير المبيعات',
+            'route': 'sales',
+            'query': lambda: db.session.query(SalesInvoice)
+                .outerjoin(SalesInvoiceItem, SalesInvoiceItem.invoice_id == SalesInvoice.id)
+                .outerjoin(Customer, SalesInvoice.customer_id == Customer.id),
+            'model': SalesInvoice,
+            'choice_filters': ('branch', 'status', 'payment_method'),
+            'date_column': SalesInvoice.date,
+            'text_columns': (SalesInvoice.invoice_number, SalesInvoice.notes, Customer.name),
+            'order': (SalesInvoice.date, SalesInvoice.id, SalesInvoiceItem.id),
+            'columns': [
+                ('رقم الفاتورة', SalesInvoice.invoice_number),
+                ('التاريخ', SalesInvoice.date),
+                ('الفرع', SalesInvoice.branch),
+                ('العميل', db.func.coalesce(Customer.name, 'عميل نقدي')),
+                ('الصنف', SalesInvoiceItem.product_name),
+                ('الكمية', SalesInvoiceItem.quantity),
+                ('سعر الوحدة', SalesInvoiceItem.unit_price),
+                ('إجمالي الصنف', SalesInvoiceItem.total_price),
+                ('إجمالي الفاتورة', SalesInvoice.total),
+                ('طريقة الدفع', SalesInvoice.payment_method),
+                ('الحالة', SalesInvoice.status),
+            ],
+        },
+        'purchases': {
+            'title': 'تقرير المشتريات',
+            'route': 'purchases',
+            'query': lambda: db.session.query(PurchaseInvoice)
+                .outerjoin(PurchaseInvoiceItem, PurchaseInvoiceItem.invoice_id == PurchaseInvoice.id)
+                .outerjoin(Supplier, PurchaseInvoice.supplier_id == Supplier.id),
+            'model': PurchaseInvoice,
+            'choice_filters': ('status', 'payment_method'),
+            'date_column': PurchaseInvoice.date,
+            'text_columns': (PurchaseInvoice.invoice_number, PurchaseInvoice.notes, Supplier.name),
+            'order': (PurchaseInvoice.date, PurchaseInvoice.id, PurchaseInvoiceItem.id),
+            'columns': [
+                ('رقم الفاتورة', PurchaseInvoice.invoice_number),
+                ('التاريخ', PurchaseInvoice.date),
+                ('المورد', db.func.coalesce(Supplier.name, 'مورد غير محدد')),
+                ('الصنف', PurchaseInvoiceItem.product_name),
+                ('الكمية', PurchaseInvoiceItem.quantity),
+                ('سعر الوحدة', PurchaseInvoiceItem.unit_price),
+                ('إجمالي الصنف', PurchaseInvoiceItem.total_price),
+                ('إجمالي الفاتورة', PurchaseInvoice.total),
+                ('طريقة الدفع', PurchaseInvoice.payment_method),
+                ('الحالة', PurchaseInvoice.status),
+            ],
+        },
+        'expenses': {
+            'title': 'تقرير المصروفات',
+            'route': 'expenses_report',
+            'query': lambda: db.session.query(Expense),
+            'model': Expense,
+            'choice_filters': ('category', 'payment_method'),
+            'date_column': Expense.date,
+            'text_columns': (Expense.description, Expense.receipt_number, Expense.notes),
+            'order': (Expense.date, Expense.id),
+            'columns': [
+                ('التاريخ', Expense.date),
+                ('الوصف', Expense.description),
+                ('الفئة', Expense.category),
+                ('المبلغ', Expense.amount),
+                ('طريقة الدفع', Expense.payment_method),
+                ('رقم الإيصال', Expense.receipt_number),
+                ('ملاحظات', Expense.notes),
+            ],
+        },
+        'inventory': {
+            'title': 'تقرير المخزون',
+            'route': 'inventory_report',
+            'query': lambda: _low_stock_filter(db.session.query(Product)),
+            'model': Product,
+            'choice_filters': ('category',),
+            'text_columns': (Product.name, Product.description, Product.category),
+            'order': (Product.id,),
+            'columns': [
+                ('المنتج', Product.name),
+                ('الفئة', Product.category),
+                ('السعر', Product.price),
+                ('التكلفة', Product.cost),
+                ('الكمية', Product.quantity),
+                ('الحد الأدنى', Product.min_quantity),
+                ('قيمة المخزون', Product.price * Product.quantity),
+            ],
+        },
+        'employees': {
+            'title': 'تقرير الموظفين',
+            'route': 'employees_report',
+            'query': lambda: db.session.query(Employee),
+            'model': Employee,
+            'choice_filters': ('status',),
+            'text_columns': (Employee.name, Employee.position, Employee.phone, Employee.email),
+            'order': (Employee.id,),
+            'columns': [
+                ('الاسم', Employee.name),
+                ('المنصب', Employee.position),
+                ('الراتب', Employee.salary),
+                ('الهاتف', Employee.phone),
+                ('البريد الإلكتروني', Employee.email),
+                ('تاريخ التعيين', Employee.hire_date),
+                ('الحالة', Employee.status),
+            ],
+        },
+        'payroll': {
+            'title': 'تقرير كشوف الرواتب',
+            'route': 'payroll_report',
+            'query': lambda: db.session.query(EmployeePayroll)
+                .join(Employee, EmployeePayroll.employee_id == Employee.id),
+            'model': EmployeePayroll,
+            'choice_filters': ('status', 'year', 'month'),
+            'text_columns': (Employee.name,),
+            'order': (EmployeePayroll.year, EmployeePayroll.month, EmployeePayroll.id),
+            'columns': [
+                ('السنة', EmployeePayroll.year),
+                ('الشهر', EmployeePayroll.month),
+                ('الموظف', Employee.name),
+                ('الراتب الأساسي', EmployeePayroll.basic_salary),
+                ('الإضافي', EmployeePayroll.overtime_amount),
+                ('البدلات', EmployeePayroll.allowances),
+                ('الاستقطاعات', EmployeePayroll.deductions),
+                ('الإجمالي', EmployeePayroll.gross_salary),
+                ('الصافي', EmployeePayroll.net_salary),
+                ('الحالة', EmployeePayroll.status),
+                ('تاريخ الدفع', EmployeePayroll.payment_date),
+            ],
+        },
+        'payments': {
+            'title': 'تقرير المدفوعات والمستحقات',
+            'route': 'payments_report',
+            'query': lambda: db.session.query(Payment)
+                .outerjoin(Customer, Payment.customer_id == Customer.id)
+                .outerjoin(Supplier, Payment.supplier_id == Supplier.id),
+            'model': Payment,
+            'choice_filters': ('payment_type', 'payment_method'),
+            'date_column': Payment.date,
+            'text_columns': (Payment.description, Customer.name, Supplier.name),
+            'order': (Payment.date, Payment.id),
+            'columns': [
+                ('التاريخ', Payment.date),
+                ('النوع', Payment.payment_type),
+                ('الطرف', db.func.coalesce(Customer.name, Supplier.name)),
+                ('الوصف', Payment.description),
+                ('المبلغ', Payment.amount),
+                ('طريقة الدفع', Payment.payment_method),
+            ],
+        },
+    }
+
+
+def build_export_query(definition):
+    """استعلام التصدير بعد تطبيق فلاتر الرابط، بأعمدة مجردة فقط"""
+    query = apply_list_filters(
+        definition['query'](), definition['model'],
+        choice_filters=definition.get('choice_filters', ()),
+        date_column=definition.get('date_column'),
+        text_columns=definition.get('text_columns', ())
+    )
+    return query.with_entities(*[column for _, column in definition['columns']]) \
+                .order_by(*definition['order'])
+
+
+def iter_export_rows(query, batch=EXPORT_BATCH_ROWS):
+    """قراءة صفوف التصدير دفعات من مؤشر جهة الخادم"""
+    for row in query.yield_per(batch):
+        yield tuple(row)
+
+
+def _export_cell(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    """تحويل قيمة إلى خلية CSV، والنصوص التي تبدأ بمحرف صيغة تُسبق بعلامة ' حتى يعرضها Excel نصاً"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv_chunks(headers, rows, batch=EXPORT_BATCH_ROWS):
+    """كتابة CSV على دفعات نصية (مع BOM ليقرأ Excel العربية بشكل صحيح)"""
+    import csv
+    import io
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(headers)
+    pending = 0
+    for row in rows:
+        writer.writerow([_csv_cell(value) for value in row])
+        pending += 1
+        if pending >= batch:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode('utf-8')
+
+
+def write_xlsx_file(path, title, headers, rows):
+    """كتابة xlsx بوضع الذاكرة الثابتة (كل صف يُكتب للقرص فور إضافته)، وإرجاع عدد الصفوف"""
+    import xlsxwriter
+
+    # النصوص تُكتب كما هي: اسم عميل يبدأ بـ = أو رابط لا يتحول إلى صيغة أو ارتباط
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'strings_to_numbers': False,
+                                          'strings_to_formulas': False, 'strings_to_urls': False})
+    try:
+        sheet = workbook.add_worksheet(title[:31])
+        sheet.right_to_left()
+        sheet.write_row(0, 0, headers, workbook.add_format({'bold': True, 'bg_color': '#D9E1F2'}))
+        sheet.set_column(0, len(headers) - 1, 16)
+        count = 0
+        for count, row in enumerate(rows, start=1):
+            sheet.write_row(count, 0, [_export_cell(value) for value in row])
+    finally:
+        workbook.close()
+    return count
+
+
+def iter_file_chunks(path, remove=True):
+    """بث ملف على أجزاء ثم حذفه"""
+    try:
+        with open(path, 'rb') as handle:
+            while True:
+                chunk = handle.read(EXPORT_FILE_CHUNK)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        if remove:
+            os.remove(path)
+
+
 @app.route('/export_excel/<report_type>')
 @login_required
 def export_excel(report_type):
-    """تصدير التقارير كـ Excel (محاكاة)"""
-    try:
-        # محاكاة تصدير Excel
-        report_names = {
-            'sales': 'تقرير المبيعات',
-            'purchases': 'تقرير المشتريات',
-            'expenses': 'تقرير المصروفات',
-            'inventory': 'تقرير المخزون',
-            'employees': 'تقرير الموظفين',
-            'payroll': 'تقرير كشوف الرواتب',
-            'payments': 'تقرير المدفوعات والمستحقات'
-        }
+    """تصدير التقارير كـ Excel أو CSV (?format=csv) مع فلاتر الرابط"""
+    import tempfile
 
-        report_name = report_names.get(report_type, 'التقرير')
+    definition = export_definitions().get(report_type)
+    if definition is None:
+        flash('نوع التقرير غير مدعوم', 'error')
+        return redirect(url_for('reports'))
 
-        # في التطبيق الحقيقي، هنا سيتم إنشاء ملف Excel
-        flash(f'تم تصدير {report_name} بصيغة Excel بنجاح! (محاكاة)', 'success')
+    headers = [header for header, _ in definition['columns']]
+    filename = f"{report_type}_{date.today().isoformat()}"
+    export_format = request.args.get('format', 'xlsx')
 
-        # إعادة توجيه للتقرير المناسب
-        report_routes = {
-            'sales': 'sales',
-            'purchases': 'purchases',
-            'expenses': 'expenses_report',
-            'inventory': 'inventory_report',
-            'employees': 'employees_report',
-            'payroll': 'payroll_report',
-            'payments': 'payments_report'
-        }
+    if request.args.get('background'):
+        # التصديرات الكبيرة تُجهز في الخلفية ويُحمّل الملف من صفحة المهام
+        filters = {key: value for key, value in request.args.items() if key not in ('format', 'background')}
+        submit_job('export', {'report_type': report_type, 'format': export_format, 'filters': filters},
+                   user_id=current_user.id)
+        flash(f"جاري تصدير {definition['title']} في الخلفية، ستصلك رسالة عند الانتهاء", 'info')
+        return redirect(url_for('jobs_page'))
 
-        route = report_routes.get(report_type, 'reports')
-        return redirect(url_for(route))
+    try:
+        query = build_export_query(definition)
+
+        if export_format != 'csv':
+            fd, path = tempfile.mkstemp(suffix='.xlsx')
+            os.close(fd)
+            streaming = False
+            try:
+                write_xlsx_file(path, definition['title'], headers, iter_export_rows(query))
+                response = app.response_class(
+                    iter_file_chunks(path), mimetype=XLSX_MIMETYPE,
+                    headers={'Content-Disposition': f'attachment; filename={filename}.xlsx',
+                             'Content-Length': str(os.path.getsize(path))}
+                )
+                # طلب لم يُقرأ جسمه (انقطاع العميل) لا يشغّل المولد، فيُحذف الملف عند الإغلاق
+                response.call_on_close(lambda: os.path.exists(path) and os.remove(path))
+                streaming = True
+                return response
+            except ImportError:
+                # xlsxwriter غير مثبت: التصدير بصيغة CSV التي يفتحها Excel أيضاً
+                export_format = 'csv'
+            finally:
+                # بعد بدء البث يحذف iter_file_chunks الملف، وقبله يُحذف هنا مهما كان الخطأ
+                if not streaming:
+                    os.remove(path)
+
+        return app.response_class(
+            stream_with_context(iter_csv_chunks(headers, iter_export_rows(query))),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}.csv'}
+        )
 
     except Exception as e:
         flash(f'حدث خطأ أثناء التصدير: {str(e)}', 'error')
-        return redirect(request.referrer or url_for('dashboard'))
+        return redirect(request.referrer or url_for(definition['route']))
+
+# ===== المهام في الخلفية =====
+# العمليات الطويلة (تصدير كامل، ملفات تقرير الضريبة، النسخ الاحتياطي، مسير الرواتب) تعمل في
+# عمليات منفصلة حتى لا يتعطل عامل الخادم الوحيد. حالة المهمة محفوظة في جدول BackgroundJob،
+# والتقدم في ملف صغير بجانب النتيجة حتى لا تتنافس الكتابة مع قراءة قاعدة البيانات، ويُرسل
+# إشعار الانتهاء عبر broadcast_update إلى غرفة المستخدم
+
+app.config['JOB_EXECUTOR'] = os.environ.get('JOB_EXECUTOR', 'process')  # process أو inline
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_START_METHOD'] = os.environ.get('JOB_START_METHOD', 'spawn')
+app.config['JOB_RESULTS_DIR'] = os.environ.get(
+    'JOB_RESULTS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'job_results')
+)
+JOB_STALE_HOURS = 6
+JOB_PROGRESS_INTERVAL = 0.5
+
+JOB_KINDS = {
+    'export': 'تصدير تقرير',
+    'vat_report': 'تقرير ضريبة القيمة المضافة',
+    'backup': 'نسخة احتياطية',
+    'payroll_run': 'مسير الرواتب'
+}
+
+# مهام تمس كل البيانات أو الرواتب: للمدير فقط
+ADMIN_JOB_KINDS = ('backup', 'payroll_run')
+
+JOB_HANDLERS = {}
+_job_executor = None
+_job_executor_lock = threading.Lock()
+
+
+def job_handler(kind):
+    """تسجيل دالة تنفيذ لنوع مهمة؛ الدالة تستقبل (job, params, progress) وترجع dict"""
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def _job_progress_path(job_id):
+    return os.path.join(app.config['JOB_RESULTS_DIR'], f'{job_id}.progress')
+
+
+def read_job_progress(job_id):
+    try:
+        with open(_job_progress_path(job_id)) as f:
+            return int(f.read() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+class JobProgress:
+    """تسجيل نسبة تقدم المهمة (بحد أقصى مرة كل نصف ثانية)"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.last_write = 0.0
+        self.percent = -1
+
+    def __call__(self, percent):
+        percent = max(0, min(int(percent), 99))
+        now = time.monotonic()
+        if percent == self.percent or now - self.last_write < JOB_PROGRESS_INTERVAL:
+            return
+        path = _job_progress_path(self.job_id)
+        with open(path + '.tmp', 'w') as f:
+            f.write(str(percent))
+        os.replace(path + '.tmp', path)
+        self.percent, self.last_write = percent, now
+
+    def clear(self):
+        try:
+            os.remove(_job_progress_path(self.job_id))
+        except OSError:
+            pass
+
+
+def job_result_path(job, filename):
+    """مسار ملف نتيجة المهمة"""
+    return os.path.join(app.config['JOB_RESULTS_DIR'], f'{job.id}_{filename}')
+
+
+def _init_job_worker():
+    """تهيئة عملية المهام: لا تُستخدم اتصالات قاعدة البيانات الموروثة من العملية الأم"""
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def run_job(job_id):
+    """تنفيذ مهمة داخل عملية المهام وحفظ نتيجتها"""
+    with app.app_context():
+        job = db.session.get(BackgroundJob, job_id)
+        if job is None or job.status != 'queued':
+            return
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        job.pid = os.getpid()
+        db.session.commit()
+
+        progress = JobProgress(job_id)
+        try:
+            handler = JOB_HANDLERS[job.kind]
+            result = handler(job, json.loads(job.params or '{}'), progress) or {}
+            job = db.session.get(BackgroundJob, job_id)
+            job.status = 'done'
+            job.result_path = result.get('path')
+            job.result_name = result.get('name')
+            job.message = result.get('message')
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(BackgroundJob, job_id)
+            job.status = 'failed'
+            job.message = str(e)[:500]
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        progress.clear()
+
+
+def _job_finished(job_id, future=None):
+    """بعد انتهاء المهمة: تسجيل الفشل غير المتوقع وإشعار صاحبها"""
+    with app.app_context():
+        job = db.session.get(BackgroundJob, job_id)
+        if job is None:
+            return
+        error = future.exception() if future is not None else None
+        if error is not None and job.status in ('queued', 'running'):
+            job.status = 'failed'
+            job.message = f'توقفت عملية المهام: {error}'[:500]
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        broadcast_update('job', job.to_dict(), room=f'user_{job.user_id}')
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # عملية لمستخدم آخر أخذت الرقم نفسه
+    return True
+
+
+def fail_orphaned_jobs():
+    """تسجيل فشل المهام المعلقة التي ماتت عمليتها (انهيار أو إعادة تشغيل)، وإرجاع عددها
+
+    المهمة المنتظرة تتبع عامل الويب الذي يملك مجمع العمليات، والجارية تتبع عملية التنفيذ؛
+    فإن لم تعد العملية موجودة لن تكتمل المهمة أبداً. رقم العملية قد يُعاد استخدامه بعد إعادة
+    تشغيل الحاوية، فتبقى المهام الأقدم من JOB_STALE_HOURS تُعد فاشلة في كل الأحوال.
+    """
+    stale = datetime.utcnow() - timedelta(hours=JOB_STALE_HOURS)
+    orphaned = [job.id for job in BackgroundJob.query.filter(BackgroundJob.status.in_(('queued', 'running')))
+                if job.pid is None or job.created_at < stale or not _process_alive(job.pid)]
+    if orphaned:
+        BackgroundJob.query.filter(
+            BackgroundJob.id.in_(orphaned),
+            BackgroundJob.status.in_(('queued', 'running'))
+        ).update({'status': 'failed', 'message': 'توقفت المهمة بسبب إعادة تشغيل الخادم',
+                  'finished_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return len(orphaned)
+
+
+def _get_job_executor():
+    """إنشاء مجمع عمليات المهام عند أول استخدام"""
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            fail_orphaned_jobs()
+
+            _job_executor = ProcessPoolExecutor(
+                max_workers=app.config['JOB_WORKERS'],
+                mp_context=multiprocessing.get_context(app.config['JOB_START_METHOD']),
+                initializer=_init_job_worker
+            )
+        return _job_executor
+
+
+def submit_job(kind, params, user_id=None):
+    """إنشاء مهمة وإرسالها للتنفيذ في الخلفية"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError('نوع المهمة غير مدعوم')
+
+    os.makedirs(app.config['JOB_RESULTS_DIR'], exist_ok=True)
+    job = BackgroundJob(kind=kind, params=json.dumps(params, ensure_ascii=False), user_id=user_id,
+                        pid=os.getpid())
+    db.session.add(job)
+    db.session.commit()
+
+    if app.config['JOB_EXECUTOR'] == 'inline':
+        run_job(job.id)
+        _job_finished(job.id)
+    else:
+        future = _get_job_executor().submit(run_job, job.id)
+        future.add_done_callback(functools.partial(_job_finished, job.id))
+    return job
+
+
+def _counted(rows, total, progress):
+    """تمرير الصفوف مع تحديث نسبة التقدم"""
+    for count, row in enumerate(rows, start=1):
+        if count % EXPORT_BATCH_ROWS == 0:
+            progress(count * 100 // max(total, 1))
+        yield row
+
+
+@job_handler('export')
+def _run_export_job(job, params, progress):
+    report_type = params.get('report_type')
+    definition = export_definitions().get(report_type)
+    if definition is None:
+        raise ValueError('نوع التقرير غير مدعوم')
+
+    export_format = 'csv' if params.get('format') == 'csv' else 'xlsx'
+    filename = f"{report_type}_{date.today().isoformat()}.{export_format}"
+    path = job_result_path(job, filename)
+    headers = [header for header, _ in definition['columns']]
+
+    # الفلاتر تُقرأ من الرابط، لذلك تُنفذ داخل سياق طلب بنفس المعاملات
+    with app.test_request_context(query_string=params.get('filters') or {}):
+        query = build_export_query(definition)
+        total = query.count()
+        rows = _counted(iter_export_rows(query), total, progress)
+        if export_format == 'xlsx':
+            write_xlsx_file(path, definition['title'], headers, rows)
+        else:
+            with open(path, 'wb') as f:
+                for chunk in iter_csv_chunks(headers, rows):
+                    f.write(chunk)
+
+    return {'path': path, 'name': filename, 'message': f"{definition['title']}: {total} صف"}
+
+
+def compute_vat_totals():
+    """إجماليات ضريبة القيمة المضافة (15%) من قاعدة البيانات"""
+    total_sales = db.session.query(db.func.coalesce(db.func.sum(SalesInvoice.total), 0)).scalar()
+    total_purchases = db.session.query(db.func.coalesce(db.func.sum(PurchaseInvoice.total), 0)).scalar()
+    total_sales_vat = float(total_sales) * 0.15
+    total_purchases_vat = float(total_purchases) * 0.15
+    return {
+        'total_sales_vat': total_sales_vat,
+        'total_purchases_vat': total_purchases_vat,
+        'net_vat': total_sales_vat - total_purchases_vat
+    }
+
+
+@job_handler('vat_report')
+def _run_vat_report_job(job, params, progress):
+    totals = compute_vat_totals()
+    progress(50)
+
+    if params.get('format') == 'pdf':
+        from fpdf import FPDF
+
+        filename = 'vat_report.pdf'
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font('Arial', 'B', 16)
+        pdf.cell(200, 10, 'VAT Report', ln=True, align='C')
+        pdf.ln(10)
+        pdf.set_font('Arial', '', 12)
+        pdf.cell(200, 10, f"Total Sales VAT: {totals['total_sales_vat']:.2f} SAR", ln=True)
+        pdf.cell(200, 10, f"Total Purchases VAT: {totals['total_purchases_vat']:.2f} SAR", ln=True)
+        pdf.cell(200, 10, f"Net VAT: {totals['net_vat']:.2f} SAR", ln=True)
+        pdf.output(job_result_path(job, filename))
+    else:
+        filename = 'vat_report.xlsx'
+        write_xlsx_file(job_result_path(job, filename), 'VAT Report', ['Description', 'Amount (SAR)'], [
+            ('Total Sales VAT', totals['total_sales_vat']),
+            ('Total Purchases VAT', totals['total_purchases_vat']),
+            ('Net VAT', totals['net_vat'])
+        ])
+
+    return {'path': job_result_path(job, filename), 'name': filename}
+
+
+@job_handler('backup')
+def _run_backup_job(job, params, progress):
+    result = perform_backup()
+    result['message'] = f"تم إنشاء النسخة الاحتياطية: {result['name']}"
+    return result
+
+
+@job_handler('payroll_run')
+def _run_payroll_job(job, params, progress):
+    """إنشاء كشوف رواتب الشهر لكل الموظفين النشطين الذين ليس لهم كشف"""
+    month = int(params.get('month') or date.today().month)
+    year = int(params.get('year') or date.today().year)
+
+    existing = db.session.query(EmployeePayroll.employee_id).filter_by(month=month, year=year)
+    employees = Employee.query.filter(Employee.status == 'active', ~Employee.id.in_(existing)) \
+                              .order_by(Employee.id).all()
+
+    for count, employee in enumerate(employees, start=1):
+        basic_salary = employee.salary or 0
+        allowances = employee.allowances or 0
+        deductions = employee.deductions or 0
+        gross_salary = basic_salary + allowances
+        payroll = EmployeePayroll(
+            employee_id=employee.id, month=month, year=year,
+            basic_salary=basic_salary,
+            working_days=employee.working_days or 30,
+            actual_working_days=employee.working_days or 30,
+            allowances=allowances, deductions=deductions,
+            gross_salary=gross_salary, net_salary=gross_salary - deductions,
+            status='pending'
+        )
+        db.session.add(payroll)
+        db.session.flush()
+        record_payroll_journal(payroll)
+        progress(count * 100 // len(employees))
+    db.session.commit()
+
+    return {'message': f'تم إنشاء {len(employees)} كشف راتب لشهر {month}/{year}'}
+
+
+def _job_or_404(job_id):
+    job = db.session.get(BackgroundJob, job_id)
+    if job is None or (job.user_id != current_user.id and current_user.role != 'admin'):
+        abort(404)
+    return job
+
+
+@app.route('/jobs/<kind>', methods=['POST'])
+@login_required
+def submit_job_route(kind):
+    """إرسال مهمة جديدة (JSON أو نموذج)"""
+    if kind in ADMIN_JOB_KINDS and current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'ليس لديك صلاحية'}), 403
+    params = request.get_json(silent=True) or request.form.to_dict()
+    try:
+        job = submit_job(kind, params, user_id=current_user.id)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, 'job': job.to_dict()}), 202
+
+
+@app.route('/api/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    """حالة المهمة ونسبة تقدمها"""
+    return jsonify({'success': True, 'job': _job_or_404(job_id).to_dict()})
+
+
+@app.route('/jobs/<int:job_id>/download')
+@login_required
+def download_job_result(job_id):
+    """تحميل نتيجة المهمة"""
+    from flask import send_file
+
+    job = _job_or_404(job_id)
+    if job.status != 'done' or not job.result_path or not os.path.exists(job.result_path):
+        flash('نتيجة المهمة غير متوفرة', 'error')
+        return redirect(url_for('jobs_page'))
+    return send_file(os.path.abspath(job.result_path), as_attachment=True, download_name=job.result_name)
+
+
+@app.route('/jobs')
+@login_required
+def jobs_page():
+    """صفحة متابعة المهام في الخلفية"""
+    jobs = BackgroundJob.query.filter_by(user_id=current_user.id) \
+                              .order_by(BackgroundJob.created_at.desc()).limit(50).all()
+
+    return render_template_string('''
+    <!DOCTYPE html>
+    <html dir="rtl" lang="ar">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>المهام في الخلفية - نظام المحاسبة</title>
+        <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.rtl.min.css" rel="stylesheet">
+        <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css" rel="stylesheet">
+        <style>
+            body { background-color: #f8f9fa; }
+            .navbar { background: linear-gradient(45deg, #667eea, #764ba2) !important; }
+        </style>
+    </head>
+    <body>
+        <nav class="navbar navbar-expand-lg navbar-dark">
+            <div class="container">
+                <a class="navbar-brand" href="{{ url_for('dashboard') }}">
+                    <i class="fas fa-calculator me-2"></i>نظام المحاسبة
+                </a>
+                <div class="navbar-nav ms-auto">
+                    <a class="nav-link" href="{{ url_for('dashboard') }}">
+                        <i class="fas fa-home me-1"></i>الرئيسية
+                    </a>
+                </div>
+            </div>
+        </nav>
+
+        <div class="container mt-4">
+            {% with messages = get_flashed_messages(with_categories=true) %}
+                {% for category, message in messages %}
+                <div class="alert alert-{{ 'danger' if category == 'error' else category }}">{{ message }}</div>
+                {% endfor %}
+            {% endwith %}
+
+            <div class="card shadow">
+                <div class="card-header bg-primary text-white">
+                    <h5 class="mb-0"><i class="fas fa-tasks me-2"></i>المهام في الخلفية</h5>
+                </div>
+                <div class="card-body p-0">
+                    <table class="table table-hover mb-0">
+                        <thead class="table-light">
+                            <tr>
+                                <th>#</th>
+                                <th>المهمة</th>
+                                <th>التاريخ</th>
+                                <th style="width: 30%">الحالة</th>
+                                <th>النتيجة</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                            {% for job in jobs %}
+                            <tr id="job-{{ job.id }}" data-status="{{ job.status }}">
+                                <td>{{ job.id }}</td>
+                                <td>{{ job_kinds.get(job.kind, job.kind) }}</td>
+                                <td>{{ job.created_at.strftime('%Y-%m-%d %H:%M') if job.created_at else '' }}</td>
+                                <td class="job-status">
+                                    {% set info = job.to_dict() %}
+                                    <div class="progress" style="height: 18px;">
+                                        <div class="progress-bar {{ 'bg-success' if job.status == 'done' else 'bg-danger' if job.status == 'failed' else 'progress-bar-striped progress-bar-animated' }}"
+                                             style="width: {{ info.progress if job.status != 'failed' else 100 }}%">{{ info.progress }}%</div>
+                                    </div>
+                                </td>
+                                <td class="job-result">
+                                    {% if info.download_url %}
+                                    <a href="{{ info.download_url }}" class="btn btn-sm btn-success"><i class="fas fa-download me-1"></i>{{ job.result_name }}</a>
+                                    {% endif %}
+                                    <small class="text-muted d-block">{{ job.message or '' }}</small>
+                                </td>
+                            </tr>
+                            {% else %}
+                            <tr><td colspan="5" class="text-center text-muted py-4">لا توجد مهام</td></tr>
+                            {% endfor %}
+                        </tbody>
+                    </table>
+                </div>
+            </div>
+        </div>
+
+        <script>
+            function renderJob(job) {
+                const row = document.getElementById('job-' + job.id);
+                if (!row) { return; }
+                row.dataset.status = job.status;
+                const bar = row.querySelector('.progress-bar');
+                bar.style.width = (job.status === 'failed' ? 100 : job.progress) + '%';
+                bar.textContent = job.progress + '%';
+                bar.className = 'progress-bar ' + (job.status === 'done' ? 'bg-success' :
+                    job.status === 'failed' ? 'bg-danger' : 'progress-bar-striped progress-bar-animated');
+                const cell = row.querySelector('.job-result');
+                cell.replaceChildren();
+                if (job.download_url) {
+                    const anchor = document.createElement('a');
+                    anchor.href = job.download_url;
+                    anchor.className = 'btn btn-sm btn-success';
+                    anchor.innerHTML = '<i class="fas fa-download me-1"></i>';
+                    anchor.appendChild(document.createTextNode(job.result_name));
+                    cell.appendChild(anchor);
+                }
+                const message = document.createElement('small');
+                message.className = 'text-muted d-block';
+                message.textContent = job.message || '';
+                cell.appendChild(message);
+            }
+
+            // متابعة تقدم المهام الجارية؛ الانتهاء يصل أيضاً عبر Socket.IO
+            setInterval(function() {
+                document.querySelectorAll('tr[data-status="queued"], tr[data-status="running"]').forEach(function(row) {
+                    fetch('/api/jobs/' + row.id.replace('job-', ''))
+                        .then(response => response.json())
+                        .then(data => { if (data.success) { renderJob(data.job); } });
+                });
+            }, 2000);
+        </script>
+        {{ SOCKETIO_JS|safe }}
+    </body>
+    </html>
+    ''', jobs=jobs, job_kinds=JOB_KINDS)
 
 # ===== تحديث الملف الشخصي =====
 
@@ -12062,49 +15694,60 @@ def change_password():
 
 # ===== نظام الإعدادات المحسن =====
 
-@app.route('/create_backup', methods=['POST'])
-@login_required
-def create_backup():
-    """إنشاء نسخة احتياطية من قاعدة البيانات"""
+def perform_backup(backup_dir='backups'):
+    """إنشاء نسخة احتياطية من قاعدة بيانات SQLite (تعمل كمهمة في الخلفية)"""
+    import sqlite3
+
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if not uri.startswith('sqlite:///'):
+        raise ValueError('النسخ الاحتياطي من الواجهة متاح لقاعدة SQLite فقط، استخدم pg_dump لقاعدة PostgreSQL')
+
+    # إنشاء مجلد النسخ الاحتياطية
+    os.makedirs(backup_dir, exist_ok=True)
+
+    # اسم ملف النسخة الاحتياطية
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    backup_filename = f'accounting_backup_{timestamp}.db'
+    backup_path = os.path.join(backup_dir, backup_filename)
+
+    # نسخ قاعدة البيانات بواجهة النسخ في SQLite حتى تكون النسخة متسقة أثناء الكتابة
+    source = sqlite3.connect(uri.replace('sqlite:///', ''))
+    target = sqlite3.connect(backup_path)
     try:
-        import sqlite3
-        import shutil
-        from datetime import datetime
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+    # إنشاء ملف JSON مع البيانات المهمة
+    backup_data = {
+        'timestamp': datetime.now().isoformat(),
+        'database_file': backup_filename,
+        'version': '1.0',
+        'description': 'نسخة احتياطية كاملة من نظام المحاسبة'
+    }
 
-        # إنشاء مجلد النسخ الاحتياطية
-        backup_dir = 'backups'
-        os.makedirs(backup_dir, exist_ok=True)
-
-        # اسم ملف النسخة الاحتياطية
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_filename = f'accounting_backup_{timestamp}.db'
-        backup_path = os.path.join(backup_dir, backup_filename)
-
-        # نسخ قاعدة البيانات
-        db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
-        shutil.copy2(db_path, backup_path)
-
-        # إنشاء ملف JSON مع البيانات المهمة
-        backup_data = {
-            'timestamp': datetime.now().isoformat(),
-            'database_file': backup_filename,
-            'version': '1.0',
-            'description': 'نسخة احتياطية كاملة من نظام المحاسبة'
-        }
+    # حفظ معلومات النسخة الاحتياطية
+    info_filename = f'backup_info_{timestamp}.json'
+    info_path = os.path.join(backup_dir, info_filename)
 
-        # حفظ معلومات النسخة الاحتياطية
-        info_filename = f'backup_info_{timestamp}.json'
-        info_path = os.path.join(backup_dir, info_filename)
+    with open(info_path, 'w', encoding='utf-8') as f:
+        json.dump(backup_data, f, ensure_ascii=False, indent=2)
 
-        with open(info_path, 'w', encoding='utf-8') as f:
-            json.dump(backup_data, f, ensure_ascii=False, indent=2)
+    return {'path': backup_path, 'name': backup_filename}
 
+@app.route('/create_backup', methods=['POST'])
+@login_required
+def create_backup():
+    """إنشاء نسخة احتياطية من قاعدة البيانات (في الخلفية)"""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'ليس لديك صلاحية'}), 403
+    try:
+        job = submit_job('backup', {}, user_id=current_user.id)
         return jsonify({
             'success': True,
-            'message': 'تم إنشاء النسخة الاحتياطية بنجاح',
-            'backup_file': backup_filename,
-            'backup_path': backup_path,
-            'timestamp': timestamp
+            'message': 'جاري إنشاء النسخة الاحتياطية في الخلفية',
+            'job_id': job.id
         })
 
     except Exception as e:
@@ -12724,8 +16367,26 @@ def settings():
                 // حفظ في localStorage
                 localStorage.setItem('systemSettings', JSON.stringify(settings));
 
-                alert('تم حفظ إعدادات النظام بنجاح!');
-                console.log('System settings saved:', settings);
+                saveSettingsToServer({
+                    company_name: settings.companyName,
+                    tax_number: settings.taxNumber,
+                    tax_rate: settings.taxRate,
+                    currency: settings.currency,
+                    default_language: settings.language,
+                    timezone: settings.timezone
+                }, 'تم حفظ إعدادات النظام بنجاح!');
+            }
+
+            function saveSettingsToServer(values, successMessage) {
+                // حفظ جميع الحقول في طلب واحد ومعاملة واحدة
+                fetch('/api/system_settings', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({settings: values})
+                })
+                .then(response => response.json())
+                .then(data => alert(data.success ? successMessage : data.message))
+                .catch(() => alert('تم الحفظ محلياً فقط - تعذر الاتصال بالخادم'));
             }
 
             function saveCompanySettings() {
@@ -12741,8 +16402,13 @@ def settings():
                 // حفظ في localStorage
                 localStorage.setItem('companySettings', JSON.stringify(companyData));
 
-                alert('تم حفظ إعدادات الشركة بنجاح!');
-                console.log('Company settings saved:', companyData);
+                saveSettingsToServer({
+                    company_name: companyData.name,
+                    tax_number: companyData.taxNumber,
+                    company_address: companyData.address,
+                    company_phone: companyData.phone,
+                    company_email: companyData.email
+                }, 'تم حفظ إعدادات الشركة بنجاح!');
             }
 
             function loadSettings() {
@@ -12933,7 +16599,7 @@ def settings():
                     .then(response => response.json())
                     .then(data => {
                         if (data.success) {
-                            alert('تم إنشاء النسخة الاحتياطية بنجاح!\\nاسم الملف: ' + data.backup_file);
+                            alert(data.message + '\\nستصلك رسالة عند الانتهاء، ويمكن متابعتها من صفحة المهام /jobs');
                         } else {
                             alert('خطأ في إنشاء النسخة الاحتياطية: ' + data.message);
                         }
@@ -13098,130 +16764,214 @@ def settings():
 
 # ===== تهيئة قاعدة البيانات =====
 
-def init_db():
-    """تهيئة قاعدة البيانات وإنشاء البيانات الأساسية مع معالجة الأخطاء"""
+_db_initialized = False
+
+def init_db(force=False):
+    """تهيئة قاعدة البيانات عند التشغيل (سريعة وآمنة عند تكرار الاستدعاء)
+
+    تُقارن بصمة المخطط المحفوظة بتعريف النماذج الحالي، فلا يُنفذ create_all وفحص
+    الجداول إلا عند أول تشغيل أو بعد تعديل النماذج. البيانات التجريبية لم تعد تُضاف
+    عند التشغيل، بل بالأمر: flask --app accounting_system_complete seed-demo
+    """
+    global _db_initialized
+    if _db_initialized and not force:
+        return
+
     with app.app_context():
         try:
             # التحقق من الاتصال بقاعدة البيانات أولاً
-            try:
-                db.engine.connect()
-                print("✅ تم الاتصال بقاعدة البيانات بنجاح")
-            except Exception as conn_error:
-                print(f"❌ فشل الاتصال بقاعدة البيانات: {conn_error}")
-
-                # في حالة فشل الاتصال، استخدام قاعدة بيانات مؤقتة
-                app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-                print("🔄 تم التبديل لقاعدة بيانات مؤقتة في الذاكرة")
-
-                # إعادة تهيئة قاعدة البيانات
-                db.init_app(app)
-
-            # إنشاء الجداول
-            db.create_all()
-
-            # طباعة معلومات قاعدة البيانات
-            db_uri = app.config['SQLALCHEMY_DATABASE_URI']
-            print(f"📊 قاعدة البيانات: {db_uri}")
-
-            # التحقق من وجود الجداول
-            inspector = db.inspect(db.engine)
-            tables = inspector.get_table_names()
-            print(f"📋 الجداول الموجودة: {len(tables)} جدول")
-
-            if 'user' in tables:
-                print("✅ جدول المستخدمين موجود")
-            if 'customer' in tables:
-                print("✅ جدول العملاء موجود")
-            if 'sales_invoice' in tables:
-                print("✅ جدول فواتير المبيعات موجود")
-
-            # إنشاء مستخدم افتراضي
-            if not User.query.filter_by(username='admin').first():
-                admin = User(
-                    username='admin',
-                    full_name='مدير النظام',
-                    role='admin'
-                )
-                admin.set_password('admin123')
-                db.session.add(admin)
-
-            # إضافة بيانات تجريبية
-            sample_customer = Customer(
-                name='عميل تجريبي',
-                phone='0501234567',
-                email='customer@example.com',
-                address='الرياض، المملكة العربية السعودية'
-            )
+            with db.engine.connect():
+                pass
+            print("✅ تم الاتصال بقاعدة البيانات بنجاح")
+            startup_timer.mark('db connect')
 
-            sample_supplier = Supplier(
-                name='مورد تجريبي',
-                phone='0507654321',
-                email='supplier@example.com',
-                address='جدة، المملكة العربية السعودية'
-            )
-
-            sample_product = Product(
-                name='منتج تجريبي',
-                description='وصف المنتج التجريبي',
-                price=100.00,
-                cost=80.00,
-                quantity=50,
-                min_quantity=10,
-                category='عام'
-            )
-
-            sample_employee = Employee(
-                name='موظف تجريبي',
-                position='محاسب',
-                salary=5000.00,
-                phone='0509876543',
-                email='employee@example.com',
-                hire_date=date.today()
-            )
+            fingerprint = schema_fingerprint(db.metadata, db.engine.dialect)
+            stored_fingerprint = None
+            try:
+                # تحميل الإعدادات مسبقاً يقرأ البصمة المحفوظة في الاستعلام نفسه
+                settings_cache.load()
+                stored_fingerprint = settings_cache.get('schema_fingerprint')
+            except Exception:
+                db.session.rollback()  # الجداول غير موجودة بعد
 
-            db.session.add_all([sample_customer, sample_supplier, sample_product, sample_employee])
-            db.session.commit()
+            if force or stored_fingerprint != fingerprint:
+                prepare_schema(fingerprint)
+                startup_timer.mark('schema create')
+            else:
+                print("✅ مخطط قاعدة البيانات مطابق للبصمة - تم تخطي الفحص")
+                startup_timer.mark('schema check')
 
-            # فحص البيانات المحفوظة
-            users_count = User.query.count()
-            customers_count = Customer.query.count()
-            products_count = Product.query.count()
-            employees_count = Employee.query.count()
+            orphaned_jobs = fail_orphaned_jobs()
+            if orphaned_jobs:
+                print(f"⚠️ تم تسجيل فشل {orphaned_jobs} مهمة توقفت عمليتها قبل الانتهاء")
 
-            print('✅ تم إنشاء المستخدم الافتراضي والبيانات التجريبية')
-            print(f"📊 إحصائيات البيانات المحفوظة:")
-            print(f"   - المستخدمون: {users_count}")
-            print(f"   - العملاء: {customers_count}")
-            print(f"   - المنتجات: {products_count}")
-            print(f"   - الموظفون: {employees_count}")
+            _db_initialized = True
 
         except Exception as e:
+            # لا تبديل صامت لقاعدة بيانات في الذاكرة: العمل عليها يضيع كل ما يُدخل بعد إعادة التشغيل
             print(f"❌ خطأ في تهيئة قاعدة البيانات: {e}")
             db.session.rollback()
+            raise
+
+    startup_timer.report()
+
+def prepare_schema(fingerprint):
+    """إنشاء الجداول والمستخدم الافتراضي ثم حفظ بصمة المخطط (عند تغير النماذج فقط)"""
+    # إنشاء الجداول الجديدة ثم إضافة الأعمدة والفهارس الناقصة للجداول الموجودة
+    # (create_all لا يعدل جدولاً قائماً)، قبل أي استعلام يقرأ الأعمدة الجديدة
+    db.create_all()
+    run_migration(db.engine, db.metadata)
+
+    # طباعة معلومات قاعدة البيانات
+    db_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    print(f"📊 قاعدة البيانات: {db_uri}")
+
+    # التحقق من وجود الجداول
+    inspector = db.inspect(db.engine)
+    tables = inspector.get_table_names()
+    print(f"📋 الجداول الموجودة: {len(tables)} جدول")
+
+    # إنشاء مستخدم افتراضي
+    if not User.query.filter_by(username='admin').first():
+        admin = User(
+            username='admin',
+            full_name='مدير النظام',
+            role='admin'
+        )
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.commit()
+        print('✅ تم إنشاء المستخدم الافتراضي')
+
+    # بناء الملخصات اليومية لأول مرة من البيانات الموجودة
+    if not DailySummary.query.first() and (
+        SalesInvoice.query.first() or PurchaseInvoice.query.first() or Expense.query.first()
+    ):
+        summary_rows = rebuild_daily_summaries()
+        print(f"📈 تم بناء الملخصات اليومية: {summary_rows} صف")
+
+    # أعمدة المدفوع والمتبقي أُضيفت بالترحيل فارغة للفواتير القديمة
+    if SalesInvoice.query.filter(SalesInvoice.balance_due.is_(None)).first() or \
+            PurchaseInvoice.query.filter(PurchaseInvoice.balance_due.is_(None)).first():
+        rebuild_balances()
+        print("💳 تم حساب أرصدة الفواتير والعملاء والموردين")
+    elif not PartyBalanceMonth.query.first() and (
+        SalesInvoice.query.filter(SalesInvoice.customer_id.isnot(None)).first() or
+        PurchaseInvoice.query.first() or Payment.query.first()
+    ):
+        month_rows = rebuild_party_months()
+        print(f"📒 تم بناء الأرصدة الشهرية لكشوف الحساب: {month_rows} صف")
+
+    if SalesInvoice.query.filter(SalesInvoice.due_date.is_(None)).first() or \
+            PurchaseInvoice.query.filter(PurchaseInvoice.due_date.is_(None)).first():
+        filled = backfill_due_dates()
+        print(f"📅 تم تعبئة تاريخ الاستحقاق لـ {filled} فاتورة")
+
+    # ترحيل القيود لأول مرة من البيانات الموجودة قبل دفتر الأستاذ
+    if not JournalEntry.query.first() and (
+        SalesInvoice.query.first() or PurchaseInvoice.query.first() or Payment.query.first() or
+        Expense.query.first() or EmployeePayroll.query.first()
+    ):
+        posted = rebuild_ledger()
+        print(f"📚 تم ترحيل القيود إلى دفتر الأستاذ: {posted} مستند")
+    else:
+        ensure_chart_of_accounts()
+        db.session.commit()
 
-            # محاولة أخيرة باستخدام قاعدة بيانات مؤقتة
-            try:
-                print("🔄 محاولة استخدام قاعدة بيانات مؤقتة...")
-                app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-                db.init_app(app)
-                db.create_all()
-
-                # إنشاء مستخدم افتراضي فقط
-                if not User.query.filter_by(username='admin').first():
-                    admin = User(
-                        username='admin',
-                        full_name='مدير النظام',
-                        role='admin'
-                    )
-                    admin.set_password('admin123')
-                    db.session.add(admin)
-                    db.session.commit()
-
-                print("⚠️ تم استخدام قاعدة بيانات مؤقتة - البيانات ستفقد عند إعادة التشغيل")
-
-            except Exception as e2:
-                print(f"💥 فشل كامل في تهيئة قاعدة البيانات: {e2}")
-                print("🆘 النظام قد لا يعمل بشكل صحيح")
+    SystemSettings.set_setting('schema_fingerprint', fingerprint, 'text', 'بصمة مخطط قاعدة البيانات')
+    settings_cache.load()
+
+def seed_demo_data():
+    """إضافة البيانات التجريبية (مرة واحدة فقط)"""
+    added = []
+    if not Customer.query.filter_by(name='عميل تجريبي').first():
+        added.append(Customer(
+            name='عميل تجريبي',
+            phone='0501234567',
+            email='customer@example.com',
+            address='الرياض، المملكة العربية السعودية'
+        ))
+
+    if not Supplier.query.filter_by(name='مورد تجريبي').first():
+        added.append(Supplier(
+            name='مورد تجريبي',
+            phone='0507654321',
+            email='supplier@example.com',
+            address='جدة، المملكة العربية السعودية'
+        ))
+
+    if not Product.query.filter_by(name='منتج تجريبي').first():
+        added.append(Product(
+            name='منتج تجريبي',
+            description='وصف المنتج التجريبي',
+            price=100.00,
+            cost=80.00,
+            quantity=50,
+            min_quantity=10,
+            category='عام'
+        ))
+
+    if not Employee.query.filter_by(name='موظف تجريبي').first():
+        added.append(Employee(
+            name='موظف تجريبي',
+            position='محاسب',
+            salary=5000.00,
+            phone='0509876543',
+            email='employee@example.com',
+            hire_date=date.today()
+        ))
+
+    db.session.add_all(added)
+    db.session.commit()
+    return len(added)
+
+@app.cli.command('init-db')
+def init_db_command():
+    """إنشاء الجداول والمستخدم الافتراضي مع تجاهل البصمة المحفوظة"""
+    init_db(force=True)
+
+@app.cli.command('seed-demo')
+def seed_demo_command():
+    """إضافة البيانات التجريبية"""
+    init_db()
+    with app.app_context():
+        added = seed_demo_data()
+
+    print(f"✅ تمت إضافة {added} سجل تجريبي")
+
+    # فحص البيانات المحفوظة
+    print(f"📊 إحصائيات البيانات المحفوظة:")
+    with app.app_context():
+        print(f"   - المستخدمون: {User.query.count()}")
+        print(f"   - العملاء: {Customer.query.count()}")
+        print(f"   - المنتجات: {Product.query.count()}")
+        print(f"   - الموظفون: {Employee.query.count()}")
+
+# ===== التشغيل متعدد العمليات (gunicorn --preload) =====
+# تُحمّل الوحدة مرة واحدة في العملية الأم وتتشارك العمليات الفرعية صفحات الذاكرة (copy-on-write).
+# ما لا يصح توريثه عبر fork يُعاد إنشاؤه في كل عملية فرعية
+
+def _after_fork_in_child():
+    """تهيئة موارد العملية الفرعية بعد fork"""
+    global _job_executor, _job_executor_lock
+    # اتصالات المجمع الموروثة مملوكة للعملية الأم: تُترك لها دون إغلاق ويُنشأ مجمع جديد
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # مجمع المهام وخيوطه لا تنتقل مع fork
+    _job_executor = None
+    _job_executor_lock = threading.Lock()
+    # حلقة إرسال التحديثات الفورية تبدأ من جديد عند أول نشر في العملية الفرعية
+    live_updates.reset()
+    # مستمع ناقل الرسائل يبدأ في كل عملية فرعية عند أول اتصال أو إرسال
+    if socketio_bus is not None:
+        socketio.server.manager_initialized = False
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def create_app():
+    """إرجاع التطبيق بعد تهيئة قاعدة البيانات (نقطة دخول gunicorn: 'wsgi:create_app()')"""
+    init_db()
+    return app
 
 # وظيفة فحص حالة البيانات
 @app.route('/check_data_status')
@@ -13273,6 +17023,7 @@ if __name__ == '__main__':
 
     # تهيئة قاعدة البيانات
     init_db()
+    start_overdue_sweeper(delay=60)
     print('✅ تم تهيئة قاعدة البيانات')
     print('🌐 الرابط: http://localhost:5000')
     print('👤 المستخدم: admin | كلمة المرور: admin123')
@@ -13291,50 +17042,28 @@ if __name__ == '__main__':
 # تقرير المدفوعات التفصيلي
 @app.route('/payments_report')
 @login_required
+@cached_report(SalesInvoice, PurchaseInvoice, Customer, Supplier)
 def payments_report():
-    from datetime import datetime, timedelta
-    from sqlalchemy import func
+    # كل الأرقام من استعلامات تجميع؛ لا تُحمّل الفواتير نفسها
+    summary_sales = invoice_status_summary(SalesInvoice)
+    summary_purchases = invoice_status_summary(PurchaseInvoice)
 
-    # جلب البيانات
-    sales_invoices = SalesInvoice.query.order_by(SalesInvoice.date.desc()).all()
-    purchase_invoices = PurchaseInvoice.query.order_by(PurchaseInvoice.date.desc()).all()
-
-    # تصنيف حسب الحالة
-    paid_sales = [s for s in sales_invoices if s.status == 'paid']
-    pending_sales = [s for s in sales_invoices if s.status == 'pending']
-    overdue_sales = [s for s in sales_invoices if s.status == 'overdue']
-    credit_sales = [s for s in sales_invoices if s.payment_method == 'credit']
-
-    paid_purchases = [p for p in purchase_invoices if p.status == 'paid']
-    pending_purchases = [p for p in purchase_invoices if p.status == 'pending']
-    overdue_purchases = [p for p in purchase_invoices if p.status == 'overdue']
-    credit_purchases = [p for p in purchase_invoices if p.payment_method == 'credit']
+    receivables_aging = aging_report(SalesInvoice, SalesInvoice.customer_id, Customer,
+                                     page=request.args.get('customers_page', 1, type=int))
+    payables_aging = aging_report(PurchaseInvoice, PurchaseInvoice.supplier_id, Supplier,
+                                  page=request.args.get('suppliers_page', 1, type=int))
 
     # حساب الإجماليات
-    total_receivables = sum(s.total for s in pending_sales + overdue_sales)
-    total_payables = sum(p.total for p in pending_purchases + overdue_purchases)
-    total_paid_sales = sum(s.total for s in paid_sales)
-    total_paid_purchases = sum(p.total for p in paid_purchases)
-    total_overdue_sales = sum(s.total for s in overdue_sales)
-    total_overdue_purchases = sum(p.total for p in overdue_purchases)
+    total_receivables = summary_sales['unpaid']['due']
+    total_payables = summary_purchases['unpaid']['due']
+    total_paid_sales = summary_sales['status']['paid']['total']
+    total_paid_purchases = summary_purchases['status']['paid']['total']
+    total_overdue_sales = summary_sales['status']['overdue']['due']
+    total_overdue_purchases = summary_purchases['status']['overdue']['due']
 
     # إحصائيات طرق الدفع
-    payment_methods_sales = {}
-    payment_methods_purchases = {}
-
-    for sale in sales_invoices:
-        method = sale.payment_method
-        if method not in payment_methods_sales:
-            payment_methods_sales[method] = {'count': 0, 'total': 0}
-        payment_methods_sales[method]['count'] += 1
-        payment_methods_sales[method]['total'] += sale.total
-
-    for purchase in purchase_invoices:
-        method = purchase.payment_method
-        if method not in payment_methods_purchases:
-            payment_methods_purchases[method] = {'count': 0, 'total': 0}
-        payment_methods_purchases[method]['count'] += 1
-        payment_methods_purchases[method]['total'] += purchase.total
+    payment_methods_sales = summary_sales['methods']
+    payment_methods_purchases = summary_purchases['methods']
 
     return render_template_string('''
     <!DOCTYPE html>
@@ -13452,7 +17181,7 @@ def payments_report():
                         <div class="text-info mb-2">
                             <i class="fas fa-clock fa-2x"></i>
                         </div>
-                        <h4 class="fw-bold text-info">{{ (credit_sales|length + credit_purchases|length) }}</h4>
+                        <h4 class="fw-bold text-info">{{ summary_sales.credit.count + summary_purchases.credit.count }}</h4>
                         <p class="text-muted mb-0 small">فواتير آجلة</p>
                     </div>
                 </div>
@@ -13576,6 +17305,26 @@ def payments_report():
                     </div>
                 </div>
             </div>
+
+            <!-- أعمار الديون -->
+            <div class="row g-4 mb-5">
+                <div class="col-12">
+                    <div class="stat-card">
+                        <div class="card-header bg-success text-white p-3">
+                            <h5 class="mb-0"><i class="fas fa-hourglass-half me-2"></i>أعمار المستحقات لنا (حسب العميل)</h5>
+                        </div>
+                        {{ render_aging_table(receivables_aging, 'العميل', 'customers_page', 'عميل نقدي') }}
+                    </div>
+                </div>
+                <div class="col-12">
+                    <div class="stat-card">
+                        <div class="card-header bg-danger text-white p-3">
+                            <h5 class="mb-0"><i class="fas fa-hourglass-half me-2"></i>أعمار المستحقات علينا (حسب المورد)</h5>
+                        </div>
+                        {{ render_aging_table(payables_aging, 'المورد', 'suppliers_page') }}
+                    </div>
+                </div>
+            </div>
         </div>
 
         <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
@@ -13618,18 +17367,18 @@ def payments_report():
                         label: 'المبيعات (ر.س)',
                         data: [
                             {{ total_paid_sales }},
-                            {{ (pending_sales|map(attribute='total')|sum) or 0 }},
+                            {{ summary_sales.status.pending.due }},
                             {{ total_overdue_sales }},
-                            {{ (credit_sales|map(attribute='total')|sum) or 0 }}
+                            {{ summary_sales.credit.total }}
                         ],
                         backgroundColor: '#28a745'
                     }, {
                         label: 'المشتريات (ر.س)',
                         data: [
                             {{ total_paid_purchases }},
-                            {{ (pending_purchases|map(attribute='total')|sum) or 0 }},
+                            {{ summary_purchases.status.pending.due }},
                             {{ total_overdue_purchases }},
-                            {{ (credit_purchases|map(attribute='total')|sum) or 0 }}
+                            {{ summary_purchases.credit.total }}
                         ],
                         backgroundColor: '#ffc107'
                     }]
@@ -13647,9 +17396,8 @@ def payments_report():
         </script>
     </body>
     </html>
-    ''', sales_invoices=sales_invoices, purchase_invoices=purchase_invoices,
-         paid_sales=paid_sales, pending_sales=pending_sales, overdue_sales=overdue_sales, credit_sales=credit_sales,
-         paid_purchases=paid_purchases, pending_purchases=pending_purchases, overdue_purchases=overdue_purchases, credit_purchases=credit_purchases,
+    ''', summary_sales=summary_sales, summary_purchases=summary_purchases,
+         receivables_aging=receivables_aging, payables_aging=payables_aging,
          total_receivables=total_receivables, total_payables=total_payables,
          total_paid_sales=total_paid_sales, total_paid_purchases=total_paid_purchases,
          total_overdue_sales=total_overdue_sales, total_overdue_purchases=total_overdue_purchases,
@@ -13699,6 +17447,9 @@ if SOCKETIO_AVAILABLE:
     def handle_connect():
         """عند اتصال مستخدم جديد"""
         print(f'🔗 مستخدم متصل: {request.sid}')
+        if current_user.is_authenticated:
+            # غرفة خاصة بالمستخدم لإشعارات مهامه في الخلفية
+            join_room(f'user_{current_user.id}')
         emit('status', {'msg': 'متصل بنجاح'})
 
     @socketio.on('disconnect')
@@ -13720,8 +17471,18 @@ if SOCKETIO_AVAILABLE:
         leave_room(room)
         emit('status', {'msg': f'غادرت غرفة {room}'})
 
+    @socketio.on('subscribe')
+    def handle_subscribe(data):
+        """الاشتراك في غرفة الصفحة الحالية للتحديث بالفروقات"""
+        if not current_user.is_authenticated:
+            return
+        rooms = live_update_subscriptions((data or {}).get('path', ''))
+        for room in rooms:
+            join_room(room)
+        emit('status', {'msg': 'تم الاشتراك في التحديث الفوري', 'rooms': rooms})
+
 def broadcast_update(event_type, data, room='general'):
-    """إرسال تحديث لجميع المستخدمين المتصلين"""
+    """إرسال تحديث فوري (دون تجميع) لجميع المستخدمين في الغرفة"""
     if SOCKETIO_AVAILABLE and socketio:
         socketio.emit('data_update', {
             'type': event_type,
@@ -13729,6 +17490,164 @@ def broadcast_update(event_type, data, room='general'):
             'timestamp': datetime.now().isoformat()
         }, room=room)
 
+# ===== التحديث الفوري بالفروقات =====
+# كل تعديل يُرسل الصف المتغير وفروقات الإحصائيات لغرف الصفحات التي تعرضه (page_<endpoint>)
+# بدلاً من إعادة تحميل الصفحة في كل المتصفحات المتصلة
+
+app.config['LIVE_UPDATE_INTERVAL_MS'] = int(os.environ.get('LIVE_UPDATE_INTERVAL_MS', 1000))
+app.config['LIVE_UPDATE_MAX_EVENTS'] = int(os.environ.get('LIVE_UPDATE_MAX_EVENTS', 200))
+
+# الصفحات التي تطبق الفروقات وأنواع الصفوف التي تعرضها
+LIVE_UPDATE_PAGES = {
+    'dashboard': ('sales_invoice', 'customer', 'product'),
+    'sales': ('sales_invoice', 'customer'),
+    'customers': ('customer',),
+    'products': ('product',),
+}
+
+live_updates = LiveUpdateCoalescer(
+    emit=socketio.emit if socketio else None,
+    interval=app.config['LIVE_UPDATE_INTERVAL_MS'] / 1000,
+    max_events=app.config['LIVE_UPDATE_MAX_EVENTS'],
+    spawn=socketio.start_background_task if socketio else None,
+    sleep=socketio.sleep if socketio else time.sleep
+)
+
+
+def _customer_live_row(customer):
+    return {
+        'id': customer.id,
+        'name': customer.name,
+        'phone': customer.phone or '-',
+        'email': customer.email or '-',
+        'address': customer.address or '-',
+        'balance': float(customer.balance or 0),
+        'created_at': customer.created_at.strftime('%Y-%m-%d') if customer.created_at else '-'
+    }
+
+
+def _product_live_row(product):
+    quantity = product.quantity or 0
+    min_quantity = product.min_quantity or 0
+    if quantity == 0:
+        stock_label, stock_class, stock_badge = 'نفد المخزون', 'out-of-stock', 'bg-danger'
+    elif quantity <= min_quantity:
+        stock_label, stock_class, stock_badge = 'مخزون منخفض', 'low-stock', 'bg-warning'
+    else:
+        stock_label, stock_class, stock_badge = 'متوفر', '', 'bg-success'
+    return {
+        'id': product.id,
+        'name': product.name,
+        'category': product.category or '-',
+        'price': float(product.price or 0),
+        'cost': float(product.cost or 0),
+        'quantity': quantity,
+        'min_quantity': min_quantity,
+        'stock_label': stock_label,
+        'stock_class': stock_class,  # صنف الصف في جدول المنتجات
+        'stock_badge': stock_badge   # لون شارة حالة المخزون
+    }
+
+
+def _sales_invoice_live_row(sale):
+    total = float(sale.total or 0)
+    discount = float(getattr(sale, 'discount', 0) or 0)
+    return {
+        'id': sale.id,
+        'invoice_number': sale.invoice_number,
+        'customer': sale.customer.name if sale.customer else 'عميل نقدي',
+        'date': sale.date.strftime('%Y-%m-%d') if sale.date else '',
+        'total': total,
+        'discount': discount,
+        'discounted_total': total - discount,
+        'status': sale.status,
+        'branch': sale.branch
+    }
+
+
+LIVE_ROWS = {
+    'customer': _customer_live_row,
+    'product': _product_live_row,
+    'sales_invoice': _sales_invoice_live_row,
+}
+
+# مساهمة الصف في بطاقات الإحصائيات (data-live-stat)، والفرق بين قبل وبعد هو ما يُرسل
+LIVE_STATS = {
+    'customer': lambda customer: {'customers_count': 1},
+    'product': lambda product: {
+        'products_count': 1,
+        'products_quantity': product.quantity or 0,
+        'products_prices': float(product.price or 0),
+        'low_stock_count': int((product.quantity or 0) <= (product.min_quantity or 0))
+    },
+    'sales_invoice': lambda sale: {
+        'sales_count': 1,
+        'sales_total': float(sale.total or 0),
+        'net_profit': float(sale.total or 0)
+    },
+}
+
+
+def live_state(event_type, obj):
+    """حالة الصف (البيانات، مساهمته في الإحصائيات) قبل التعديل أو الحذف"""
+    return LIVE_ROWS[event_type](obj), LIVE_STATS[event_type](obj)
+
+
+def live_update_rooms(event_type):
+    """غرف الصفحات التي تعرض هذا النوع
+
+    لا غرف للفروع: Socket.IO يرسل لاتحاد الغرف لا لتقاطعها، فغرفة الفرع لا تضيّق الجمهور.
+    البطاقات المحصورة في فرع تتجاهل فروقات غيره في المتصفح (data-branch)
+    """
+    return [f'page_{page}' for page, types in LIVE_UPDATE_PAGES.items() if event_type in types]
+
+
+def live_update_subscriptions(path):
+    """الغرف التي ينضم لها متصفح في الصفحة path"""
+    try:
+        endpoint, _ = app.url_map.bind('').match(urlsplit(path).path)
+    except Exception:
+        endpoint = None
+    return [f'page_{endpoint}'] if endpoint in LIVE_UPDATE_PAGES else []
+
+
+def publish_live_update(event_type, action, obj=None, before=None):
+    """نشر تعديل صف بعد حفظه: action = created أو updated أو deleted
+
+    before هو live_state للصف قبل التعديل (مطلوب للتعديل والحذف لأن الصف المحذوف
+    لا يمكن قراءته بعد commit).
+    """
+    if not (SOCKETIO_AVAILABLE and socketio):
+        return
+    try:
+        before_row, before_stats = before if before else (None, None)
+        if action == 'deleted':
+            row, after_stats = before_row, None
+        else:
+            row, after_stats = live_state(event_type, obj)
+        live_updates.publish(live_update_rooms(event_type), {
+            'type': event_type,
+            'action': action,
+            'id': row['id'],
+            'row': row,
+            'stats': stats_delta(before_stats, after_stats)
+        })
+    except Exception as e:
+        print(f'⚠️ تعذر نشر التحديث الفوري: {e}')
+
+
+@app.route('/api/live_updates')
+@login_required
+def live_updates_stats():
+    """عدادات التحديث الفوري وناقل الرسائل بين العمليات (للمدير)"""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'ليس لديك صلاحية'}), 403
+    return jsonify({
+        'success': True,
+        'stats': live_updates.stats(),
+        'bus': socketio_bus.stats() if socketio_bus is not None else None
+    })
+
 # تم نقل تعريف SOCKETIO_JS إلى أعلى الملف
 
 # ===== مسارات اللغات المتعددة والفروع =====
@@ -13738,6 +17657,7 @@ def change_language(language=None):
     """تغيير لغة التطبيق"""
     if language and language in app.config['LANGUAGES']:
         session['language'] = language
+        g.pop('locale', None)
         flash('تم تغيير اللغة بنجاح' if language == 'ar' else 'Language changed successfully', 'success')
 
     # العودة للصفحة السابقة أو الرئيسية
@@ -13757,89 +17677,26 @@ def change_branch(branch=None):
 
 @app.route('/get_translations')
 def get_translations():
-    """الحصول على الترجمات للـ JavaScript"""
-    current_lang = get_locale()
-
-    translations = {
-        'ar': {
-            'welcome': 'مرحباً',
-            'dashboard': 'لوحة التحكم',
-            'customers': 'العملاء',
-            'suppliers': 'الموردين',
-            'products': 'المنتجات',
-            'sales': 'المبيعات',
-            'employees': 'الموظفين',
-            'reports': 'التقارير',
-            'settings': 'الإعدادات',
-            'logout': 'تسجيل الخروج',
-            'add': 'إضافة',
-            'edit': 'تعديل',
-            'delete': 'حذف',
-            'save': 'حفظ',
-            'cancel': 'إلغاء',
-            'confirm': 'تأكيد',
-            'success': 'نجح',
-            'error': 'خطأ',
-            'warning': 'تحذير',
-            'info': 'معلومات',
-            'loading': 'جاري التحميل...',
-            'search': 'بحث',
-            'print': 'طباعة',
-            'export': 'تصدير',
-            'total': 'الإجمالي',
-            'date': 'التاريخ',
-            'name': 'الاسم',
-            'phone': 'الهاتف',
-            'email': 'البريد الإلكتروني',
-            'address': 'العنوان',
-            'price': 'السعر',
-            'quantity': 'الكمية',
-            'description': 'الوصف',
-            'category': 'الفئة',
-            'status': 'الحالة',
-            'actions': 'الإجراءات'
-        },
-        'en': {
-            'welcome': 'Welcome',
-            'dashboard': 'Dashboard',
-            'customers': 'Customers',
-            'suppliers': 'Suppliers',
-            'products': 'Products',
-            'sales': 'Sales',
-            'employees': 'Employees',
-            'reports': 'Reports',
-            'settings': 'Settings',
-            'logout': 'Logout',
-            'add': 'Add',
-            'edit': 'Edit',
-            'delete': 'Delete',
-            'save': 'Save',
-            'cancel': 'Cancel',
-            'confirm': 'Confirm',
-            'success': 'Success',
-            'error': 'Error',
-            'warning': 'Warning',
-            'info': 'Information',
-            'loading': 'Loading...',
-            'search': 'Search',
-            'print': 'Print',
-            'export': 'Export',
-            'total': 'Total',
-            'date': 'Date',
-            'name': 'Name',
-            'phone': 'Phone',
-            'email': 'Email',
-            'address': 'Address',
-            'price': 'Price',
-            'quantity': 'Quantity',
-            'description': 'Description',
-            'category': 'Category',
-            'status': 'Status',
-            'actions': 'Actions'
-        }
-    }
-
-    return jsonify(translations.get(current_lang, translations['ar']))
+    """الحصول على الترجمات للـ JavaScript (تحويل إلى الحزمة ذات البصمة للغة الحالية)"""
+    return redirect(translation_bundle_url())
+
+@app.route('/i18n/<filename>')
+def translation_bundle(filename):
+    """تقديم حزمة الترجمة بنسختها المضغوطة مسبقاً مع تخزين دائم في المتصفح"""
+    bundle = TRANSLATION_BUNDLE_FILES.get(filename)
+    if bundle is None:
+        abort(404)
+
+    encoding, body = bundle.variant(request.headers.get('Accept-Encoding'))
+    response = app.response_class(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    # اسم الملف يتغير مع المحتوى، فلا حاجة لإعادة التحقق
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.set_etag(f'{bundle.digest}-{encoding or "identity"}')
+    # إعادة التحميل القسري ترسل If-None-Match: الرد 304 بلا جسم
+    return response.make_conditional(request)
 
 # ===== مسارات الطوارئ =====
 
@@ -13922,5 +17779,8 @@ def reactivate_security():
     </html>
     '''
 
-# للنشر على Render
-init_db()
+startup_timer.mark('routes')
+
+# للنشر على Render (INIT_DB_ON_IMPORT=0 لتأجيل التهيئة إلى create_app)
+if os.environ.get('INIT_DB_ON_IMPORT', '1') != '0':
+    init_db()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🟢 قاعدة البيانات مع الخيوط الخضراء (eventlet)
+Cooperative database access under the eventlet worker
+
+مشغلات psycopg2 و sqlite3 مكتوبة بلغة C وتحجب العملية كلها أثناء الاستعلام، فيتوقف
+محور eventlet وكل عملاء Socket.IO معه. هذه الوحدة تجعل الوصول تعاونياً:
+
+- PostgreSQL: دالة انتظار لـ psycopg2 (بأسلوب psycogreen) تعيد التحكم للمحور أثناء
+  انتظار رد الخادم
+- SQLite: تنفيذ استدعاءات الاتصال في مجمع الخيوط الأصلية (eventlet.tpool) مع تفعيل
+  وضع WAL حتى لا تنتظر الكتابة انتهاء القراءات الطويلة
+
+تُفعّل تلقائياً فقط عندما تكون العملية معدلة بـ eventlet.monkey_patch (عامل eventlet في gunicorn).
+"""
+
+import logging
+
+from sqlalchemy import event
+
+logger = logging.getLogger('GreenDB')
+
+
+def is_green():
+    """هل العملية تعمل بخيوط eventlet الخضراء؟"""
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched('socket') and patcher.is_monkey_patched('thread')
+
+
+# ----- PostgreSQL -----
+
+def eventlet_wait_callback(conn, timeout=-1):
+    """انتظار نتيجة psycopg2 دون حجب المحور"""
+    from eventlet.hubs import trampoline
+    from psycopg2 import extensions, OperationalError
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            trampoline(conn.fileno(), read=True)
+        elif state == extensions.POLL_WRITE:
+            trampoline(conn.fileno(), write=True)
+        else:
+            raise OperationalError(f'Bad result from poll: {state!r}')
+
+
+def patch_psycopg2():
+    """تسجيل دالة الانتظار التعاونية لـ psycopg2"""
+    try:
+        from psycopg2 import extensions
+    except ImportError:
+        return False
+    extensions.set_wait_callback(eventlet_wait_callback)
+    return True
+
+
+# ----- SQLite -----
+
+def _sqlite_tpool_connect(dialect, conn_rec, cargs, cparams):
+    """فتح اتصال SQLite تُنفذ استدعاءاته في خيوط tpool"""
+    from eventlet import tpool
+
+    dbapi = dialect.loaded_dbapi
+    # الاتصال يُستخدم من عدة خيوط أصلية في tpool (واحد في كل مرة)
+    cparams = dict(cparams, check_same_thread=False)
+    connection = tpool.execute(dbapi.connect, *cargs, **cparams)
+    return tpool.Proxy(connection, autowrap=(dbapi.Cursor,))
+
+
+def _sqlite_wal(dbapi_connection, connection_record):
+    """وضع WAL: القراءة والكتابة المتزامنة دون انتظار متبادل"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+
+def enable_green_db(app, db):
+    """تفعيل الوصول التعاوني لقاعدة البيانات إذا كانت العملية تعمل بـ eventlet"""
+    if not is_green():
+        return None
+
+    with app.app_context():
+        engine = db.engine
+        dialect = engine.dialect.name
+
+        if dialect == 'postgresql':
+            patch_psycopg2()
+        elif dialect == 'sqlite':
+            if not event.contains(engine, 'do_connect', _sqlite_tpool_connect):
+                event.listen(engine, 'do_connect', _sqlite_tpool_connect)
+                if engine.url.database not in (None, '', ':memory:'):
+                    event.listen(engine, 'connect', _sqlite_wal)
+        else:
+            logger.warning(f'⚠️ لا يوجد وضع تعاوني لمشغل {dialect}، ستحجب الاستعلامات محور eventlet')
+            return None
+
+        # الاتصالات المفتوحة قبل التفعيل تعمل بالوضع الحاجب
+        engine.dispose()
+
+    logger.info(f'🟢 تم تفعيل الوصول التعاوني لقاعدة البيانات ({dialect})')
+    return dialect
+
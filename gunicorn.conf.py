@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+إعدادات gunicorn للتشغيل بعدة عمليات
+Gunicorn settings for multi-worker deployments
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+- preload_app: تُحمّل الوحدة (وقوالبها وفهارس الترجمة) مرة واحدة في العملية الأم،
+  وتتشارك العمليات الفرعية صفحاتها بدلاً من تحميل نسخة لكل عملية
+- بعد fork تتخلص كل عملية من اتصالات قاعدة البيانات الموروثة (انظر _after_fork_in_child)
+- مع عامل eventlet يُفعّل الوصول التعاوني لقاعدة البيانات في كل عملية (انظر green_db.py)
+
+المتغيرات:
+    WEB_CONCURRENCY   عدد العمليات (افتراضياً 1)
+    WORKER_CLASS      eventlet (افتراضياً، مطلوب لـ Socket.IO) أو sync / gthread
+    WORKER_THREADS    عدد الخيوط لكل عملية مع gthread
+    GUNICORN_PRELOAD  0 لتحميل الوحدة في كل عملية على حدة (للمقارنة)
+    DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT  مجمع اتصالات PostgreSQL لكل عملية
+    SOCKETIO_BUS      ناقل رسائل Socket.IO بين العمليات (افتراضياً auto مع أكثر من عملية،
+                      انظر socketio_bus.py)
+    RATE_LIMIT_BACKEND  عدادات حد المعدل (افتراضياً sqlite مشتركة مع أكثر من عملية،
+                      انظر rate_limiter.py)
+    OVERDUE_SWEEP_SECONDS  فترة ترحيل الفواتير المعلقة بعد تاريخ استحقاقها إلى متأخرة
+                      (افتراضياً 3600، و 0 للإيقاف)
+
+تنبيه: Socket.IO مع أكثر من عملية يحتاج جلسات لاصقة (sticky sessions) في موازن الحمل.
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_class = os.environ.get('WORKER_CLASS', 'eventlet')
+threads = int(os.environ.get('WORKER_THREADS', 1))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+timeout = int(os.environ.get('WORKER_TIMEOUT', 120))
+
+# تهيئة قاعدة البيانات تتم صراحة في wsgi.create_app مرة واحدة في العملية الأم
+raw_env = ['INIT_DB_ON_IMPORT=0']
+
+# مع أكثر من عملية يجب أن يصل broadcast_update لمتصفحات كل العمليات
+raw_env.append(f"SOCKETIO_BUS={os.environ.get('SOCKETIO_BUS', 'auto' if workers > 1 else 'none')}")
+
+# وكذلك حدود معدل الطلبات: بعدادات داخل كل عملية يحصل كل IP على الحد مضروباً في عدد العمليات
+raw_env.append(f"RATE_LIMIT_BACKEND={os.environ.get('RATE_LIMIT_BACKEND', 'sqlite' if workers > 1 else 'memory')}")
+
+
+def when_ready(server):
+    # نقل كائنات الوحدة المحملة إلى جيل دائم: لا يلمسها جامع القمامة في العمليات الفرعية
+    # فتبقى صفحاتها مشتركة بدلاً من نسخها عند أول دورة جمع
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # عامل eventlet يطبق monkey_patch بعد fork، أي بعد تحميل الوحدة في العملية الأم،
+    # فيُفعّل الوصول التعاوني لقاعدة البيانات هنا
+    from accounting_system_complete import app, db, start_overdue_sweeper
+    from green_db import enable_green_db
+    from rate_limiter import timer_wheel
+    enable_green_db(app, db)
+    # خيط عجلة المؤقتات لا ينتقل مع fork: يبدأ هنا بعد monkey_patch فيكون خيطاً أخضر
+    # ينام بـ eventlet.sleep، والمؤقتات الموروثة من العملية الأم (تحديث قائمة الحظر) تستأنف
+    timer_wheel.start()
+    # ترحيل الفواتير المتأخرة دورياً في كل عملية (التحديث مشروط بالحالة فلا يتكرر أثره)
+    start_overdue_sweeper()
@@ -8,18 +8,22 @@ Advanced IP Blocking System
 
 from flask import Flask, request, abort, jsonify
 import logging
-from datetime import datetime, timedelta
-import json
-import os
+import sqlite3
+
+from ip_blocklist import blocklist as shared_blocklist
+from rate_limiter import create_rate_limiter
 
 class IPBlocker:
     """نظام حظر IP المتقدم"""
     
-    def __init__(self, app=None):
+    def __init__(self, app=None, blocklist=None):
         self.app = app
         
-        # قائمة الـ IPs المحظورة (يمكن إضافة المزيد)
-        self.BLOCKED_IPS = {
+        # قائمة الحظر المشتركة مع security_system (تقبل شبكات CIDR مثل 185.220.0.0/16)
+        self.blocklist = blocklist if blocklist is not None else shared_blocklist
+        
+        # IPs محظورة افتراضياً تُضاف للقائمة عند التحميل (يمكن إضافة المزيد)
+        self.DEFAULT_BLOCKED_IPS = {
             '144.86.9.109',  # IP المطلوب حظره
             '192.168.1.100', # مثال لـ IP آخر
             '10.0.0.50',     # مثال لـ IP محلي مشبوه
@@ -32,8 +36,8 @@ class IPBlocker:
             '199.87.154.255',   # Known scanner
         }
         
-        # عدادات المحاولات لكل IP
-        self.attempt_counts = {}
+        # عدادات المحاولات لكل IP: أكثر من 50 طلباً في الساعة يؤدي للحظر
+        self.attempt_limiter = create_rate_limiter(50, 3600, name='ip_blocker')
         
         # إعداد نظام السجلات
         self.setup_logging()
@@ -80,7 +84,7 @@ class IPBlocker:
     
     def is_ip_blocked(self, ip):
         """فحص ما إذا كان IP محظور"""
-        return ip in self.BLOCKED_IPS
+        return self.blocklist.is_blocked(ip)
     
     def is_ip_suspicious(self, ip):
         """فحص ما إذا كان IP مشبوه"""
@@ -88,57 +92,46 @@ class IPBlocker:
     
     def add_blocked_ip(self, ip, reason="Manual block"):
         """إضافة IP إلى قائمة المحظورين"""
-        self.BLOCKED_IPS.add(ip)
+        if not self.blocklist.block(ip, reason):
+            return False
         self.logger.warning(f"تم حظر IP جديد: {ip} - السبب: {reason}")
-        self.save_blocked_ips()
+        return True
     
     def remove_blocked_ip(self, ip):
         """إزالة IP من قائمة المحظورين"""
-        if ip in self.BLOCKED_IPS:
-            self.BLOCKED_IPS.remove(ip)
+        if self.blocklist.unblock(ip):
             self.logger.info(f"تم رفع الحظر عن IP: {ip}")
-            self.save_blocked_ips()
             return True
         return False
     
     def save_blocked_ips(self):
-        """حفظ قائمة IPs المحظورة في ملف"""
+        """حفظ قائمة IPs المحظورة في ملف (ضغط السجل في blocked_ips.json)"""
         try:
-            with open('blocked_ips.json', 'w') as f:
-                json.dump(list(self.BLOCKED_IPS), f, indent=2)
+            self.blocklist.compact()
         except Exception as e:
             self.logger.error(f"خطأ في حفظ قائمة IPs المحظورة: {e}")
     
     def load_blocked_ips(self):
         """تحميل قائمة IPs المحظورة من ملف"""
         try:
-            if os.path.exists('blocked_ips.json'):
-                with open('blocked_ips.json', 'r') as f:
-                    blocked_list = json.load(f)
-                    self.BLOCKED_IPS.update(blocked_list)
-                    self.logger.info(f"تم تحميل {len(blocked_list)} IP محظور من الملف")
+            count = self.blocklist.load()
+            self.logger.info(f"تم تحميل {count} IP محظور من الملف")
+            for ip in self.DEFAULT_BLOCKED_IPS:
+                if ip not in self.blocklist.entries:
+                    self.blocklist.block(ip, "Default block list")
         except Exception as e:
             self.logger.error(f"خطأ في تحميل قائمة IPs المحظورة: {e}")
     
     def track_attempt(self, ip):
         """تتبع محاولات الوصول لكل IP"""
-        now = datetime.now()
-        
-        if ip not in self.attempt_counts:
-            self.attempt_counts[ip] = []
-        
-        # إضافة المحاولة الحالية
-        self.attempt_counts[ip].append(now)
-        
-        # إزالة المحاولات القديمة (أكثر من ساعة)
-        hour_ago = now - timedelta(hours=1)
-        self.attempt_counts[ip] = [
-            attempt for attempt in self.attempt_counts[ip] 
-            if attempt > hour_ago
-        ]
-        
         # إذا تجاوز عدد المحاولات 50 في الساعة، احظر IP
-        if len(self.attempt_counts[ip]) > 50:
+        try:
+            allowed = self.attempt_limiter.hit(ip)
+        except sqlite3.OperationalError as e:
+            # ملف العدادات المشترك مقفل: لا نحظر ولا نُسقط الطلب
+            self.logger.error(f"تعذر تتبع محاولات {ip}: {e}")
+            return False
+        if not allowed:
             self.add_blocked_ip(ip, "Too many requests (>50/hour)")
             return True
         
@@ -173,13 +166,13 @@ class IPBlocker:
     
     def blocked_ips_admin(self):
         """صفحة إدارة IPs المحظورة"""
-        blocked_count = len(self.BLOCKED_IPS)
+        blocked_count = len(self.blocklist)
         suspicious_count = len(self.SUSPICIOUS_IPS)
-        attempts_count = len(self.attempt_counts)
+        attempts_count = len(self.attempt_limiter)
 
         # إنشاء قائمة IPs
         ip_list = ""
-        for ip in self.BLOCKED_IPS:
+        for ip in self.blocklist:
             ip_list += f'<div class="ip-card"><strong>{ip}</strong> <button class="btn btn-sm btn-light float-end" onclick="unblockIP(\'{ip}\')">إلغاء الحظر</button></div>'
 
         html_content = f"""
@@ -302,8 +295,7 @@ class IPBlocker:
         ip = data.get('ip')
         reason = data.get('reason', 'Manual block')
         
-        self.add_blocked_ip(ip, reason)
-        return jsonify({'success': True})
+        return jsonify({'success': self.add_blocked_ip(ip, reason)})
 
 # إنشاء مثيل نظام حظر IP
 ip_blocker = IPBlocker()
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🧱 قائمة الحظر الدائمة بمطابقة الشبكات (CIDR)
+Append-only persistent blocklist with CIDR prefix matching
+
+قائمة حظر واحدة يتشاركها ip_blocker و security_system:
+
+- المطابقة: شجرة بادئات ثنائية لكل من IPv4 و IPv6 (أطول بادئة مطابقة)، فيمكن حظر
+  شبكة كاملة مثل 185.220.0.0/16، والفحص بعدد بتات العنوان مهما كبرت القائمة.
+  عناوين IPv4 المضمّنة في IPv6 (‎::ffff:1.2.3.4) تُطابق كعناوين IPv4
+- القائمة البيضاء (whitelist_ips.json) في شجرة ثانية ولها الأولوية: لا يُحظر عنوان ضمنها
+- الحفظ: كل حظر أو رفع حظر سطر JSON يُلحق بملف السجل (blocked_ips.json.journal) بدلاً من
+  إعادة كتابة الملف كاملاً. الضغط (compaction) يكتب الحالة في blocked_ips.json ويبدأ سجلاً
+  جديداً، ويتم في خيط عجلة المؤقتات بعد عدد من الإضافات لا في مسار الطلب
+- عدة عمليات: كل عملية تقرأ ما أضافته الأخرى للسجل دورياً (refresh_interval)، والكتابة
+  والضغط تحت قفل ملف (fcntl)
+- الحظر المؤقت: الإدخال يحمل وقت انتهائه، فيبقى صالحاً بعد إعادة التشغيل وفي العمليات الأخرى
+"""
+
+import os
+import json
+import time
+import logging
+import ipaddress
+import threading
+from functools import lru_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: بدون قفل بين العمليات
+    fcntl = None
+
+from rate_limiter import timer_wheel
+
+logger = logging.getLogger('IPBlocklist')
+
+
+@lru_cache(maxsize=4096)
+def parse_network(value):
+    """'1.2.3.4' أو '10.0.0.0/8' -> ip_network؛ None إذا لم يكن عنواناً صالحاً"""
+    try:
+        network = ipaddress.ip_network(str(value).strip(), strict=False)
+    except ValueError:
+        return None
+    if network.version == 6 and network.prefixlen >= 96 and network.network_address.ipv4_mapped:
+        network = ipaddress.ip_network(f'{network.network_address.ipv4_mapped}/{network.prefixlen - 96}')
+    return network
+
+
+def network_key(network):
+    """الصيغة المعروضة: العنوان وحده للمضيف المفرد، وإلا الشبكة بصيغة CIDR"""
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return str(network)
+
+
+class PrefixTree:
+    """شجرة بادئات ثنائية: كل عقدة [ابن 0، ابن 1، القيمة]"""
+
+    def __init__(self):
+        self.roots = {4: [None, None, None], 6: [None, None, None]}
+        self.size = 0
+
+    def _bits(self, network):
+        return int(network.network_address), network.max_prefixlen, network.prefixlen
+
+    def insert(self, network, value):
+        address, width, length = self._bits(network)
+        node = self.roots[network.version]
+        for i in range(length):
+            bit = (address >> (width - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        if node[2] is None:
+            self.size += 1
+        node[2] = value
+
+    def remove(self, network):
+        address, width, length = self._bits(network)
+        path = [self.roots[network.version]]
+        for i in range(length):
+            node = path[-1][(address >> (width - 1 - i)) & 1]
+            if node is None:
+                return None
+            path.append(node)
+        value, path[-1][2] = path[-1][2], None
+        if value is not None:
+            self.size -= 1
+            # حذف العقد التي أصبحت فارغة
+            for i in range(length, 0, -1):
+                node = path[i]
+                if node[0] is None and node[1] is None and node[2] is None:
+                    path[i - 1][(address >> (width - i)) & 1] = None
+                else:
+                    break
+        return value
+
+    def match(self, network):
+        """قيمة أطول بادئة تحتوي العنوان (أو الشبكة) أو None"""
+        address, width, length = self._bits(network)
+        node = self.roots[network.version]
+        found = node[2]
+        for i in range(length):
+            node = node[(address >> (width - 1 - i)) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                found = node[2]
+        return found
+
+    def clear(self):
+        self.__init__()
+
+    def __len__(self):
+        return self.size
+
+
+class Blocklist:
+    """قائمة الحظر: شجرة الحظر والقائمة البيضاء مع سجل إلحاقي على القرص (path=None للذاكرة فقط)"""
+
+    def __init__(self, path=None, whitelist_path=None, compact_every=500, refresh_interval=5.0):
+        self.path = path
+        self.journal_path = f'{path}.journal' if path else None
+        self.whitelist_path = whitelist_path
+        self.compact_every = compact_every
+        self.refresh_interval = refresh_interval
+        self.entries = {}  # المفتاح المعروض -> {'reason', 'at', 'expires'}
+        self.tree = PrefixTree()
+        self.whitelist = PrefixTree()
+        self._lock = threading.RLock()
+        self._loaded = path is None and whitelist_path is None
+        self._journal_offset = 0
+        self._journal_inode = None
+        self._journal_writes = 0
+        self._whitelist_mtime = None
+
+    # ===== الاستعلام =====
+
+    def is_whitelisted(self, ip):
+        network = parse_network(ip)
+        self._ensure_loaded()
+        return network is not None and self.whitelist.match(network) is not None
+
+    def match(self, ip):
+        """الإدخال الذي يحظر العنوان (أو None)، مع مراعاة القائمة البيضاء والانتهاء"""
+        network = parse_network(ip)
+        if network is None:
+            return None
+        self._ensure_loaded()
+        if self.whitelist.match(network) is not None:
+            return None
+        key = self.tree.match(network)
+        if key is None:
+            return None
+        entry = self.entries.get(key)
+        if entry is None or (entry['expires'] and entry['expires'] <= time.time()):
+            return None
+        return dict(entry, network=key)
+
+    def is_blocked(self, ip):
+        return self.match(ip) is not None
+
+    __contains__ = is_blocked
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self.entries)
+
+    def __iter__(self):
+        self._ensure_loaded()
+        return iter(list(self.entries))
+
+    # ===== التعديل =====
+
+    def block(self, ip, reason='', duration=None):
+        """حظر عنوان أو شبكة؛ False للعناوين غير الصالحة أو ضمن القائمة البيضاء"""
+        network = parse_network(ip)
+        if network is None:
+            logger.warning(f'⚠️ عنوان غير صالح للحظر: {ip}')
+            return False
+        self._ensure_loaded()
+        if self.whitelist.match(network) is not None:
+            logger.info(f'ℹ️ لن يُحظر {ip}: ضمن القائمة البيضاء')
+            return False
+        key = network_key(network)
+        record = {'op': 'block', 'net': key, 'reason': reason, 'at': time.time(),
+                  'expires': time.time() + duration if duration else None}
+        with self._lock:
+            current = self.entries.get(key)
+            if current is not None and not current['expires'] and duration:
+                return True  # الحظر الدائم لا يتحول إلى مؤقت
+            self._apply(record)
+            self._append(record)
+        return True
+
+    def unblock(self, ip):
+        network = parse_network(ip)
+        if network is None:
+            return False
+        self._ensure_loaded()
+        key = network_key(network)
+        with self._lock:
+            if key not in self.entries:
+                return False
+            record = {'op': 'unblock', 'net': key, 'at': time.time()}
+            self._apply(record)
+            self._append(record)
+        return True
+
+    def expire(self, ip):
+        """رفع الحظر المؤقت المنتهي فقط (لا يمس الحظر الدائم أو المُمدد)"""
+        network = parse_network(ip)
+        entry = self.entries.get(network_key(network)) if network is not None else None
+        if entry is None or not entry['expires'] or entry['expires'] > time.time() + 1:
+            return False
+        return self.unblock(ip)
+
+    def _apply(self, record):
+        network = parse_network(record['net'])
+        if network is None:
+            return
+        key = network_key(network)
+        if record['op'] == 'block':
+            self.entries[key] = {'reason': record.get('reason', ''), 'at': record.get('at'),
+                                 'expires': record.get('expires')}
+            self.tree.insert(network, key)
+        elif self.entries.pop(key, None) is not None:
+            self.tree.remove(network)
+
+    # ===== الحفظ =====
+
+    def _file_lock(self, exclusive=True):
+        return _FileLock(f'{self.path}.lock' if self.path else None, exclusive)
+
+    def _append(self, record):
+        if not self.journal_path:
+            return
+        # السطر يُقرأ مرة أخرى مع إضافات العمليات الأخرى في refresh؛ إعادة تطبيقه لا تغير شيئاً
+        # وترتيب الملف هو المرجع عند التعارض
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        try:
+            with self._file_lock():
+                with open(self.journal_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            logger.error(f'❌ تعذر حفظ قائمة الحظر: {e}')
+            return
+        self._journal_writes += 1
+        if self._journal_writes >= self.compact_every:
+            self._journal_writes = 0
+            timer_wheel.schedule(('blocklist-compact', self.path), 0, self.compact)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    def load(self):
+        """تحميل اللقطة ثم إعادة تطبيق السجل، والقائمة البيضاء"""
+        with self._lock:
+            self._loaded = True
+            if self.path:
+                with self._file_lock(exclusive=False):
+                    self._load_files()
+            self._load_whitelist()
+        if self.path and self.refresh_interval:
+            timer_wheel.schedule(('blocklist-refresh', self.path), self.refresh_interval, self._refresh_loop)
+        return len(self.entries)
+
+    def _load_files(self):
+        """الحالة من اللقطة والسجل (داخل قفل الملف)"""
+        self.entries.clear()
+        self.tree.clear()
+        for item in self._read_snapshot():
+            self._apply(item)
+        self._journal_offset, self._journal_inode = 0, None
+        self._read_journal()
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f'❌ خطأ في تحميل قائمة الحظر: {e}')
+            return []
+        # الصيغة القديمة: قائمة عناوين؛ الإدخالات المؤقتة كائنات
+        return [{'op': 'block', 'net': item, 'reason': '', 'at': None, 'expires': None}
+                if isinstance(item, str) else dict(item, op='block') for item in items]
+
+    def _read_journal(self):
+        """تطبيق ما أُضيف للسجل منذ آخر قراءة؛ سجل جديد (بعد ضغط) يعني إعادة التحميل"""
+        try:
+            stat = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return False
+        if self._journal_inode is not None and stat.st_ino != self._journal_inode:
+            return True
+        if stat.st_size <= self._journal_offset:
+            return False
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            f.seek(self._journal_offset)
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # سطر لم يكتمل بعد
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    logger.warning('⚠️ سطر تالف في سجل الحظر')
+                self._journal_offset += len(line.encode('utf-8'))
+        self._journal_inode = stat.st_ino
+        return False
+
+    def refresh(self):
+        """قراءة ما أضافته العمليات الأخرى"""
+        if not self.path or not self._loaded:
+            return
+        with self._lock:
+            with self._file_lock(exclusive=False):
+                reload = self._read_journal()
+            if reload:
+                self.load()
+                return
+            self._load_whitelist()
+
+    def _refresh_loop(self):
+        self.refresh()
+        timer_wheel.schedule(('blocklist-refresh', self.path), self.refresh_interval, self._refresh_loop)
+
+    def compact(self):
+        """كتابة الحالة الحالية في اللقطة وبدء سجل جديد، مع حذف الإدخالات المنتهية"""
+        if not self.path:
+            return
+        with self._lock:
+            with self._file_lock():
+                if self._read_journal():
+                    self._load_files()
+                now = time.time()
+                items = []
+                for key, entry in self.entries.items():
+                    if entry['expires'] and entry['expires'] <= now:
+                        continue
+                    if entry['expires'] or entry['reason']:
+                        items.append({'net': key, 'reason': entry['reason'], 'at': entry['at'],
+                                      'expires': entry['expires']})
+                    else:
+                        items.append(key)
+                temp_path = f'{self.path}.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(items, f, indent=2, ensure_ascii=False)
+                os.replace(temp_path, self.path)
+                # سجل جديد بملف جديد: العمليات الأخرى تكتشف تغير inode فتعيد التحميل
+                open(temp_path, 'w').close()
+                os.replace(temp_path, self.journal_path)
+                self._journal_offset = 0
+                self._journal_inode = os.stat(self.journal_path).st_ino
+        logger.info(f'🗜️ تم ضغط قائمة الحظر: {len(items)} إدخال')
+
+    def _load_whitelist(self):
+        if not self.whitelist_path:
+            return
+        try:
+            mtime = os.path.getmtime(self.whitelist_path)
+        except OSError:
+            return
+        if mtime == self._whitelist_mtime:
+            return
+        try:
+            with open(self.whitelist_path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f'❌ خطأ في تحميل القائمة البيضاء: {e}')
+            return
+        self.whitelist.clear()
+        for item in items:
+            network = parse_network(item)
+            if network is not None:  # أسماء مثل localhost لا تطابق عنواناً
+                self.whitelist.insert(network, network_key(network))
+        self._whitelist_mtime = mtime
+
+
+class _FileLock:
+    """قفل ملف بين العمليات (لا شيء بدون fcntl أو بدون مسار)"""
+
+    def __init__(self, path, exclusive=True):
+        self.path = path
+        self.exclusive = exclusive
+        self._file = None
+
+    def __enter__(self):
+        if self.path and fcntl is not None:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+# القائمة المشتركة: blocked_ips.json و whitelist_ips.json في مجلد التشغيل كما في ip_blocker
+blocklist = Blocklist(os.environ.get('BLOCKLIST_FILE', 'blocked_ips.json'),
+                      os.environ.get('WHITELIST_FILE', 'whitelist_ips.json'))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+📡 التحديث الفوري بالفروقات
+Coalesced row-level live updates for Socket.IO
+
+بدلاً من إعادة تحميل الصفحة عند كل تعديل، يُرسل الصف المتغير (فاتورة، منتج، عميل)
+مع فروقات بطاقات الإحصائيات، ويطبقها المتصفح مباشرة على الجداول والبطاقات.
+
+- التجميع: التحديثات المتتالية تُجمع لكل مجموعة غرف وتُرسل رسالة واحدة كل فترة
+  (LIVE_UPDATE_INTERVAL_MS)، وتعديلات الصف نفسه خلال الفترة تُدمج في حدث واحد
+- الحد الأقصى: إذا تجاوزت الدفعة max_events يُرسل إشعار overflow فيعيد المتصفح
+  تحميل الصفحة مرة واحدة بدلاً من تطبيق آلاف الفروقات
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger('LiveUpdates')
+
+
+def stats_delta(before, after):
+    """فرق مساهمة الصف في الإحصائيات: after - before (القيم الصفرية تُحذف)"""
+    before = before or {}
+    after = after or {}
+    delta = {}
+    for name in set(before) | set(after):
+        value = after.get(name, 0) - before.get(name, 0)
+        if value:
+            delta[name] = value
+    return delta
+
+
+def merge_events(old, new):
+    """دمج حدثين للصف نفسه داخل فترة التجميع، أو None إذا ألغى أحدهما الآخر"""
+    stats = dict(old.get('stats') or {})
+    for name, value in (new.get('stats') or {}).items():
+        stats[name] = stats.get(name, 0) + value
+    stats = {name: value for name, value in stats.items() if value}
+
+    if old['action'] == 'created' and new['action'] == 'deleted':
+        # صف أُضيف ثم حُذف قبل الإرسال: لا داعي لإرساله
+        return None
+    action = 'created' if old['action'] == 'created' else new['action']
+    return dict(new, action=action, stats=stats)
+
+
+class LiveUpdateCoalescer:
+    """تجميع أحداث التحديث الفوري وإرسالها دفعة واحدة لكل مجموعة غرف في كل فترة"""
+
+    def __init__(self, emit=None, interval=1.0, max_events=200, spawn=None, sleep=time.sleep):
+        self.emit = emit
+        self.interval = interval
+        self.max_events = max_events
+        self.spawn = spawn
+        self.sleep = sleep
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.published = 0
+        self.merged = 0
+        self.messages = 0
+
+    def reset(self):
+        """مسح الأحداث المعلقة وحالة حلقة الإرسال (بعد fork في العملية الابنة)"""
+        with self._lock:
+            self._pending = {}
+            self._started = False
+
+    def publish(self, rooms, event):
+        """إضافة حدث لصف واحد: event يحتوي type و action و id"""
+        rooms = tuple(sorted(set(rooms)))
+        if not rooms:
+            return
+        key = (event['type'], event.get('id'))
+        with self._lock:
+            self.published += 1
+            events = self._pending.setdefault(rooms, OrderedDict())
+            old = events.pop(key, None)
+            if old is not None:
+                self.merged += 1
+                event = merge_events(old, event)
+            if event is not None:
+                events[key] = event
+
+        if not self.interval:
+            self.flush()
+        else:
+            self.start()
+
+    def flush(self):
+        """إرسال الأحداث المعلقة: رسالة واحدة لكل مجموعة غرف. يرجع عدد الرسائل"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        sent = 0
+        for rooms, events in pending.items():
+            if not events:
+                continue
+            events = list(events.values())
+            payload = {'type': 'batch', 'timestamp': time.time()}
+            if len(events) > self.max_events:
+                payload.update(events=[], overflow=True, count=len(events))
+            else:
+                payload['events'] = events
+            self.emit('data_update', payload, to=list(rooms))
+            sent += 1
+        self.messages += sent
+        return sent
+
+    def start(self):
+        """تشغيل حلقة الإرسال الدوري مرة واحدة لكل عملية"""
+        if self._started or self.spawn is None:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.spawn(self._run)
+
+    def _run(self):
+        while True:
+            self.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f'❌ خطأ في إرسال التحديثات الفورية: {e}')
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'pending': sum(len(events) for events in self._pending.values()),
+            'published': self.published,
+            'merged': self.merged,
+            'messages': self.messages
+        }
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ترحيل قاعدة البيانات: إضافة الأعمدة والجداول والفهارس الناقصة
+Online database migration for accounting_system_complete
+
+يقارن تعريف النماذج بقاعدة البيانات الفعلية ويضيف ما ينقصها دون إيقاف النظام:
+- على PostgreSQL تُبنى الفهارس بـ CREATE INDEX CONCURRENTLY فلا تُقفل الجداول أمام الكتابة
+- على SQLite يُبنى كل فهرس في معاملة مستقلة مع مهلة قصيرة بينها حتى لا تُحجب الكتابات المنتظرة
+
+الاستخدام:
+    python migrate_database.py            # تنفيذ الترحيل
+    python migrate_database.py --dry-run  # عرض الخطة فقط
+"""
+
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+from sqlalchemy import inspect, literal
+from sqlalchemy.schema import CreateIndex
+
+
+def _column_default_sql(column, dialect):
+    """تحويل القيمة الافتراضية للعمود إلى SQL (للقيم الثابتة فقط)"""
+    default = column.default
+    if default is None or not getattr(default, 'is_scalar', False):
+        return None
+    return str(literal(default.arg, type_=column.type).compile(
+        dialect=dialect, compile_kwargs={'literal_binds': True}
+    ))
+
+
+def schema_fingerprint(metadata, dialect):
+    """بصمة ثابتة لتعريف الجداول والأعمدة والفهارس، تتغير بأي تعديل على النماذج"""
+    description = []
+    for table in sorted(metadata.tables.values(), key=lambda table: table.name):
+        description.append([
+            table.name,
+            [[column.name, str(column.type.compile(dialect=dialect)), column.nullable, column.primary_key]
+             for column in table.columns],
+            sorted([index.name, [column.name for column in index.columns], bool(index.unique)]
+                   for index in table.indexes)
+        ])
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def plan_migration(engine, metadata):
+    """حساب الجداول والأعمدة والفهارس الناقصة"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    plan = {'tables': [], 'columns': [], 'indexes': [], 'invalid_indexes': []}
+
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            plan['tables'].append(table)
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                plan['columns'].append(column)
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing_indexes:
+                plan['indexes'].append(index)
+
+    # فهارس فشل بناؤها المتزامن سابقاً وبقيت غير صالحة في PostgreSQL
+    if engine.dialect.name == 'postgresql':
+        declared = {index.name: index for table in metadata.tables.values() for index in table.indexes}
+        with engine.connect() as conn:
+            invalid = conn.exec_driver_sql(
+                'SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+                'WHERE NOT i.indisvalid'
+            ).scalars().all()
+        plan['invalid_indexes'] = [declared[name] for name in invalid if name in declared]
+
+    return plan
+
+
+def add_column(engine, column):
+    """إضافة عمود ناقص لجدول موجود"""
+    dialect = engine.dialect
+    column_type = column.type.compile(dialect=dialect)
+    default_sql = _column_default_sql(column, dialect)
+
+    ddl = f'ALTER TABLE {dialect.identifier_preparer.format_table(column.table)} ' \
+          f'ADD COLUMN {dialect.identifier_preparer.format_column(column)} {column_type}'
+    if default_sql is not None:
+        ddl += f' DEFAULT {default_sql}'
+        # NOT NULL آمن فقط عند وجود قيمة افتراضية تملأ الصفوف القديمة
+        if not column.nullable:
+            ddl += ' NOT NULL'
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(ddl)
+
+
+def build_index(engine, index, pause=0.0):
+    """بناء فهرس واحد دون حجب الكتابة قدر الإمكان"""
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+
+    if engine.dialect.name == 'postgresql':
+        # CONCURRENTLY لا يعمل داخل معاملة
+        ddl = ddl.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1) \
+                 .replace('CREATE UNIQUE INDEX', 'CREATE UNIQUE INDEX CONCURRENTLY', 1)
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.exec_driver_sql(ddl)
+    else:
+        with engine.begin() as conn:
+            if engine.dialect.name == 'sqlite':
+                conn.exec_driver_sql('PRAGMA busy_timeout = 30000')
+            conn.exec_driver_sql(ddl)
+        if pause:
+            # إفساح المجال للكتابات المنتظرة قبل الفهرس التالي
+            time.sleep(pause)
+
+
+def drop_index(engine, index):
+    """حذف فهرس (يُستخدم للفهارس غير الصالحة قبل إعادة بنائها)"""
+    name = engine.dialect.identifier_preparer.format_index(index)
+    if engine.dialect.name == 'postgresql':
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.exec_driver_sql(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+    else:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS {name}')
+
+
+def run_migration(engine, metadata, dry_run=False, pause=None, verbose=True):
+    """تنفيذ الترحيل الكامل وإرجاع الخطة المنفذة"""
+    log = print if verbose else (lambda *args, **kwargs: None)
+    if pause is None:
+        pause = 0.2 if engine.dialect.name == 'sqlite' else 0.0
+
+    plan = plan_migration(engine, metadata)
+    total = sum(len(items) for items in plan.values())
+    log(f"📋 خطة الترحيل ({engine.dialect.name}): "
+        f"{len(plan['tables'])} جدول، {len(plan['columns'])} عمود، "
+        f"{len(plan['indexes'])} فهرس، {len(plan['invalid_indexes'])} فهرس غير صالح")
+
+    if dry_run:
+        for table in plan['tables']:
+            log(f"   + {table.name} (جدول جديد)")
+        for column in plan['columns']:
+            log(f"   + {column.table.name}.{column.name}")
+        for index in plan['invalid_indexes'] + plan['indexes']:
+            log(f"   + {index.name} ({index.table.name})")
+        return plan
+
+    for table in plan['tables']:
+        table.create(engine, checkfirst=True)
+        log(f"✅ تم إنشاء الجدول {table.name}")
+
+    for column in plan['columns']:
+        add_column(engine, column)
+        log(f"✅ تم إضافة العمود {column.table.name}.{column.name}")
+
+    for index in plan['invalid_indexes']:
+        drop_index(engine, index)
+        log(f"🧹 تم حذف الفهرس غير الصالح {index.name}")
+
+    for index in plan['invalid_indexes'] + plan['indexes']:
+        started = time.perf_counter()
+        build_index(engine, index, pause=pause)
+        log(f"✅ تم بناء الفهرس {index.name} خلال {time.perf_counter() - started:.2f} ث")
+
+    if total and engine.dialect.name in ('sqlite', 'postgresql'):
+        # تحديث إحصائيات المخطط حتى يستخدم الفهارس الجديدة
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.exec_driver_sql('ANALYZE')
+
+    log('🎉 قاعدة البيانات محدثة' if total else '✅ قاعدة البيانات محدثة مسبقاً')
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ترحيل قاعدة بيانات نظام المحاسبة')
+    parser.add_argument('--dry-run', action='store_true', help='عرض الخطة دون تنفيذ')
+    parser.add_argument('--pause', type=float, default=None,
+                        help='مهلة بين بناء الفهارس على SQLite بالثواني')
+    args = parser.parse_args()
+
+    from accounting_system_complete import app, db
+
+    print('🚀 ترحيل قاعدة البيانات - نظام المحاسبة الاحترافي')
+    print('=' * 50)
+    try:
+        with app.app_context():
+            run_migration(db.engine, db.metadata, dry_run=args.dry_run, pause=args.pause)
+    except Exception as e:
+        print(f'❌ فشل الترحيل: {e}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+⏱️ محدد معدل الطلبات بذاكرة ثابتة وعجلة مؤقتات
+Bounded O(1) rate limiter and a single-thread timer wheel
+
+- SlidingWindowLimiter: نافذة منزلقة تقريبية بعدادين لكل مفتاح (النافذة الحالية والسابقة)
+  بدلاً من قائمة طوابع زمنية يُعاد بناؤها مع كل طلب. التقدير:
+      السابقة × (الجزء المتبقي منها داخل النافذة) + الحالية
+  الذاكرة ثابتة لكل IP، والمفاتيح الخاملة تُحذف بترتيب LRU عند تجاوز max_keys
+- الواجهات الخلفية:
+  memory  OrderedDict داخل العملية (افتراضياً)
+  sqlite  ملف SQLite مشترك بين عمليات gunicorn: تحديث واحد (UPSERT ... RETURNING) لكل طلب
+- TimerWheel: خيط واحد لكل عملية ينفذ مهام الانتهاء (رفع الحظر) بدلاً من خيط نائم لكل IP.
+  إضافة مؤقت وإلغاؤه O(1)
+
+الإعدادات (متغيرات البيئة):
+    RATE_LIMIT_BACKEND  memory (افتراضياً) أو sqlite
+    RATE_LIMIT_DB       ملف SQLite المشترك (افتراضياً instance/rate_limits.db)
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger('RateLimiter')
+
+
+class MemoryBackend:
+    """عدادات داخل العملية مع حذف LRU"""
+
+    name = 'memory'
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._entries = OrderedDict()  # key -> [window_start, current, previous]
+        self._lock = threading.Lock()
+
+    def hit(self, key, window_start, window):
+        """تسجيل طلب وإرجاع (الحالية، السابقة)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [window_start, 0, 0]
+                if len(self._entries) > self.max_keys:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+                if entry[0] != window_start:
+                    entry[2] = entry[1] if entry[0] == window_start - window else 0
+                    entry[0], entry[1] = window_start, 0
+            entry[1] += 1
+            return entry[1], entry[2]
+
+    def reset(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, prefix=''):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def count(self, prefix=''):
+        return sum(1 for key in self._entries if key.startswith(prefix))
+
+    def total(self, prefix, window_start, window):
+        """عدد الطلبات في النافذتين الحالية والسابقة للمفاتيح ذات البادئة"""
+        with self._lock:
+            return sum(current + previous for key, (start, current, previous) in self._entries.items()
+                       if key.startswith(prefix) and start >= window_start - window)
+
+
+class SQLiteBackend:
+    """عدادات في ملف SQLite مشترك بين العمليات"""
+
+    name = 'sqlite'
+    prune_every = 1000
+
+    def __init__(self, path, max_keys=10000, timeout=1.0):
+        self.path = path
+        self.max_keys = max_keys
+        self.timeout = timeout
+        self._local = threading.local()
+        self._hits = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connection(self):
+        # اتصال لكل خيط ولكل عملية: اتصالات SQLite لا تُنقل عبر fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit ('
+                'key TEXT PRIMARY KEY, window_start INTEGER NOT NULL, current INTEGER NOT NULL, '
+                'previous INTEGER NOT NULL, last_seen REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_rate_limit_last_seen ON rate_limit (last_seen)')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def hit(self, key, window_start, window):
+        conn = self._connection()
+        # عبارات SET تُقيّم على القيم القديمة للصف، فالتدوير وزيادة العداد في عبارة واحدة
+        current, previous = conn.execute(
+            'INSERT INTO rate_limit (key, window_start, current, previous, last_seen) '
+            'VALUES (:key, :start, 1, 0, :now) '
+            'ON CONFLICT(key) DO UPDATE SET '
+            '  previous = CASE WHEN window_start = :start THEN previous '
+            '                  WHEN window_start = :start - :window THEN current ELSE 0 END, '
+            '  current = CASE WHEN window_start = :start THEN current + 1 ELSE 1 END, '
+            '  window_start = :start, last_seen = :now '
+            'RETURNING current, previous',
+            {'key': key, 'start': window_start, 'window': window, 'now': time.time()}
+        ).fetchone()
+        self._hits += 1
+        if self._hits % self.prune_every == 0:
+            self.prune(window)
+        return current, previous
+
+    def prune(self, window):
+        """حذف المفاتيح الخاملة ثم الأقدم استخداماً فوق max_keys"""
+        conn = self._connection()
+        conn.execute('DELETE FROM rate_limit WHERE last_seen < ?', (time.time() - 2 * window,))
+        conn.execute(
+            'DELETE FROM rate_limit WHERE key IN (SELECT key FROM rate_limit ORDER BY last_seen DESC '
+            'LIMIT -1 OFFSET ?)', (self.max_keys,)
+        )
+
+    def reset(self, key):
+        self._connection().execute('DELETE FROM rate_limit WHERE key = ?', (key,))
+
+    def clear(self, prefix=''):
+        self._connection().execute("DELETE FROM rate_limit WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def count(self, prefix=''):
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM rate_limit WHERE substr(key, 1, ?) = ?', (len(prefix), prefix)
+        ).fetchone()[0]
+
+    def total(self, prefix, window_start, window):
+        return self._connection().execute(
+            'SELECT COALESCE(SUM(current + previous), 0) FROM rate_limit '
+            'WHERE substr(key, 1, ?) = ? AND window_start >= ?',
+            (len(prefix), prefix, window_start - window)
+        ).fetchone()[0]
+
+
+class SlidingWindowLimiter:
+    """limit طلب كحد أقصى خلال window ثانية لكل مفتاح"""
+
+    def __init__(self, limit, window, backend=None, name='', clock=time.time):
+        self.limit = limit
+        self.window = int(window)
+        self.backend = backend or MemoryBackend()
+        # بادئة المفاتيح: عدة محددات بنوافذ مختلفة تتشارك جدول SQLite واحداً
+        self.prefix = f'{name}:' if name else ''
+        self.clock = clock
+
+    def hit(self, key):
+        """تسجيل طلب؛ False إذا تجاوز المفتاح الحد"""
+        now = self.clock()
+        window_start = int(now // self.window * self.window)
+        current, previous = self.backend.hit(self.prefix + key, window_start, self.window)
+        return previous * (1 - (now - window_start) / self.window) + current <= self.limit
+
+    def reset(self, key):
+        self.backend.reset(self.prefix + key)
+
+    def clear(self):
+        self.backend.clear(self.prefix)
+
+    def __len__(self):
+        """عدد المفاتيح المتتبعة"""
+        return self.backend.count(self.prefix)
+
+    def request_count(self):
+        """عدد الطلبات المسجلة في آخر نافذتين (للوحة الأمان)"""
+        now = self.clock()
+        return self.backend.total(self.prefix, int(now // self.window * self.window), self.window)
+
+
+def create_rate_limiter(limit, window, name='', backend=None, path=None, max_keys=10000):
+    """إنشاء محدد المعدل حسب RATE_LIMIT_BACKEND"""
+    backend = (backend or os.environ.get('RATE_LIMIT_BACKEND') or 'memory').strip().lower()
+    if backend == 'sqlite':
+        store = SQLiteBackend(path or os.environ.get('RATE_LIMIT_DB') or os.path.join('instance', 'rate_limits.db'),
+                              max_keys)
+    elif backend == 'memory':
+        store = MemoryBackend(max_keys)
+    else:
+        raise ValueError(f'قيمة RATE_LIMIT_BACKEND غير معروفة: {backend}')
+    return SlidingWindowLimiter(limit, window, store, name=name)
+
+
+class TimerWheel:
+    """عجلة مؤقتات مجزأة: خانة لكل tick، والمؤقتات الأبعد من دورة كاملة تنتظر عدد دوراتها"""
+
+    def __init__(self, tick=1.0, slots=512, clock=time.monotonic, sleep=None):
+        self.tick = tick
+        self.slots = [dict() for _ in range(slots)]
+        self.clock = clock
+        self.sleep = sleep
+        self._timers = {}  # key -> رقم الخانة
+        self._lock = threading.Lock()
+        self._thread = None
+        self._position = 0
+        self._last_tick = None
+        self.fired = 0
+
+    def schedule(self, key, delay, callback):
+        """تنفيذ callback بعد delay ثانية تقريباً (بدقة tick)؛ يستبدل مؤقت المفتاح نفسه"""
+        ticks = max(1, int(-(-delay // self.tick)))
+        with self._lock:
+            self._cancel(key)
+            if self._last_tick is None:
+                self._last_tick = self.clock()
+            slot = (self._position + ticks) % len(self.slots)
+            rounds = (ticks - 1) // len(self.slots)
+            self.slots[slot][key] = [rounds, callback]
+            self._timers[key] = slot
+        self.start()
+
+    def cancel(self, key):
+        with self._lock:
+            return self._cancel(key)
+
+    def _cancel(self, key):
+        slot = self._timers.pop(key, None)
+        if slot is None:
+            return False
+        self.slots[slot].pop(key, None)
+        return True
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __contains__(self, key):
+        return key in self._timers
+
+    def advance(self, now=None):
+        """تنفيذ المؤقتات المستحقة حتى الوقت now"""
+        now = self.clock() if now is None else now
+        due = []
+        with self._lock:
+            if self._last_tick is None:
+                self._last_tick = now
+            while now - self._last_tick >= self.tick:
+                self._last_tick += self.tick
+                self._position = (self._position + 1) % len(self.slots)
+                slot = self.slots[self._position]
+                for key, timer in list(slot.items()):
+                    if timer[0] > 0:
+                        timer[0] -= 1
+                        continue
+                    del slot[key]
+                    del self._timers[key]
+                    due.append(timer[1])
+        for callback in due:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f'❌ خطأ في مؤقت: {e}')
+            self.fired += 1
+        return len(due)
+
+    def start(self):
+        """تشغيل خيط العجلة مرة واحدة لكل عملية"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='timer-wheel', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            # time.sleep يُقرأ عند التنفيذ لا عند الاستيراد: الوحدة تُحمّل في العملية الأم قبل أن
+            # يطبق عامل eventlet الـ monkey_patch، والنسخة الأصلية تحجب الـ hub كله طوال tick
+            (self.sleep or time.sleep)(self.tick)
+            self.advance()
+
+    def reset(self):
+        """بعد fork: الخيط لا ينتقل للعملية الفرعية؛ المؤقتات المعلقة تبقى ويبدأ خيط جديد
+        مع أول جدولة أو باستدعاء start() (يستدعيه post_worker_init بعد monkey_patch)"""
+        self._lock = threading.Lock()
+        self._thread = None
+
+
+# عجلة واحدة لكل عملية يتشاركها security_system و ip_blocker
+timer_wheel = TimerWheel()
+os.register_at_fork(after_in_child=timer_wheel.reset)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🗃️ ذاكرة نتائج التقارير
+Report result cache (memory LRU + optional local disk)
+
+تخزن ناتج صفحات التقارير بمفتاح يتضمن إصدار البيانات، فلا تحتاج لانتهاء صلاحية:
+عند تعديل الجداول يتغير الإصدار فيتغير المفتاح، وتخرج الإدخالات القديمة تلقائياً
+بسياسة الأقل استخداماً (LRU) ضمن حدود العدد والحجم.
+
+- الذاكرة: حد أقصى لعدد الإدخالات ولإجمالي الحجم بالبايت
+- القرص (اختياري): ملفات مشتركة بين عمليات الخادم على نفس الجهاز، بحد أقصى لعدد الملفات
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ReportCache:
+    """ذاكرة LRU للتقارير مع طبقة قرص اختيارية وعدادات إصابة/إخفاق"""
+
+    def __init__(self, max_entries=128, max_bytes=64 * 1024 * 1024, disk_dir=None, disk_max_entries=512):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.reset_stats()
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(parts):
+        """مفتاح ثابت من أجزاء المفتاح (يصلح اسماً لملف)"""
+        return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """إرجاع القيمة المخزنة أو None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        value = self._read_disk(key)
+        if value is not None:
+            self.disk_hits += 1
+            self._store_memory(key, value)
+            return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        """تخزين نص التقرير"""
+        self._store_memory(key, value)
+        self._write_disk(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.cache'):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except OSError:
+                        pass
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+        }
+
+    # ----- الذاكرة -----
+
+    def _store_memory(self, key, value):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    # ----- القرص -----
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f'{key}.cache')
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                value = f.read()
+            os.utime(path)  # تحديث وقت الاستخدام لترتيب الحذف
+            return value
+        except OSError:
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(value)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            return
+
+        self._disk_writes += 1
+        if self._disk_writes % 32 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """حذف أقدم الملفات عند تجاوز الحد"""
+        try:
+            files = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir)
+                     if name.endswith('.cache')]
+            if len(files) <= self.disk_max_entries:
+                return
+            files.sort(key=os.path.getmtime)
+            for path in files[:len(files) - self.disk_max_entries]:
+                os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس سرعة التصدير (صف/ثانية) والذاكرة
+Export throughput benchmark
+
+يولد فواتير مبيعات بأصنافها في قاعدة SQLite مؤقتة ثم يصدّر تقرير المبيعات
+عبر /export_excel/sales بصيغتي CSV و xlsx ويقيس عدد الصفوف في الثانية
+ونمو الذاكرة المقيمة للعملية أثناء التصدير.
+
+الاستخدام:
+    python scripts/benchmark_export.py [--invoices 200000]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# إضافة مسار التطبيق
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_indexes import generate_dataset
+
+
+def current_rss():
+    """الذاكرة المقيمة الحالية بالبايت (لينكس)"""
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def run_export(client, url):
+    """تنفيذ التصدير واستهلاك الاستجابة جزءاً جزءاً"""
+    rss_before = peak = current_rss()
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    size = 0
+    for index, chunk in enumerate(response.response):
+        size += len(chunk)
+        if index % 16 == 0:
+            peak = max(peak, current_rss())
+    response.close()
+    elapsed = time.perf_counter() - started
+    return elapsed, size, peak - rss_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس سرعة التصدير')
+    parser.add_argument('--invoices', type=int, default=200000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='accounting_bench_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    import accounting_system_complete as system
+    from accounting_system_complete import app, db
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        print(f'🧪 توليد {args.invoices:,} فاتورة في {workdir} ...')
+        generate_dataset(db, system, args.invoices)
+        rows = system.SalesInvoiceItem.query.count()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    print()
+    print(f"{'format':<8}{'rows':>10}{'seconds':>10}{'rows/sec':>12}{'MB out':>9}{'RSS +MB':>9}")
+    print('-' * 58)
+    for export_format in ('csv', 'xlsx'):
+        elapsed, size, peak = run_export(client, f'/export_excel/sales?format={export_format}')
+        print(f'{export_format:<8}{rows:>10,}{elapsed:>10.2f}{rows / elapsed:>12,.0f}'
+              f'{size / 1e6:>9.1f}{peak / 1e6:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
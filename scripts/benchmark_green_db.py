@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس حجب محور eventlet بالاستعلامات الطويلة
+Report queries vs POS writes under eventlet, blocking vs cooperative
+
+داخل عملية معدلة بـ eventlet.monkey_patch (كما في عامل eventlet في gunicorn):
+- عدة خيوط خضراء تنفذ استعلام تقرير ثقيل بشكل متكرر
+- خيط يحفظ فاتورة نقاط بيع كل 20 ms ويقيس زمن كل حفظ
+- خيط نبض ينام 10 ms ويقيس التأخر (توقف المحور يعني توقف كل عملاء Socket.IO)
+
+ثم يعيد القياس بعد enable_green_db (tpool + WAL لـ SQLite).
+
+الاستخدام:
+    python scripts/benchmark_green_db.py [--invoices 300000] [--duration 10] [--reports 4]
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from datetime import date
+
+from sqlalchemy import event, text
+
+# إضافة مسار التطبيق
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_scenario(system, duration, reports):
+    app, db = system.app, system.db
+    stop = time.perf_counter() + duration
+    pos_latency, heartbeat_lag, report_times = [], [], []
+
+    def report_worker():
+        with app.app_context():
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                db.session.execute(text(
+                    'SELECT customer_id, SUM(total), COUNT(*) FROM sales_invoice '
+                    'GROUP BY customer_id ORDER BY 2 DESC'
+                )).fetchall()
+                db.session.rollback()
+                report_times.append(time.perf_counter() - started)
+                eventlet.sleep(0.05)  # مهلة بين طلبات التقارير كما في حركة حقيقية
+
+    def pos_worker():
+        number = 0
+        with app.app_context():
+            while time.perf_counter() < stop:
+                number += 1
+                started = time.perf_counter()
+                invoice = system.SalesInvoice(
+                    invoice_number=f'POS-{time.time_ns()}-{number}', date=date.today(),
+                    subtotal=10, tax_amount=1.5, total=11.5, payment_method='cash', status='paid'
+                )
+                db.session.add(invoice)
+                db.session.commit()
+                pos_latency.append(time.perf_counter() - started)
+                eventlet.sleep(0.02)
+
+    def heartbeat():
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            eventlet.sleep(0.01)
+            heartbeat_lag.append(time.perf_counter() - started - 0.01)
+
+    pool = eventlet.GreenPool()
+    for _ in range(reports):
+        pool.spawn(report_worker)
+    pool.spawn(pos_worker)
+    pool.spawn(heartbeat)
+    pool.waitall()
+
+    return {
+        'reports': len(report_times),
+        'report_ms': statistics.median(report_times) * 1000 if report_times else 0,
+        'writes': len(pos_latency),
+        'write_p50': percentile(pos_latency, 0.5) * 1000,
+        'write_p95': percentile(pos_latency, 0.95) * 1000,
+        'write_max': max(pos_latency) * 1000 if pos_latency else 0,
+        'lag_max': max(heartbeat_lag) * 1000 if heartbeat_lag else 0,
+        'lag_p95': percentile(heartbeat_lag, 0.95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس حجب محور eventlet')
+    parser.add_argument('--invoices', type=int, default=300000)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--reports', type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='accounting_bench_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['TEMPLATE_CACHE_DIR'] = os.path.join(workdir, 'jinja_cache')
+    os.environ['SLOW_REQUEST_MS'] = '0'
+
+    import accounting_system_complete as system
+    from accounting_system_complete import app, db
+    from green_db import enable_green_db
+    from benchmark_indexes import generate_dataset
+
+    with app.app_context():
+        # الوحدة فعّلت الوضع التعاوني عند الاستيراد؛ نبدأ بالوضع الحاجب للمقارنة
+        from green_db import _sqlite_tpool_connect, _sqlite_wal
+        db.engine.dispose()
+        for name, listener in (('do_connect', _sqlite_tpool_connect), ('connect', _sqlite_wal)):
+            if event.contains(db.engine, name, listener):
+                event.remove(db.engine, name, listener)
+        db.engine.dispose()
+
+        print(f'🧪 توليد {args.invoices:,} فاتورة في {workdir} ...')
+        generate_dataset(db, system, args.invoices)
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('PRAGMA journal_mode=DELETE')
+
+    blocking = run_scenario(system, args.duration, args.reports)
+    enable_green_db(app, db)
+    cooperative = run_scenario(system, args.duration, args.reports)
+
+    print()
+    print(f"{'mode':<14}{'reports':>9}{'report ms':>11}{'writes':>8}{'write p50':>11}"
+          f"{'write p95':>11}{'write max':>11}{'hub lag p95':>13}{'hub lag max':>13}")
+    print('-' * 101)
+    for name, result in (('blocking', blocking), ('cooperative', cooperative)):
+        print(f"{name:<14}{result['reports']:>9}{result['report_ms']:>11.1f}{result['writes']:>8}"
+              f"{result['write_p50']:>11.1f}{result['write_p95']:>11.1f}{result['write_max']:>11.1f}"
+              f"{result['lag_p95']:>13.1f}{result['lag_max']:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
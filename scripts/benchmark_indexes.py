@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس أداء الاستعلامات قبل وبعد الفهارس
+Index before/after benchmark on a generated dataset
+
+ينشئ قاعدة SQLite مؤقتة بعدد كبير من الفواتير (500 ألف افتراضياً)، ويقيس
+استعلامات التقارير والقوائم بدون فهارس، ثم يبني الفهارس عبر migrate_database
+ويعيد القياس.
+
+الاستخدام:
+    python scripts/benchmark_indexes.py [--invoices 500000] [--repeat 5]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, datetime, timedelta
+
+# إضافة مسار التطبيق
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def generate_dataset(db, system, invoices, seed=42):
+    """توليد بيانات تجريبية بإدخال جماعي"""
+    rng = random.Random(seed)
+    branches = list(system.app.config['BRANCHES'])
+    statuses = ['paid', 'paid', 'paid', 'pending', 'overdue']
+    methods = ['cash', 'mada', 'visa', 'bank', 'credit']
+    start = date.today() - timedelta(days=3 * 365)
+    customers = max(invoices // 250, 10)
+    products = 2000
+
+    conn = db.engine.raw_connection()
+    cursor = conn.cursor()
+    cursor.executemany(
+        'INSERT INTO customer (name, phone, created_at) VALUES (?, ?, ?)',
+        [(f'عميل {i}', f'05{i:08d}', datetime.utcnow()) for i in range(customers)]
+    )
+    cursor.executemany(
+        'INSERT INTO product (name, price, cost, quantity, min_quantity, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+        [(f'منتج {i}', 10, 8, rng.randint(0, 200), 10, datetime.utcnow()) for i in range(products)]
+    )
+
+    batch = []
+    items = []
+    for i in range(1, invoices + 1):
+        day = start + timedelta(days=rng.randrange(3 * 365))
+        total = round(rng.uniform(10, 2000), 2)
+        batch.append((
+            f'BENCH-{i}', rng.randint(1, customers), day, total, 0, total,
+            rng.choice(methods), rng.choice(statuses), rng.choice(branches),
+            datetime.combine(day, datetime.min.time())
+        ))
+        items.append((i, f'منتج {i % products}', 1, total, total))
+        if len(batch) >= 50000:
+            _flush_invoices(cursor, batch, items)
+    _flush_invoices(cursor, batch, items)
+
+    conn.commit()
+    conn.close()
+    return customers
+
+
+def _flush_invoices(cursor, batch, items):
+    cursor.executemany(
+        'INSERT INTO sales_invoice (invoice_number, customer_id, date, subtotal, tax_amount, total, '
+        'payment_method, status, branch, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', batch
+    )
+    cursor.executemany(
+        'INSERT INTO sales_invoice_item (invoice_id, product_name, quantity, unit_price, total_price) '
+        'VALUES (?, ?, ?, ?, ?)', items
+    )
+    batch.clear()
+    items.clear()
+
+
+def benchmark_queries(db, system, customers):
+    """الاستعلامات الممثلة لمسارات القوائم والتقارير"""
+    SalesInvoice = system.SalesInvoice
+    func = db.func
+    month_start = date.today().replace(day=1) - timedelta(days=60)
+    month_end = month_start + timedelta(days=30)
+    customer_id = customers // 2
+
+    return [
+        ('sales list: branch, newest 50',
+         lambda: SalesInvoice.query.filter(SalesInvoice.branch == 'China Town')
+         .order_by(SalesInvoice.date.desc(), SalesInvoice.id.desc()).limit(50).all()),
+        ('recent sales by created_at',
+         lambda: SalesInvoice.query.order_by(SalesInvoice.created_at.desc()).limit(5).all()),
+        ('sales report: one month total',
+         lambda: db.session.query(func.sum(SalesInvoice.total))
+         .filter(SalesInvoice.date.between(month_start, month_end)).scalar()),
+        ('payments: overdue oldest 50',
+         lambda: SalesInvoice.query.filter(SalesInvoice.status == 'overdue')
+         .order_by(SalesInvoice.date).limit(50).all()),
+        ('payments: pending by method',
+         lambda: db.session.query(SalesInvoice.payment_method, func.sum(SalesInvoice.total))
+         .filter(SalesInvoice.status == 'pending').group_by(SalesInvoice.payment_method).all()),
+        ('customer history',
+         lambda: SalesInvoice.query.filter(SalesInvoice.customer_id == customer_id)
+         .order_by(SalesInvoice.date).all()),
+        ('invoice items lookup',
+         lambda: system.SalesInvoiceItem.query.filter_by(invoice_id=customer_id * 7).all()),
+        ('low stock products',
+         lambda: system.Product.query.filter(system.Product.quantity <= system.Product.min_quantity).all()),
+    ]
+
+
+def time_queries(db, queries, repeat):
+    results = {}
+    for name, query in queries:
+        timings = []
+        for _ in range(repeat):
+            db.session.expire_all()
+            started = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - started)
+        results[name] = min(timings) * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس أداء الفهارس')
+    parser.add_argument('--invoices', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='accounting_bench_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    import accounting_system_complete as system
+    from accounting_system_complete import app, db
+    from migrate_database import run_migration, drop_index
+
+    with app.app_context():
+        # البدء من مخطط بلا فهارس كما في قواعد البيانات القديمة
+        indexed_tables = [system.SalesInvoice, system.SalesInvoiceItem, system.Product]
+        for model in indexed_tables:
+            for index in model.__table__.indexes:
+                drop_index(db.engine, index)
+
+        print(f'🧪 توليد {args.invoices:,} فاتورة في {workdir} ...')
+        started = time.perf_counter()
+        customers = generate_dataset(db, system, args.invoices)
+        print(f'   تم خلال {time.perf_counter() - started:.1f} ث')
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.exec_driver_sql('ANALYZE')
+
+        queries = benchmark_queries(db, system, customers)
+        before = time_queries(db, queries, args.repeat)
+
+        print('🔧 بناء الفهارس عبر migrate_database ...')
+        started = time.perf_counter()
+        run_migration(db.engine, db.metadata, pause=0, verbose=False)
+        print(f'   تم خلال {time.perf_counter() - started:.1f} ث')
+
+        after = time_queries(db, queries, args.repeat)
+
+    print()
+    print(f"{'query':<36}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    print('-' * 70)
+    for name, _ in queries:
+        speedup = before[name] / after[name] if after[name] else float('inf')
+        print(f'{name:<36}{before[name]:>12.2f}{after[name]:>12.2f}{speedup:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
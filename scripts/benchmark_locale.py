@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس أثر حفظ اللغة لكل طلب والفهرس المدمج للترجمة
+Per-request locale memoization benchmark
+
+يقيس زمن الطلب للصفحات ثنائية اللغة /dashboard و /users بالعربية والإنجليزية:
+- قبل: تُحسب اللغة من الجلسة والمتصفح في كل استدعاء لـ get_locale() و _()
+- بعد: تُحسب مرة واحدة لكل طلب وتُترجم النصوص من الفهرس المدمج
+
+الاستخدام:
+    python scripts/benchmark_locale.py [--requests 100]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+# إضافة مسار التطبيق
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROUTES = ['/dashboard', '/users']
+
+
+def time_requests(client, url, count):
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (url, response.status_code)
+    return statistics.median(timings)
+
+
+def legacy_globals(system):
+    """الدوال كما كانت: حساب اللغة والبحث في TRANSLATIONS مع كل نص"""
+    def translate(text):
+        current_lang = system.resolve_locale()
+        if current_lang in system.TRANSLATIONS and text in system.TRANSLATIONS[current_lang]:
+            return system.TRANSLATIONS[current_lang][text]
+        return text
+
+    return {'get_locale': system.resolve_locale, '_': translate}
+
+
+def count_calls(system, client, url):
+    """عدد مرات حساب اللغة في عرض واحد للصفحة"""
+    calls = []
+    original = system.resolve_locale
+    system.resolve_locale = lambda: calls.append(1) or original()
+    try:
+        client.get(url)
+    finally:
+        system.resolve_locale = original
+    return len(calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس حفظ اللغة لكل طلب')
+    parser.add_argument('--requests', type=int, default=100)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='accounting_bench_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['TEMPLATE_CACHE_DIR'] = os.path.join(workdir, 'jinja_cache')
+
+    import accounting_system_complete as system
+    from accounting_system_complete import app, db
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        if not system.User.query.filter_by(username='admin').first():
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            db.session.add(admin)
+            db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    current = {name: app.jinja_env.globals[name] for name in ('get_locale', '_')}
+    legacy = legacy_globals(system)
+
+    results = []
+    for language in ('ar', 'en'):
+        client.get(f'/change_language/{language}')
+        for url in ROUTES:
+            client.get(url)  # تسخين ذاكرة القوالب
+            calls = count_calls(system, client, url)
+
+            app.jinja_env.globals.update(legacy)
+            legacy_calls = count_calls(system, client, url)
+            before = time_requests(client, url, args.requests)
+            app.jinja_env.globals.update(current)
+
+            after = time_requests(client, url, args.requests)
+            results.append((f'{url} [{language}]', legacy_calls, calls, before, after))
+
+    # تكلفة الاستدعاء الواحد داخل طلب
+    per_call = []
+    with app.test_request_context('/', headers={'Accept-Language': 'en-US,en;q=0.9,ar;q=0.8'}):
+        for name, func in (('get_locale before', legacy['get_locale']), ('get_locale after', system.get_locale),
+                           ('_() before', lambda: legacy['_']('Dashboard')), ('_() after', lambda: system._('Dashboard'))):
+            started = time.perf_counter()
+            for _ in range(20000):
+                func()
+            per_call.append((name, (time.perf_counter() - started) / 20000 * 1e6))
+
+    print()
+    for name, micros in per_call:
+        print(f'{name:<20}{micros:>8.2f} µs/call')
+
+    print()
+    print(f"{'route':<20}{'calls before':>14}{'calls after':>13}{'before ms':>11}{'after ms':>10}{'saved':>8}")
+    print('-' * 76)
+    for name, legacy_calls, calls, before, after in results:
+        saved = (1 - after / before) * 100 if before else 0
+        print(f'{name:<20}{legacy_calls:>14}{calls:>13}{before:>11.2f}{after:>10.2f}{saved:>7.0f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس ناقل رسائل Socket.IO بين العمليات
+Cross-process fan-out latency of the Socket.IO message bus
+
+عدة عمليات مستقبلة (مثل عمليات gunicorn) تستمع على الناقل، وعملية ترسل رسائل
+data_update بحجم دفعة تحديث فوري نموذجية، ثم يُحسب زمن الوصول لكل عملية.
+
+الاستخدام:
+    python scripts/benchmark_socketio_bus.py [--backend unix] [--workers 4] [--messages 2000]
+    python scripts/benchmark_socketio_bus.py --backend postgres --url postgresql://...
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+
+# إضافة مسار التطبيق
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from socketio_bus import UnixSocketManager, PostgresNotifyManager, libpq_url
+
+
+def make_manager(args, bus_dir):
+    if args.backend == 'postgres':
+        return PostgresNotifyManager(libpq_url(args.url), channel='socketio_bus_bench')
+    return UnixSocketManager(bus_dir, channel='socketio_bus_bench')
+
+
+def receive(args, bus_dir, ready, results):
+    manager = make_manager(args, bus_dir)
+    if args.backend == 'unix':
+        manager.bind()
+    listener = manager._listen()
+    ready.release()
+    latencies = []
+    for payload in listener:
+        message = json.loads(payload)
+        if message.get('event') == 'stop':
+            break
+        latencies.append(time.time() - message['data'][0]['timestamp'])
+    results.put(latencies)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس ناقل رسائل Socket.IO')
+    parser.add_argument('--backend', choices=('unix', 'postgres'), default='unix')
+    parser.add_argument('--url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--messages', type=int, default=2000)
+    args = parser.parse_args()
+
+    bus_dir = tempfile.mkdtemp(prefix='bus')
+    ready = multiprocessing.Semaphore(0)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=receive, args=(args, bus_dir, ready, results))
+                 for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.acquire()
+    time.sleep(0.5)  # LISTEN في PostgreSQL
+
+    sender = make_manager(args, bus_dir)
+    event = {'type': 'sales_invoice', 'action': 'created', 'id': 1, 'stats': {'sales_total': 115.0},
+             'row': {'invoice_number': 'INV-000001', 'customer': 'عميل نقدي', 'total': 115.0}}
+    started = time.perf_counter()
+    for _ in range(args.messages):
+        sender._publish({'method': 'emit', 'event': 'data_update', 'namespace': '/', 'room': 'page_sales',
+                         'data': [{'type': 'batch', 'timestamp': time.time(), 'events': [event]}]})
+    elapsed = time.perf_counter() - started
+    sender._publish({'method': 'emit', 'event': 'stop', 'data': []})
+
+    latencies = [value for _ in processes for value in results.get(timeout=60)]
+    for process in processes:
+        process.join()
+    shutil.rmtree(bus_dir, ignore_errors=True)
+
+    print(f"🔀 {args.backend}: {args.messages} رسالة إلى {args.workers} عمليات")
+    print(f"   الإرسال: {args.messages / elapsed:.0f} رسالة/ث ({elapsed * 1e6 / args.messages:.0f} µs لكل رسالة)")
+    print(f"   الوصول: {len(latencies)}/{args.messages * args.workers}، "
+          f"الوسيط {statistics.median(latencies) * 1000:.2f} ms، p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس تكلفة ترجمة القوالب لكل طلب
+Per-request template compile cost benchmark
+
+يقيس زمن الطلب لصفحات /dashboard و /sales و /payments في حالتين:
+- بدون ذاكرة: يُترجم القالب في كل طلب (سلوك render_template_string في Flask)
+- مع الذاكرة: يُعاد استخدام القالب المترجم
+
+ويقيس أيضاً زمن الترجمة وحدها، وزمن التحميل من ذاكرة الشيفرة على القرص
+كما يحدث عند بدء عملية gunicorn جديدة.
+
+الاستخدام:
+    python scripts/benchmark_templates.py [--requests 50]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+# إضافة مسار التطبيق
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROUTES = ['/dashboard', '/sales', '/payments']
+
+
+class _NoCache(dict):
+    """قاموس لا يحتفظ بشيء، لمحاكاة الترجمة في كل طلب"""
+
+    def __setitem__(self, key, value):
+        pass
+
+
+def time_requests(client, url, count):
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (url, response.status_code)
+    return statistics.median(timings)
+
+
+def capture_sources(system, client):
+    """التقاط نص القالب الذي تستخدمه كل صفحة"""
+    sources = {}
+    original = system.get_compiled_template
+    for url in ROUTES:
+        seen = []
+        system.get_compiled_template = lambda source: seen.append(source) or original(source)
+        client.get(url)
+        system.get_compiled_template = original
+        sources[url] = max(seen, key=len)
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس تكلفة ترجمة القوالب')
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='accounting_bench_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['TEMPLATE_CACHE_DIR'] = os.path.join(workdir, 'jinja_cache')
+
+    import accounting_system_complete as system
+    from accounting_system_complete import app, db
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        if not system.User.query.filter_by(username='admin').first():
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            db.session.add(admin)
+            db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    sources = capture_sources(system, client)
+
+    results = {}
+    for url in ROUTES:
+        system._compiled_templates = _NoCache()
+        bytecode_cache, app.jinja_env.bytecode_cache = app.jinja_env.bytecode_cache, None
+        uncached = time_requests(client, url, args.requests)
+        app.jinja_env.bytecode_cache = bytecode_cache
+
+        system._compiled_templates = {}
+        client.get(url)
+        cached = time_requests(client, url, args.requests)
+
+        source = sources[url]
+        started = time.perf_counter()
+        app.jinja_env.from_string(source)
+        compile_ms = (time.perf_counter() - started) * 1000
+
+        # عملية جديدة: الذاكرة في الذاكرة فارغة لكن الشيفرة محفوظة على القرص
+        system._compiled_templates = {}
+        started = time.perf_counter()
+        system.get_compiled_template(source)
+        warm_ms = (time.perf_counter() - started) * 1000
+
+        results[url] = (len(source), compile_ms, warm_ms, uncached, cached)
+
+    print()
+    print(f"{'route':<12}{'size KB':>9}{'compile ms':>12}{'disk ms':>10}"
+          f"{'uncached ms':>13}{'cached ms':>11}{'saved':>8}")
+    print('-' * 75)
+    for url, (size, compile_ms, warm_ms, uncached, cached) in results.items():
+        saved = (1 - cached / uncached) * 100 if uncached else 0
+        print(f'{url:<12}{size / 1024:>9.1f}{compile_ms:>12.2f}{warm_ms:>10.2f}'
+              f'{uncached:>13.2f}{cached:>11.2f}{saved:>7.0f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس فاحص التهديدات
+Threat scanner cost per request: legacy per-pattern loops vs single-pass scanner
+
+يقارن الفحص القديم (re.search لكل نمط ولكل فئة، ثم مرور ثانٍ للتهديدات المتقدمة) بالفاحص
+المترجم مسبقاً على:
+- حمولات scripts/security_test.py (يجب أن تتطابق النتائج)
+- طلب فاتورة عادي بعدد كبير من البنود (الحالة الشائعة: لا تهديد)
+
+الاستخدام:
+    python scripts/benchmark_threat_scanner.py [--items 200] [--rounds 200] [--no-ahocorasick]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+
+# إضافة مسار التطبيق
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from threat_scanner import (ThreatScanner, SQL_INJECTION_PATTERNS, XSS_PATTERNS, PATH_TRAVERSAL_PATTERNS,
+                            ADVANCED_THREAT_PATTERNS, AHOCORASICK_AVAILABLE)
+
+# حمولات scripts/security_test.py
+SQL_PAYLOADS = [
+    "'; DROP TABLE users; --",
+    "1' OR '1'='1",
+    "admin'--",
+    "1' UNION SELECT * FROM users--",
+    "'; INSERT INTO users VALUES('hacker','password'); --"
+]
+XSS_PAYLOADS = [
+    "<script>alert('XSS')</script>",
+    "<img src=x onerror=alert('XSS')>",
+    "javascript:alert('XSS')",
+    "<svg onload=alert('XSS')>",
+    "<iframe src=javascript:alert('XSS')></iframe>"
+]
+OTHER_PAYLOADS = [
+    "<?php echo 'test'; ?>",
+    "../../etc/passwd",
+    "; rm -rf /",
+    "{\"$where\": \"1\"}",
+    "<!DOCTYPE x [<!ENTITY e SYSTEM 'file:///etc/passwd'>]>",
+]
+
+
+def legacy_scan(data):
+    """الفحص القديم كما في security_system قبل الفاحص المترجم"""
+    threats = []
+    upper, lower = str(data).upper(), str(data).lower()
+    if any(re.search(p, upper, re.IGNORECASE) for p in SQL_INJECTION_PATTERNS):
+        threats.append('SQL Injection')
+    if any(re.search(p, str(data), re.IGNORECASE) for p in XSS_PATTERNS):
+        threats.append('XSS Attack')
+    if any(re.search(p, lower) for p in PATH_TRAVERSAL_PATTERNS):
+        threats.append('Path Traversal')
+    for threat_type, patterns in ADVANCED_THREAT_PATTERNS.items():
+        if any(re.search(p, lower, re.IGNORECASE) for p in patterns):
+            threats.append(threat_type)
+    return threats
+
+
+def invoice_form(items):
+    """حقول طلب حفظ فاتورة مبيعات بعدد items من البنود"""
+    form = {'invoice_number': 'INV-000123', 'customer_name': 'مؤسسة النور التجارية',
+            'date': '2024-05-01', 'payment_method': 'cash', 'notes': 'تسليم في الفرع الرئيسي'}
+    for i in range(items):
+        form[f'items[{i}][product_id]'] = str(1000 + i)
+        form[f'items[{i}][name]'] = f'صنف رقم {i}'
+        form[f'items[{i}][quantity]'] = str(1 + i % 7)
+        form[f'items[{i}][price]'] = f'{12.5 + i:.2f}'
+    return [part for key, value in form.items() for part in (key, value)]
+
+
+def measure(scan, values, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for value in values:
+            scan(value)
+    return (time.perf_counter() - started) * 1e6 / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس فاحص التهديدات')
+    parser.add_argument('--items', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--no-ahocorasick', action='store_true')
+    args = parser.parse_args()
+
+    # التطابق: الفاحص الجديد يعطي الأنواع نفسها لكل حمولة
+    scanner = ThreatScanner(use_ahocorasick=not args.no_ahocorasick)
+    uncached = ThreatScanner(use_ahocorasick=not args.no_ahocorasick, cache_size=0)
+    payloads = SQL_PAYLOADS + XSS_PAYLOADS + OTHER_PAYLOADS
+    mismatches = [p for p in payloads if sorted(legacy_scan(p)) != sorted(scanner.scan(p))]
+    for payload in payloads:
+        print(f"   {payload[:45]:<45} {', '.join(scanner.scan(payload))}")
+    if mismatches:
+        print(f"❌ نتائج مختلفة عن الفحص القديم: {mismatches}")
+        sys.exit(1)
+
+    values = invoice_form(args.items)
+    print(f"\n🔎 طلب فاتورة: {len(values)} قيمة، المرشح الأولي: {scanner.prefilter_backend}"
+          f" (pyahocorasick {'متاحة' if AHOCORASICK_AVAILABLE else 'غير مثبتة'})")
+    legacy_form = measure(legacy_scan, values, max(1, args.rounds // 10))
+    legacy_payloads = measure(legacy_scan, payloads, args.rounds)
+    results = [
+        ('الفحص القديم', legacy_form, legacy_form),
+        ('الفاحص المترجم بدون ذاكرة', measure(uncached.scan, values, args.rounds), legacy_form),
+        ('الفاحص المترجم مع ذاكرة LRU', measure(scanner.scan, values, args.rounds), legacy_form),
+        ('الحمولات الهجومية (قديم)', legacy_payloads, legacy_payloads),
+        ('الحمولات الهجومية (مترجم)', measure(uncached.scan, payloads, args.rounds), legacy_payloads),
+    ]
+    for name, micros, baseline in results:
+        print(f"   {name:<30} {micros:10.1f} µs/طلب" + (f"  (×{baseline / micros:.1f})" if micros < baseline else ''))
+
+
+if __name__ == '__main__':
+    main()
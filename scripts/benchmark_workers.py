@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس الطلبات في الثانية بعدد مختلف من عمليات gunicorn
+Requests/sec benchmark at 1, 2, 4 and 8 gunicorn workers
+
+يشغل gunicorn بإعدادات gunicorn.conf.py (preload) على قاعدة SQLite مؤقتة، ويرسل
+طلبات متزامنة لمسار واحد لمدة محددة، ثم يطبع الطلبات في الثانية وزمن الاستجابة
+وذاكرة العمليات (PSS: الصفحات المشتركة مقسومة على عدد العمليات).
+
+الاستخدام:
+    python scripts/benchmark_workers.py [--workers 1 2 4 8] [--path /api/products]
+                                        [--clients 16] [--duration 10] [--worker-class sync]
+                                        [--no-preload]
+"""
+
+import os
+import sys
+import time
+import json
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import statistics
+import http.client
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def login_cookie(port):
+    """تسجيل الدخول وإرجاع ترويسة الجلسة"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    body = urllib.parse.urlencode({'username': 'admin', 'password': 'admin123'})
+    conn.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie', '').split(';')[0]
+    conn.close()
+    return cookie
+
+
+def wait_for_server(port, timeout=120):
+    """انتظار رد فعلي من التطبيق (بدون preload تفتح العملية الأم المنفذ قبل جاهزية العمليات)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+            conn.request('GET', '/login')
+            status = conn.getresponse().status
+            conn.close()
+            if status == 200:
+                return True
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def worker_memory(master_pid):
+    """مجموع PSS و RSS للعملية الأم وعملياتها الفرعية بالميغابايت (لينكس فقط)"""
+    pids = [master_pid]
+    try:
+        with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+            pids += [int(pid) for pid in f.read().split()]
+    except OSError:
+        return None, None
+
+    pss = rss = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Pss:'):
+                        pss += int(line.split()[1])
+                    elif line.startswith('Rss:'):
+                        rss += int(line.split()[1])
+        except OSError:
+            pass
+    return pss / 1024, rss / 1024
+
+
+def load(port, path, cookie, clients, duration):
+    """إرسال طلبات متزامنة وإرجاع (عدد الطلبات الناجحة، الأخطاء، الأزمنة)"""
+    stop = time.perf_counter() + duration
+    timings, errors = [], [0]
+    lock = threading.Lock()
+
+    def client():
+        conn = None
+        local = []
+        while time.perf_counter() < stop:
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                started = time.perf_counter()
+                conn.request('GET', path, headers={'Cookie': cookie})
+                response = conn.getresponse()
+                response.read()
+                local.append(time.perf_counter() - started)
+                if response.status != 200:
+                    with lock:
+                        errors[0] += 1
+                if response.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                conn = None
+        with lock:
+            timings.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(timings), errors[0], timings
+
+
+def run(workers, args, workdir):
+    port = free_port()
+    env = dict(os.environ,
+               DATABASE_URL='sqlite:///' + os.path.join(workdir, 'bench.db'),
+               TEMPLATE_CACHE_DIR=os.path.join(workdir, 'jinja_cache'),
+               WEB_CONCURRENCY=str(workers),
+               WORKER_CLASS=args.worker_class,
+               PORT=str(port),
+               GUNICORN_PRELOAD='0' if args.no_preload else '1',
+               SLOW_REQUEST_MS='0')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning',
+         'wsgi:application'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_for_server(port):
+            raise RuntimeError('لم يبدأ gunicorn')
+        cookie = login_cookie(port)
+        load(port, args.path, cookie, args.clients, 1)  # تسخين كل العمليات
+        pss, rss = worker_memory(server.pid)
+        count, errors, timings = load(port, args.path, cookie, args.clients, args.duration)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    return {
+        'workers': workers,
+        'rps': count / args.duration,
+        'p50': statistics.median(timings) * 1000 if timings else 0,
+        'p95': sorted(timings)[int(len(timings) * 0.95)] * 1000 if timings else 0,
+        'errors': errors,
+        'pss': pss,
+        'rss': rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس الطلبات في الثانية بعدة عمليات')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--path', default='/api/products')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--worker-class', default='sync')
+    parser.add_argument('--no-preload', action='store_true', help='تحميل الوحدة في كل عملية (للمقارنة)')
+    parser.add_argument('--json', action='store_true', help='إخراج النتائج بصيغة JSON')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='accounting_bench_')
+    results = [run(workers, args, workdir) for workers in args.workers]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f'\n{args.path}  ({args.worker_class}, {"no preload" if args.no_preload else "preload"}, '
+          f'{args.clients} clients, {args.duration:.0f}s, {os.cpu_count()} CPU)')
+    print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}{'PSS MB':>9}{'RSS MB':>9}")
+    print('-' * 62)
+    for result in results:
+        pss = f"{result['pss']:.0f}" if result['pss'] is not None else '-'
+        rss = f"{result['rss']:.0f}" if result['rss'] is not None else '-'
+        print(f"{result['workers']:>8}{result['rps']:>10.1f}{result['p50']:>9.1f}{result['p95']:>9.1f}"
+              f"{result['errors']:>8}{pss:>9}{rss:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -144,39 +144,24 @@ class TranslationManager:
             return False
     
     def create_js_translations(self, language):
-        """إنشاء ملف ترجمات JavaScript"""
+        """إنشاء حزمة ترجمات JavaScript من الفهرس نفسه الذي تستخدمه _() في النظام"""
         logger.info(f"إنشاء ترجمات JavaScript للغة: {language}")
         
         try:
-            import polib
-            import json
+            from accounting_system_complete import TRANSLATION_BUNDLES
+            from translation_catalog import write_js_bundles
             
-            # قراءة ملف .po
-            po_file = self.translations_dir / language / 'LC_MESSAGES' / 'messages.po'
-            
-            if not po_file.exists():
-                logger.warning(f"ملف الترجمة غير موجود: {po_file}")
+            if language not in TRANSLATION_BUNDLES:
+                logger.warning(f"لا يوجد فهرس ترجمة للغة: {language}")
                 return False
             
-            po = polib.pofile(str(po_file))
-            
-            # تحويل إلى JSON
-            translations = {}
-            for entry in po:
-                if entry.msgstr:
-                    translations[entry.msgid] = entry.msgstr
+            # ملفات بأسماء تتضمن بصمة المحتوى مع نسخ .gz و .br لخادم الملفات الثابتة
+            output_dir = Path(__file__).resolve().parent.parent / 'static' / 'i18n'
+            manifest = write_js_bundles({language: TRANSLATION_BUNDLES[language]}, str(output_dir))
             
-            # حفظ ملف JSON
-            js_file = self.translations_dir / language / 'LC_MESSAGES' / 'messages.json'
-            with open(js_file, 'w', encoding='utf-8') as f:
-                json.dump(translations, f, ensure_ascii=False, indent=2)
-            
-            logger.info(f"تم إنشاء ملف JavaScript: {js_file}")
+            logger.info(f"تم إنشاء ملف JavaScript: {output_dir / manifest[language]}")
             return True
             
-        except ImportError:
-            logger.error("مكتبة polib غير مثبتة. يرجى تثبيتها: pip install polib")
-            return False
         except Exception as e:
             logger.error(f"خطأ في إنشاء ترجمات JavaScript: {str(e)}")
             return False
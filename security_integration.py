@@ -241,7 +241,7 @@ def integrate_security_with_app(app):
         ''', 
         blocked_count=len(security_system.blocked_ips),
         threats_count=0,  # يمكن إضافة عداد التهديدات
-        requests_count=sum(len(requests) for requests in security_system.rate_limits.values()),
+        requests_count=security_system.rate_limiter.request_count(),
         uptime="24:00:00",  # يمكن حساب الوقت الفعلي
         blocked_ips=list(security_system.blocked_ips)
         )
@@ -253,7 +253,7 @@ def integrate_security_with_app(app):
         return jsonify({
             'blocked_count': len(security_system.blocked_ips),
             'threats_count': 0,
-            'requests_count': sum(len(requests) for requests in security_system.rate_limits.values()),
+            'requests_count': security_system.rate_limiter.request_count(),
             'timestamp': datetime.now().isoformat()
         })
     
@@ -264,8 +264,7 @@ def integrate_security_with_app(app):
         data = request.get_json()
         ip = data.get('ip')
         
-        if ip and ip in security_system.blocked_ips:
-            security_system.blocked_ips.remove(ip)
+        if ip and security_system.unblock_ip(ip):
             security_system.logger.info(f"✅ تم إلغاء حظر IP بواسطة المدير: {ip}")
             return jsonify({'success': True})
         
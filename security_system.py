@@ -16,15 +16,19 @@ Advanced Security System Against Hackers
 """
 
 import os
-import re
-import time
 import hashlib
 import secrets
 import logging
+import sqlite3
 from datetime import datetime, timedelta
 from collections import defaultdict
 from functools import wraps
 from flask import request, abort, session, jsonify, redirect, url_for
+
+from ip_blocklist import blocklist as shared_blocklist
+from rate_limiter import create_rate_limiter, timer_wheel
+from threat_scanner import (ThreatScanner, ScanAllowList, iter_request_values, ADVANCED_THREAT_PATTERNS,
+                            BASIC_CATEGORIES, SQL_INJECTION, XSS_ATTACK, PATH_TRAVERSAL)
 try:
     import ipaddress
 except ImportError:
@@ -43,12 +47,12 @@ except ImportError:
 class SecuritySystem:
     """نظام الحماية الرئيسي"""
     
-    def __init__(self, app=None):
+    def __init__(self, app=None, blocklist=None):
         self.app = app
         self.failed_attempts = defaultdict(list)
-        self.blocked_ips = set()
+        # قائمة الحظر المشتركة مع ip_blocker (شبكات CIDR والقائمة البيضاء)
+        self.blocked_ips = blocklist if blocklist is not None else shared_blocklist
         self.suspicious_activities = defaultdict(list)
-        self.rate_limits = defaultdict(list)
         self.security_tokens = {}
         
         # إعدادات الحماية
@@ -58,6 +62,15 @@ class SecuritySystem:
         self.RATE_LIMIT_WINDOW = 300  # 5 دقائق
         self.SESSION_TIMEOUT = 1800  # 30 دقيقة
         
+        # حد المعدل: عدادان لكل IP بدلاً من قائمة طوابع زمنية، ورفع الحظر عبر عجلة المؤقتات
+        self.rate_limiter = create_rate_limiter(self.RATE_LIMIT_REQUESTS, self.RATE_LIMIT_WINDOW, name='security')
+        
+        # فاحص التهديدات: الأنواع الأساسية افتراضياً، والمتقدمة بعد enable_advanced_detection
+        self.scanner = ThreatScanner()
+        self.request_scanner = ThreatScanner(BASIC_CATEGORIES)
+        self.scan_allow = ScanAllowList()
+        self.on_advanced_threat = None
+        
         # إعداد نظام السجلات
         self.setup_logging()
         
@@ -79,6 +92,13 @@ class SecuritySystem:
             'WTF_CSRF_TIME_LIMIT': 3600
         })
         
+        # حدود الفحص: الطول الأقصى للقيمة والحقول المستثناة لكل مسار
+        # SECURITY_SCAN_ALLOW = {'add_sale': ['notes'], 'api_webhook': ['*']}
+        max_length = app.config.get('SECURITY_SCAN_MAX_LENGTH')
+        if max_length:
+            self.scanner.max_value_length = self.request_scanner.max_value_length = max_length
+        self.scan_allow = ScanAllowList(app.config.get('SECURITY_SCAN_ALLOW'))
+        
         # تطبيق الحماية على جميع الطلبات
         app.before_request(self.security_check)
         app.after_request(self.add_security_headers)
@@ -113,39 +133,41 @@ class SecuritySystem:
     
     def is_ip_blocked(self, ip):
         """فحص ما إذا كان IP محظور"""
-        return ip in self.blocked_ips
+        return self.blocked_ips.is_blocked(ip)
     
     def block_ip(self, ip, reason="Suspicious activity"):
         """حظر IP مع تسجيل السبب"""
-        self.blocked_ips.add(ip)
+        if not self.blocked_ips.block(ip, reason, duration=self.BLOCK_DURATION):
+            return
         self.logger.warning(f"🚫 IP محظور: {ip} - السبب: {reason}")
         
         # إزالة الحظر بعد فترة
-        def unblock_later():
-            time.sleep(self.BLOCK_DURATION)
-            if ip in self.blocked_ips:
-                self.blocked_ips.remove(ip)
-                self.logger.info(f"✅ تم رفع الحظر عن IP: {ip}")
-        
-        import threading
-        threading.Thread(target=unblock_later, daemon=True).start()
+        timer_wheel.schedule((self, ip), self.BLOCK_DURATION, lambda: self.expire_block(ip))
+    
+    def expire_block(self, ip):
+        """رفع الحظر المؤقت عند انتهائه (من عجلة المؤقتات)"""
+        if self.blocked_ips.expire(ip):
+            self.rate_limiter.reset(ip)
+            self.logger.info(f"✅ تم رفع الحظر عن IP: {ip}")
+    
+    def unblock_ip(self, ip):
+        """رفع الحظر عن IP وإلغاء مؤقته"""
+        timer_wheel.cancel((self, ip))
+        if self.blocked_ips.unblock(ip):
+            self.rate_limiter.reset(ip)
+            self.logger.info(f"✅ تم رفع الحظر عن IP: {ip}")
+            return True
+        return False
     
     def check_rate_limit(self, ip):
-        """فحص حد المعدل للطلبات"""
-        now = time.time()
-        window_start = now - self.RATE_LIMIT_WINDOW
-        
-        # تنظيف الطلبات القديمة
-        self.rate_limits[ip] = [
-            timestamp for timestamp in self.rate_limits[ip]
-            if timestamp > window_start
-        ]
-        
-        # إضافة الطلب الحالي
-        self.rate_limits[ip].append(now)
-        
-        # فحص تجاوز الحد
-        if len(self.rate_limits[ip]) > self.RATE_LIMIT_REQUESTS:
+        """فحص حد المعدل للطلبات (يسمح بالطلب إذا تعذرت قراءة العدّاد)"""
+        try:
+            allowed = self.rate_limiter.hit(ip)
+        except sqlite3.OperationalError as e:
+            # ملف العدادات المشترك مقفل أو غير متاح: لا نُسقط الطلب بخطأ 500
+            self.logger.error(f"⚠️ تعذر فحص حد المعدل لـ {ip}: {e}")
+            return True
+        if not allowed:
             self.block_ip(ip, "Rate limit exceeded")
             return False
         
@@ -153,98 +175,43 @@ class SecuritySystem:
     
     def detect_sql_injection(self, data):
         """كشف محاولات SQL Injection"""
-        if not data:
-            return False
-        
-        # أنماط SQL Injection الشائعة
-        sql_patterns = [
-            r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|UNION)\b)",
-            r"(\b(OR|AND)\s+\d+\s*=\s*\d+)",
-            r"(\b(OR|AND)\s+['\"]?\w+['\"]?\s*=\s*['\"]?\w+['\"]?)",
-            r"(--|#|/\*|\*/)",
-            r"(\bUNION\s+SELECT\b)",
-            r"(\b(INFORMATION_SCHEMA|SYSOBJECTS|SYSCOLUMNS)\b)",
-            r"([\'\"];?\s*(DROP|DELETE|INSERT|UPDATE))",
-            r"(\b(EXEC|EXECUTE)\s*\()",
-            r"(\b(SP_|XP_)\w+)",
-            r"(WAITFOR\s+DELAY)"
-        ]
-        
-        data_str = str(data).upper()
-        for pattern in sql_patterns:
-            if re.search(pattern, data_str, re.IGNORECASE):
-                return True
-        
-        return False
+        return bool(data) and SQL_INJECTION in self.scanner.scan(data)
     
     def detect_xss(self, data):
         """كشف محاولات XSS"""
-        if not data:
-            return False
-        
-        # أنماط XSS الشائعة
-        xss_patterns = [
-            r"<script[^>]*>.*?</script>",
-            r"javascript:",
-            r"on\w+\s*=",
-            r"<iframe[^>]*>",
-            r"<object[^>]*>",
-            r"<embed[^>]*>",
-            r"<link[^>]*>",
-            r"<meta[^>]*>",
-            r"vbscript:",
-            r"expression\s*\(",
-            r"@import",
-            r"<svg[^>]*>.*?</svg>",
-            r"<img[^>]*onerror",
-            r"<body[^>]*onload"
-        ]
-        
-        data_str = str(data)
-        for pattern in xss_patterns:
-            if re.search(pattern, data_str, re.IGNORECASE):
-                return True
-        
-        return False
+        return bool(data) and XSS_ATTACK in self.scanner.scan(data)
     
     def detect_path_traversal(self, data):
         """كشف محاولات Path Traversal"""
-        if not data:
-            return False
-        
-        dangerous_patterns = [
-            r"\.\./",
-            r"\.\.\\",
-            r"%2e%2e%2f",
-            r"%2e%2e\\",
-            r"..%2f",
-            r"..%5c",
-            r"%252e%252e%252f",
-            r"....//",
-            r"....\\\\",
-        ]
-        
-        data_str = str(data).lower()
-        for pattern in dangerous_patterns:
-            if re.search(pattern, data_str):
-                return True
-        
-        return False
+        return bool(data) and PATH_TRAVERSAL in self.scanner.scan(data)
     
     def validate_input(self, data):
-        """فحص شامل للمدخلات"""
-        threats = []
-        
-        if self.detect_sql_injection(data):
-            threats.append("SQL Injection")
-        
-        if self.detect_xss(data):
-            threats.append("XSS Attack")
-        
-        if self.detect_path_traversal(data):
-            threats.append("Path Traversal")
-        
-        return threats
+        """فحص شامل للمدخلات (الأنواع الأساسية) بمرور واحد"""
+        return [threat for threat in self.scanner.scan(data) if threat in BASIC_CATEGORIES]
+    
+    def enable_advanced_detection(self, on_threat):
+        """فحص التهديدات المتقدمة في المرور نفسه؛ on_threat(ip, threats) يُستدعى قبل الحظر"""
+        self.request_scanner = self.scanner
+        self.on_advanced_threat = on_threat
+    
+    def scan_request(self, endpoint=None):
+        """أول تهديد في الطلب: (الأنواع، البيانات) أو (None, None)"""
+        if self.scan_allow.skip_endpoint(endpoint):
+            return None, None
+        # معاملات الرابط وحقول النموذج وقيم JSON (كل قيمة على حدة مع استثناءات الحقول)
+        for _, _, data in iter_request_values(request, self.scan_allow, endpoint):
+            threats = self.request_scanner.scan(data)
+            if threats:
+                return threats, data
+        
+        # فحص الهيدرز المشبوهة (الأنواع الأساسية فقط)
+        for header in ('User-Agent', 'Referer', 'X-Forwarded-For'):
+            data = request.headers.get(header)
+            if data:
+                threats = self.validate_input(data)
+                if threats:
+                    return threats, data
+        return None, None
     
     def security_check(self):
         """فحص الأمان الرئيسي لكل طلب"""
@@ -260,40 +227,20 @@ class SecuritySystem:
             self.logger.warning(f"⚡ تجاوز حد المعدل من IP: {ip}")
             abort(429)
         
-        # فحص المدخلات في جميع البيانات
-        all_data = []
-        
-        # فحص معاملات URL
-        for key, value in request.args.items():
-            all_data.extend([key, value])
-        
-        # فحص بيانات النموذج
-        for key, value in request.form.items():
-            all_data.extend([key, value])
-        
-        # فحص JSON data
-        if request.is_json:
-            try:
-                json_data = request.get_json()
-                if json_data:
-                    all_data.append(str(json_data))
-            except:
-                pass
-        
-        # فحص الهيدرز المشبوهة
-        suspicious_headers = ['User-Agent', 'Referer', 'X-Forwarded-For']
-        for header in suspicious_headers:
-            if request.headers.get(header):
-                all_data.append(request.headers.get(header))
-        
-        # تحليل جميع البيانات
-        for data in all_data:
-            threats = self.validate_input(data)
-            if threats:
-                threat_str = ", ".join(threats)
+        # فحص المدخلات في جميع البيانات بمرور واحد لكل قيمة
+        threats, data = self.scan_request(request.endpoint)
+        if threats:
+            basic = [threat for threat in threats if threat in BASIC_CATEGORIES]
+            if basic:
+                threat_str = ", ".join(basic)
                 self.logger.critical(f"🚨 هجوم مكتشف من IP {ip}: {threat_str} - البيانات: {data[:100]}")
                 self.block_ip(ip, f"Attack detected: {threat_str}")
-                abort(403)
+            else:
+                threat_str = ", ".join(threats)
+                if self.on_advanced_threat:
+                    self.on_advanced_threat(ip, threats)
+                self.block_ip(ip, f"Advanced threat: {threat_str}")
+            abort(403)
         
         # فحص جلسة المستخدم
         self.check_session_security()
@@ -399,55 +346,15 @@ class AdvancedThreatDetection:
     """نظام كشف التهديدات المتقدم"""
 
     def __init__(self):
-        self.threat_patterns = {
-            'command_injection': [
-                r';\s*(rm|del|format|shutdown|reboot)',
-                r'\|\s*(nc|netcat|telnet|ssh)',
-                r'`[^`]*`',
-                r'\$\([^)]*\)',
-                r'&&\s*(rm|del|format)',
-                r'\|\|\s*(rm|del|format)'
-            ],
-            'ldap_injection': [
-                r'\*\)\(\|',
-                r'\*\)\(\&',
-                r'\)\(\|',
-                r'\)\(\&',
-                r'\*\)\(\w+=\*'
-            ],
-            'xml_injection': [
-                r'<!ENTITY',
-                r'<!DOCTYPE',
-                r'&\w+;',
-                r'<!\[CDATA\[',
-                r']]>'
-            ],
-            'nosql_injection': [
-                r'\$where',
-                r'\$ne',
-                r'\$gt',
-                r'\$lt',
-                r'\$regex',
-                r'\$or',
-                r'\$and'
-            ]
-        }
+        self.threat_patterns = ADVANCED_THREAT_PATTERNS
+        self.scanner = ThreatScanner(list(ADVANCED_THREAT_PATTERNS))
 
     def detect_advanced_threats(self, data):
         """كشف التهديدات المتقدمة"""
         if not data:
             return []
 
-        detected_threats = []
-        data_str = str(data).lower()
-
-        for threat_type, patterns in self.threat_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, data_str, re.IGNORECASE):
-                    detected_threats.append(threat_type)
-                    break
-
-        return detected_threats
+        return self.scanner.scan(data)
 
 class HoneypotSystem:
     """نظام الفخاخ الأمنية"""
@@ -538,6 +445,9 @@ security_monitor = SecurityMonitor()
 def init_security(app):
     """تهيئة نظام الحماية الشامل"""
     security.init_app(app)
+    security.enable_advanced_detection(
+        lambda ip, threats: security_monitor.log_security_event('ADVANCED_THREAT', ip, f'Threats: {", ".join(threats)}')
+    )
 
     # إضافة الفحوصات المتقدمة
     @app.before_request
@@ -551,19 +461,6 @@ def init_security(app):
             security.block_ip(ip, "Honeypot triggered")
             return honeypot.trap_attacker(ip), 403
 
-        # فحص التهديدات المتقدمة
-        all_data = []
-        for key, value in request.args.items():
-            all_data.extend([key, value])
-        for key, value in request.form.items():
-            all_data.extend([key, value])
-
-        for data in all_data:
-            threats = advanced_detection.detect_advanced_threats(data)
-            if threats:
-                threat_str = ", ".join(threats)
-                security_monitor.log_security_event('ADVANCED_THREAT', ip, f'Threats: {threat_str}')
-                security.block_ip(ip, f"Advanced threat: {threat_str}")
-                abort(403)
+        # التهديدات المتقدمة تُفحص في security_check مع الأساسية بمرور واحد
 
     return security
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🔀 ناقل رسائل Socket.IO بين العمليات
+Cross-worker Socket.IO message bus
+
+بدون ناقل رسائل يصل broadcast_update فقط للمتصفحات المتصلة بالعملية نفسها. هذه الوحدة
+توفر مديري عملاء (client_manager) لمكتبة python-socketio ينشرون كل emit لبقية العمليات:
+
+- postgres: قناة LISTEN/NOTIFY على قاعدة PostgreSQL نفسها، دون خدمة إضافية.
+  الرسائل الأكبر من حد NOTIFY (8000 بايت) تُحفظ في جدول مؤقت ويُرسل رقمها فقط
+- unix: مقبس Unix من نوع datagram لكل عملية داخل مجلد مشترك، للتطوير ومع SQLite
+  على جهاز واحد. المقابس المتروكة من عمليات منتهية تُحذف عند أول إرسال فاشل
+
+الإعدادات (متغيرات البيئة):
+    SOCKETIO_BUS      none (افتراضياً) أو postgres أو unix أو auto (postgres إن كانت
+                      قاعدة البيانات PostgreSQL وإلا unix)
+    SOCKETIO_BUS_DIR  مجلد مقابس unix (افتراضياً instance/socketio_bus)
+"""
+
+import os
+import time
+import uuid
+import select
+import socket
+import logging
+import threading
+
+import socketio
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger('SocketIOBus')
+
+SPILL_TABLE = 'socketio_bus_message'
+
+
+class MessageBusManager(socketio.PubSubManager):
+    """أساس مشترك: معرّف مستقل لكل عملية وعدادات الرسائل"""
+
+    def __init__(self, channel='socketio_bus', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.published = 0
+        self.received = 0
+        self._lock = None
+        self._lock_owner = None
+
+    def publish_lock(self):
+        """قفل النشر، يُنشأ عند أول نشر في العملية التي تنشر
+
+        مع gunicorn --preload يُنشأ المدير في العملية الأم قبل monkey_patch، فقفل من __init__
+        يكون قفلاً أصلياً: خيط أخضر ينتظره يحجب العملية كلها بينما صاحبه ينتظر الـ hub داخل
+        execute أو sendto. threading.Lock المقروء هنا (بعد fork و monkey_patch) قفل أخضر،
+        ويُعاد إنشاء القفل إذا تغيرت العملية أو استُبدل threading.Lock نفسه بالـ monkey_patch
+        """
+        owner = (os.getpid(), threading.Lock)
+        if self._lock_owner != owner:
+            self._lock = threading.Lock()
+            self._lock_owner = owner
+        return self._lock
+
+    def initialize(self):
+        # مع gunicorn --preload يُنشأ المدير في العملية الأم فترث كل العمليات host_id نفسه،
+        # فتتجاهل كل عملية رسائل الأخرى على أنها رسائلها. التهيئة تحدث في العملية التي تخدم
+        self.host_id = uuid.uuid4().hex
+        super().initialize()
+
+    def stats(self):
+        return {'backend': self.name, 'channel': self.channel,
+                'published': self.published, 'received': self.received}
+
+
+class PostgresNotifyManager(MessageBusManager):
+    """ناقل عبر LISTEN/NOTIFY في PostgreSQL"""
+
+    name = 'postgres'
+    notify_limit = 7900  # حد حمولة NOTIFY 8000 بايت
+
+    def __init__(self, url, channel='socketio_bus', write_only=False, logger=None,
+                 poll_timeout=5.0, reconnect_delay=1.0):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.url = url
+        self.poll_timeout = poll_timeout
+        self.reconnect_delay = reconnect_delay
+        self._conn = None
+        self._spill_ready = False
+        self._spills = 0
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.url)
+        conn.autocommit = True
+        return conn
+
+    def _publish(self, data):
+        import psycopg2
+
+        payload = self.json.dumps(data)
+        with self.publish_lock():
+            for attempt in (1, 2):
+                try:
+                    if self._conn is None or self._conn.closed:
+                        self._conn = self._connect()
+                    with self._conn.cursor() as cursor:
+                        if len(payload.encode('utf-8')) > self.notify_limit:
+                            payload_ref = self._spill(cursor, payload)
+                            cursor.execute('SELECT pg_notify(%s, %s)', (self.channel, payload_ref))
+                        else:
+                            cursor.execute('SELECT pg_notify(%s, %s)', (self.channel, payload))
+                    self.published += 1
+                    return
+                except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                    # انقطاع الاتصال: إعادة الاتصال مرة واحدة
+                    self._conn = None
+                    if attempt == 2:
+                        logger.error(f'❌ تعذر نشر رسالة Socket.IO عبر PostgreSQL: {e}')
+
+    def _spill(self, cursor, payload):
+        """حفظ رسالة كبيرة في الجدول المؤقت وإرجاع مرجعها @<id>"""
+        if not self._spill_ready:
+            cursor.execute(
+                f'CREATE UNLOGGED TABLE IF NOT EXISTS {SPILL_TABLE} ('
+                'id BIGSERIAL PRIMARY KEY, payload TEXT NOT NULL, '
+                'created_at TIMESTAMPTZ NOT NULL DEFAULT now())'
+            )
+            self._spill_ready = True
+        cursor.execute(f'INSERT INTO {SPILL_TABLE} (payload) VALUES (%s) RETURNING id', (payload,))
+        message_id = cursor.fetchone()[0]
+
+        self._spills += 1
+        if self._spills % 100 == 0:
+            cursor.execute(f"DELETE FROM {SPILL_TABLE} WHERE created_at < now() - interval '5 minutes'")
+        return f'@{message_id}'
+
+    def _listen(self):
+        import psycopg2
+        from psycopg2 import sql
+
+        while True:
+            conn = None
+            try:
+                conn = self._connect()
+                with conn.cursor() as cursor:
+                    cursor.execute(sql.SQL('LISTEN {}').format(sql.Identifier(self.channel)))
+                while True:
+                    # select معدّل تعاونياً مع eventlet؛ المهلة تكشف الاتصال المنقطع عبر poll
+                    select.select([conn], [], [], self.poll_timeout)
+                    conn.poll()
+                    while conn.notifies:
+                        payload = conn.notifies.pop(0).payload
+                        if payload.startswith('@'):
+                            with conn.cursor() as cursor:
+                                cursor.execute(f'SELECT payload FROM {SPILL_TABLE} WHERE id = %s',
+                                               (int(payload[1:]),))
+                                row = cursor.fetchone()
+                            if row is None:
+                                continue
+                            payload = row[0]
+                        self.received += 1
+                        yield payload
+            except psycopg2.Error as e:
+                logger.warning(f'⚠️ انقطع الاستماع لقناة {self.channel}، إعادة الاتصال: {e}')
+                time.sleep(self.reconnect_delay)
+            finally:
+                if conn is not None and not conn.closed:
+                    conn.close()
+
+
+class UnixSocketManager(MessageBusManager):
+    """ناقل عبر مقابس Unix datagram: مقبس لكل عملية في مجلد مشترك"""
+
+    name = 'unix'
+    max_datagram = 1024 * 1024
+
+    def __init__(self, bus_dir, channel='socketio_bus', write_only=False, logger=None, send_timeout=1.0):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.bus_dir = bus_dir
+        self.send_timeout = send_timeout
+        self.path = None
+        self._receiver = None
+        self._sender = None
+        os.makedirs(bus_dir, exist_ok=True)
+
+    def bind(self):
+        """إنشاء مقبس الاستقبال لهذه العملية (مرة واحدة)"""
+        if self._receiver is None:
+            # اسم قصير: حد مسار مقبس Unix نحو 108 أحرف
+            path = os.path.join(self.bus_dir, f'{self.channel}.{os.getpid()}.{self.host_id[:8]}.sock')
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.max_datagram)
+            receiver.bind(path)
+            self._receiver, self.path = receiver, path
+        return self._receiver
+
+    def close(self):
+        if self._receiver is not None:
+            self._receiver.close()
+            self._receiver = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def peers(self):
+        """مسارات مقابس العمليات الأخرى على القناة نفسها"""
+        prefix = f'{self.channel}.'
+        return [os.path.join(self.bus_dir, name) for name in os.listdir(self.bus_dir)
+                if name.startswith(prefix) and name.endswith('.sock')
+                and os.path.join(self.bus_dir, name) != self.path]
+
+    def _publish(self, data):
+        payload = self.json.dumps(data).encode('utf-8')
+        if len(payload) > self.max_datagram:
+            logger.error(f'❌ رسالة Socket.IO أكبر من {self.max_datagram} بايت، لن تُرسل للعمليات الأخرى')
+            return
+
+        with self.publish_lock():
+            if self._sender is None:
+                self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._sender.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.max_datagram)
+                self._sender.settimeout(self.send_timeout)
+            for path in self.peers():
+                try:
+                    self._sender.sendto(payload, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # مقبس عملية منتهية
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                except OSError as e:
+                    # عملية مشغولة امتلأ مخزنها: لا تُعطّل البقية
+                    logger.warning(f'⚠️ تعذر إرسال رسالة Socket.IO إلى {os.path.basename(path)}: {e}')
+            self.published += 1
+
+    def _listen(self):
+        receiver = self.bind()
+        while True:
+            data = receiver.recv(self.max_datagram)
+            self.received += 1
+            yield data.decode('utf-8')
+
+
+def resolve_bus_mode(mode, database_url):
+    """تحويل SOCKETIO_BUS إلى postgres أو unix أو None"""
+    mode = (mode or 'none').strip().lower()
+    if mode in ('', 'none', '0', 'off'):
+        return None
+    is_postgres = bool(database_url) and database_url.startswith(('postgres://', 'postgresql'))
+    if mode == 'auto':
+        return 'postgres' if is_postgres else ('unix' if hasattr(socket, 'AF_UNIX') else None)
+    if mode == 'postgres' and not is_postgres:
+        raise ValueError('SOCKETIO_BUS=postgres يتطلب DATABASE_URL لقاعدة PostgreSQL')
+    if mode not in ('postgres', 'unix'):
+        raise ValueError(f'قيمة SOCKETIO_BUS غير معروفة: {mode}')
+    return mode
+
+
+def libpq_url(database_url):
+    """رابط SQLAlchemy (postgresql+psycopg2://) بصيغة يقبلها psycopg2.connect"""
+    url = make_url(database_url.replace('postgres://', 'postgresql://', 1))
+    return url.set(drivername='postgresql').render_as_string(hide_password=False)
+
+
+def create_message_bus(mode, database_url=None, bus_dir=None, channel='socketio_bus'):
+    """إنشاء مدير العملاء المناسب أو None للعمل بعملية واحدة"""
+    mode = resolve_bus_mode(mode, database_url)
+    if mode == 'postgres':
+        return PostgresNotifyManager(libpq_url(database_url), channel=channel)
+    if mode == 'unix':
+        return UnixSocketManager(bus_dir, channel=channel)
+    return None
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+⏱️ مراقبة استعلامات SQL لكل طلب
+Per-request SQL profiler
+
+يلتقط كل استعلام ينفذه محرك SQLAlchemy أثناء الطلب ويحسب:
+- عدد الاستعلامات وزمنها الإجمالي
+- الأشكال المتكررة للاستعلام نفسه (نمط N+1 مثل s.customer.name داخل حلقة)
+- ترويسة Server-Timing تظهر في أدوات المطور بالمتصفح (لا تُضاف للاستجابات المتدفقة)
+- سجل للطلبات البطيئة مع أثقل الاستعلامات
+
+الإعدادات (متغيرات البيئة أو app.config):
+    SQL_PROFILER_ENABLED   تفعيل المراقبة (افتراضياً 1)
+    SLOW_REQUEST_MS        حد الطلب البطيء بالملي ثانية (افتراضياً 500، 0 للتعطيل)
+    SQL_NPLUSONE_THRESHOLD عدد تكرار الشكل نفسه لاعتباره N+1 (افتراضياً 10)
+    SQL_PROFILER_TOP       عدد الاستعلامات المعروضة في السجل (افتراضياً 5)
+"""
+
+import os
+import re
+import time
+import logging
+
+from flask import g, request, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('SQLProfiler')
+
+# توحيد شكل الاستعلام: القيم الحرفية وقوائم IN الطويلة لا تغير الشكل
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:\?|%\(\w+\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+))+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """إرجاع الشكل الموحد للاستعلام"""
+    shape = _STRING_LITERAL.sub('?', statement)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(?, ...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class RequestProfile:
+    """إحصائيات الاستعلامات لطلب واحد"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.total = 0.0
+        self.shapes = {}
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total += duration
+        shape = statement_shape(statement)
+        stats = self.shapes.get(shape)
+        if stats is None:
+            self.shapes[shape] = [1, duration]
+        else:
+            stats[0] += 1
+            stats[1] += duration
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def repeated(self, threshold):
+        """الأشكال المتكررة بعدد يساوي الحد أو يزيد عليه"""
+        return sorted(
+            ((shape, count, duration) for shape, (count, duration) in self.shapes.items()
+             if count >= threshold),
+            key=lambda item: item[1], reverse=True
+        )
+
+    def top(self, limit):
+        """أثقل الأشكال من حيث الزمن الإجمالي"""
+        return sorted(
+            ((shape, count, duration) for shape, (count, duration) in self.shapes.items()),
+            key=lambda item: item[2], reverse=True
+        )[:limit]
+
+
+class SQLProfiler:
+    """مراقب استعلامات SQL على مستوى الطلب"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.enabled = True
+        self.slow_request_ms = 500
+        self.nplusone_threshold = 10
+        self.top_statements = 5
+
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """تهيئة المراقب مع Flask"""
+        self.app = app
+        config = app.config
+        self.enabled = str(config.get('SQL_PROFILER_ENABLED',
+                                      os.environ.get('SQL_PROFILER_ENABLED', '1'))).lower() not in ('0', 'false', 'no')
+        self.slow_request_ms = float(config.get('SLOW_REQUEST_MS', os.environ.get('SLOW_REQUEST_MS', 500)))
+        self.nplusone_threshold = int(config.get('SQL_NPLUSONE_THRESHOLD',
+                                                 os.environ.get('SQL_NPLUSONE_THRESHOLD', 10)))
+        self.top_statements = int(config.get('SQL_PROFILER_TOP', os.environ.get('SQL_PROFILER_TOP', 5)))
+
+        if not self.enabled:
+            return
+
+        # الاستماع على فئة Engine يشمل المحرك الذي ينشئه Flask-SQLAlchemy لاحقاً
+        if not event.contains(Engine, 'before_cursor_execute', self.before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+
+    # ----- أحداث المحرك -----
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_app_context() and 'sql_profile' in g:
+            conn.info.setdefault('sql_profiler_started', []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not has_app_context() or 'sql_profile' not in g:
+            return
+        started = conn.info.get('sql_profiler_started')
+        if not started:
+            return
+        g.sql_profile.record(statement, time.perf_counter() - started.pop())
+
+    # ----- أحداث الطلب -----
+
+    def start_request(self):
+        g.sql_profile = RequestProfile()
+
+    def finish_request(self, response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        if response.is_streamed:
+            # جسم الاستجابة المتدفقة (NDJSON، CSV) ينفذ استعلاماته بعد هذه النقطة،
+            # فالأرقام هنا ناقصة وتُضلل أكثر مما تفيد في أثقل الطلبات
+            return response
+
+        elapsed_ms = profile.elapsed * 1000
+        db_ms = profile.total * 1000
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={db_ms:.1f};desc="{profile.count} queries", app;dur={elapsed_ms - db_ms:.1f}'
+        )
+
+        repeated = profile.repeated(self.nplusone_threshold)
+        if repeated:
+            shape, count, duration = repeated[0]
+            response.headers.add('Server-Timing', f'nplus1;dur={duration * 1000:.1f};desc="{count}x"')
+            logger.warning(
+                f"🔁 N+1 محتمل في {request.method} {request.path}: "
+                f"{count} استعلام بالشكل نفسه ({duration * 1000:.1f} ms)\n    {shape[:300]}"
+            )
+
+        if self.slow_request_ms and elapsed_ms >= self.slow_request_ms:
+            lines = [
+                f"🐢 طلب بطيء {request.method} {request.path}: {elapsed_ms:.0f} ms، "
+                f"{profile.count} استعلام ({db_ms:.0f} ms في قاعدة البيانات)"
+            ]
+            for shape, count, duration in profile.top(self.top_statements):
+                lines.append(f"    {duration * 1000:8.1f} ms  x{count:<4} {shape[:200]}")
+            logger.warning('\n'.join(lines))
+
+        return response
+
+
+# إنشاء مثيل المراقب
+sql_profiler = SQLProfiler()
+
+
+def init_sql_profiler(app):
+    """تهيئة مراقب استعلامات SQL"""
+    sql_profiler.init_app(app)
+    return sql_profiler
@@ -7,8 +7,15 @@ Comprehensive Testing System
 
 import os
 import sys
+import tempfile
 
 # إضافة مسار التطبيق
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# قاعدة بيانات مؤقتة للاختبارات حتى لا تُمس بيانات التطوير أو الإنتاج
+_TEST_DIR = tempfile.mkdtemp(prefix='accounting_tests_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_TEST_DIR, 'accounting_test.db')
+os.environ['TEMPLATE_CACHE_DIR'] = os.path.join(_TEST_DIR, 'jinja_cache')
+os.environ['JOB_RESULTS_DIR'] = os.path.join(_TEST_DIR, 'job_results')
+
 __all__ = []
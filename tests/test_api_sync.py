@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات واجهة API للمزامنة
+Sync API Tests
+"""
+
+import json
+import unittest
+from datetime import date, datetime, timedelta
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db
+
+
+class TestSyncAPI(unittest.TestCase):
+    """اختبارات الصفحات والحقول و ETag و NDJSON"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            customer = system.Customer(name='عميل API')
+            db.session.add(customer)
+            for i in range(25):
+                invoice = system.SalesInvoice(
+                    invoice_number=f'API-{i}', date=date(2024, 1, 1), subtotal=10, total=11.5,
+                    status='paid', customer=customer if i % 2 else None
+                )
+                invoice.items.append(system.SalesInvoiceItem(product_name='صنف', quantity=1,
+                                                             unit_price=10, total_price=10))
+                db.session.add(invoice)
+            db.session.commit()
+
+    def test_cursor_pagination(self):
+        """المؤشر يمر على كل الفواتير مرة واحدة"""
+        seen = []
+        url = '/api/sales?per_page=10'
+        while url:
+            payload = self.client.get(url).get_json()
+            seen.extend(row['id'] for row in payload['data'])
+            url = f"/api/sales?per_page=10&cursor={payload['next_cursor']}" if payload['next_cursor'] else None
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, sorted(set(seen)))
+
+    def test_fields_projection(self):
+        """fields= يحدد الحقول المُرجعة"""
+        payload = self.client.get('/api/sales?fields=invoice_number,customer_name').get_json()
+        self.assertEqual(set(payload['data'][0]), {'id', 'invoice_number', 'customer_name'})
+        names = {row['customer_name'] for row in payload['data']}
+        self.assertEqual(names, {'عميل API', 'عميل نقدي'})
+
+        response = self.client.get('/api/sales?fields=password')
+        self.assertEqual(response.status_code, 400)
+
+    def test_updated_since(self):
+        """updated_since يُرجع السجلات المعدلة فقط"""
+        with app.app_context():
+            invoice = system.SalesInvoice.query.filter_by(invoice_number='API-3').first()
+            invoice.updated_at = datetime.utcnow() + timedelta(days=1)
+            db.session.commit()
+        since = (datetime.utcnow() + timedelta(hours=1)).isoformat()
+        payload = self.client.get(f'/api/sales?updated_since={since}').get_json()
+        self.assertEqual([row['invoice_number'] for row in payload['data']], ['API-3'])
+        self.assertEqual(self.client.get('/api/sales?updated_since=yesterday').status_code, 400)
+
+    def test_etag(self):
+        """If-None-Match يعيد 304 عند عدم التغيير"""
+        response = self.client.get('/api/customers')
+        etag = response.headers['ETag']
+        cached = self.client.get('/api/customers', headers={'If-None-Match': etag})
+        self.assertEqual(cached.status_code, 304)
+
+        with app.app_context():
+            db.session.add(system.Customer(name='عميل جديد'))
+            db.session.commit()
+        changed = self.client.get('/api/customers', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+
+    def test_ndjson_stream(self):
+        """format=ndjson يبث كل الصفوف سطراً بسطر (أصناف الفواتير للمستخدم المسجل فقط)"""
+        url = '/api/sales_items?format=ndjson&fields=invoice_id,total_price'
+        self.assertEqual(self.client.get(url).status_code, 302)
+        with app.app_context():
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            db.session.add(admin)
+            db.session.commit()
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+        response = self.client.get(url)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(rows[0]['total_price'], 10.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
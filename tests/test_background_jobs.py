@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات المهام في الخلفية
+Background Job Runner Tests
+"""
+
+import time
+import unittest
+import importlib.util
+from datetime import date
+from unittest import mock
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db, BackgroundJob
+
+
+class TestBackgroundJobs(unittest.TestCase):
+    """اختبارات إرسال المهام ومتابعتها وتحميل نتائجها"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        app.config['JOB_EXECUTOR'] = 'inline'
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            for username, role in (('admin', 'admin'), ('cashier', 'user')):
+                user = system.User(username=username, full_name=username, role=role)
+                user.set_password('admin123')
+                db.session.add(user)
+            for i in range(3):
+                db.session.add(system.Employee(name=f'موظف {i}', position='محاسب', salary=5000,
+                                               allowances=500, deductions=100, hire_date=date(2023, 1, 1),
+                                               status='active' if i < 2 else 'inactive'))
+            db.session.add(system.Expense(description='كهرباء', amount=300, category='utilities',
+                                          date=date(2024, 2, 1)))
+            db.session.commit()
+        self.login('admin')
+
+    def login(self, username):
+        self.client.get('/logout')
+        self.client.post('/login', data={'username': username, 'password': 'admin123'})
+
+    def submit(self, kind, params):
+        response = self.client.post(f'/jobs/{kind}', json=params)
+        self.assertEqual(response.status_code, 202)
+        return response.get_json()['job']['id']
+
+    def status(self, job_id):
+        return self.client.get(f'/api/jobs/{job_id}').get_json()['job']
+
+    def test_export_job_download(self):
+        """مهمة التصدير تنتج ملفاً قابلاً للتحميل"""
+        job_id = self.submit('export', {'report_type': 'expenses', 'format': 'csv',
+                                        'filters': {'category': 'utilities'}})
+        job = self.status(job_id)
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['progress'], 100)
+        download = self.client.get(job['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertIn('كهرباء', download.get_data(as_text=True))
+
+    def test_payroll_run_idempotent(self):
+        """مسير الرواتب ينشئ كشوف الموظفين النشطين مرة واحدة"""
+        self.submit('payroll_run', {'month': 3, 'year': 2024})
+        self.submit('payroll_run', {'month': 3, 'year': 2024})
+        with app.app_context():
+            payrolls = system.EmployeePayroll.query.filter_by(month=3, year=2024).all()
+            self.assertEqual(len(payrolls), 2)
+            self.assertEqual(float(payrolls[0].net_salary), 5400.0)
+
+    def test_failed_job_recorded(self):
+        """فشل المهمة يُسجل برسالة"""
+        job_id = self.submit('export', {'report_type': 'unknown'})
+        job = self.status(job_id)
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('غير مدعوم', job['message'])
+        self.assertEqual(self.client.post('/jobs/format_disk', json={}).status_code, 400)
+
+    def test_completion_broadcast(self):
+        """انتهاء المهمة يُرسل لغرفة المستخدم"""
+        with mock.patch.object(system, 'broadcast_update') as broadcast:
+            job_id = self.submit('payroll_run', {'month': 1, 'year': 2024})
+        event_type, payload = broadcast.call_args.args
+        self.assertEqual(event_type, 'job')
+        self.assertEqual(payload['id'], job_id)
+        self.assertTrue(broadcast.call_args.kwargs['room'].startswith('user_'))
+
+    def test_jobs_private(self):
+        """المستخدم لا يرى مهام غيره"""
+        job_id = self.submit('payroll_run', {'month': 1, 'year': 2024})
+        self.login('cashier')
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}').status_code, 404)
+        self.assertEqual(self.client.get('/jobs').status_code, 200)
+
+    def test_admin_only_kinds(self):
+        """الرواتب والنسخ الاحتياطي للمدير فقط"""
+        self.login('cashier')
+        for kind in system.ADMIN_JOB_KINDS:
+            self.assertEqual(self.client.post(f'/jobs/{kind}', json={'month': 1, 'year': 2024}).status_code, 403)
+        self.assertEqual(self.client.post('/create_backup').status_code, 403)
+        self.submit('export', {'report_type': 'expenses', 'format': 'csv'})
+        with app.app_context():
+            self.assertEqual([job.kind for job in BackgroundJob.query], ['export'])
+
+    def test_orphaned_jobs_failed(self):
+        """مهام عملية ميتة تُسجل فاشلة، ومهام العمليات الحية تبقى"""
+        import multiprocessing
+
+        dead = multiprocessing.get_context('spawn').Process(target=time.sleep, args=(0,))
+        dead.start()
+        dead.join()
+        with app.app_context():
+            jobs = [BackgroundJob(kind='export', status='running', pid=dead.pid),
+                    BackgroundJob(kind='export', status='queued', pid=system.os.getpid()),
+                    BackgroundJob(kind='export', status='done', pid=dead.pid)]
+            db.session.add_all(jobs)
+            db.session.commit()
+            self.assertEqual(system.fail_orphaned_jobs(), 1)
+            self.assertEqual([db.session.get(BackgroundJob, job.id).status for job in jobs],
+                             ['failed', 'queued', 'done'])
+
+    @unittest.skipUnless(importlib.util.find_spec('xlsxwriter'), 'xlsxwriter غير مثبت')
+    def test_vat_report_redirects_to_jobs(self):
+        """ملف تقرير الضريبة يُجهز في الخلفية"""
+        response = self.client.get('/vat_report?format=excel')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/jobs', response.headers['Location'])
+        with app.app_context():
+            self.assertEqual(BackgroundJob.query.one().status, 'done')
+
+    def test_process_pool(self):
+        """المهمة تعمل فعلاً في عملية منفصلة"""
+        app.config['JOB_EXECUTOR'] = 'process'
+        try:
+            job_id = self.submit('payroll_run', {'month': 4, 'year': 2024})
+            deadline = time.time() + 60
+            while self.status(job_id)['status'] in ('queued', 'running') and time.time() < deadline:
+                time.sleep(0.2)
+            self.assertEqual(self.status(job_id)['status'], 'done')
+        finally:
+            app.config['JOB_EXECUTOR'] = 'inline'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات تغيير الحالة جماعياً وترحيل الفواتير المتأخرة
+Bulk Status and Overdue Sweep Tests
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import socket
+import tempfile
+import unittest
+import subprocess
+import urllib.request
+import importlib.util
+from datetime import date, timedelta
+from unittest import mock
+
+from sqlalchemy import event, create_engine
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db, SalesInvoice, Customer, Payment
+
+
+class TestBulkStatus(unittest.TestCase):
+    """اختبارات واجهة الحالة الجماعية والترحيل الدوري"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.today = date(2024, 6, 30)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            customers = [Customer(name='عميل 1'), Customer(name='عميل 2')]
+            db.session.add_all([admin] + customers)
+            db.session.flush()
+            for i in range(12):
+                db.session.add(SalesInvoice(
+                    invoice_number=f'S-{i}', customer_id=customers[i % 2].id,
+                    date=self.today - timedelta(days=5 * i), subtotal=10, total=10,
+                    status='paid' if i == 0 else 'pending',
+                    payment_method='credit' if i % 3 == 0 else 'cash'
+                ))
+            db.session.commit()
+            system.rebuild_balances()
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def statuses(self):
+        with app.app_context():
+            return {number: status for number, status in
+                    db.session.query(SalesInvoice.invoice_number, SalesInvoice.status)}
+
+    def ids(self, *numbers):
+        with app.app_context():
+            return [invoice_id for invoice_id, in db.session.query(SalesInvoice.id)
+                    .filter(SalesInvoice.invoice_number.in_(numbers))]
+
+    def test_default_due_date(self):
+        with app.app_context():
+            invoice = SalesInvoice.query.filter_by(invoice_number='S-2').one()
+            self.assertEqual(invoice.due_date, invoice.date + timedelta(days=app.config['PAYMENT_TERMS_DAYS']))
+
+    def test_bulk_overdue_by_ids(self):
+        with mock.patch.object(system, 'broadcast_update') as broadcast:
+            data = self.client.post('/api/invoices/bulk_status', json={
+                'type': 'sale', 'status': 'overdue', 'ids': self.ids('S-0', 'S-1', 'S-2')
+            }).get_json()
+        self.assertEqual((data['updated'], data['skipped']), (2, 1))  # المدفوعة لا تتغير
+        statuses = self.statuses()
+        self.assertEqual((statuses['S-0'], statuses['S-1'], statuses['S-3']), ('paid', 'overdue', 'pending'))
+        broadcast.assert_called_once_with('invoices_status', {'type': 'sale', 'status': 'overdue', 'count': 2})
+
+    def test_bulk_by_filter(self):
+        data = self.client.post('/api/invoices/bulk_status?payment_method=credit&status=pending',
+                                json={'type': 'sale', 'status': 'overdue'}).get_json()
+        self.assertEqual(data['updated'], 3)  # S-3 و S-6 و S-9
+        self.assertEqual(sorted(n for n, s in self.statuses().items() if s == 'overdue'), ['S-3', 'S-6', 'S-9'])
+
+        # بدون معرفات أو فلاتر يُرفض الطلب
+        response = self.client.post('/api/invoices/bulk_status', json={'type': 'sale', 'status': 'overdue'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_paid_one_payment_per_party(self):
+        data = self.client.post('/api/invoices/bulk_status', json={
+            'type': 'sale', 'status': 'paid', 'ids': self.ids('S-1', 'S-2', 'S-3', 'S-4')
+        }).get_json()
+        self.assertEqual(data['updated'], 4)
+        with app.app_context():
+            self.assertEqual(sorted(float(p.amount) for p in Payment.query), [20.0, 20.0])
+            self.assertEqual(sorted(float(c.balance) for c in Customer.query), [30.0, 40.0])
+
+    def test_chunked_update(self):
+        """عبارة UPDATE واحدة لكل دفعة من المعرفات"""
+        statements = []
+
+        def _record(conn, cursor, statement, *args):
+            if statement.startswith('UPDATE sales_invoice'):
+                statements.append(statement)
+
+        with app.app_context():
+            ids = [invoice_id for invoice_id, in db.session.query(SalesInvoice.id)]
+            event.listen(db.engine, 'before_cursor_execute', _record)
+            try:
+                self.assertEqual(system.bulk_update_status(SalesInvoice, ids, 'overdue', chunk_size=5), 11)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', _record)
+            db.session.commit()
+        self.assertEqual(len(statements), 3)
+
+    def test_sweep(self):
+        with app.app_context():
+            # الفواتير من S-7 فأقدم تجاوزت 30 يوماً
+            with mock.patch.object(system, 'broadcast_update') as broadcast:
+                counts = system.sweep_overdue_invoices(today=self.today, chunk_size=2)
+            self.assertEqual(counts, {'sale': 5, 'purchase': 0})
+            broadcast.assert_called_once_with('invoices_overdue', counts)
+            self.assertEqual(system.sweep_overdue_invoices(today=self.today), {'sale': 0, 'purchase': 0})
+        overdue = sorted(n for n, s in self.statuses().items() if s == 'overdue')
+        self.assertEqual(overdue, ['S-10', 'S-11', 'S-7', 'S-8', 'S-9'])
+
+    def test_backfill_due_dates(self):
+        with app.app_context():
+            SalesInvoice.query.update({SalesInvoice.due_date: None})
+            db.session.commit()
+            self.assertEqual(system.backfill_due_dates(), 12)
+            invoice = SalesInvoice.query.filter_by(invoice_number='S-4').one()
+            self.assertEqual(invoice.due_date, invoice.date + timedelta(days=app.config['PAYMENT_TERMS_DAYS']))
+
+    def test_mark_as_overdue_reopens_paid_invoice(self):
+        """الفاتورة المدفوعة تعود غير مدفوعة وتبقى دفعتها رصيداً دائناً"""
+        invoice_id = self.ids('S-1')[0]
+        self.client.post(f'/mark_as_paid/sale/{invoice_id}')
+        self.assertTrue(self.client.post(f'/mark_as_overdue/sale/{invoice_id}').get_json()['success'])
+        with app.app_context():
+            invoice = db.session.get(SalesInvoice, invoice_id)
+            self.assertEqual((invoice.status, float(invoice.amount_paid), float(invoice.balance_due)),
+                             ('overdue', 0.0, 10.0))
+            self.assertEqual(float(invoice.customer.balance), 50.0)  # 60 مستحقة - دفعة 10 غير مخصصة
+
+        # المدفوعة مسبقاً بدون دفعة تضيف مبلغها لرصيد العميل
+        legacy_id = self.ids('S-0')[0]
+        self.client.post(f'/mark_as_overdue/sale/{legacy_id}')
+        with app.app_context():
+            self.assertEqual(float(db.session.get(SalesInvoice, legacy_id).customer.balance), 60.0)
+
+    def test_sweeper_scheduled_on_timer_wheel(self):
+        self.addCleanup(system.timer_wheel.cancel, 'overdue_sweep')
+        with mock.patch.object(system.timer_wheel, 'start'):
+            system.start_overdue_sweeper()
+        self.assertIn('overdue_sweep', system.timer_wheel)
+
+
+# تشغيل سكربت التحديث الفوري في node مع DOM مبسط، وإرجاع الإشعارات وإعادات التحميل لكل حالة
+CLIENT_HARNESS = '''
+const vm = require('vm');
+const results = [];
+for (const testCase of __CASES__) {
+    const handlers = {};
+    const notes = [];
+    let reloads = 0;
+    const context = {
+        console: {log() {}},
+        io: () => ({on: (name, handler) => { handlers[name] = handler; }, emit() {}}),
+        location: {pathname: testCase.path, reload() { reloads += 1; }},
+        setTimeout: (callback) => { callback(); return 1; },
+        document: {querySelectorAll: () => []},
+    };
+    vm.createContext(context);
+    vm.runInContext(__SCRIPT__, context);
+    context.showNotification = (message, type) => notes.push([message, type]);
+    handlers.data_update(testCase.event);
+    results.push({notes: notes, reloads: reloads});
+}
+console.log(JSON.stringify(results));
+'''
+
+
+@unittest.skipUnless(shutil.which('node') and system.SOCKETIO_JS, 'node أو Socket.IO غير متاح')
+class TestInvoiceStatusClient(unittest.TestCase):
+    """المتصفح يعرض بث تغيّر الحالة ويعيد تحميل صفحة الفواتير المعنية"""
+
+    def run_client(self, cases):
+        script = re.findall(r'<script>(.*?)</script>', system.SOCKETIO_JS, re.S)[-1]
+        harness = CLIENT_HARNESS.replace('__CASES__', json.dumps(cases)).replace('__SCRIPT__', json.dumps(script))
+        result = subprocess.run(['node', '-'], input=harness, capture_output=True, text=True, timeout=30)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout)
+
+    def test_status_broadcasts_handled(self):
+        overdue = {'type': 'invoices_overdue', 'data': {'sale': 3, 'purchase': 0}}
+        bulk = {'type': 'invoices_status', 'data': {'type': 'purchase', 'status': 'paid', 'count': 2}}
+        results = self.run_client([
+            {'path': '/sales', 'event': overdue},
+            {'path': '/purchases', 'event': overdue},
+            {'path': '/purchases', 'event': bulk},
+            {'path': '/sales', 'event': {'type': 'invoices_overdue', 'data': {'sale': 0, 'purchase': 0}}},
+        ])
+        self.assertEqual(results[0], {'notes': [['تم تحويل 3 فاتورة إلى متأخرة', 'warning']], 'reloads': 1})
+        self.assertEqual(results[1], {'notes': [['تم تحويل 3 فاتورة إلى متأخرة', 'warning']], 'reloads': 0})
+        self.assertEqual(results[2], {'notes': [['تم تحويل 2 فاتورة إلى مدفوعة', 'info']], 'reloads': 1})
+        self.assertEqual(results[3], {'notes': [], 'reloads': 0})
+
+    def test_sweep_broadcast_shape(self):
+        """الترحيل يبث العدد لكل نوع بالشكل الذي يقرؤه المتصفح"""
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(SalesInvoice(invoice_number='LATE', date=date(2024, 1, 1), due_date=date(2024, 1, 31),
+                                        subtotal=5, total=5, status='pending'))
+            db.session.commit()
+            with mock.patch.object(system, 'broadcast_update') as broadcast:
+                system.sweep_overdue_invoices(today=date(2024, 6, 1))
+        broadcast.assert_called_once_with('invoices_overdue', {'sale': 1, 'purchase': 0})
+
+
+@unittest.skipUnless(importlib.util.find_spec('gunicorn') and importlib.util.find_spec('eventlet'),
+                     'gunicorn أو eventlet غير مثبت')
+class TestGunicornSweeper(unittest.TestCase):
+    """تشغيل فعلي بإعدادات gunicorn.conf.py (eventlet و --preload) مع الترحيل الدوري كل ثانية"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.workdir, 'smoke.db')
+        engine = create_engine(f'sqlite:///{self.path}')
+        db.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(SalesInvoice.__table__.insert(), {
+                'invoice_number': 'LATE-1', 'date': date.today() - timedelta(days=60),
+                'due_date': date.today() - timedelta(days=30), 'subtotal': 10, 'total': 10,
+                'status': 'pending', 'branch': 'Place India'
+            })
+        engine.dispose()
+
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            self.port = probe.getsockname()[1]
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PORT=str(self.port), DATABASE_URL=f'sqlite:///{self.path}',
+                   OVERDUE_SWEEP_SECONDS='1', WORKER_CLASS='eventlet', GUNICORN_PRELOAD='1',
+                   WEB_CONCURRENCY='1', JOB_RESULTS_DIR=os.path.join(self.workdir, 'jobs'))
+        self.server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application'],
+            cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.addCleanup(self.stop)
+
+    def stop(self):
+        self.server.terminate()
+        try:
+            self.server.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            self.server.kill()
+            self.server.wait()
+
+    def get(self, timeout=5):
+        with urllib.request.urlopen(f'http://127.0.0.1:{self.port}/login', timeout=timeout) as response:
+            return response.status
+
+    def invoice_status(self):
+        engine = create_engine(f'sqlite:///{self.path}')
+        try:
+            with engine.connect() as conn:
+                return conn.exec_driver_sql("SELECT status FROM sales_invoice WHERE invoice_number = 'LATE-1'").scalar()
+        finally:
+            engine.dispose()
+
+    def test_requests_served_while_sweeping(self):
+        deadline = time.time() + 90
+        while True:
+            self.assertIsNone(self.server.poll(), 'توقف gunicorn أثناء التشغيل')
+            try:
+                self.get(timeout=2)
+                break
+            except OSError:
+                if time.time() > deadline:
+                    self.fail('gunicorn لم يستجب')
+                time.sleep(0.5)
+
+        # عدة دورات ترحيل: كل طلب يجب أن يُخدم خلال مهلته ولا يعلق خلف عجلة المؤقتات
+        for _ in range(8):
+            self.assertEqual(self.get(), 200)
+            time.sleep(0.5)
+        self.assertEqual(self.invoice_status(), 'overdue')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات الملخصات اليومية للوحة التحكم
+Daily Summary Rollup Tests
+"""
+
+import unittest
+from decimal import Decimal
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db, DailySummary, SalesInvoice
+
+
+class TestDailySummary(unittest.TestCase):
+    """اختبارات تحديث الملخصات اليومية مع عمليات الكتابة"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            db.session.add_all([admin, system.Supplier(name='مورد')])
+            db.session.commit()
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def add_sale(self, number, total):
+        """إضافة فاتورة مبيعات عبر المسار"""
+        return self.client.post('/add_sale', data={
+            'invoice_number': number,
+            'subtotal': str(total),
+            'total': str(total)
+        })
+
+    def totals(self, **kwargs):
+        with app.app_context():
+            return system.get_summary_totals(**kwargs)
+
+    def test_writes_update_summary(self):
+        """إضافة وحذف الفواتير والمصروفات تنعكس على الملخص"""
+        self.add_sale('S-1', 100)
+        self.add_sale('S-2', 50)
+        self.client.post('/add_purchase', data={'invoice_number': 'P-1', 'supplier_id': '1',
+                                                'subtotal': '30', 'total': '30'})
+        self.client.post('/add_expense', data={'description': 'كهرباء', 'amount': '20', 'category': 'عام'})
+
+        totals = self.totals()
+        self.assertEqual(totals['sales_count'], 2)
+        self.assertEqual(Decimal(totals['sales_total']), Decimal('150'))
+        self.assertEqual(Decimal(totals['purchases_total']), Decimal('30'))
+        self.assertEqual(Decimal(totals['expenses_total']), Decimal('20'))
+
+        with app.app_context():
+            sale_id = SalesInvoice.query.filter_by(invoice_number='S-2').first().id
+        self.client.delete(f'/delete_sale/{sale_id}')
+        self.assertEqual(Decimal(self.totals()['sales_total']), Decimal('100'))
+
+    def test_status_changes_track_paid_amount(self):
+        """تغيير الحالة إلى مدفوعة ثم متأخرة يعدل المبلغ المدفوع"""
+        self.add_sale('S-1', 80)
+        with app.app_context():
+            sale_id = SalesInvoice.query.first().id
+
+        self.client.post(f'/mark_as_paid/sale/{sale_id}')
+        self.assertEqual(Decimal(self.totals()['sales_paid']), Decimal('80'))
+        self.client.post(f'/mark_as_overdue/sale/{sale_id}')
+        self.assertEqual(Decimal(self.totals()['sales_paid']), Decimal('0'))
+
+    def test_branch_filter(self):
+        """مبيعات الفرع لا تشمل الفروع الأخرى"""
+        self.add_sale('S-1', 100)
+        with app.app_context():
+            SalesInvoice.query.first().branch = 'China Town'
+            db.session.commit()
+            system.rebuild_daily_summaries()
+        self.assertEqual(Decimal(self.totals(branch='Place India')['sales_total']), Decimal('0'))
+        self.assertEqual(Decimal(self.totals(branch='China Town')['sales_total']), Decimal('100'))
+
+    def test_rebuild_matches_incremental(self):
+        """إعادة البناء الكاملة تطابق التحديث التدريجي"""
+        self.add_sale('S-1', 100)
+        self.add_sale('S-2', 25)
+        incremental = self.totals()
+        with app.app_context():
+            system.rebuild_daily_summaries()
+            self.assertEqual(DailySummary.query.count(), 1)
+        self.assertEqual(self.totals(), incremental)
+
+    def test_dashboard_renders(self):
+        """لوحة التحكم تعمل مع الملخصات"""
+        self.add_sale('S-1', 100)
+        response = self.client.get('/dashboard')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/statistics').json['data']['financial']['total_sales'], 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات محرك التصدير
+Export Engine Tests
+"""
+
+import csv
+import io
+import zipfile
+import unittest
+import importlib.util
+from unittest import mock
+from datetime import date
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db
+
+XLSX_AVAILABLE = importlib.util.find_spec('xlsxwriter') is not None
+
+
+class TestExport(unittest.TestCase):
+    """اختبارات تصدير CSV و Excel"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            db.session.add(admin)
+            customer = system.Customer(name='عميل التصدير')
+            for i in range(6):
+                invoice = system.SalesInvoice(
+                    invoice_number=f'EXP-{i}', date=date(2024, 1, i + 1), subtotal=20, total=23,
+                    customer=customer if i % 2 else None, branch='China Town' if i < 3 else 'Place India'
+                )
+                invoice.items.append(system.SalesInvoiceItem(product_name='أ', quantity=1, unit_price=5, total_price=5))
+                invoice.items.append(system.SalesInvoiceItem(product_name='ب', quantity=3, unit_price=5, total_price=15))
+                db.session.add(invoice)
+            db.session.add(system.Expense(description='إيجار', amount=1000, category='rent', date=date(2024, 1, 1)))
+            db.session.commit()
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def read_csv(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.mimetype, 'text/csv')
+        return list(csv.reader(io.StringIO(response.get_data(as_text=True).lstrip('﻿'))))
+
+    def test_sales_csv_lines(self):
+        """تصدير المبيعات يخرج صفاً لكل صنف"""
+        rows = self.read_csv('/export_excel/sales?format=csv')
+        self.assertEqual(rows[0][0], 'رقم الفاتورة')
+        self.assertEqual(len(rows) - 1, 12)
+        self.assertIn('عميل التصدير', {row[3] for row in rows[1:]})
+
+    def test_filters_applied(self):
+        """فلاتر الرابط تُطبق على التصدير"""
+        rows = self.read_csv('/export_excel/sales?format=csv&branch=China+Town&date_from=2024-01-02')
+        self.assertEqual({row[0] for row in rows[1:]}, {'EXP-1', 'EXP-2'})
+
+    def test_all_reports_export(self):
+        """كل أنواع التقارير قابلة للتصدير"""
+        for report_type in ('sales', 'purchases', 'expenses', 'inventory', 'employees', 'payroll', 'payments'):
+            response = self.client.get(f'/export_excel/{report_type}?format=csv')
+            self.assertEqual(response.status_code, 200, report_type)
+            response.get_data()
+            response.close()
+        self.assertEqual(self.client.get('/export_excel/unknown').status_code, 302)
+
+    @unittest.skipUnless(XLSX_AVAILABLE, 'xlsxwriter غير مثبت')
+    def test_xlsx_export(self):
+        """ملف xlsx صالح يحتوي الصفوف"""
+        response = self.client.get('/export_excel/expenses')
+        self.assertEqual(response.mimetype, system.XLSX_MIMETYPE)
+        with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('إيجار', sheet)
+
+    def add_formula_expense(self):
+        with app.app_context():
+            db.session.add(system.Expense(description='=HYPERLINK("http://x")', amount=5, category='other',
+                                          date=date(2024, 1, 2)))
+            db.session.commit()
+
+    def test_csv_formula_cells_escaped(self):
+        """النص الذي يبدأ بمحرف صيغة يُصدّر نصاً لا صيغة"""
+        self.add_formula_expense()
+        rows = self.read_csv('/export_excel/expenses?format=csv')
+        self.assertIn('\'=HYPERLINK("http://x")', {row[1] for row in rows[1:]})
+        self.assertIn('إيجار', {row[1] for row in rows[1:]})
+
+    @unittest.skipUnless(XLSX_AVAILABLE, 'xlsxwriter غير مثبت')
+    def test_xlsx_formula_cells_as_text(self):
+        """xlsx يكتب النص كسلسلة لا كصيغة أو رابط"""
+        self.add_formula_expense()
+        response = self.client.get('/export_excel/expenses')
+        with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertNotIn('<f>', sheet)
+        self.assertNotIn('<hyperlink', sheet)
+        self.assertIn('<t>=HYPERLINK("http://x")</t>', sheet)
+
+    def test_xlsx_temp_file_removed_on_error(self):
+        """ملف xlsx المؤقت يُحذف مهما كان خطأ الكتابة"""
+        paths = []
+
+        def failing_write(path, *args):
+            paths.append(path)
+            raise RuntimeError('disk full')
+
+        with mock.patch.object(system, 'write_xlsx_file', failing_write):
+            response = self.client.get('/export_excel/expenses')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(paths), 1)
+        self.assertFalse(system.os.path.exists(paths[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات التشغيل متعدد العمليات
+Fork Safety Tests
+"""
+
+import os
+import unittest
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db
+
+
+class TestForkSafety(unittest.TestCase):
+    """اختبارات تهيئة العملية الفرعية بعد fork"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(system.Customer(name='عميل'))
+            db.session.commit()
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'fork غير متاح')
+    def test_child_gets_fresh_pool(self):
+        """العملية الفرعية تنشئ مجمع اتصالات جديداً وتعمل استعلاماتها"""
+        with app.app_context():
+            parent_pool = id(db.engine.pool)
+            db.session.query(system.Customer).count()  # اتصال مفتوح في مجمع العملية الأم
+
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                with app.app_context():
+                    fresh = id(db.engine.pool) != parent_pool
+                    count = db.session.query(system.Customer).count()
+                ok = fresh and count == 1 and system._job_executor is None
+                os.write(write_fd, b'1' if ok else b'0')
+            finally:
+                os._exit(0)
+
+        os.close(write_fd)
+        result = os.read(read_fd, 1)
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+        self.assertEqual(result, b'1')
+
+        # العملية الأم تواصل استخدام مجمعها
+        with app.app_context():
+            self.assertEqual(id(db.engine.pool), parent_pool)
+            self.assertEqual(db.session.query(system.Customer).count(), 1)
+
+    def test_create_app(self):
+        """create_app يعيد التطبيق نفسه بعد التهيئة"""
+        self.assertIs(system.create_app(), app)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات دفتر الأستاذ العام والتقارير المالية
+General Ledger Tests
+"""
+
+import unittest
+from datetime import date
+from decimal import Decimal
+
+import accounting_system_complete as system
+from accounting_system_complete import (app, db, SalesInvoice, Customer, Supplier, Employee, EmployeePayroll,
+                                        JournalEntry, JournalLine, AccountPeriodBalance, ledger_totals,
+                                        trial_balance, income_statement, balance_sheet)
+
+
+class TestGeneralLedger(unittest.TestCase):
+    """الترحيل التلقائي والأرصدة الشهرية"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        app.config['REPORT_CACHE_ENABLED'] = False
+        self.addCleanup(app.config.__setitem__, 'REPORT_CACHE_ENABLED', True)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            customer, supplier = Customer(name='عميل'), Supplier(name='مورد')
+            employee = Employee(name='موظف', position='محاسب', salary=3000, hire_date=date(2023, 1, 1))
+            db.session.add_all([admin, customer, supplier, employee])
+            db.session.commit()
+            self.customer_id, self.supplier_id, self.employee_id = customer.id, supplier.id, employee.id
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def add_documents(self):
+        self.client.post('/add_sale', data={
+            'invoice_number': 'S-1', 'customer_id': self.customer_id,
+            'subtotal': 100, 'tax_amount': 15, 'total': 115, 'payment_method': 'credit'
+        })
+        self.client.post('/add_purchase', data={
+            'invoice_number': 'P-1', 'supplier_id': self.supplier_id,
+            'subtotal': 40, 'tax_amount': 6, 'total': 46
+        })
+        self.client.post('/add_expense', data={
+            'description': 'كهرباء', 'amount': 20, 'category': 'utilities', 'date': date.today().isoformat()
+        })
+        self.client.post('/save_employee_payment', data={
+            'employee_id': self.employee_id, 'month': date.today().month, 'year': date.today().year,
+            'amount': 10, 'payment_method': 'cash'
+        })
+        self.client.post('/api/payments', json={'party': 'customer', 'party_id': self.customer_id, 'amount': 50})
+
+    def balances(self):
+        return {row['account'].code: row['balance'] for row in trial_balance()['rows']}
+
+    def test_automatic_posting(self):
+        self.add_documents()
+        with app.app_context():
+            self.assertEqual(JournalEntry.query.count(), 5)
+            trial = trial_balance()
+            self.assertEqual(trial['debit'], trial['credit'])
+            self.assertEqual(self.balances(), {
+                '1100': Decimal('20'),   # 50 - 20 - 10
+                '1200': Decimal('65'),
+                '1300': Decimal('6'),
+                '2100': Decimal('46'),
+                '2200': Decimal('15'),
+                '4100': Decimal('100'),
+                '5100': Decimal('40'),
+                '5200': Decimal('20'),
+                '5300': Decimal('10'),
+            })
+
+            statement = income_statement()
+            self.assertEqual(statement['net_profit'], Decimal('30'))
+            sheet = balance_sheet()
+            self.assertEqual(sheet['total_assets'], sheet['total_liabilities'] + sheet['total_equity'])
+            self.assertEqual(sheet['retained_earnings'], Decimal('30'))
+
+            sale_id = SalesInvoice.query.filter_by(invoice_number='S-1').one().id
+
+        # حذف الفاتورة يلغي قيدها ويبقى المقبوض دائناً على العميل
+        self.client.delete(f'/delete_sale/{sale_id}')
+        with app.app_context():
+            balances = self.balances()
+            self.assertEqual(balances['1200'], Decimal('-50'))
+            self.assertNotIn('4100', balances)
+            self.assertEqual(JournalEntry.query.filter_by(source='sale').count(), 0)
+
+    def test_settlement_and_reopen(self):
+        with app.app_context():
+            invoice = SalesInvoice(invoice_number='S-paid', customer_id=self.customer_id, date=date(2024, 3, 5),
+                                   subtotal=80, total=80, status='paid')
+            db.session.add(invoice)
+            db.session.flush()
+            system.record_invoice_journal(invoice)
+            db.session.commit()
+            self.assertEqual(self.balances()['1100'], Decimal('80'))
+            self.assertNotIn('1200', {code for code, balance in self.balances().items() if balance})
+
+            system.reopen_invoice(invoice)
+            db.session.commit()
+            self.assertEqual(self.balances()['1200'], Decimal('80'))
+            self.assertEqual(JournalEntry.query.filter_by(source='sale_settlement').count(), 0)
+
+    def test_period_ranges_match_lines(self):
+        with app.app_context():
+            for index, day in enumerate([date(2024, 1, 15), date(2024, 1, 31), date(2024, 2, 1),
+                                         date(2024, 2, 20), date(2024, 3, 10), date(2024, 4, 2)]):
+                system.post_journal(day, f'قيد {index}', 'test', index,
+                                    [('5200', 10 + index, 0), ('1100', 0, 10 + index)])
+            db.session.commit()
+
+            def from_lines(start, end):
+                totals = {}
+                query = db.session.query(JournalLine, JournalEntry).join(JournalEntry)
+                for line, entry in query:
+                    if (start is None or entry.date >= start) and (end is None or entry.date <= end):
+                        row = totals.setdefault(line.account_id, [Decimal('0'), Decimal('0')])
+                        row[0] += line.debit
+                        row[1] += line.credit
+                return totals
+
+            for start, end in [(None, None), (date(2024, 1, 20), None), (None, date(2024, 2, 29)),
+                               (date(2024, 2, 1), date(2024, 3, 31)), (date(2024, 1, 31), date(2024, 2, 1)),
+                               (date(2024, 2, 5), date(2024, 2, 25)), (date(2024, 1, 16), date(2024, 4, 1))]:
+                expected = {account: values for account, values in from_lines(start, end).items()}
+                self.assertEqual(ledger_totals(start, end), expected, (start, end))
+
+            with self.assertRaises(ValueError):
+                system.post_journal(date(2024, 1, 1), 'غير متوازن', 'test', 99, [('5200', 5, 0), ('1100', 0, 4)])
+
+    def test_rebuild_and_payroll(self):
+        self.add_documents()
+        with app.app_context():
+            system._run_payroll_job(None, {'month': 1, 'year': 2024}, lambda percent: None)
+            payroll = EmployeePayroll.query.filter_by(month=1, year=2024).one()
+            self.assertEqual(JournalEntry.query.filter_by(source='payroll', source_id=payroll.id).one().date,
+                             date(2024, 1, 31))
+            self.assertEqual(self.balances()['2300'], Decimal('3000'))
+
+            def snapshot():
+                return sorted((row.account_id, row.period, row.debit, row.credit)
+                              for row in AccountPeriodBalance.query if row.debit or row.credit)
+
+            before = snapshot()
+            self.assertEqual(system.rebuild_ledger(), 6)
+            self.assertEqual(snapshot(), before)
+
+    def test_report_routes(self):
+        self.add_documents()
+        response = self.client.get('/trial_balance')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ذمم العملاء', response.get_data(as_text=True))
+        self.assertEqual(self.client.get('/balance_sheet?date_to=2099-12-31').status_code, 200)
+        response = self.client.get('/profit_loss_report?date_from=2000-01-01')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('100.00', response.get_data(as_text=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات الوصول التعاوني لقاعدة البيانات
+Green Database Access Tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+import subprocess
+import importlib.util
+
+from accounting_system_complete import app, db
+from green_db import enable_green_db, patch_psycopg2, eventlet_wait_callback
+
+EVENTLET_AVAILABLE = importlib.util.find_spec('eventlet') is not None
+PSYCOPG2_AVAILABLE = importlib.util.find_spec('psycopg2') is not None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# استعلام طويل في عملية معدلة بـ eventlet مع خيط نبض يجب أن يستمر أثناءه
+GREEN_SCRIPT = r'''
+import eventlet
+eventlet.monkey_patch()
+import time
+from sqlalchemy import text
+from accounting_system_complete import app, db
+
+ticks = []
+def heartbeat():
+    for _ in range(200):
+        eventlet.sleep(0.005)
+        ticks.append(time.perf_counter())
+
+with app.app_context():
+    assert db.engine.dialect.name == 'sqlite'
+    beat = eventlet.spawn(heartbeat)
+    eventlet.sleep(0)
+    started = time.perf_counter()
+    db.session.execute(text(
+        'WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 3000000) SELECT SUM(x) FROM n'
+    )).scalar()
+    finished = time.perf_counter()
+    during = [t for t in ticks if started < t < finished]
+    print('TICKS', len(during), round(finished - started, 3))
+'''
+
+
+class TestGreenDB(unittest.TestCase):
+    """اختبارات تفعيل الوضع التعاوني"""
+
+    def test_not_green_is_noop(self):
+        """بدون monkey_patch لا يتغير شيء"""
+        self.assertIsNone(enable_green_db(app, db))
+
+    @unittest.skipUnless(PSYCOPG2_AVAILABLE, 'psycopg2 غير مثبت')
+    def test_psycopg2_wait_callback(self):
+        """تسجيل دالة الانتظار التعاونية لـ psycopg2"""
+        from psycopg2 import extensions
+        try:
+            self.assertTrue(patch_psycopg2())
+            self.assertIs(extensions.get_wait_callback(), eventlet_wait_callback)
+        finally:
+            extensions.set_wait_callback(None)
+
+    @unittest.skipUnless(EVENTLET_AVAILABLE, 'eventlet غير مثبت')
+    def test_sqlite_query_does_not_block_hub(self):
+        """المحور يواصل العمل أثناء استعلام SQLite طويل"""
+        workdir = tempfile.mkdtemp()
+        env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(workdir, 'green.db'),
+                   PYTHONPATH=ROOT)
+        result = subprocess.run([sys.executable, '-c', GREEN_SCRIPT], cwd=ROOT, env=env,
+                                capture_output=True, text=True, timeout=120)
+        line = [l for l in result.stdout.splitlines() if l.startswith('TICKS')]
+        self.assertTrue(line, result.stdout[-2000:] + result.stderr[-2000:])
+        ticks, elapsed = int(line[0].split()[1]), float(line[0].split()[2])
+        if elapsed > 0.1:
+            self.assertGreater(ticks, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات قائمة الحظر الدائمة
+IP Blocklist Tests
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from ip_blocklist import Blocklist, PrefixTree, parse_network
+from ip_blocker import IPBlocker
+from security_system import SecuritySystem
+
+
+class TestPrefixTree(unittest.TestCase):
+    """اختبارات شجرة البادئات"""
+
+    def test_longest_prefix(self):
+        tree = PrefixTree()
+        tree.insert(parse_network('10.0.0.0/8'), 'wide')
+        tree.insert(parse_network('10.1.0.0/16'), 'narrow')
+        tree.insert(parse_network('2001:db8::/32'), 'v6')
+        self.assertEqual(tree.match(parse_network('10.1.2.3')), 'narrow')
+        self.assertEqual(tree.match(parse_network('10.2.0.1')), 'wide')
+        self.assertIsNone(tree.match(parse_network('11.0.0.1')))
+        self.assertEqual(tree.match(parse_network('2001:db8::1')), 'v6')
+        self.assertIsNone(tree.match(parse_network('2001:db9::1')))
+
+        self.assertEqual(tree.remove(parse_network('10.1.0.0/16')), 'narrow')
+        self.assertEqual(tree.match(parse_network('10.1.2.3')), 'wide')
+        self.assertIsNone(tree.remove(parse_network('10.1.0.0/16')))
+        self.assertEqual(len(tree), 2)
+
+    def test_parse(self):
+        self.assertEqual(str(parse_network('::ffff:1.2.3.4')), '1.2.3.4/32')
+        self.assertEqual(str(parse_network('10.1.2.3/8')), '10.0.0.0/8')
+        self.assertIsNone(parse_network('localhost'))
+        self.assertIsNone(parse_network(None))
+
+
+class TestBlocklist(unittest.TestCase):
+    """اختبارات الحفظ والضغط والقائمة البيضاء"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.path = os.path.join(self.directory, 'blocked_ips.json')
+        self.whitelist_path = os.path.join(self.directory, 'whitelist_ips.json')
+        with open(self.whitelist_path, 'w') as f:
+            json.dump(['127.0.0.1', 'localhost', '192.168.1.0/24'], f)
+        with open(self.path, 'w') as f:
+            json.dump(['144.86.9.109'], f)  # الصيغة القديمة
+
+    def blocklist(self):
+        return Blocklist(self.path, self.whitelist_path, refresh_interval=0)
+
+    def journal(self):
+        with open(f'{self.path}.journal') as f:
+            return [json.loads(line) for line in f]
+
+    def test_cidr_and_whitelist(self):
+        blocklist = self.blocklist()
+        self.assertIn('144.86.9.109', blocklist)
+        self.assertTrue(blocklist.block('185.220.0.0/16', 'Tor'))
+        self.assertIn('185.220.101.182', blocklist)
+        self.assertIn('::ffff:185.220.1.1', blocklist)
+        self.assertNotIn('185.221.0.1', blocklist)
+
+        # القائمة البيضاء لها الأولوية
+        self.assertFalse(blocklist.block('192.168.1.7'))
+        blocklist.block('192.168.0.0/16')
+        self.assertNotIn('192.168.1.7', blocklist)
+        self.assertIn('192.168.2.7', blocklist)
+        self.assertFalse(blocklist.block('not-an-ip'))
+
+    def test_journal_append_and_compaction(self):
+        blocklist = self.blocklist()
+        blocklist.block('1.2.3.4', 'Attack')
+        blocklist.block('5.6.7.8', duration=60)
+        blocklist.unblock('1.2.3.4')
+        self.assertEqual([(r['op'], r['net']) for r in self.journal()],
+                         [('block', '1.2.3.4'), ('block', '5.6.7.8'), ('unblock', '1.2.3.4')])
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), ['144.86.9.109'])  # اللقطة لم تُعد كتابتها
+
+        blocklist.compact()
+        self.assertEqual(self.journal(), [])
+        with open(self.path) as f:
+            snapshot = json.load(f)
+        self.assertEqual(snapshot[0], '144.86.9.109')
+        self.assertEqual(snapshot[1]['net'], '5.6.7.8')
+
+        reloaded = self.blocklist()
+        self.assertEqual(sorted(reloaded), ['144.86.9.109', '5.6.7.8'])
+
+    def test_expiry(self):
+        blocklist = self.blocklist()
+        blocklist.block('5.6.7.8', duration=60)
+        blocklist.block('5.6.7.9')
+        self.assertFalse(blocklist.expire('5.6.7.8'))
+        self.assertFalse(blocklist.expire('5.6.7.9'))
+        with mock.patch('ip_blocklist.time.time', return_value=blocklist.entries['5.6.7.8']['expires'] + 1):
+            self.assertNotIn('5.6.7.8', blocklist)
+            self.assertTrue(blocklist.expire('5.6.7.8'))
+            blocklist.compact()
+        self.assertEqual(sorted(self.blocklist()), ['144.86.9.109', '5.6.7.9'])
+
+    def test_permanent_block_not_downgraded(self):
+        blocklist = self.blocklist()
+        blocklist.block('5.6.7.8', 'Manual')
+        blocklist.block('5.6.7.8', 'Rate limit', duration=60)
+        self.assertIsNone(blocklist.entries['5.6.7.8']['expires'])
+
+    def test_other_process_changes(self):
+        """عملية أخرى تضيف للسجل ثم تضغطه"""
+        worker_a, worker_b = self.blocklist(), self.blocklist()
+        self.assertEqual(len(worker_b), 1)
+        worker_a.block('1.1.1.1')
+        worker_b.refresh()
+        self.assertIn('1.1.1.1', worker_b)
+
+        worker_a.unblock('144.86.9.109')
+        worker_a.compact()
+        worker_a.block('2.2.2.2')
+        worker_b.refresh()
+        self.assertEqual(sorted(worker_b), ['1.1.1.1', '2.2.2.2'])
+
+
+class TestSharedBlocklist(unittest.TestCase):
+    """ip_blocker و security_system يتشاركان القائمة"""
+
+    def test_shared(self):
+        blocklist = Blocklist()
+        blocker = IPBlocker(blocklist=blocklist)
+        security = SecuritySystem(blocklist=blocklist)
+
+        blocker.add_blocked_ip('203.0.113.0/24', 'Manual')
+        self.assertTrue(security.is_ip_blocked('203.0.113.9'))
+        security.block_ip('198.51.100.1', 'Attack')
+        self.assertTrue(blocker.is_ip_blocked('198.51.100.1'))
+        self.assertTrue(security.unblock_ip('198.51.100.1'))
+        self.assertFalse(blocker.is_ip_blocked('198.51.100.1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات ترقيم القوائم (keyset) والتصفية
+List Keyset Pagination Tests
+"""
+
+import re
+import unittest
+from datetime import date, timedelta
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db, SalesInvoice
+
+
+class TestListPagination(unittest.TestCase):
+    """اختبارات صفحات القوائم"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            db.session.add(admin)
+            for i in range(120):
+                db.session.add(SalesInvoice(
+                    invoice_number=f'INV-{i}', date=date(2024, 1, 1) + timedelta(days=i % 30),
+                    subtotal=10, total=10, status='paid' if i % 2 else 'pending',
+                    branch='China Town' if i % 3 == 0 else 'Place India'
+                ))
+            db.session.commit()
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def invoice_numbers(self, html):
+        return re.findall(r'<td[^>]*>(INV-\d+)</td>', html)
+
+    def test_cursor_roundtrip(self):
+        """ترميز المؤشر وفكه يحافظ على الأنواع"""
+        columns = [SalesInvoice.date, SalesInvoice.id]
+        token = system.encode_cursor([date(2024, 5, 1), 42])
+        self.assertEqual(system.decode_cursor(token, columns), [date(2024, 5, 1), 42])
+        self.assertIsNone(system.decode_cursor('not-a-cursor', columns))
+
+    def test_walk_all_pages(self):
+        """التنقل بالصفحات يعرض كل فاتورة مرة واحدة بالترتيب"""
+        seen = []
+        url = '/sales'
+        while url:
+            html = self.client.get(url).get_data(as_text=True)
+            seen.extend(self.invoice_numbers(html))
+            match = re.search(r'href="([^"]*after=[^"]*)"', html)
+            url = match.group(1).replace('&amp;', '&') if match else None
+
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(len(set(seen)), 120)
+
+    def test_previous_page(self):
+        """زر السابق يعيد الصفحة الأولى"""
+        first = self.client.get('/sales').get_data(as_text=True)
+        next_url = re.search(r'href="([^"]*after=[^"]*)"', first).group(1).replace('&amp;', '&')
+        second = self.client.get(next_url).get_data(as_text=True)
+        prev_url = re.search(r'href="([^"]*before=[^"]*)"', second).group(1).replace('&amp;', '&')
+        back = self.client.get(prev_url).get_data(as_text=True)
+        self.assertEqual(self.invoice_numbers(back), self.invoice_numbers(first))
+
+    def test_filters(self):
+        """الفلاتر تُطبق في قاعدة البيانات"""
+        html = self.client.get('/sales?branch=China+Town&status=pending&per_page=200').get_data(as_text=True)
+        with app.app_context():
+            expected = SalesInvoice.query.filter_by(branch='China Town', status='pending').count()
+        self.assertEqual(len(self.invoice_numbers(html)), expected)
+
+        html = self.client.get('/sales?q=INV-11&per_page=200').get_data(as_text=True)
+        self.assertEqual(sorted(self.invoice_numbers(html)), ['INV-11', 'INV-110', 'INV-111', 'INV-112',
+                                                              'INV-113', 'INV-114', 'INV-115', 'INV-116',
+                                                              'INV-117', 'INV-118', 'INV-119'])
+
+    def test_list_pages_render(self):
+        """جميع صفحات القوائم تعمل"""
+        for url in ['/sales', '/purchases', '/customers', '/products', '/employees', '/expenses', '/users']:
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات التحديث الفوري بالفروقات
+Live Update (delta push) Tests
+"""
+
+import unittest
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db, socketio, live_updates
+from live_updates import LiveUpdateCoalescer, stats_delta
+
+
+class TestLiveUpdateCoalescer(unittest.TestCase):
+    """اختبارات تجميع الأحداث"""
+
+    def setUp(self):
+        self.sent = []
+        self.coalescer = LiveUpdateCoalescer(
+            emit=lambda event, payload, to: self.sent.append((payload, to)),
+            interval=1.0, max_events=3
+        )
+
+    def event(self, action, row_id=1, **stats):
+        return {'type': 'product', 'action': action, 'id': row_id, 'row': {'id': row_id}, 'stats': stats}
+
+    def test_burst_becomes_one_message(self):
+        """عدة أحداث في الفترة نفسها تُرسل رسالة واحدة لكل مجموعة غرف"""
+        for row_id in (1, 2):
+            self.coalescer.publish(['page_products', 'page_dashboard'], self.event('created', row_id))
+        self.coalescer.publish(['page_dashboard', 'page_products'], self.event('updated', 2))
+        self.assertEqual(self.sent, [])
+
+        self.assertEqual(self.coalescer.flush(), 1)
+        payload, rooms = self.sent[0]
+        self.assertEqual(rooms, ['page_dashboard', 'page_products'])
+        self.assertEqual([(e['id'], e['action']) for e in payload['events']], [(1, 'created'), (2, 'created')])
+        self.assertEqual(self.coalescer.flush(), 0)
+
+    def test_merge_same_row(self):
+        """تعديلات الصف نفسه تُدمج وتُجمع فروقات الإحصائيات"""
+        rooms = ['page_products']
+        self.coalescer.publish(rooms, self.event('updated', quantity=5))
+        self.coalescer.publish(rooms, self.event('updated', quantity=-2, price=1))
+        self.coalescer.flush()
+        event = self.sent[0][0]['events'][0]
+        self.assertEqual(event['stats'], {'quantity': 3, 'price': 1})
+
+        self.sent.clear()
+        self.coalescer.publish(rooms, self.event('created', count=1))
+        self.coalescer.publish(rooms, self.event('deleted', count=-1))
+        self.assertEqual(self.coalescer.flush(), 0)
+
+    def test_overflow(self):
+        """الدفعات الكبيرة تُستبدل بإشعار overflow"""
+        for row_id in range(5):
+            self.coalescer.publish(['page_products'], self.event('created', row_id))
+        self.coalescer.flush()
+        payload = self.sent[0][0]
+        self.assertTrue(payload['overflow'])
+        self.assertEqual(payload['count'], 5)
+        self.assertEqual(payload['events'], [])
+
+    def test_stats_delta(self):
+        self.assertEqual(stats_delta({'a': 1, 'b': 2}, {'a': 1, 'b': 5}), {'b': 3})
+        self.assertEqual(stats_delta(None, {'a': 1}), {'a': 1})
+        self.assertEqual(stats_delta({'a': 1}, None), {'a': -1})
+
+
+@unittest.skipUnless(socketio, 'Flask-SocketIO غير متاح')
+class TestLiveUpdateRoutes(unittest.TestCase):
+    """اختبارات نشر الفروقات من المسارات"""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            user = system.User(username='admin', full_name='admin', role='admin')
+            user.set_password('admin123')
+            db.session.add(user)
+            db.session.commit()
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+        # الإرسال يدوي في الاختبار بدلاً من حلقة الخلفية
+        self.spawn = live_updates.spawn
+        live_updates.spawn = None
+        live_updates.flush()
+
+    def tearDown(self):
+        live_updates.spawn = self.spawn
+
+    def connect(self, path):
+        socket = socketio.test_client(app, flask_test_client=self.client)
+        socket.emit('subscribe', {'path': path})
+        status = [m for m in socket.get_received() if m['name'] == 'status'][-1]
+        return socket, status['args'][0]['rooms']
+
+    def batches(self, socket):
+        return [m['args'][0] for m in socket.get_received()
+                if m['name'] == 'data_update' and m['args'][0]['type'] == 'batch']
+
+    def test_subscribe_rooms(self):
+        _, rooms = self.connect('/products?page=2')
+        self.assertEqual(rooms, ['page_products'])
+        _, rooms = self.connect('/settings')
+        self.assertEqual(rooms, [])
+
+    def test_customer_created_is_pushed_to_pages(self):
+        """إضافة عميل تصل صفاً واحداً لصفحة العملاء دون صفحة المنتجات"""
+        customers_page, _ = self.connect('/customers')
+        products_page, _ = self.connect('/products')
+
+        self.client.post('/add_customer', data={'name': 'عميل فوري', 'phone': '0500'})
+        live_updates.flush()
+
+        batches = self.batches(customers_page)
+        self.assertEqual(len(batches), 1)
+        event = batches[0]['events'][0]
+        self.assertEqual(event['action'], 'created')
+        self.assertEqual(event['row']['name'], 'عميل فوري')
+        self.assertEqual(event['stats'], {'customers_count': 1})
+        self.assertEqual(self.batches(products_page), [])
+
+    def test_product_update_and_delete(self):
+        """تعديل المنتج يرسل فرق الكمية، والحذف يرسل الفروقات السالبة"""
+        with app.app_context():
+            product = system.Product(name='منتج', price=10, cost=5, quantity=20, min_quantity=10)
+            db.session.add(product)
+            db.session.commit()
+            product_id = product.id
+        socket, _ = self.connect('/products')
+
+        self.client.post('/add_stock', data={'product_id': product_id, 'quantity': 5})
+        live_updates.flush()
+        event = self.batches(socket)[0]['events'][0]
+        self.assertEqual(event['action'], 'updated')
+        self.assertEqual(event['row']['quantity'], 25)
+        self.assertEqual(event['stats'], {'products_quantity': 5})
+        self.assertEqual(event['row']['stock_class'], '')
+        self.assertEqual(event['row']['stock_badge'], 'bg-success')
+
+        self.client.post('/add_stock', data={'product_id': product_id, 'quantity': -20})
+        live_updates.flush()
+        event = self.batches(socket)[0]['events'][0]
+        self.assertEqual(event['row']['stock_label'], 'مخزون منخفض')
+        self.assertEqual(event['row']['stock_class'], 'low-stock')
+        self.assertEqual(event['row']['stock_badge'], 'bg-warning')
+
+        self.client.delete(f'/delete_product/{product_id}')
+        live_updates.flush()
+        event = self.batches(socket)[0]['events'][0]
+        self.assertEqual(event['action'], 'deleted')
+        self.assertEqual(event['stats']['products_count'], -1)
+        self.assertEqual(event['stats']['products_quantity'], -5)
+
+    def test_sales_invoice_goes_to_sales_pages_only(self):
+        """فاتورة المبيعات تصل لصفحة المبيعات دون الصفحات التي لا تعرضها"""
+        socket, _ = self.connect('/sales')
+        settings_page, _ = self.connect('/settings')
+        self.client.post('/add_sale', data={
+            'invoice_number': 'LIVE-1', 'subtotal': '100', 'total': '115'
+        })
+        live_updates.flush()
+        event = self.batches(socket)[0]['events'][0]
+        self.assertEqual(event['row']['invoice_number'], 'LIVE-1')
+        self.assertEqual(event['stats']['sales_total'], 115.0)
+        self.assertEqual(self.batches(settings_page), [])
+
+    def test_pages_render_live_markup(self):
+        response = self.client.get('/sales')
+        self.assertIn(b'data-live-stat="customers_count"', response.data)
+        response = self.client.get('/dashboard')
+        self.assertIn(b'data-live-stat="sales_total"', response.data)
+        self.assertNotIn(b'location.reload();\n        }, 2000)', response.data)
+
+    def test_products_page_marks_stock_classes(self):
+        """صف المنتج وشارته يحملان الصنف الذي يبدله فرق الكمية"""
+        with app.app_context():
+            db.session.add(system.Product(name='منخفض', price=1, cost=1, quantity=2, min_quantity=5))
+            db.session.commit()
+        response = self.client.get('/products')
+        self.assertIn(b'data-row-class-field="stock_class"', response.data)
+        self.assertIn(b'class="low-stock" data-class-field="stock_class" data-live-class="low-stock"', response.data)
+        self.assertIn(b'data-class-field="stock_badge" data-live-class="bg-warning"', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات اللغة لكل طلب والفهرس المدمج
+Locale Memoization Tests
+"""
+
+import unittest
+from unittest import mock
+
+import accounting_system_complete as system
+from accounting_system_complete import app
+
+
+class TestLocale(unittest.TestCase):
+    """اختبارات حساب اللغة مرة واحدة والترجمة من الفهرس المدمج"""
+
+    def test_resolved_once_per_request(self):
+        """اللغة تُحسب مرة واحدة مهما تكرر الاستدعاء"""
+        with app.test_request_context('/', headers={'Accept-Language': 'en'}):
+            with mock.patch.object(system, 'resolve_locale', wraps=system.resolve_locale) as resolve:
+                for _ in range(50):
+                    self.assertEqual(system.get_locale(), 'en')
+                    system._('Dashboard')
+                self.assertEqual(resolve.call_count, 1)
+
+    def test_session_language_wins(self):
+        """لغة الجلسة مقدمة على لغة المتصفح"""
+        with app.test_request_context('/', headers={'Accept-Language': 'en'}):
+            system.session['language'] = 'ar'
+            self.assertEqual(system.get_locale(), 'ar')
+            self.assertEqual(system._('Dashboard'), 'لوحة التحكم')
+
+    def test_catalog_merges_po_files(self):
+        """الفهرس يجمع ملفات .po مع TRANSLATIONS، والقاموس اليدوي هو المرجع عند التعارض"""
+        catalog = system.TRANSLATION_CATALOGS['en']
+        self.assertEqual(catalog['تكاليف الوجبات'], 'Meal Costs')
+        for text, translation in system.TRANSLATIONS['en'].items():
+            self.assertEqual(catalog[text], translation)
+        self.assertEqual(system.translate_text('لوحة التحكم', 'en'), 'Dashboard')
+        self.assertEqual(system.translate_text('نص غير مترجم', 'en'), 'نص غير مترجم')
+
+    def test_outside_request(self):
+        """خارج الطلب تُستخدم اللغة الافتراضية"""
+        self.assertEqual(system.get_locale(), 'ar')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات كشف حساب العميل والمورد
+Customer and Supplier Statement Tests
+"""
+
+import unittest
+from datetime import date
+from decimal import Decimal
+
+import accounting_system_complete as system
+from accounting_system_complete import (app, db, SalesInvoice, PurchaseInvoice, Customer, Supplier,
+                                        PartyBalanceMonth, record_payment, party_statement)
+
+
+class TestPartyStatement(unittest.TestCase):
+    """الرصيد الجاري والترقيم والرصيد الافتتاحي الشهري"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            customer, other = Customer(name='عميل'), Customer(name='عميل آخر')
+            supplier = Supplier(name='مورد')
+            db.session.add_all([admin, customer, other, supplier])
+            db.session.commit()
+            self.customer_id, self.other_id, self.supplier_id = customer.id, other.id, supplier.id
+
+            # فواتير على ثلاثة أشهر، ودفعات جزئية، وفاتورة مدفوعة بدون دفعة
+            for index in range(12):
+                day = date(2024, 1 + index // 4, 1 + index * 2)
+                self.add_invoice(SalesInvoice, f'S-{index}', day, 100 + index, customer_id=customer.id)
+            self.add_invoice(SalesInvoice, 'S-paid', date(2024, 2, 5), 50, customer_id=customer.id, status='paid')
+            self.add_invoice(SalesInvoice, 'S-other', date(2024, 1, 3), 999, customer_id=other.id)
+            record_payment('customer', customer.id, 250, payment_date=date(2024, 1, 20))
+            record_payment('customer', customer.id, 75, payment_date=date(2024, 2, 5))
+            record_payment('customer', customer.id, 40, payment_date=date(2024, 3, 30))
+            self.add_invoice(PurchaseInvoice, 'P-1', date(2024, 1, 10), 300, supplier_id=supplier.id)
+            record_payment('supplier', supplier.id, 120, payment_date=date(2024, 2, 1))
+            db.session.commit()
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def add_invoice(self, model, number, day, total, **party):
+        invoice = model(invoice_number=number, date=day, subtotal=total, total=total,
+                        status=party.pop('status', 'pending'), **party)
+        db.session.add(invoice)
+        db.session.flush()
+        system.record_invoice_balance(invoice)
+
+    def all_pages(self, party, party_id, per_page):
+        """التنقل من آخر صفحة إلى الأقدم بمؤشر before"""
+        pages = [party_statement(party, party_id, per_page=per_page)]
+        while pages[0].has_prev:
+            pages.insert(0, party_statement(party, party_id, before=self.cursor(pages[0].prev_cursor),
+                                            per_page=per_page))
+        return pages
+
+    def cursor(self, token):
+        return system.decode_cursor(token, system.STATEMENT_CURSOR_COLUMNS)
+
+    def test_running_balance_across_pages(self):
+        with app.app_context():
+            full = party_statement('customer', self.customer_id, per_page=100)
+            self.assertEqual(len(full.items), 12 + 1 + 1 + 3)
+            self.assertEqual(full.opening_balance, 0)
+            self.assertFalse(full.has_prev or full.has_next)
+
+            # الرصيد الجاري = مجموع المدين - الدائن بالترتيب
+            running = Decimal('0')
+            for entry in full.items:
+                running += entry['debit'] - entry['credit']
+                self.assertEqual(entry['balance'], running)
+            self.assertEqual(full.closing_balance, db.session.get(Customer, self.customer_id).balance)
+
+            kinds = [entry['kind'] for entry in full.items if entry['date'] == date(2024, 2, 5)]
+            self.assertEqual(kinds, ['invoice', 'settlement', 'payment'])
+
+            pages = self.all_pages('customer', self.customer_id, per_page=4)
+            self.assertEqual([entry for page in pages for entry in page.items], full.items)
+            for previous, page in zip(pages, pages[1:]):
+                self.assertEqual(page.opening_balance, previous.closing_balance)
+
+            # للأمام بمؤشر after من الصفحة الأولى
+            page = party_statement('customer', self.customer_id, after=self.cursor(pages[0].next_cursor),
+                                   per_page=4)
+            self.assertEqual(page.items, pages[1].items)
+            self.assertTrue(page.has_prev)
+
+    def test_opening_balance_from_months(self):
+        with app.app_context():
+            months = {row.month: row.movement for row in
+                      PartyBalanceMonth.query.filter_by(party='customer', party_id=self.customer_id)}
+            self.assertEqual(sorted(months), [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)])
+            self.assertEqual(system.party_opening_balance('customer', self.customer_id, date(2024, 2, 1)),
+                             months[date(2024, 1, 1)])
+
+            # إعادة البناء تطابق الحركات المحدثة تدريجياً
+            before = sorted((row.party, row.party_id, row.month, row.movement) for row in PartyBalanceMonth.query)
+            system.rebuild_party_months()
+            after = sorted((row.party, row.party_id, row.month, row.movement) for row in PartyBalanceMonth.query)
+            self.assertEqual(after, before)
+
+            # حذف دفعة يعدل حركة شهرها
+            payment = system.Payment.query.filter_by(amount=40).one()
+            system.delete_payment(payment)
+            db.session.commit()
+            march = PartyBalanceMonth.query.filter_by(party='customer', party_id=self.customer_id,
+                                                      month=date(2024, 3, 1)).one()
+            self.assertEqual(march.movement, months[date(2024, 3, 1)] + 40)
+
+    def test_supplier_statement(self):
+        with app.app_context():
+            page = party_statement('supplier', self.supplier_id)
+            self.assertEqual([(e['kind'], e['debit'], e['credit'], e['balance']) for e in page.items], [
+                ('invoice', 0, 300, 300),
+                ('payment', 120, 0, 180),
+            ])
+            self.assertEqual(page.closing_balance, db.session.get(Supplier, self.supplier_id).balance)
+
+    def test_routes(self):
+        response = self.client.get(f'/customers/{self.customer_id}/statement?per_page=5')
+        self.assertEqual(response.status_code, 200)
+        html = response.get_data(as_text=True)
+        self.assertIn('S-11', html)
+        self.assertNotIn('S-other', html)
+        self.assertIn('before=', html)
+
+        response = self.client.get(f'/suppliers/{self.supplier_id}/statement')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('P-1', response.get_data(as_text=True))
+        self.assertEqual(self.client.get('/customers/999/statement').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات تخصيص المدفوعات وأرصدة الفواتير والأطراف
+Payment Allocation and Balance Tests
+"""
+
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+
+from sqlalchemy import MetaData, Table, create_engine, inspect
+
+import accounting_system_complete as system
+from accounting_system_complete import (app, db, SalesInvoice, PurchaseInvoice, Customer, Supplier,
+                                        Payment, PaymentAllocation, DailySummary)
+from migrate_database import plan_migration, run_migration
+
+# أعمدة الأرصدة المخزنة التي يجب أن يضيفها الترحيل لقواعد البيانات القائمة
+BALANCE_COLUMNS = {
+    'sales_invoice': ('amount_paid', 'balance_due'),
+    'purchase_invoice': ('amount_paid', 'balance_due'),
+    'customer': ('balance',),
+    'supplier': ('balance',),
+}
+
+
+class TestPaymentAllocation(unittest.TestCase):
+    """اختبارات الدفعات الجزئية والأرصدة المخزنة"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            customer = Customer(name='عميل')
+            supplier = Supplier(name='مورد')
+            db.session.add_all([admin, customer, supplier])
+            db.session.commit()
+            self.customer_id, self.supplier_id = customer.id, supplier.id
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def add_sale(self, number, total):
+        self.client.post('/add_sale', data={
+            'invoice_number': number, 'customer_id': self.customer_id,
+            'subtotal': total, 'total': total, 'payment_method': 'credit'
+        })
+        with app.app_context():
+            return SalesInvoice.query.filter_by(invoice_number=number).one().id
+
+    def pay(self, amount, allocations=None, party='customer'):
+        body = {'party': party, 'party_id': self.customer_id if party == 'customer' else self.supplier_id,
+                'amount': amount}
+        if allocations is not None:
+            body['allocations'] = [{'invoice_id': i, 'amount': a} for i, a in allocations]
+        return self.client.post('/api/payments', json=body)
+
+    def state(self, invoice_id):
+        with app.app_context():
+            invoice = db.session.get(SalesInvoice, invoice_id)
+            return float(invoice.amount_paid), float(invoice.balance_due), invoice.status
+
+    def balance(self):
+        with app.app_context():
+            return float(db.session.get(Customer, self.customer_id).balance)
+
+    def test_new_invoice_balance(self):
+        first = self.add_sale('S-1', 100)
+        self.add_sale('S-2', 50)
+        self.assertEqual(self.state(first), (0.0, 100.0, 'pending'))
+        self.assertEqual(self.balance(), 150.0)
+
+    def test_partial_payments_across_invoices(self):
+        first, second = self.add_sale('S-1', 100), self.add_sale('S-2', 50)
+        response = self.pay(60, [(first, 40), (second, 20)])
+        self.assertEqual(response.get_json()['balance'], 90.0)
+        self.assertEqual(self.state(first), (40.0, 60.0, 'pending'))
+        self.assertEqual(self.state(second), (20.0, 30.0, 'pending'))
+
+        # تسديد المتبقي: الفاتورة تصبح مدفوعة وتُحسب في الملخص اليومي
+        self.pay(30, [(second, 30)])
+        self.assertEqual(self.state(second), (50.0, 0.0, 'paid'))
+        with app.app_context():
+            self.assertEqual(db.session.query(db.func.sum(DailySummary.sales_paid)).scalar(), Decimal('50'))
+        self.assertEqual(self.balance(), 60.0)
+
+    def test_auto_allocation_oldest_first(self):
+        first, second = self.add_sale('S-1', 100), self.add_sale('S-2', 50)
+        data = self.pay(130).get_json()
+        self.assertEqual((data['allocated'], data['unallocated']), (130.0, 0.0))
+        self.assertEqual(self.state(first)[2], 'paid')
+        self.assertEqual(self.state(second), (30.0, 20.0, 'pending'))
+
+        # دفعة أكبر من المستحق: الباقي رصيد دائن
+        data = self.pay(50).get_json()
+        self.assertEqual((data['allocated'], data['unallocated'], data['balance']), (20.0, 30.0, -30.0))
+
+    def test_overpayment_rejected(self):
+        first = self.add_sale('S-1', 100)
+        response = self.pay(150, [(first, 150)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.state(first), (0.0, 100.0, 'pending'))
+        self.assertEqual(self.pay(10, [(first, 20)]).status_code, 400)
+        with app.app_context():
+            self.assertEqual(Payment.query.count(), 0)
+
+    def test_delete_payment_and_invoice(self):
+        first, second = self.add_sale('S-1', 100), self.add_sale('S-2', 50)
+        payment_id = self.pay(120).get_json()['payment_id']
+        self.assertEqual(self.client.delete(f'/api/payments/{payment_id}').get_json()['success'], True)
+        self.assertEqual(self.state(first), (0.0, 100.0, 'pending'))
+        self.assertEqual(self.balance(), 150.0)
+
+        # حذف فاتورة مسددة جزئياً: دفعتها تبقى رصيداً دائناً
+        self.pay(70, [(first, 70)])
+        self.client.delete(f'/delete_sale/{first}')
+        self.assertEqual(self.balance(), -20.0)
+        with app.app_context():
+            self.assertEqual(PaymentAllocation.query.count(), 0)
+
+    def test_mark_as_paid_records_payment(self):
+        first = self.add_sale('S-1', 100)
+        self.pay(30, [(first, 30)])
+        self.client.post(f'/mark_as_paid/sale/{first}')
+        self.assertEqual(self.state(first), (100.0, 0.0, 'paid'))
+        self.assertEqual(self.balance(), 0.0)
+        with app.app_context():
+            self.assertEqual(sorted(float(p.amount) for p in Payment.query), [30.0, 70.0])
+
+    def test_supplier_payment(self):
+        with app.app_context():
+            purchase = PurchaseInvoice(invoice_number='P-1', supplier_id=self.supplier_id,
+                                       subtotal=200, total=200)
+            db.session.add(purchase)
+            system.record_invoice_balance(purchase)
+            db.session.commit()
+        data = self.pay(80, party='supplier').get_json()
+        self.assertEqual(data['balance'], 120.0)
+        with app.app_context():
+            self.assertEqual(Payment.query.one().payment_type, 'paid')
+
+    def test_rebuild_matches_incremental(self):
+        first, second = self.add_sale('S-1', 100), self.add_sale('S-2', 50)
+        self.pay(130)
+        self.pay(40)
+        with app.app_context():
+            legacy = SalesInvoice(invoice_number='S-3', customer_id=self.customer_id, subtotal=25, total=25,
+                                  status='paid')
+            db.session.add(legacy)
+            db.session.commit()
+            expected = [(float(i.amount_paid), float(i.balance_due)) for i in SalesInvoice.query.order_by(SalesInvoice.id)]
+            SalesInvoice.query.update({SalesInvoice.amount_paid: 0, SalesInvoice.balance_due: None})
+            Customer.query.update({Customer.balance: 0})
+            db.session.commit()
+            system.rebuild_balances()
+            self.assertEqual([(float(i.amount_paid), float(i.balance_due))
+                              for i in SalesInvoice.query.order_by(SalesInvoice.id)], expected)
+        self.assertEqual(self.balance(), -20.0)
+
+
+class TestBalanceColumnsMigration(unittest.TestCase):
+    """أعمدة الأرصدة تصل للقواعد القائمة عبر الترحيل وليس create_all"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.engine = create_engine(f'sqlite:///{self.path}')
+        self.addCleanup(self.engine.dispose)
+
+        # الجداول كما كانت قبل الأرصدة المخزنة
+        old = MetaData()
+        for table in db.metadata.sorted_tables:
+            missing = BALANCE_COLUMNS.get(table.name, ())
+            Table(table.name, old, *[column._copy() for column in table.columns if column.name not in missing])
+        old.create_all(self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(old.tables['customer'].insert(), {'name': 'عميل قديم'})
+
+    def columns(self, table):
+        return {column['name']: column for column in inspect(self.engine).get_columns(table)}
+
+    def test_plan_covers_balance_columns(self):
+        planned = {(column.table.name, column.name) for column in plan_migration(self.engine, db.metadata)['columns']}
+        for table, names in BALANCE_COLUMNS.items():
+            for name in names:
+                self.assertIn((table, name), planned)
+
+    def test_migration_adds_balance_columns(self):
+        run_migration(self.engine, db.metadata, pause=0, verbose=False)
+        for table, names in BALANCE_COLUMNS.items():
+            self.assertTrue(set(names) <= set(self.columns(table)), table)
+        self.assertFalse(plan_migration(self.engine, db.metadata)['columns'])
+        # رصيد الطرف NOT NULL بقيمة افتراضية تملأ الصفوف القديمة
+        self.assertFalse(self.columns('customer')['balance']['nullable'])
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql('SELECT balance FROM customer').scalar(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات محرك أعمار الديون وصفحات المدفوعات
+Receivables / Payables Aging Tests
+"""
+
+import unittest
+from datetime import date, timedelta
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db, SalesInvoice, PurchaseInvoice, Customer, Supplier
+
+
+class TestPaymentsAging(unittest.TestCase):
+    """اختبارات التجميع في قاعدة البيانات"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.today = date(2024, 6, 30)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            db.session.add(admin)
+            customers = [Customer(name=f'عميل {i}') for i in range(3)]
+            supplier = Supplier(name='مورد')
+            db.session.add_all(customers + [supplier])
+            db.session.flush()
+
+            # (العميل، عمر الفاتورة بالأيام، المبلغ، الحالة، طريقة الدفع)
+            rows = [
+                (0, 5, 100, 'pending', 'credit'),
+                (0, 45, 200, 'overdue', 'credit'),
+                (0, 120, 300, 'overdue', 'cash'),
+                (1, 30, 50, 'pending', 'cash'),
+                (1, 31, 70, 'pending', 'mada'),
+                (1, 90, 80, 'overdue', 'credit'),
+                (2, 10, 999, 'paid', 'cash'),
+                (None, 91, 40, 'pending', 'cash'),
+            ]
+            for i, (customer, age, total, status, method) in enumerate(rows):
+                db.session.add(SalesInvoice(
+                    invoice_number=f'S-{i}', customer_id=customers[customer].id if customer is not None else None,
+                    date=self.today - timedelta(days=age), subtotal=total, total=total,
+                    status=status, payment_method=method
+                ))
+            for i, (age, total, status) in enumerate([(20, 500, 'pending'), (75, 250, 'overdue'), (3, 60, 'paid')]):
+                db.session.add(PurchaseInvoice(
+                    invoice_number=f'P-{i}', supplier_id=supplier.id, date=self.today - timedelta(days=age),
+                    subtotal=total, total=total, status=status, payment_method='credit'
+                ))
+            db.session.commit()
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def test_status_summary(self):
+        with app.app_context():
+            summary = system.invoice_status_summary(SalesInvoice)
+        self.assertEqual((summary['count'], summary['total']), (8, 1839.0))
+        self.assertEqual(summary['status']['paid'], {'count': 1, 'total': 999.0, 'due': 0.0})
+        self.assertEqual(summary['status']['overdue'], {'count': 3, 'total': 580.0, 'due': 580.0})
+        self.assertEqual(summary['unpaid'], {'count': 7, 'total': 840.0, 'due': 840.0})
+        self.assertEqual(summary['credit'], {'count': 3, 'total': 380.0, 'due': 380.0})
+        self.assertEqual(summary['methods']['cash'], {'count': 4, 'total': 1389.0, 'due': 390.0})
+
+    def test_aging_buckets(self):
+        with app.app_context():
+            report = system.aging_report(SalesInvoice, SalesInvoice.customer_id, Customer, as_of=self.today)
+        self.assertEqual(report.totals['outstanding'], 840.0)
+        self.assertEqual(report.totals['buckets'], {
+            'days_0_30': 150.0, 'days_31_60': 270.0, 'days_61_90': 80.0, 'days_over_90': 340.0
+        })
+        # الترتيب حسب الرصيد تنازلياً، والعميل المدفوع بالكامل لا يظهر
+        self.assertEqual([(p['name'], p['outstanding']) for p in report.parties],
+                         [('عميل 0', 600.0), ('عميل 1', 200.0), (None, 40.0)])
+        self.assertEqual(report.parties[1]['buckets'], {
+            'days_0_30': 50.0, 'days_31_60': 70.0, 'days_61_90': 80.0, 'days_over_90': 0.0
+        })
+
+    def test_aging_pagination(self):
+        with app.app_context():
+            first = system.aging_report(SalesInvoice, SalesInvoice.customer_id, Customer,
+                                        as_of=self.today, per_page=2)
+            second = system.aging_report(SalesInvoice, SalesInvoice.customer_id, Customer,
+                                         as_of=self.today, page=2, per_page=2)
+        self.assertEqual((first.party_count, first.pages, first.has_next), (3, 2, True))
+        self.assertEqual([p['name'] for p in second.parties], [None])
+        self.assertFalse(second.has_next)
+        self.assertTrue(second.has_prev)
+
+    def test_unpaid_index_used(self):
+        """استعلام الأعمار يقرأ الفهرس الجزئي المغطي فقط (بعد ANALYZE كما في migrate_database)"""
+        with app.app_context():
+            db.session.execute(db.text('ANALYZE'))
+            plan = db.session.execute(db.text(
+                "EXPLAIN QUERY PLAN SELECT customer_id, SUM(total) FROM sales_invoice "
+                "WHERE status IN ('pending', 'overdue') GROUP BY customer_id"
+            )).fetchall()
+        self.assertIn('ix_sales_invoice_aging', ' '.join(row[-1] for row in plan))
+
+    def test_pages_render(self):
+        for url in ('/payments', '/payments_report', '/payments?customers_page=2'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            html = response.get_data(as_text=True)
+            self.assertIn('aging-table', html)
+            self.assertIn('عميل 0', html)
+
+        html = self.client.get('/payments').get_data(as_text=True)
+        self.assertIn('المستحقات لنا (7)', html)
+        self.assertIn('المستحقات علينا (2)', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات محدد المعدل وعجلة المؤقتات
+Rate Limiter and Timer Wheel Tests
+"""
+
+import os
+import sys
+import shutil
+import subprocess
+import importlib.util
+import sqlite3
+import tempfile
+import unittest
+
+from rate_limiter import (SlidingWindowLimiter, MemoryBackend, SQLiteBackend, TimerWheel,
+                          create_rate_limiter, timer_wheel)
+from ip_blocklist import Blocklist
+from security_system import SecuritySystem
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestSlidingWindowLimiter(unittest.TestCase):
+    """اختبارات النافذة المنزلقة"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = SlidingWindowLimiter(3, 10, MemoryBackend(), clock=self.clock)
+
+    def test_limit_within_window(self):
+        self.assertEqual([self.limiter.hit('a') for _ in range(4)], [True, True, True, False])
+        self.assertTrue(self.limiter.hit('b'))
+
+    def test_previous_window_weight(self):
+        """الطلبات السابقة يقل وزنها مع تقدم النافذة الحالية"""
+        for _ in range(3):
+            self.limiter.hit('a')
+        self.clock.now = 1012.0  # 20% من النافذة الجديدة: 3 × 0.8 + 1 = 3.4
+        self.assertFalse(self.limiter.hit('a'))
+        self.clock.now = 1019.0  # 3 × 0.1 + 2 = 2.3
+        self.assertTrue(self.limiter.hit('a'))
+        self.clock.now = 1040.0  # نافذتان خاليتان
+        self.assertEqual(self.limiter.request_count(), 0)
+        self.assertTrue(self.limiter.hit('a'))
+
+    def test_lru_eviction(self):
+        limiter = SlidingWindowLimiter(3, 10, MemoryBackend(max_keys=2), clock=self.clock)
+        limiter.hit('a')
+        limiter.hit('b')
+        limiter.hit('a')
+        limiter.hit('c')  # يُحذف b الأقدم استخداماً
+        self.assertEqual(list(limiter.backend._entries), ['a', 'c'])
+        self.assertEqual(len(limiter), 2)
+
+    def test_reset(self):
+        for _ in range(4):
+            self.limiter.hit('a')
+        self.limiter.reset('a')
+        self.assertTrue(self.limiter.hit('a'))
+
+
+class TestSQLiteBackend(unittest.TestCase):
+    """اختبارات العدادات المشتركة بين العمليات"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.path = os.path.join(self.directory, 'rate_limits.db')
+        self.clock = FakeClock()
+
+    def limiter(self, name='security', limit=3, max_keys=100):
+        return SlidingWindowLimiter(limit, 10, SQLiteBackend(self.path, max_keys), name=name, clock=self.clock)
+
+    def test_shared_between_workers(self):
+        """عمليتان (اتصالان مستقلان) تتشاركان العدّاد نفسه"""
+        worker_a, worker_b = self.limiter(), self.limiter()
+        self.assertTrue(worker_a.hit('1.2.3.4'))
+        self.assertTrue(worker_b.hit('1.2.3.4'))
+        self.assertTrue(worker_a.hit('1.2.3.4'))
+        self.assertFalse(worker_b.hit('1.2.3.4'))
+
+        # محدد آخر بالملف نفسه لا يتأثر
+        other = self.limiter(name='ip_blocker')
+        self.assertTrue(other.hit('1.2.3.4'))
+        self.assertEqual((len(worker_a), len(other), worker_a.request_count()), (1, 1, 4))
+
+    def test_rollover_and_prune(self):
+        limiter = self.limiter(max_keys=2)
+        for ip in ('a', 'b', 'c'):
+            self.clock.now += 1
+            limiter.hit(ip)
+        self.clock.now = 1012.0
+        limiter.hit('c')
+        conn = limiter.backend._connection()
+        self.assertEqual(conn.execute("SELECT window_start, current, previous FROM rate_limit "
+                                      "WHERE key = 'security:c'").fetchone(), (1010, 1, 1))
+        limiter.backend.prune(10)
+        self.assertEqual(len(limiter), 2)
+
+    def test_create_from_environment(self):
+        limiter = create_rate_limiter(5, 60, name='x', backend='sqlite', path=self.path)
+        self.assertIsInstance(limiter.backend, SQLiteBackend)
+        self.assertIsInstance(create_rate_limiter(5, 60).backend, MemoryBackend)
+        with self.assertRaises(ValueError):
+            create_rate_limiter(5, 60, backend='redis')
+
+
+class TestTimerWheel(unittest.TestCase):
+    """اختبارات عجلة المؤقتات"""
+
+    def setUp(self):
+        self.clock = FakeClock(0.0)
+        self.wheel = TimerWheel(tick=1.0, slots=8, clock=self.clock)
+        self.wheel.start = lambda: None  # التقدم يدوي في الاختبار
+        self.fired = []
+
+    def test_fires_after_delay(self):
+        self.wheel.schedule('a', 3, lambda: self.fired.append('a'))
+        self.wheel.schedule('b', 20, lambda: self.fired.append('b'))  # أكثر من دورة
+        self.assertEqual(self.wheel.advance(2.0), 0)
+        self.assertEqual(self.wheel.advance(3.0), 1)
+        self.assertEqual(self.fired, ['a'])
+        self.wheel.advance(19.0)
+        self.assertEqual(self.fired, ['a'])
+        self.wheel.advance(20.0)
+        self.assertEqual(self.fired, ['a', 'b'])
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_reschedule_and_cancel(self):
+        self.wheel.schedule('a', 2, lambda: self.fired.append(1))
+        self.wheel.schedule('a', 5, lambda: self.fired.append(2))
+        self.wheel.schedule('b', 1, lambda: self.fired.append(3))
+        self.assertTrue(self.wheel.cancel('b'))
+        self.assertFalse(self.wheel.cancel('b'))
+        self.wheel.advance(10.0)
+        self.assertEqual(self.fired, [2])
+
+    @unittest.skipUnless(importlib.util.find_spec('eventlet'), 'eventlet غير مثبت')
+    def test_does_not_block_eventlet_hub(self):
+        """عجلة أُنشئت قبل monkey_patch (كما مع --preload) تنام نوماً أخضر لا يحجب الطلبات"""
+        script = (
+            'import time\n'
+            'from rate_limiter import TimerWheel\n'
+            'wheel = TimerWheel(tick=0.5)\n'
+            'import eventlet\n'
+            'eventlet.monkey_patch()\n'
+            'fired = []\n'
+            "wheel.schedule('a', 0.5, lambda: fired.append(1))\n"
+            'started = time.monotonic()\n'
+            'for _ in range(10):\n'
+            '    eventlet.sleep(0.01)\n'
+            'blocked = time.monotonic() - started\n'
+            'eventlet.sleep(1.5)\n'
+            "print(f'{blocked:.3f} {len(fired)}')\n"
+        )
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 0, result.stderr)
+        blocked, fired = result.stdout.split()
+        self.assertLess(float(blocked), 0.4)
+        self.assertEqual(fired, '1')
+
+
+class TestSecuritySystemLimits(unittest.TestCase):
+    """رفع الحظر عبر العجلة المشتركة بدلاً من خيط لكل IP"""
+
+    def test_block_and_unblock(self):
+        security = SecuritySystem(blocklist=Blocklist())
+        security.RATE_LIMIT_REQUESTS = security.rate_limiter.limit = 2
+        self.addCleanup(lambda: timer_wheel.cancel((security, '9.9.9.9')))
+
+        self.assertTrue(security.check_rate_limit('9.9.9.9'))
+        self.assertTrue(security.check_rate_limit('9.9.9.9'))
+        self.assertFalse(security.check_rate_limit('9.9.9.9'))
+        self.assertIn('9.9.9.9', security.blocked_ips)
+        self.assertIn((security, '9.9.9.9'), timer_wheel)
+
+        self.assertTrue(security.unblock_ip('9.9.9.9'))
+        self.assertNotIn((security, '9.9.9.9'), timer_wheel)
+        self.assertTrue(security.check_rate_limit('9.9.9.9'))
+
+    def test_locked_database_fails_open(self):
+        """قفل ملف العدادات يسمح بالطلب ويُسجَّل بدلاً من خطأ 500"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, 'rate_limits.db')
+        security = SecuritySystem(blocklist=Blocklist())
+        security.rate_limiter = SlidingWindowLimiter(2, 60, SQLiteBackend(path, 100, timeout=0),
+                                                     name='security')
+        security.check_rate_limit('8.8.8.8')
+
+        # عملية أخرى تمسك قفل الكتابة
+        writer = sqlite3.connect(path, isolation_level=None)
+        self.addCleanup(writer.close)
+        writer.execute('BEGIN IMMEDIATE')
+        with self.assertLogs('SecuritySystem', 'ERROR') as logs:
+            self.assertTrue(security.check_rate_limit('8.8.8.8'))
+        self.assertIn('database is locked', logs.output[0])
+        self.assertNotIn('8.8.8.8', security.blocked_ips)
+
+
+if __name__ == '__main__':
+    unittest.main()
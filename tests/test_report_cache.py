@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات ذاكرة التقارير وإصدارات البيانات
+Report Cache Tests
+"""
+
+import unittest
+from datetime import date
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db, report_cache, get_data_versions
+from report_cache import ReportCache
+
+
+class TestReportCache(unittest.TestCase):
+    """اختبارات إصابة الذاكرة وإبطالها بتغير إصدار البيانات"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        app.config['REPORT_CACHE_ENABLED'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            user = system.User(username='admin', full_name='admin', role='admin')
+            user.set_password('admin123')
+            db.session.add(user)
+            db.session.add(system.Expense(description='كهرباء', amount=300, category='utilities',
+                                          date=date(2024, 2, 1)))
+            db.session.commit()
+        report_cache.clear()
+        report_cache.reset_stats()
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def add_expense(self, amount):
+        with app.app_context():
+            db.session.add(system.Expense(description='إيجار', amount=amount, category='rent',
+                                          date=date(2024, 3, 1)))
+            db.session.commit()
+
+    def test_second_view_is_hit(self):
+        """العرض الثاني للتقرير نفسه يأتي من الذاكرة"""
+        first = self.client.get('/expenses_report')
+        second = self.client.get('/expenses_report')
+        self.assertEqual(first.headers['X-Report-Cache'], 'miss')
+        self.assertEqual(second.headers['X-Report-Cache'], 'hit')
+        self.assertEqual(first.data, second.data)
+
+    def test_write_invalidates(self):
+        """إضافة سجل تغير الإصدار فيُعاد حساب التقرير"""
+        self.client.get('/expenses_report')
+        self.add_expense(777)
+        response = self.client.get('/expenses_report')
+        self.assertEqual(response.headers['X-Report-Cache'], 'miss')
+        self.assertIn('777', response.get_data(as_text=True))
+
+    def test_unrelated_write_keeps_entry(self):
+        """تعديل جدول لا يعتمد عليه التقرير لا يبطله"""
+        self.client.get('/expenses_report')
+        with app.app_context():
+            db.session.add(system.Customer(name='عميل'))
+            db.session.commit()
+        self.assertEqual(self.client.get('/expenses_report').headers['X-Report-Cache'], 'hit')
+
+    def test_params_are_part_of_key(self):
+        """الفترة والفرع جزء من المفتاح"""
+        self.client.get('/quick_report/daily')
+        self.assertEqual(self.client.get('/quick_report/monthly').headers['X-Report-Cache'], 'miss')
+        with self.client.session_transaction() as sess:
+            sess['current_branch'] = 'China Town'
+        self.assertEqual(self.client.get('/quick_report/daily').headers['X-Report-Cache'], 'miss')
+
+    def test_rollback_keeps_version(self):
+        """التراجع عن المعاملة لا يغير الإصدار"""
+        with app.app_context():
+            before = get_data_versions(('expense',))
+            db.session.add(system.Expense(description='مؤقت', amount=1, category='rent', date=date(2024, 3, 1)))
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(get_data_versions(('expense',)), before)
+
+            db.session.query(system.Expense).filter_by(category='utilities').update({'amount': 301})
+            db.session.commit()
+            self.assertEqual(get_data_versions(('expense',))[0], before[0] + 1)
+
+    def test_lru_bounds(self):
+        """الذاكرة لا تتجاوز حد العدد والحجم"""
+        cache = ReportCache(max_entries=3, max_bytes=100)
+        for i in range(5):
+            cache.set(str(i), 'x' * 10)
+        self.assertEqual(cache.stats()['entries'], 3)
+        self.assertIsNone(cache.get('0'))
+        self.assertEqual(cache.get('4'), 'x' * 10)
+
+        cache.set('big', 'y' * 60)
+        cache.set('big2', 'y' * 60)
+        self.assertLessEqual(cache.stats()['bytes'], 100)
+        self.assertGreater(cache.evictions, 0)
+
+    def test_stats_endpoint(self):
+        """عدادات الذاكرة متاحة للمدير"""
+        self.client.get('/expenses_report')
+        self.client.get('/expenses_report')
+        stats = self.client.get('/api/report_cache').get_json()['stats']
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات ذاكرة إعدادات النظام
+Settings Cache Tests
+"""
+
+import unittest
+
+from sqlalchemy import event
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db, settings_cache, SystemSettings, DataVersion
+
+
+class TestSettingsCache(unittest.TestCase):
+    """اختبارات القراءة من الذاكرة وإبطالها"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            user = system.User(username='admin', full_name='admin', role='admin')
+            user.set_password('admin123')
+            db.session.add(user)
+            db.session.commit()
+            SystemSettings.set_setting('company_logo', '/static/uploads/logo.png', 'file')
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def count_queries(self, func):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                result = func()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+        return result, statements
+
+    def test_reads_do_not_query(self):
+        """القراءات المتكررة لا تصل لقاعدة البيانات"""
+        settings_cache.check_interval = 3600
+        with app.app_context():
+            settings_cache.load()
+        result, statements = self.count_queries(
+            lambda: [system.get_company_logo() for _ in range(100)] + [SystemSettings.get_setting('missing', 'x')]
+        )
+        self.assertEqual(result[0], '/static/uploads/logo.png')
+        self.assertEqual(result[-1], 'x')
+        self.assertEqual(statements, [])
+
+    def test_set_setting_invalidates(self):
+        """الكتابة تظهر فوراً في القراءة التالية"""
+        settings_cache.check_interval = 3600
+        with app.app_context():
+            self.assertEqual(system.get_company_logo(), '/static/uploads/logo.png')
+            SystemSettings.set_setting('company_logo', '/static/uploads/new.png', 'file')
+            self.assertEqual(system.get_company_logo(), '/static/uploads/new.png')
+
+    def test_other_worker_write_detected(self):
+        """تغير إصدار الإعدادات من عملية أخرى يعيد التحميل"""
+        settings_cache.check_interval = 0
+        with app.app_context():
+            settings_cache.load()
+            # محاكاة كتابة عملية أخرى: تعديل الصف مباشرة دون المرور بالذاكرة
+            db.session.execute(SystemSettings.__table__.update().values(setting_value='/other.png'))
+            db.session.commit()
+            self.assertEqual(SystemSettings.get_setting('company_logo'), '/other.png')
+        settings_cache.check_interval = 1.0
+
+    def test_batch_set_one_commit(self):
+        """حفظ عدة مفاتيح في معاملة واحدة يزيد الإصدار مرة واحدة"""
+        with app.app_context():
+            before = db.session.get(DataVersion, 'system_settings').version
+            saved = SystemSettings.set_setting({'company_name': 'شركة', 'tax_rate': '15', 'company_logo': '/l.png'})
+            self.assertEqual(len(saved), 3)
+            self.assertEqual(db.session.get(DataVersion, 'system_settings').version, before + 1)
+            self.assertEqual(SystemSettings.get_setting('tax_rate'), '15')
+            self.assertEqual(SystemSettings.query.count(), 3)
+
+    def test_settings_api(self):
+        """واجهة حفظ الإعدادات تحفظ كل الحقول"""
+        response = self.client.post('/api/system_settings', json={'settings': {'company_name': 'شركة', 'currency': 'SAR'}})
+        self.assertTrue(response.get_json()['success'])
+        with app.app_context():
+            self.assertEqual(SystemSettings.get_setting('currency'), 'SAR')
+        response = self.client.post('/api/system_settings', json={'settings': {'autosave_1_x': '{}'}})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
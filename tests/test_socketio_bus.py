@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات ناقل رسائل Socket.IO بين العمليات
+Socket.IO Message Bus Tests
+"""
+
+import os
+import json
+import time
+import socket
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+import subprocess
+import importlib.util
+
+import socketio
+
+from socketio_bus import (UnixSocketManager, PostgresNotifyManager, create_message_bus,
+                          resolve_bus_mode, libpq_url)
+
+
+class TestBusConfig(unittest.TestCase):
+    """اختبارات اختيار الناقل"""
+
+    def test_resolve_mode(self):
+        self.assertIsNone(resolve_bus_mode(None, None))
+        self.assertIsNone(resolve_bus_mode('none', 'postgresql://db/x'))
+        self.assertEqual(resolve_bus_mode('auto', 'postgres://u:p@db/x'), 'postgres')
+        self.assertEqual(resolve_bus_mode('auto', 'sqlite:///x.db'), 'unix')
+        self.assertEqual(resolve_bus_mode('unix', 'postgresql://db/x'), 'unix')
+        with self.assertRaises(ValueError):
+            resolve_bus_mode('postgres', 'sqlite:///x.db')
+        with self.assertRaises(ValueError):
+            resolve_bus_mode('redis', None)
+
+    def test_libpq_url(self):
+        self.assertEqual(libpq_url('postgresql+psycopg2://u:p@db:5432/x'), 'postgresql://u:p@db:5432/x')
+        self.assertEqual(libpq_url('postgres://u:p@db/x'), 'postgresql://u:p@db/x')
+
+    def test_create(self):
+        bus_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, bus_dir, True)
+        self.assertIsInstance(create_message_bus('auto', None, bus_dir), UnixSocketManager)
+        self.assertIsInstance(create_message_bus('auto', 'postgresql://u@db/x'), PostgresNotifyManager)
+        self.assertIsNone(create_message_bus('none'))
+
+
+class TestUnixSocketBus(unittest.TestCase):
+    """اختبارات ناقل مقابس Unix"""
+
+    def setUp(self):
+        self.bus_dir = tempfile.mkdtemp(prefix='bus')
+        self.addCleanup(shutil.rmtree, self.bus_dir, True)
+
+    def manager(self):
+        manager = UnixSocketManager(self.bus_dir)
+        self.addCleanup(manager.close)
+        return manager
+
+    def test_publish_reaches_other_processes_only(self):
+        sender, receiver = self.manager(), self.manager()
+        sender.bind()
+        receiver.bind()
+        self.assertEqual(sender.peers(), [receiver.path])
+
+        sender._publish({'method': 'emit', 'event': 'data_update', 'data': ['مرحبا']})
+        message = json.loads(next(receiver._listen()))
+        self.assertEqual(message['data'], ['مرحبا'])
+        self.assertEqual((sender.published, receiver.received), (1, 1))
+
+    def test_stale_socket_removed(self):
+        sender = self.manager()
+        stale_path = os.path.join(self.bus_dir, 'socketio_bus.999999.deadbeef.sock')
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        stale.bind(stale_path)
+        stale.close()
+
+        sender._publish({'method': 'emit'})
+        self.assertFalse(os.path.exists(stale_path))
+
+    def test_emit_across_servers(self):
+        """emit في خادم يصل لعميل متصل بخادم آخر عبر الناقل"""
+        server_a = socketio.Server(async_mode='threading', client_manager=self.manager())
+        manager_b = self.manager()
+        server_b = socketio.Server(async_mode='threading', client_manager=manager_b)
+        sent = []
+        server_b._send_eio_packet = lambda eio_sid, pkt: sent.append((eio_sid, pkt.data))
+
+        # عميل متصل بالخادم الثاني في غرفة صفحة المبيعات
+        sid = manager_b.connect('eio-1', '/')
+        manager_b.enter_room(sid, '/', 'page_sales')
+        server_b.manager_initialized = True
+        manager_b.initialize()
+        deadline = time.time() + 5
+        while manager_b._receiver is None and time.time() < deadline:
+            time.sleep(0.01)
+
+        server_a.emit('data_update', {'type': 'batch', 'events': []}, to='page_sales')
+        while not sent and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(sent), 1)
+        eio_sid, data = sent[0]
+        self.assertEqual(eio_sid, 'eio-1')
+        self.assertEqual(json.loads(data[1:]), ['data_update', {'type': 'batch', 'events': []}])
+
+
+GREEN_PUBLISH_SCRIPT = '''
+import sys
+import tempfile
+from socketio_bus import UnixSocketManager, PostgresNotifyManager
+
+# المديران يُنشآن (ويُنشأ قفلاهما) قبل monkey_patch كما في العملية الأم مع --preload
+unix = UnixSocketManager(tempfile.mkdtemp(prefix='bus'))
+postgres = PostgresNotifyManager('postgresql://unused/x')
+unix.publish_lock()
+postgres.publish_lock()
+
+import eventlet
+eventlet.monkey_patch()
+
+
+class YieldingCursor:
+    """مؤشر يسلّم الـ hub أثناء execute كما يفعل psycopg2 مع eventlet"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, *args):
+        eventlet.sleep(0.05)
+
+
+class YieldingConnection:
+    closed = False
+
+    def cursor(self):
+        return YieldingCursor()
+
+
+postgres._connect = YieldingConnection
+peers = unix.peers
+unix.peers = lambda: (eventlet.sleep(0.05), peers())[1]
+
+pool = eventlet.GreenPool()
+for manager in (postgres, postgres, unix, unix):
+    pool.spawn(manager._publish, {'method': 'emit'})
+pool.waitall()
+print(postgres.published, unix.published)
+'''
+
+
+@unittest.skipUnless(importlib.util.find_spec('eventlet') and importlib.util.find_spec('psycopg2'),
+                     'eventlet أو psycopg2 غير مثبت')
+class TestGreenPublish(unittest.TestCase):
+    """نشران متزامنان من خيطين أخضرين لا يحجبان العملية"""
+
+    def test_concurrent_green_publishes(self):
+        result = subprocess.run([sys.executable, '-c', GREEN_PUBLISH_SCRIPT], capture_output=True, text=True,
+                                timeout=30, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split(), ['2', '2'])
+
+
+@unittest.skipUnless(os.environ.get('SOCKETIO_BUS_TEST_URL'),
+                     'SOCKETIO_BUS_TEST_URL (قاعدة PostgreSQL للاختبار) غير محدد')
+class TestPostgresNotifyBus(unittest.TestCase):
+    """اختبارات ناقل LISTEN/NOTIFY (تحتاج PostgreSQL محلياً)"""
+
+    def test_small_and_spilled_messages(self):
+        url = libpq_url(os.environ['SOCKETIO_BUS_TEST_URL'])
+        sender = PostgresNotifyManager(url, channel='socketio_bus_test')
+        receiver = PostgresNotifyManager(url, channel='socketio_bus_test', poll_timeout=0.2)
+        listener = receiver._listen()
+        messages = []
+        thread = threading.Thread(target=lambda: messages.extend(next(listener) for _ in range(2)), daemon=True)
+        thread.start()
+        time.sleep(0.5)
+
+        sender._publish({'method': 'emit', 'data': ['x']})
+        sender._publish({'method': 'emit', 'data': ['y' * 20000]})
+        thread.join(10)
+        self.assertEqual([json.loads(m)['data'][0][:1] for m in messages], ['x', 'y'])
+        self.assertEqual(len(json.loads(messages[1])['data'][0]), 20000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات مراقبة استعلامات SQL
+SQL Profiler Tests
+"""
+
+import unittest
+from datetime import date
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db
+from sql_profiler import sql_profiler, statement_shape
+
+
+class TestSQLProfiler(unittest.TestCase):
+    """اختبارات Server-Timing وكشف N+1"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            db.session.add(admin)
+            for i in range(15):
+                customer = system.Customer(name=f'عميل {i}')
+                db.session.add(customer)
+                db.session.add(system.SalesInvoice(
+                    invoice_number=f'INV-{i}', date=date(2024, 1, 1), customer=customer,
+                    subtotal=10, total=10, status='paid'
+                ))
+            db.session.commit()
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def test_statement_shape(self):
+        """القيم الحرفية وقوائم IN لا تغير شكل الاستعلام"""
+        self.assertEqual(
+            statement_shape("SELECT * FROM t WHERE id = 5 AND name = 'x'"),
+            statement_shape("SELECT *\n FROM t WHERE id = 17 AND name = 'y'")
+        )
+        self.assertEqual(
+            statement_shape('SELECT * FROM t WHERE id IN (?, ?, ?)'),
+            statement_shape('SELECT * FROM t WHERE id IN (?, ?)')
+        )
+
+    def test_server_timing_header(self):
+        """كل طلب يحمل ترويسة Server-Timing بعدد الاستعلامات"""
+        response = self.client.get('/sales')
+        self.assertEqual(response.status_code, 200)
+        timing = response.headers.get('Server-Timing')
+        self.assertIn('db;dur=', timing)
+        self.assertIn('queries', timing)
+        self.assertNotIn('nplus1', timing)
+
+    def test_streamed_response_skipped(self):
+        """الاستجابة المتدفقة تنفذ استعلاماتها بعد after_request فلا تُقاس"""
+        with app.test_request_context('/stream'):
+            sql_profiler.start_request()
+            system.SalesInvoice.query.all()
+            response = sql_profiler.finish_request(app.response_class(iter(['a', 'b'])))
+        self.assertTrue(response.is_streamed)
+        self.assertNotIn('Server-Timing', response.headers)
+
+    def test_nplusone_detected(self):
+        """الاستعلامات المتكررة بالشكل نفسه تُكشف كـ N+1"""
+        with app.test_request_context('/nplusone'):
+            sql_profiler.start_request()
+            names = [sale.customer.name for sale in system.SalesInvoice.query.all()]
+            self.assertEqual(len(names), 15)
+            with self.assertLogs('SQLProfiler', level='WARNING') as logs:
+                response = sql_profiler.finish_request(app.response_class('ok'))
+        self.assertIn('nplus1', ','.join(response.headers.getlist('Server-Timing')))
+        self.assertTrue(any('N+1' in line for line in logs.output))
+
+        # التحميل المسبق يزيل التكرار
+        response = self.client.get('/api/sales')
+        self.assertNotIn('nplus1', ','.join(response.headers.getlist('Server-Timing')))
+
+    def test_slow_request_logged(self):
+        """الطلبات البطيئة تُسجل مع أثقل الاستعلامات"""
+        previous = sql_profiler.slow_request_ms
+        sql_profiler.slow_request_ms = 0.001
+        try:
+            with self.assertLogs('SQLProfiler', level='WARNING') as logs:
+                self.client.get('/sales')
+        finally:
+            sql_profiler.slow_request_ms = previous
+        self.assertTrue(any('SELECT' in line for line in logs.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
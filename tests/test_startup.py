@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات مسار التشغيل السريع
+Startup Path Tests
+"""
+
+import unittest
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, inspect
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db, SystemSettings
+from migrate_database import schema_fingerprint
+
+
+# الأعمدة والجداول التي أضيفت بعد المخطط الأصلي (قاعدة بيانات منشأة بالإصدار الأول)
+BASELINE_MISSING_COLUMNS = {
+    'customer': ('balance', 'updated_at'),
+    'supplier': ('balance', 'updated_at'),
+    'product': ('updated_at',),
+    'sales_invoice': ('due_date', 'amount_paid', 'balance_due', 'updated_at'),
+    'purchase_invoice': ('due_date', 'amount_paid', 'balance_due'),
+}
+BASELINE_MISSING_TABLES = ('account', 'account_period_balance', 'background_job', 'daily_summary',
+                           'data_version', 'journal_entry', 'journal_line', 'party_balance_month',
+                           'payment_allocation')
+
+
+def create_baseline_schema(engine):
+    """إنشاء مخطط الإصدار الأول: الجداول القديمة بلا الأعمدة الجديدة ولا فهارسها"""
+    baseline = MetaData()
+    for table in db.metadata.sorted_tables:
+        if table.name in BASELINE_MISSING_TABLES:
+            continue
+        missing = BASELINE_MISSING_COLUMNS.get(table.name, ())
+        Table(table.name, baseline, *[column._copy() for column in table.columns if column.name not in missing])
+    baseline.create_all(engine)
+    return baseline
+
+
+class TestStartup(unittest.TestCase):
+    """اختبارات بصمة المخطط وتخطي التهيئة المكررة"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+
+    def run_init(self):
+        system._db_initialized = False
+        with mock.patch.object(system.db, 'create_all', wraps=db.create_all) as create_all:
+            system.init_db()
+        return create_all.call_count
+
+    def test_fingerprint_tracks_schema(self):
+        """البصمة ثابتة وتتغير بإضافة عمود"""
+        def build(extra):
+            metadata = MetaData()
+            columns = [Column('id', Integer, primary_key=True), Column('name', String(50))]
+            if extra:
+                columns.append(Column('note', String(20)))
+            Table('sample', metadata, *columns)
+            return metadata
+
+        with app.app_context():
+            dialect = db.engine.dialect
+            self.assertEqual(schema_fingerprint(build(False), dialect), schema_fingerprint(build(False), dialect))
+            self.assertNotEqual(schema_fingerprint(build(False), dialect), schema_fingerprint(build(True), dialect))
+
+    def test_matching_fingerprint_skips_create_all(self):
+        """التشغيل الأول ينشئ المخطط ويحفظ البصمة، والتالي يتخطاه"""
+        self.assertEqual(self.run_init(), 1)
+        with app.app_context():
+            self.assertEqual(SystemSettings.get_setting('schema_fingerprint'),
+                             schema_fingerprint(db.metadata, db.engine.dialect))
+            self.assertIsNotNone(system.User.query.filter_by(username='admin').first())
+        self.assertEqual(self.run_init(), 0)
+
+    def test_repeated_call_is_noop(self):
+        """الاستدعاء الثاني في العملية نفسها لا يفعل شيئاً"""
+        self.run_init()
+        with mock.patch.object(system.db, 'create_all') as create_all, \
+                mock.patch.object(system.settings_cache, 'load') as load:
+            system.init_db()
+        create_all.assert_not_called()
+        load.assert_not_called()
+
+    def test_upgrade_baseline_database(self):
+        """قاعدة بيانات بالمخطط الأول تُرحّل أعمدتها ثم تُحسب الأرصدة وتواريخ الاستحقاق"""
+        with app.app_context():
+            db.drop_all()
+            baseline = create_baseline_schema(db.engine)
+            with db.engine.begin() as conn:
+                conn.execute(baseline.tables['customer'].insert(), {'id': 1, 'name': 'عميل قديم'})
+                conn.execute(baseline.tables['sales_invoice'].insert(), [
+                    {'invoice_number': 'OLD-1', 'customer_id': 1, 'date': date(2024, 1, 10),
+                     'subtotal': 100, 'total': 100, 'status': 'pending'},
+                    {'invoice_number': 'OLD-2', 'customer_id': 1, 'date': date(2024, 1, 11),
+                     'subtotal': 50, 'total': 50, 'status': 'paid'},
+                ])
+            self.assertNotIn('balance_due', {column['name'] for column in inspect(db.engine).get_columns('sales_invoice')})
+
+        self.run_init()
+        self.assertTrue(system._db_initialized)
+        with app.app_context():
+            self.assertEqual(app.config['SQLALCHEMY_DATABASE_URI'], str(db.engine.url))
+            inspector = inspect(db.engine)
+            for table, columns in BASELINE_MISSING_COLUMNS.items():
+                self.assertTrue(set(columns) <= {column['name'] for column in inspector.get_columns(table)}, table)
+            invoices = {invoice.invoice_number: invoice for invoice in system.SalesInvoice.query}
+            self.assertEqual(invoices['OLD-1'].balance_due, Decimal('100'))
+            self.assertEqual(invoices['OLD-2'].balance_due, Decimal('0'))
+            self.assertEqual(invoices['OLD-1'].due_date, date(2024, 1, 10) + system.timedelta(
+                days=app.config['PAYMENT_TERMS_DAYS']))
+            self.assertEqual(db.session.get(system.Customer, 1).balance, Decimal('100'))
+            self.assertEqual(SystemSettings.get_setting('schema_fingerprint'),
+                             schema_fingerprint(db.metadata, db.engine.dialect))
+
+    def test_init_failure_is_loud(self):
+        """فشل التهيئة يُرفع بدل التبديل الصامت لقاعدة بيانات في الذاكرة"""
+        system._db_initialized = False
+        uri = app.config['SQLALCHEMY_DATABASE_URI']
+        with mock.patch.object(system, 'prepare_schema', side_effect=RuntimeError('disk full')), \
+                mock.patch.object(system.settings_cache, 'get', return_value=None):
+            with self.assertRaises(RuntimeError):
+                system.init_db()
+        self.assertFalse(system._db_initialized)
+        self.assertEqual(app.config['SQLALCHEMY_DATABASE_URI'], uri)
+
+    def test_seed_demo_idempotent(self):
+        """البيانات التجريبية تُضاف مرة واحدة عبر الأمر"""
+        runner = app.test_cli_runner()
+        self.run_init()
+        result = runner.invoke(args=['seed-demo'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        runner.invoke(args=['seed-demo'])
+        with app.app_context():
+            self.assertEqual(system.Customer.query.filter_by(name='عميل تجريبي').count(), 1)
+            self.assertEqual(system.Employee.query.count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
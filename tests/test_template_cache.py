@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات ذاكرة القوالب المترجمة
+Compiled Template Cache Tests
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import accounting_system_complete as system
+from accounting_system_complete import app, db
+
+
+class TestTemplateCache(unittest.TestCase):
+    """اختبارات ترجمة القوالب مرة واحدة"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin = system.User(username='admin', full_name='مدير النظام', role='admin')
+            admin.set_password('admin123')
+            db.session.add(admin)
+            db.session.commit()
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def test_template_compiled_once(self):
+        """الصفحة لا تُترجم مجدداً في الطلبات التالية"""
+        self.client.get('/dashboard')
+        with mock.patch.object(app.jinja_env, 'compile', wraps=app.jinja_env.compile) as compile_mock:
+            for _ in range(3):
+                self.assertEqual(self.client.get('/dashboard').status_code, 200)
+        compile_mock.assert_not_called()
+
+    def test_same_source_same_template(self):
+        """النص نفسه يعيد القالب نفسه"""
+        source = '{{ value }} - {{ _("Dashboard") }}'
+        with app.test_request_context():
+            first = system.get_compiled_template(source)
+            self.assertIs(system.get_compiled_template(source), first)
+            self.assertTrue(system.render_template_string(source, value=5).startswith('5 - '))
+
+    def test_autoescape_enabled(self):
+        """القيم تُهرب تلقائياً كما في render_template_string الأصلي"""
+        with app.app_context():
+            db.session.add(system.Customer(name='<img src=x onerror=alert(1)>'))
+            db.session.commit()
+        html = self.client.get('/customers').get_data(as_text=True)
+        self.assertIn('&lt;img src=x onerror=alert(1)&gt;', html)
+        self.assertNotIn('<img src=x onerror=alert(1)>', html)
+        with app.test_request_context():
+            self.assertEqual(system.render_template_string('{{ value }}', value='<b>'), '&lt;b&gt;')
+
+    def test_bytecode_written_to_disk(self):
+        """الشيفرة المترجمة تُحفظ على القرص لتستخدمها العمليات الجديدة"""
+        cache_dir = app.config['TEMPLATE_CACHE_DIR']
+        source = '<p>{{ value }} bytecode-test</p>'
+        system._compiled_templates.pop(source, None)
+        before = set(os.listdir(cache_dir))
+        with app.test_request_context():
+            system.get_compiled_template(source)
+        self.assertTrue(set(os.listdir(cache_dir)) - before)
+
+        # عملية جديدة: تُحمّل من القرص دون ترجمة
+        system._compiled_templates.pop(source)
+        with mock.patch.object(app.jinja_env, 'compile') as compile_mock:
+            template = system.get_compiled_template(source)
+        compile_mock.assert_not_called()
+        self.assertEqual(template.render(value=1), '<p>1 bytecode-test</p>')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات فاحص التهديدات المترجم
+Threat Scanner Tests
+"""
+
+import os
+import sys
+import unittest
+
+from flask import Flask, request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+import threat_scanner
+from threat_scanner import ThreatScanner, ScanAllowList, BASIC_CATEGORIES
+from ip_blocklist import Blocklist
+from security_system import SecuritySystem, AdvancedThreatDetection
+from benchmark_threat_scanner import legacy_scan, invoice_form, SQL_PAYLOADS, XSS_PAYLOADS, OTHER_PAYLOADS
+
+
+class TestThreatScanner(unittest.TestCase):
+    """اختبارات الفحص بمرور واحد"""
+
+    def scanners(self):
+        yield ThreatScanner(use_ahocorasick=False, cache_size=0)
+        yield ThreatScanner(prefilter=False)
+        if threat_scanner.AHOCORASICK_AVAILABLE:
+            yield ThreatScanner(use_ahocorasick=True)
+
+    def test_payloads_match_legacy(self):
+        """نفس الأنواع التي يكتشفها الفحص القديم لكل حمولة"""
+        samples = SQL_PAYLOADS + XSS_PAYLOADS + OTHER_PAYLOADS + [
+            'ſelect * from users', 'https://example.com/a', "x' oR 'a'='a", '%2E%2E%2Fetc', 'test$ne',
+        ]
+        for scanner in self.scanners():
+            for sample in samples:
+                self.assertEqual(sorted(scanner.scan(sample)), sorted(legacy_scan(sample)),
+                                 f'{scanner.prefilter_backend}: {sample}')
+
+    def test_benign_values(self):
+        scanner = ThreatScanner()
+        for value in invoice_form(20) + ['', None, 0, 'محمد عبدالله', '12.50']:
+            self.assertEqual(scanner.scan(value), [], value)
+
+    def test_max_length(self):
+        """الجزء بعد الحد الأقصى لا يُفحص"""
+        scanner = ThreatScanner(max_value_length=100)
+        self.assertEqual(scanner.scan('a' * 100 + '<script>x</script>'), [])
+        self.assertEqual(scanner.scan('<script>x</script>' + 'a' * 1000), ['XSS Attack'])
+
+    def test_cache(self):
+        scanner = ThreatScanner(cache_max_length=10)
+        scanner.scan('12')
+        scanner.scan('12')
+        scanner.scan('x' * 50)
+        info = scanner.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_allow_list(self):
+        allow = ScanAllowList({'add_sale': ['notes'], 'webhook': ['*']})
+        self.assertTrue(allow.allows('add_sale', 'notes'))
+        self.assertFalse(allow.allows('add_sale', 'total'))
+        self.assertFalse(allow.allows('add_customer', 'notes'))
+        self.assertTrue(allow.skip_endpoint('webhook'))
+        self.assertFalse(allow.skip_endpoint('add_sale'))
+
+    def test_detection_wrappers(self):
+        security = SecuritySystem(blocklist=Blocklist())
+        self.assertTrue(security.detect_sql_injection("1' OR '1'='1"))
+        self.assertTrue(security.detect_xss('<svg onload=alert(1)>'))
+        self.assertTrue(security.detect_path_traversal('../../etc/passwd'))
+        self.assertEqual(security.validate_input('; rm -rf /'), [])
+        self.assertEqual(AdvancedThreatDetection().detect_advanced_threats('; rm -rf /'), ['command_injection'])
+
+
+class TestSecurityCheck(unittest.TestCase):
+    """اختبارات فحص الطلبات في SecuritySystem"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config.update(SECURITY_SCAN_ALLOW={'sale': ['notes']}, SECURITY_SCAN_MAX_LENGTH=1000)
+        self.security = SecuritySystem(blocklist=Blocklist())
+        self.advanced = []
+        self.security.init_app(self.app)
+        self.app.config['SESSION_COOKIE_SECURE'] = False
+
+        @self.app.route('/sale', methods=['POST'])
+        def sale():
+            return 'ok'
+
+        self.client = self.app.test_client()
+
+    def post(self, data, ip='10.0.0.1'):
+        return self.client.post('/sale', data=data, headers={'X-Forwarded-For': ip}).status_code
+
+    def post_json(self, payload, ip='10.0.0.1'):
+        return self.client.post('/sale', json=payload, headers={'X-Forwarded-For': ip}).status_code
+
+    def test_blocks_basic_threat(self):
+        self.assertEqual(self.post({'total': '115', 'customer': 'عميل'}), 200)
+        self.assertEqual(self.post({'total': "1' OR '1'='1"}, ip='10.0.0.2'), 403)
+        self.assertIn('10.0.0.2', self.security.blocked_ips)
+
+    def test_allow_listed_field(self):
+        self.assertEqual(self.post({'notes': 'select the blue <b>box</b>'}), 200)
+        self.assertEqual(self.post({'total': 'select the blue box'}, ip='10.0.0.3'), 403)
+
+    def test_advanced_threats_in_same_pass(self):
+        self.assertEqual(self.post({'cmd': '; rm -rf /'}, ip='10.0.0.4'), 200)
+        self.security.enable_advanced_detection(lambda ip, threats: self.advanced.append((ip, threats)))
+        self.assertEqual(self.post({'cmd': '; rm -rf /'}, ip='10.0.0.5'), 403)
+        self.assertEqual(self.advanced, [('10.0.0.5', ['command_injection'])])
+        self.assertEqual(self.security.request_scanner.categories[:3], list(BASIC_CATEGORIES))
+
+    def test_json_values_scanned_individually(self):
+        """قيم JSON تُفحص واحدة واحدة مع استثناءات الحقول، لا تمثيل str() للجسم كاملاً"""
+        with self.app.test_request_context('/sale', method='POST', json={
+                'customer': {'name': "O'Brien", 'tags': ['vip', 1]}, 'notes': '<b>x</b>', 'paid': True}):
+            allow = ScanAllowList({'sale': ['notes']})
+            values = list(threat_scanner.iter_request_values(request, allow, 'sale'))
+        self.assertIn(('json', 'name', "O'Brien"), values)
+        self.assertIn(('json', 'tags', '1'), values)
+        self.assertIn(('json', 'paid', 'True'), values)
+        self.assertNotIn(('json', 'notes', '<b>x</b>'), values)
+
+        self.assertEqual(self.post_json({'customer': {'name': "O'Brien"}, 'notes': 'select <b>box</b>'}), 200)
+        self.assertEqual(self.post_json({'items': [{'name': "1' OR '1'='1"}]}, ip='10.0.0.6'), 403)
+
+        self.security.enable_advanced_detection(lambda ip, threats: self.advanced.append((ip, threats)))
+        self.assertEqual(self.post_json({'lines': [{'cmd': '; rm -rf /'}]}, ip='10.0.0.7'), 403)
+        self.assertEqual(self.advanced, [('10.0.0.7', ['command_injection'])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات حزم الترجمة للمتصفح
+Translation Bundle Tests
+"""
+
+import os
+import gzip
+import json
+import tempfile
+import unittest
+
+import accounting_system_complete as system
+from accounting_system_complete import app
+from translation_catalog import write_js_bundles
+
+
+class TestTranslationBundles(unittest.TestCase):
+    """اختبارات الحزم ذات البصمة وتقديمها"""
+
+    def setUp(self):
+        """إعداد الاختبار"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def test_bundle_contents(self):
+        """الحزمة تجمع الفهرس المدمج ومفاتيح الواجهة"""
+        bundle = system.TRANSLATION_BUNDLES['en']
+        messages = json.loads(bundle.body)
+        self.assertEqual(messages['dashboard'], 'Dashboard')
+        self.assertEqual(messages['لوحة التحكم'], 'Dashboard')
+        self.assertEqual(messages['تكاليف الوجبات'], 'Meal Costs')
+        self.assertIn(bundle.digest, bundle.filename)
+
+    def test_get_translations_redirects_to_bundle(self):
+        """المسار القديم يحول إلى حزمة لغة الجلسة"""
+        with self.client.session_transaction() as sess:
+            sess['language'] = 'en'
+        response = self.client.get('/get_translations')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.location.endswith(system.TRANSLATION_BUNDLES['en'].filename))
+
+    def test_served_precompressed_and_immutable(self):
+        """تقديم النسخة المضغوطة مع تخزين دائم"""
+        url = system.translation_bundle_url('ar')
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertEqual(json.loads(gzip.decompress(response.data))['dashboard'], 'لوحة التحكم')
+
+        plain = self.client.get(url, headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(json.loads(plain.data)['dashboard'], 'لوحة التحكم')
+
+        self.assertEqual(self.client.get('/i18n/translations.ar.000000000000.json').status_code, 404)
+
+    def test_conditional_request(self):
+        """إعادة الطلب بالـ ETag نفسه ترجع 304 بلا جسم"""
+        url = system.translation_bundle_url('en')
+        headers = {'Accept-Encoding': 'gzip'}
+        etag = self.client.get(url, headers=headers).headers['ETag']
+        response = self.client.get(url, headers={**headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        # ETag نسخة أخرى (غير مضغوطة) لا يطابق
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip;q=0', 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_write_bundles(self):
+        """كتابة الحزم على القرص مع ملف manifest"""
+        output_dir = tempfile.mkdtemp()
+        write_js_bundles({'ar': system.TRANSLATION_BUNDLES['ar']}, output_dir)
+        manifest = write_js_bundles({'en': system.TRANSLATION_BUNDLES['en']}, output_dir)
+        self.assertEqual(set(manifest), {'ar', 'en'})
+        path = os.path.join(output_dir, manifest['en'])
+        self.assertTrue(os.path.exists(path + '.gz'))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), system.TRANSLATION_BUNDLES['en'].body)
+
+
+if __name__ == '__main__':
+    unittest.main()
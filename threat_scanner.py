@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🔎 فاحص التهديدات المترجم مسبقاً
+Single-pass compiled threat scanner
+
+يجمع أنماط SQL Injection و XSS و Path Traversal والتهديدات المتقدمة في تعبير نمطي
+واحد مترجم مسبقاً، فيُفحص كل حقل بمرور واحد بدلاً من عشرات استدعاءات re.search:
+
+1. مرشح أولي: الكلمات والرموز التي لا يطابق أي نمط بدون إحداها ('<' و '=' و 'select' ...).
+   القيم العادية (أرقام، أسماء، كميات) لا تحتوي أياً منها فلا يُشغّل التعبير النمطي أصلاً.
+   يُستخدم Aho-Corasick (مكتبة pyahocorasick الاختيارية) إذا كانت مثبتة
+2. التعبير المجمّع: مرور واحد يحدد هل في القيمة تهديد
+3. عند الاكتشاف فقط (مسار نادر): تحديد أنواع التهديد بأنماط كل فئة على حدة
+
+وحدود الكلفة:
+- الحد الأقصى لطول القيمة المفحوصة (max_value_length): الأجزاء الأطول لا تُفحص
+- ذاكرة LRU لنتائج القيم القصيرة المتكررة (الكميات والأسعار في نماذج الفواتير)
+- قوائم سماح لكل مسار: حقول لا تُفحص في مسارات محددة (مثل ملاحظات الفاتورة)
+"""
+
+import re
+from functools import lru_cache
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+# ===== الأنماط =====
+# كل فئة: (الأنماط، المحفزات). المحفزات نصوص لا يمكن لأي نمط في الفئة أن يطابق
+# دون وجود إحداها في القيمة؛ عند إضافة نمط يجب إضافة محفزه هنا
+
+SQL_INJECTION_PATTERNS = [
+    r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|UNION)\b)",
+    r"(\b(OR|AND)\s+\d+\s*=\s*\d+)",
+    r"(\b(OR|AND)\s+['\"]?\w+['\"]?\s*=\s*['\"]?\w+['\"]?)",
+    r"(--|#|/\*|\*/)",
+    r"(\bUNION\s+SELECT\b)",
+    r"(\b(INFORMATION_SCHEMA|SYSOBJECTS|SYSCOLUMNS)\b)",
+    r"([\'\"];?\s*(DROP|DELETE|INSERT|UPDATE))",
+    r"(\b(EXEC|EXECUTE)\s*\()",
+    r"(\b(SP_|XP_)\w+)",
+    r"(WAITFOR\s+DELAY)"
+]
+SQL_INJECTION_TRIGGERS = [
+    'select', 'insert', 'update', 'delete', 'drop', 'create', 'alter', 'exec', 'union',
+    '=', '--', '#', '/*', '*/', 'information_schema', 'sysobjects', 'syscolumns',
+    'sp_', 'xp_', 'waitfor'
+]
+
+XSS_PATTERNS = [
+    r"<script[^>]*>.*?</script>",
+    r"javascript:",
+    r"on\w+\s*=",
+    r"<iframe[^>]*>",
+    r"<object[^>]*>",
+    r"<embed[^>]*>",
+    r"<link[^>]*>",
+    r"<meta[^>]*>",
+    r"vbscript:",
+    r"expression\s*\(",
+    r"@import",
+    r"<svg[^>]*>.*?</svg>",
+    r"<img[^>]*onerror",
+    r"<body[^>]*onload"
+]
+XSS_TRIGGERS = ['<', 'script:', '=', 'expression', '@import']
+
+PATH_TRAVERSAL_PATTERNS = [
+    r"\.\./",
+    r"\.\.\\",
+    r"%2e%2e%2f",
+    r"%2e%2e\\",
+    r"..%2f",
+    r"..%5c",
+    r"%252e%252e%252f",
+    r"....//",
+    r"....\\\\",
+]
+PATH_TRAVERSAL_TRIGGERS = ['../', '..\\', '%2e', '%2f', '%5c', '%25', '//', '\\\\']
+
+ADVANCED_THREAT_PATTERNS = {
+    'command_injection': [
+        r';\s*(rm|del|format|shutdown|reboot)',
+        r'\|\s*(nc|netcat|telnet|ssh)',
+        r'`[^`]*`',
+        r'\$\([^)]*\)',
+        r'&&\s*(rm|del|format)',
+        r'\|\|\s*(rm|del|format)'
+    ],
+    'ldap_injection': [
+        r'\*\)\(\|',
+        r'\*\)\(\&',
+        r'\)\(\|',
+        r'\)\(\&',
+        r'\*\)\(\w+=\*'
+    ],
+    'xml_injection': [
+        r'<!ENTITY',
+        r'<!DOCTYPE',
+        r'&\w+;',
+        r'<!\[CDATA\[',
+        r']]>'
+    ],
+    'nosql_injection': [
+        r'\$where',
+        r'\$ne',
+        r'\$gt',
+        r'\$lt',
+        r'\$regex',
+        r'\$or',
+        r'\$and'
+    ]
+}
+ADVANCED_THREAT_TRIGGERS = {
+    'command_injection': [';', '|', '`', '$(', '&&'],
+    'ldap_injection': [')('],
+    'xml_injection': ['<', '&', ']]>'],
+    'nosql_injection': ['$'],
+}
+
+# أسماء الفئات كما تظهر في السجلات وقرارات الحظر
+SQL_INJECTION = 'SQL Injection'
+XSS_ATTACK = 'XSS Attack'
+PATH_TRAVERSAL = 'Path Traversal'
+BASIC_CATEGORIES = (SQL_INJECTION, XSS_ATTACK, PATH_TRAVERSAL)
+
+THREAT_CATEGORIES = {
+    SQL_INJECTION: (SQL_INJECTION_PATTERNS, SQL_INJECTION_TRIGGERS),
+    XSS_ATTACK: (XSS_PATTERNS, XSS_TRIGGERS),
+    PATH_TRAVERSAL: (PATH_TRAVERSAL_PATTERNS, PATH_TRAVERSAL_TRIGGERS),
+}
+for _name, _patterns in ADVANCED_THREAT_PATTERNS.items():
+    THREAT_CATEGORIES[_name] = (_patterns, ADVANCED_THREAT_TRIGGERS[_name])
+
+
+class _Prefilter:
+    """هل تحتوي القيمة على أي محفز؟
+
+    بديل re يطابق المحفزات بـ IGNORECASE فيتبع قواعد حالة الأحرف نفسها في الأنماط.
+    Aho-Corasick يقارن بايتات بأحرف صغيرة، فيُستخدم للقيم ASCII فقط: قيم Unicode مثل 'ſelect'
+    تطابق SELECT بـ IGNORECASE دون أن تحتوي 'select' بعد lower()
+    """
+
+    def __init__(self, triggers, use_ahocorasick=True):
+        triggers = sorted(set(triggers), key=len, reverse=True)
+        self.backend = 'ahocorasick' if (use_ahocorasick and AHOCORASICK_AVAILABLE) else 're'
+        if self.backend == 'ahocorasick':
+            automaton = ahocorasick.Automaton()
+            for trigger in triggers:
+                automaton.add_word(trigger, trigger)
+            automaton.make_automaton()
+            self._automaton = automaton
+        else:
+            self._pattern = re.compile('|'.join(re.escape(trigger) for trigger in triggers), re.IGNORECASE)
+
+    def __call__(self, value):
+        if self.backend == 'ahocorasick':
+            if not value.isascii():
+                return True
+            for _ in self._automaton.iter(value.lower()):
+                return True
+            return False
+        return self._pattern.search(value) is not None
+
+
+class ThreatScanner:
+    """فاحص بمرور واحد لمجموعة فئات من THREAT_CATEGORIES"""
+
+    def __init__(self, categories=None, max_value_length=16384, prefilter=True,
+                 use_ahocorasick=True, cache_size=4096, cache_max_length=256):
+        self.categories = list(categories or THREAT_CATEGORIES)
+        self.max_value_length = max_value_length
+        self.cache_max_length = cache_max_length
+
+        self._by_category = {
+            name: re.compile('|'.join(f'(?:{p})' for p in THREAT_CATEGORIES[name][0]), re.IGNORECASE | re.DOTALL)
+            for name in self.categories
+        }
+        self._combined = re.compile(
+            '|'.join(f'(?:{pattern.pattern})' for pattern in self._by_category.values()),
+            re.IGNORECASE | re.DOTALL
+        )
+        triggers = [trigger for name in self.categories for trigger in THREAT_CATEGORIES[name][1]]
+        self._prefilter = _Prefilter(triggers, use_ahocorasick) if prefilter else None
+        self._cached_scan = lru_cache(maxsize=cache_size)(self._scan) if cache_size else self._scan
+
+    @property
+    def prefilter_backend(self):
+        return self._prefilter.backend if self._prefilter else None
+
+    def scan(self, value):
+        """قائمة أنواع التهديد في القيمة (فارغة إذا كانت سليمة)"""
+        if not value:
+            return []
+        value = value if isinstance(value, str) else str(value)
+        if len(value) > self.max_value_length:
+            value = value[:self.max_value_length]
+        if len(value) <= self.cache_max_length:
+            return list(self._cached_scan(value))
+        return list(self._scan(value))
+
+    def _scan(self, value):
+        if self._prefilter is not None and not self._prefilter(value):
+            return ()
+        if self._combined.search(value) is None:
+            return ()
+        return tuple(name for name, pattern in self._by_category.items() if pattern.search(value))
+
+    def cache_info(self):
+        return self._cached_scan.cache_info() if hasattr(self._cached_scan, 'cache_info') else None
+
+
+class ScanAllowList:
+    """حقول مستثناة من الفحص لكل مسار: {endpoint: ['notes', ...]} و '*' لكل الحقول"""
+
+    def __init__(self, rules=None):
+        self.rules = {endpoint: frozenset(fields) for endpoint, fields in (rules or {}).items()}
+
+    def skip_endpoint(self, endpoint):
+        return '*' in self.rules.get(endpoint, ())
+
+    def allows(self, endpoint, field):
+        fields = self.rules.get(endpoint)
+        return bool(fields) and ('*' in fields or field in fields)
+
+
+def iter_request_values(request, allow_list=None, endpoint=None):
+    """أزواج (مصدر، اسم الحقل، القيمة) من معاملات الرابط وحقول النموذج وقيم جسم JSON"""
+    items = [('args', request.args.items(multi=True)), ('form', request.form.items(multi=True))]
+    if request.is_json:
+        items.append(('json', _iter_json(request.get_json(silent=True))))
+    for source, pairs in items:
+        for key, value in pairs:
+            yield source, key, key
+            if allow_list is None or not allow_list.allows(endpoint, key):
+                yield source, key, value
+
+
+def _iter_json(data, key=None):
+    """(المفتاح، القيمة) لكل قيمة مفردة في JSON؛ عناصر القوائم تحمل مفتاح القائمة
+
+    تُفحص القيم كما أرسلت لا تمثيل str() للقاموس، فعلامات الاقتباس التي يضيفها
+    بايثون حول القيم لا تُحسب محاولة حقن
+    """
+    if isinstance(data, dict):
+        for name, value in data.items():
+            yield from _iter_json(value, str(name))
+    elif isinstance(data, list):
+        for value in data:
+            yield from _iter_json(value, key)
+    elif data is not None:
+        yield key or '', str(data)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌐 فهارس الترجمة المدمجة
+Merged per-locale translation catalogs
+
+يدمج ملفات translations/<lang>/LC_MESSAGES/messages.po مع قاموس TRANSLATIONS
+المكتوب يدوياً في قاموس واحد مسطح لكل لغة، يُبنى مرة واحدة لكل عملية.
+الترجمة بعدها بحث واحد في قاموس بدلاً من المرور بعدة مصادر.
+
+ترتيب الأولوية: TRANSLATIONS اليدوي ثم ملف .po ثم ملف .mo المترجم (إذا لم تتوفر مكتبة Babel).
+
+ومن الفهرس نفسه تُبنى حزم ترجمة JavaScript باسم يتضمن بصمة المحتوى
+(translations.<lang>.<hash>.json) مع نسخ gzip و brotli مضغوطة مسبقاً،
+فيخزنها المتصفح مرة واحدة لكل إصدار.
+"""
+
+import os
+import json
+import gzip
+import hashlib
+import gettext
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+def load_po_messages(path):
+    """قراءة ملف .po وإرجاع {النص: الترجمة} للرسائل المترجمة فقط"""
+    from babel.messages.pofile import read_po
+
+    with open(path, 'rb') as f:
+        catalog = read_po(f)
+    messages = {}
+    for message in catalog:
+        if not message.id or message.fuzzy:
+            continue
+        msgid = message.id[0] if isinstance(message.id, (list, tuple)) else message.id
+        msgstr = message.string[0] if isinstance(message.string, (list, tuple)) else message.string
+        if msgstr:
+            messages[msgid] = msgstr
+    return messages
+
+
+def load_mo_messages(path):
+    """قراءة ملف .mo المترجم بمكتبة gettext القياسية"""
+    with open(path, 'rb') as f:
+        translations = gettext.GNUTranslations(f)
+    return {msgid: msgstr for msgid, msgstr in translations._catalog.items()
+            if isinstance(msgid, str) and msgid and msgstr}
+
+
+def load_locale_messages(translations_dir, locale):
+    """رسائل لغة واحدة من ملفات translations/"""
+    base = os.path.join(translations_dir, locale, 'LC_MESSAGES')
+    po_path = os.path.join(base, 'messages.po')
+    mo_path = os.path.join(base, 'messages.mo')
+
+    if os.path.exists(po_path):
+        try:
+            return load_po_messages(po_path)
+        except ImportError:
+            pass
+    if os.path.exists(mo_path):
+        return load_mo_messages(mo_path)
+    return {}
+
+
+def build_catalogs(translations_dir, locales, overrides=None):
+    """بناء فهرس مدمج لكل لغة: {اللغة: {النص: الترجمة}}"""
+    overrides = overrides or {}
+    catalogs = {}
+    for locale in locales:
+        catalog = load_locale_messages(translations_dir, locale)
+        catalog.update(overrides.get(locale, {}))
+        catalogs[locale] = catalog
+    return catalogs
+
+
+class TranslationBundle:
+    """حزمة ترجمة لغة واحدة للمتصفح بنسخها المضغوطة"""
+
+    def __init__(self, locale, messages):
+        self.locale = locale
+        self.body = json.dumps(messages, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        self.digest = hashlib.sha256(self.body).hexdigest()[:12]
+        self.filename = f'translations.{locale}.{self.digest}.json'
+        # mtime=0 حتى تكون النسخة المضغوطة ثابتة بين عمليات البناء
+        self.encoded = {'gzip': gzip.compress(self.body, compresslevel=9, mtime=0)}
+        if BROTLI_AVAILABLE:
+            self.encoded['br'] = brotli.compress(self.body, quality=11)
+
+    def variant(self, accept_encoding):
+        """اختيار أصغر نسخة يقبلها المتصفح: (الترميز أو None، المحتوى)"""
+        accepted = set()
+        for part in (accept_encoding or '').split(','):
+            name, _, params = part.partition(';')
+            if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                accepted.add(name.strip())
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encoded and encoding in accepted:
+                return encoding, self.encoded[encoding]
+        return None, self.body
+
+
+def build_js_bundles(catalogs, extra=None):
+    """بناء حزمة لكل لغة من الفهرس المدمج مع مفاتيح الواجهة الإضافية"""
+    extra = extra or {}
+    bundles = {}
+    for locale, catalog in catalogs.items():
+        messages = dict(catalog)
+        messages.update(extra.get(locale, {}))
+        bundles[locale] = TranslationBundle(locale, messages)
+    return bundles
+
+
+def write_js_bundles(bundles, output_dir):
+    """كتابة الحزم ونسخها المضغوطة وملف manifest.json (للنشر خلف خادم ملفات ثابتة)"""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    for locale, bundle in bundles.items():
+        path = os.path.join(output_dir, bundle.filename)
+        with open(path, 'wb') as f:
+            f.write(bundle.body)
+        for encoding, data in bundle.encoded.items():
+            with open(path + ('.gz' if encoding == 'gzip' else '.br'), 'wb') as f:
+                f.write(data)
+        manifest[locale] = bundle.filename
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
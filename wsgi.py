@@ -12,21 +12,20 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 try:
-    from accounting_system_complete import app, init_db, SOCKETIO_AVAILABLE, socketio
+    from accounting_system_complete import create_app, SOCKETIO_AVAILABLE, socketio
 
-    # Initialize database
+    # Initialize database (once per process; with --preload this runs in the master only)
     print("🚀 بدء تهيئة النظام للإنتاج...")
-    with app.app_context():
-        init_db()
+    app = create_app()
     print("✅ تم تهيئة النظام بنجاح")
 
     # WSGI application with SocketIO support
+    # (SocketIO(app) already wraps app.wsgi_app, so the Flask app itself is the WSGI callable)
     if SOCKETIO_AVAILABLE and socketio:
         print("🔄 استخدام SocketIO للتحديث الفوري")
-        application = socketio
     else:
         print("📡 استخدام Flask العادي")
-        application = app
+    application = app
 
     print("🌐 النظام جاهز للعمل في الإنتاج")
 